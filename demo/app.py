@@ -13,7 +13,11 @@ The application will serve the main page with a form for entering
 claim details and display simulated fraud prediction results.
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, current_app, render_template, request, jsonify, send_file
+from werkzeug.exceptions import HTTPException
+from urllib.parse import quote
+import functools
+import mimetypes
 import os
 import uuid
 import json
@@ -24,14 +28,29 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import our new services and models
-from models import Claim, FileInfo
-from services import HybridDataService
-from utils import ValidationError, Config
+from models import Claim, CLAIM_SUMMARY_FIELDS
+from services import HybridDataService, AsyncHybridDataService, EventLoopThread
+from services.evidence_store import EvidenceStore
+from services.jobs import JobQueue, JobWorkerPool
+from utils import ValidationError, Config, validate_claim
+from utils.http_cache import ResponseStats, compress_response, version_etag
+from utils.pagination import InvalidCursorError
+
+
+class UploadRequest(Request):
+    """Request whose file parts are written to the evidence store as they are parsed"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        store = getattr(current_app, 'evidence_store', None)
+        if store is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return store.spool()
 
 
 def create_app(testing=False):
     """Create and configure the Flask application"""
     app = Flask(__name__)
+    app.request_class = UploadRequest
     
     # Initialize services
     data_service = HybridDataService()
@@ -40,52 +59,147 @@ def create_app(testing=False):
     # Store data_service in app context for testing
     app.data_service = data_service
 
+    # Optionally serve storage calls from one event loop per worker process,
+    # sharing an async Cosmos DB client between all request threads
+    async_service = None
+    if config.get('hybrid.async_storage', False):
+        storage_loop = EventLoopThread()
+        async_service = storage_loop.run(AsyncHybridDataService.create(data_service))
+    async_call_timeout = config.get('hybrid.async_call_timeout_seconds', 30.0)
+    app.async_service = async_service
+
+    def storage(method, *args, **kwargs):
+        """Call a storage method, on the storage event loop when async storage is enabled"""
+        if async_service is not None:
+            return storage_loop.run(getattr(async_service, method)(*args, **kwargs), async_call_timeout)
+        return getattr(data_service, method)(*args, **kwargs)
+
     # Configuration for file uploads
     UPLOAD_FOLDER = config.get('app.upload_folder', 'uploads')
     MAX_FILE_SIZE = config.get('app.max_file_size', 16 * 1024 * 1024)  # 16MB max file size
     ALLOWED_EXTENSIONS = config.get('app.allowed_extensions', {'pdf', 'png', 'jpg', 'jpeg', 'gif'})
+    # Uploads never change once saved, so clients may cache them for this long
+    DOWNLOAD_MAX_AGE = config.get('app.download_max_age', 365 * 24 * 3600)
+    # '' streams downloads from the worker; 'x-sendfile' or 'x-accel-redirect'
+    # hands the transfer to the front web server
+    DOWNLOAD_OFFLOAD = config.get('app.download_offload', '')
+    X_ACCEL_REDIRECT_PREFIX = config.get('app.x_accel_redirect_prefix', '/protected-uploads/')
+    # JSON reads carry ETags from the storage write version and are
+    # compressed when larger than this many bytes
+    JSON_ETAGS = config.get('app.json_etags', True)
+    COMPRESSION_MIN_BYTES = config.get('app.compression_min_bytes', 1024)
+    COMPRESSION_LEVEL = config.get('app.compression_level', 6)
+    # Summary fields /list_claims returns unless ?fields= asks for others
+    LIST_CLAIMS_FIELDS = ['claim_id', 'claim_amount', 'submission_time', 'files_count', 'status', 'fraud_score']
 
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
     app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
     app.config['TESTING'] = testing
 
-    # Create uploads directory if it doesn't exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(os.path.join(UPLOAD_FOLDER, 'pdfs'), exist_ok=True)
-    os.makedirs(os.path.join(UPLOAD_FOLDER, 'images'), exist_ok=True)
+    # Create the uploads directories; file parts stream into them while the request is parsed
+    evidence_store = EvidenceStore(
+        UPLOAD_FOLDER,
+        chunk_size=config.get('app.upload_chunk_bytes', 64 * 1024),
+        workers=config.get('app.upload_workers', 4),
+        fsync=config.get('app.upload_fsync', False))
+    app.evidence_store = evidence_store
+    data_service.evidence_store = evidence_store
 
     def allowed_file(filename):
         """Check if file extension is allowed"""
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-    def save_uploaded_file(file, file_type, claim_id):
+    def store_claim_stage(claim_data, results):
+        """Processing stage: save the claim to local storage, backup, event log and Cosmos DB"""
+        return {'claim_id': storage('save_claim', claim_data)}
+
+    def evidence_stage(claim_data, results):
+        """Processing stage: find other claims submitted with the same evidence files"""
+        shared = {}
+        for file_info in claim_data.get('uploaded_files', []):
+            if file_info.get('sha256'):
+                claim_ids = {ref['claim_id'] for ref in evidence_store.claims_for(file_info['sha256'])}
+                claim_ids.discard(claim_data['claim_id'])
+                if claim_ids:
+                    shared[file_info['sha256']] = sorted(claim_ids)
+        return {'shared_evidence': shared}
+
+    def release_submitted_files(claim_data):
+        """Drop the evidence references of a submission whose claim was never stored"""
+        saved_names = [file_info['saved_name'] for file_info in claim_data.get('uploaded_files', [])]
+        if saved_names:
+            evidence_store.release_files(claim_data['claim_id'], saved_names)
+
+    def release_failed_job(job, error):
+        """Release the files of a claim job that failed before its claim was stored"""
+        if job['stage_index'] == 0:
+            release_submitted_files(job['payload'])
+
+    # Submissions are queued as jobs whose stages run on local worker threads
+    ASYNC_SUBMIT = config.get('processing.async_submit', True)
+    job_pool = JobWorkerPool(
+        JobQueue(config.get('processing.jobs_path', 'jobs.db')),
+        [('store', store_claim_stage), ('evidence', evidence_stage)],
+        workers=config.get('processing.workers', 4),
+        max_attempts=config.get('processing.max_attempts', 5),
+        base_backoff=config.get('processing.retry_delay_seconds', 1.0),
+        max_backoff=config.get('processing.max_backoff_seconds', 60.0),
+        lease_seconds=config.get('processing.lease_seconds', 300.0),
+        permanent_errors=(ValidationError,),
+        retention_seconds=config.get('processing.job_retention_seconds', 86400.0),
+        on_failure=release_failed_job)
+    app.job_pool = job_pool
+    if job_pool.queue.stats()['depth']:
+        # Resume jobs left unfinished by a previous run
+        job_pool.start()
+
+    def save_uploaded_files(uploads, claim_id):
         """
-        Save an uploaded file and return file information.
+        Save the allowed uploaded files of a claim concurrently and return their file information.
         """
-        if file and allowed_file(file.filename):
-            # Get file extension
-            original_filename = file.filename
-            file_extension = original_filename.rsplit('.', 1)[1].lower()
-            
-            # Generate unique filename with claim ID
-            unique_filename = f"{claim_id}_{uuid.uuid4().hex}.{file_extension}"
-            
-            # Determine subfolder based on file type
-            subfolder = 'pdfs' if file_type == 'pdf' else 'images'
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], subfolder, unique_filename)
-            
-            # Save the file
-            file.save(filepath)
-            
-            return {
-                'original_name': original_filename,
-                'saved_name': unique_filename,
-                'file_path': filepath,
-                'file_type': file_type,
-                'file_size': os.path.getsize(filepath)
-            }
-        return None
+        accepted = [(file, file_type) for file, file_type in uploads
+                    if file and file.filename and allowed_file(file.filename)]
+        return evidence_store.save_all(accepted, claim_id)
+
+    response_stats = ResponseStats()
+    app.response_stats = response_stats
+
+    def conditional_json(kind):
+        """
+        Serve a JSON read with a weak ETag built from the write version of the
+        claims or the events, answering a matching If-None-Match with 304
+        before the view loads anything, and compress the response.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = None
+                if JSON_ETAGS:
+                    # Taken before the view reads, so a concurrent write changes it again.
+                    # The claim cache checks its entries against the same version, so
+                    # the body is never older than the ETag it is sent with.
+                    version = data_service.get_write_version(kind)
+                    if version:
+                        etag = version_etag(version, request.path, request.query_string.decode('latin-1'))
+                if etag and request.if_none_match.contains_weak(etag):
+                    response = app.response_class(status=304)
+                    response.set_etag(etag, weak=True)
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                    response.vary.add('Accept-Encoding')
+                    response_stats.record_not_modified()
+                    return response
+
+                response = app.make_response(view(*args, **kwargs))
+                if etag and response.status_code == 200:
+                    response.set_etag(etag, weak=True)
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                return compress_response(response, request.accept_encodings,
+                                         COMPRESSION_MIN_BYTES, COMPRESSION_LEVEL, response_stats)
+            return wrapper
+        return decorator
 
     @app.route('/')
     def index():
@@ -106,7 +220,8 @@ def create_app(testing=False):
     def submit_claim():
         """
         Handle claim submission with file uploads.
-        Saves uploaded files and returns file information.
+        Saves uploaded files, then queues the claim for processing and
+        returns 202 with the job ID (see /jobs/<job_id>).
         """
         try:
             # Get form data
@@ -118,37 +233,42 @@ def create_app(testing=False):
             if not claim_amount or not description:
                 return jsonify({'success': False, 'error': 'Missing required fields'}), 400
             
-            uploaded_files = []
-            
-            # Handle PDF document upload
-            if 'pdfDocument' in request.files:
-                pdf_file = request.files['pdfDocument']
-                if pdf_file.filename:
-                    file_info = save_uploaded_file(pdf_file, 'pdf', claim_id)
-                    if file_info:
-                        uploaded_files.append(file_info)
-            
-            # Handle image evidence uploads
-            if 'imageEvidence' in request.files:
-                image_files = request.files.getlist('imageEvidence')
-                for image_file in image_files:
-                    if image_file.filename:
-                        file_info = save_uploaded_file(image_file, 'image', claim_id)
-                        if file_info:
-                            uploaded_files.append(file_info)
-            
             # Save claim data to using our data service
             claim_data = {
                 'claim_id': claim_id,
                 'claim_amount': float(claim_amount),
                 'description': description,
-                'uploaded_files': uploaded_files,
+                'uploaded_files': [],
                 'submission_time': datetime.now().isoformat()
             }
             
+            try:
+                # Reject invalid claims before their files take evidence references
+                validate_claim(claim_data)
+                
+                # The PDF document and the image evidence, already spooled to disk and hashed
+                uploads = [(request.files.get('pdfDocument'), 'pdf')]
+                uploads += [(image_file, 'image') for image_file in request.files.getlist('imageEvidence')]
+                uploaded_files = save_uploaded_files(uploads, claim_id)
+                claim_data['uploaded_files'] = uploaded_files
+            except ValidationError as e:
+                return jsonify({'success': False, 'error': e.message, 'validation_errors': e.errors}), 400
+            
             # Save the claim using our data service
             try:
-                saved_claim_id = data_service.save_claim(claim_data)
+                if ASYNC_SUBMIT:
+                    # The job stores the raw claim until processed
+                    job_id = job_pool.submit('claim', claim_id, claim_data)
+                    return jsonify({
+                        'success': True,
+                        'uploadedFiles': uploaded_files,
+                        'message': f'Claim {claim_id} accepted for processing',
+                        'claim_id': claim_id,
+                        'job_id': job_id,
+                        'status_url': f'/jobs/{job_id}'
+                    }), 202
+                
+                saved_claim_id = storage('save_claim', claim_data)
                 return jsonify({
                     'success': True, 
                     'uploadedFiles': uploaded_files,
@@ -156,19 +276,43 @@ def create_app(testing=False):
                     'claim_id': saved_claim_id
                 })
             except ValidationError as e:
+                release_submitted_files(claim_data)
                 return jsonify({'success': False, 'error': e.message, 'validation_errors': e.errors}), 400
+            except Exception:
+                release_submitted_files(claim_data)
+                raise
             
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
 
+    @app.route('/jobs/<job_id>')
+    def get_job(job_id):
+        """
+        Progress of a claim processing job: status (queued, running,
+        succeeded or failed), completed stages, attempts and stage results.
+        """
+        try:
+            job = job_pool.status(job_id)
+            
+            if not job:
+                return jsonify({'success': False, 'error': 'Job not found'}), 404
+            
+            return jsonify({
+                'success': True,
+                'job': job
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/get_claim/<claim_id>')
+    @conditional_json('claims')
     def get_claim(claim_id):
         """
         Retrieve claim data and file information by claim ID.
         """
         try:
             # Get claim using data service
-            claim = data_service.get_claim(claim_id)
+            claim = storage('get_claim', claim_id)
             
             if not claim:
                 return jsonify({'success': False, 'error': 'Claim not found'}), 404
@@ -180,70 +324,155 @@ def create_app(testing=False):
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/claims/<claim_id>/history')
+    def get_claim_history(claim_id):
+        """
+        List the stored revisions of a claim.
+        """
+        try:
+            versions = storage('get_claim_history', claim_id)
+            
+            if not versions:
+                return jsonify({'success': False, 'error': 'No history for claim'}), 404
+            
+            return jsonify({
+                'success': True,
+                'claim_id': claim_id,
+                'versions': versions
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/claims/<claim_id>/history/<int:version>')
+    def get_claim_version(claim_id, version):
+        """
+        Retrieve a claim as it was at a given revision.
+        """
+        try:
+            claim = storage('get_claim_at', claim_id, version)
+            
+            if not claim:
+                return jsonify({'success': False, 'error': 'Claim version not found'}), 404
+            
+            return jsonify({
+                'success': True,
+                'version': version,
+                'claim': claim
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    def cache_forever(response):
+        """Mark a download as immutable and cacheable by the reviewer's browser only"""
+        response.cache_control.public = None
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        response.cache_control.max_age = DOWNLOAD_MAX_AGE
+        return response
+
+    def offloaded_download(file_path, filename, sha256):
+        """
+        Answer a download with headers only, leaving the transfer (and any
+        Range request) to the front web server.
+        """
+        stat = os.stat(file_path)
+        response = app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        response.set_etag(sha256 or f"{int(stat.st_mtime)}-{stat.st_size}")
+        response.last_modified = stat.st_mtime
+        response = cache_forever(response).make_conditional(request)
+        if response.status_code == 304:
+            return response
+        if DOWNLOAD_OFFLOAD == 'x-accel-redirect':
+            relative_path = os.path.relpath(file_path, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX + quote(relative_path)
+        else:
+            response.headers['X-Sendfile'] = os.path.abspath(file_path)
+        return response
+
     @app.route('/download_file/<claim_id>/<filename>')
     def download_file(claim_id, filename):
         """
         Download uploaded files by claim ID and filename.
+        
+        The content hash is the strong ETag, so If-None-Match and
+        If-Modified-Since are answered with 304, Range requests with 206,
+        and the file may be cached for good.
         """
         try:
-            # Check if file is PDF or image based on extension
-            file_extension = filename.rsplit('.', 1)[1].lower()
-            if file_extension == 'pdf':
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'pdfs', filename)
-            else:
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'images', filename)
+            # Content-addressed object referenced by the claim, or a file saved before that
+            file_path, sha256 = evidence_store.locate(claim_id, filename)
             
-            if os.path.exists(file_path):
-                return send_file(file_path, as_attachment=True)
+            if file_path and os.path.exists(file_path):
+                if DOWNLOAD_OFFLOAD:
+                    return offloaded_download(file_path, filename, sha256)
+                return cache_forever(send_file(
+                    file_path, as_attachment=True, download_name=filename,
+                    etag=sha256 or True, conditional=True, max_age=DOWNLOAD_MAX_AGE))
             else:
                 return jsonify({'success': False, 'error': 'File not found'})
-                
+        
+        except HTTPException as e:
+            # e.g. 416 for a range outside the file
+            return e
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
 
+    @app.route('/evidence/<sha256>/claims')
+    def evidence_claims(sha256):
+        """
+        List the claims an uploaded file (by content hash) was submitted with.
+        The same evidence on several claims is a fraud signal.
+        """
+        try:
+            references = evidence_store.claims_for(sha256.lower())
+            return jsonify({
+                'success': True,
+                'sha256': sha256.lower(),
+                'claims': references,
+                'count': len(references)
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/list_claims')
+    @conditional_json('claims')
     def list_claims():
         """
-        List all submitted claims.
+        List submitted claims, newest first.
+        
+        Pass the returned next_cursor as ?cursor= to fetch the following page,
+        and a comma-separated ?fields= to choose the summary fields returned.
         """
         try:
-            # Get limit and offset from query parameters
+            # Get limit, cursor and legacy offset from query parameters
             limit = int(request.args.get('limit', 100))
             offset = int(request.args.get('offset', 0))
+            cursor = request.args.get('cursor')
             
-            # Get claims using data service
-            claims = data_service.list_claims(limit=limit)
-            
-            # Apply offset manually if needed
-            if offset > 0 and offset < len(claims):
-                claims = claims[offset:]
+            fields = LIST_CLAIMS_FIELDS
+            if request.args.get('fields'):
+                fields = [name.strip() for name in request.args['fields'].split(',') if name.strip()]
+                unknown = [name for name in fields if name not in CLAIM_SUMMARY_FIELDS]
+                if unknown or not fields:
+                    return jsonify({'success': False,
+                                    'error': f"Unknown fields: {', '.join(unknown)}; "
+                                             f"choose from {', '.join(CLAIM_SUMMARY_FIELDS)}"}), 400
             
-            # Format for response
-            claim_list = []
-            for claim in claims:
-                # Handle both object and dictionary formats
-                if isinstance(claim, dict):
-                    claim_list.append({
-                        'claim_id': claim.get('claim_id'),
-                        'claim_amount': claim.get('claim_amount'),
-                        'submission_time': claim.get('submission_time'),
-                        'files_count': len(claim.get('uploaded_files', [])),
-                        'status': claim.get('status'),
-                        'fraud_score': claim.get('fraud_score')
-                    })
-                else:
-                    # For object type (when using local service)
-                    claim_list.append({
-                        'claim_id': claim.claim_id,
-                        'claim_amount': claim.claim_amount,
-                        'submission_time': claim.submission_time,
-                        'files_count': len(claim.uploaded_files),
-                        'status': claim.status,
-                        'fraud_score': claim.fraud_score
-                    })
+            # Get claim summaries using data service
+            if offset > 0 and not cursor:
+                # Legacy offset pagination; its cost grows with the offset
+                claims = storage('list_claim_summaries', limit=limit, offset=offset, fields=fields)
+                next_cursor = None
+            else:
+                claims, next_cursor = storage('list_claim_summaries_page',
+                                              limit=limit, cursor=cursor, fields=fields)
             
-            return jsonify({'success': True, 'claims': claim_list})
+            return jsonify({'success': True, 'claims': claims, 'next_cursor': next_cursor})
             
+        except InvalidCursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)})
 
@@ -260,7 +489,7 @@ def create_app(testing=False):
                 return jsonify({'success': False, 'error': 'No update data provided'}), 400
             
             # Update claim using data service
-            updated_claim = data_service.update_claim(claim_id, update_data)
+            updated_claim = storage('update_claim', claim_id, update_data)
             
             if not updated_claim:
                 return jsonify({'success': False, 'error': 'Claim not found or update failed'}), 404
@@ -283,22 +512,61 @@ def create_app(testing=False):
             return jsonify({'success': False, 'error': str(e)}), 500
 
     @app.route('/events/<entity_id>')
+    @conditional_json('events')
     def get_events(entity_id):
         """
         Get events for a specific entity (e.g., a claim)
         """
         try:
-            # Get limit from query parameters
+            # Get limit and cursor from query parameters
             limit = int(request.args.get('limit', 100))
+            cursor = request.args.get('cursor')
             
             # Get events using the hybrid data service
-            events = data_service.list_events(entity_id, limit)
+            events, next_cursor = storage('list_events_page', entity_id, limit, cursor)
             
             return jsonify({
                 'success': True,
                 'events': events,
-                'count': len(events)
+                'count': len(events),
+                'next_cursor': next_cursor
             })
+        except InvalidCursorError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/healthz')
+    def healthz():
+        """
+        Liveness and storage health from cached state; never touches storage.
+        """
+        return jsonify(dict(data_service.get_health(), success=True))
+
+    @app.route('/metrics')
+    def metrics():
+        """
+        Operational metrics: read cache, cloud sync lag, outbox depth, RU
+        charge, latency and item count histograms per Cosmos DB operation,
+        evidence storage saved by deduplication, processing queue depth
+        with latency per stage, and 304s and bytes saved by compression on
+        the JSON read API.
+        """
+        try:
+            metrics = dict(data_service.get_metrics(), evidence=evidence_store.stats(), jobs=job_pool.stats(),
+                           http=response_stats.snapshot())
+            return jsonify({'success': True, 'metrics': metrics})
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/stats')
+    def stats():
+        """
+        Dashboard aggregates, maintained as claims are written, so serving
+        them never scans the claims.
+        """
+        try:
+            return jsonify({'success': True, 'stats': storage('get_aggregates')})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -0,0 +1,91 @@
+"""
+Benchmark CosmosDBService against the in-memory Cosmos DB fake.
+
+Loads N synthetic claims (and one event each) through save_claims_bulk and
+save_events_bulk, then times point reads, deep OFFSET listings against
+continuation-token pages, summary projections and per-entity event
+listings. Alongside wall-clock time it reports the mean synthetic request
+charge of each operation from cosmos_metrics, which is what differs
+between query shapes on a real account. Latency and throttling can be
+injected to see how the service behaves under them.
+
+Usage (from the demo directory):
+    python -m benchmarks.cosmos_service
+    python -m benchmarks.cosmos_service --sizes 1000 --latency-ms 5 --throttle-rate 0.01
+"""
+import argparse
+import random
+import time
+import uuid
+from typing import Callable, Dict, List, Any
+
+from benchmarks.storage_engines import make_claims, timed
+from services.cosmos_client_factory import CosmosClientFactory
+from services.cosmos_metrics import cosmos_metrics
+from services.cosmos_service import CosmosDBService
+from utils.config import Config
+
+
+def make_events(claims: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One submission event per claim"""
+    return [{'event_id': str(uuid.uuid4()), 'entity_id': claim['claim_id'], 'event_type': 'submitted',
+             'timestamp': claim['submission_time'], 'data': {}} for claim in claims]
+
+
+def run_size(claims: List[Dict[str, Any]], endpoint: str, reads: int) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark on a fresh fake account and return ms and RU per operation"""
+    CosmosClientFactory.reset()
+    Config.set('database.cosmos_endpoint', endpoint)
+    service = CosmosDBService()
+    service.save_claims_bulk(claims)
+    service.save_events_bulk(make_events(claims))
+
+    rng = random.Random(7)
+    sample = [rng.choice(claims)['claim_id'] for _ in range(reads)]
+    deep = len(claims) // 2
+    benchmarks: Dict[str, Callable[[], Any]] = {
+        'get_claim': lambda: service.get_claim(rng.choice(sample)),
+        'list_claims': lambda: service.list_claims(100, deep),
+        'list_claims_page': lambda: service.list_claims_page(100),
+        'list_claim_summaries': lambda: service.list_claim_summaries(100, deep),
+        'list_events': lambda: service.list_events(rng.choice(sample), 10),
+    }
+
+    results = {}
+    for name, fn in benchmarks.items():
+        cosmos_metrics.reset()
+        repeat = reads if name in ('get_claim', 'list_events') else 10
+        elapsed = timed(fn, repeat=repeat)
+        charge = cosmos_metrics.snapshot()['operations'].get(name, {}).get('request_charge', {})
+        results[name] = {'ms': elapsed, 'ru': charge.get('sum', 0.0) / repeat}
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark CosmosDBService on the in-memory fake")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="Numbers of claims to load")
+    parser.add_argument('--reads', type=int, default=200, help="Random point reads per run")
+    parser.add_argument('--partitions', type=int, default=4, help="Physical partitions per container")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latency added to every request")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests answered 429")
+    args = parser.parse_args(argv)
+
+    Config()
+    endpoint = (f"fake://bench?partitions={args.partitions}&latency_ms={args.latency_ms}"
+                f"&throttle_rate={args.throttle_rate}&seed=1")
+
+    print(f"{'operation':<22} {'claims':>9} {'ms':>9} {'RU':>9}")
+    for size in args.sizes:
+        start = time.perf_counter()
+        results = run_size(make_claims(size), endpoint, args.reads)
+        for name, r in results.items():
+            print(f"{name:<22} {size:>9} {r['ms']:>9.3f} {r['ru']:>9.2f}", flush=True)
+        print(f"({size} claims in {time.perf_counter() - start:.1f}s)")
+    CosmosClientFactory.reset()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""
+Benchmark the local storage engines against each other.
+
+Loads N synthetic claims into each engine through its storage hooks, then
+times point reads, first and deep page listings and full save_claim calls
+(validation, history and events included). Every run uses a fresh
+temporary directory.
+
+Usage (from the demo directory):
+    python -m benchmarks.storage_engines
+    python -m benchmarks.storage_engines --sizes 10000 100000 --engines file sqlite
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any
+
+from services.data_service import LocalDataService
+from services.segment_service import SegmentedDataService
+from services.sqlite_service import SQLiteDataService
+from utils.config import Config
+
+ENGINES: Dict[str, Callable[[], LocalDataService]] = {
+    'file': LocalDataService,
+    'segment': SegmentedDataService,
+    'sqlite': SQLiteDataService,
+}
+STATUSES = ('pending', 'approved', 'rejected', 'under_review')
+
+
+def make_claims(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate synthetic claim documents with spread-out submission times"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [{
+        'claim_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'claim_amount': round(rng.uniform(100, 50000), 2),
+        'description': f"Synthetic claim {i}",
+        'uploaded_files': [],
+        'submission_time': (start + timedelta(seconds=rng.randrange(365 * 86400))).isoformat(),
+        'updated_time': None,
+        'fraud_score': round(rng.random(), 3),
+        'status': rng.choice(STATUSES)
+    } for i in range(count)]
+
+
+def timed(fn: Callable[[], Any], repeat: int = 1) -> float:
+    """Average wall-clock milliseconds of fn over repeat calls"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run_engine(engine: str, claims: List[Dict[str, Any]], reads: int) -> Dict[str, float]:
+    """Run every benchmark for one engine and return the timings"""
+    root = tempfile.mkdtemp(prefix=f"bench-{engine}-")
+    for key, value in (('claims_dir', 'claims'), ('events_dir', 'events'),
+                       ('backup_dir', 'backups'), ('segments_dir', 'segments'),
+                       ('sqlite_path', 'claims.db')):
+        Config.set(f'storage.{key}', f"{root}/{value}")
+
+    service = ENGINES[engine]()
+    try:
+        results = {}
+        start = time.perf_counter()
+        for claim_data in claims:
+            service._write_claim_record(claim_data['claim_id'], claim_data)
+        elapsed = time.perf_counter() - start
+        results['load_claims_per_s'] = len(claims) / elapsed if elapsed else 0.0
+
+        rng = random.Random(7)
+        sample = [rng.choice(claims)['claim_id'] for _ in range(reads)]
+        results['point_read_ms'] = timed(lambda: [service._read_claim_record(c) for c in sample]) / reads
+        results['first_page_ms'] = timed(lambda: service._list_claim_records(100, 0), repeat=10)
+        results['deep_page_ms'] = timed(
+            lambda: service._list_claim_records(100, len(claims) // 2), repeat=10)
+
+        extra = make_claims(200, seed=len(claims))
+        results['save_claim_ms'] = timed(lambda: [service.save_claim(c) for c in extra]) / len(extra)
+
+        if isinstance(service, SQLiteDataService):
+            results['status_query_ms'] = timed(
+                lambda: service.find_claims(status='under_review', min_fraud_score=0.9), repeat=10)
+        return results
+    finally:
+        service.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Compare local storage engines")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="Numbers of claims to load")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=['file', 'segment', 'sqlite'],
+                        help="Engines to benchmark")
+    parser.add_argument('--reads', type=int, default=1000, help="Random point reads per run")
+    args = parser.parse_args(argv)
+
+    # Load config.json now so it cannot override the directories set per run
+    Config()
+    Config.set('storage.event_durability', 'async')
+
+    print(f"{'engine':<8} {'claims':>9} {'load/s':>10} {'read ms':>9} {'page ms':>9} "
+          f"{'deep ms':>9} {'save ms':>9} {'query ms':>9}")
+    for size in args.sizes:
+        claims = make_claims(size)
+        for engine in args.engines:
+            r = run_engine(engine, claims, args.reads)
+            query = f"{r['status_query_ms']:>9.3f}" if 'status_query_ms' in r else f"{'-':>9}"
+            print(f"{engine:<8} {size:>9} {r['load_claims_per_s']:>10.0f} {r['point_read_ms']:>9.3f} "
+                  f"{r['first_page_ms']:>9.3f} {r['deep_page_ms']:>9.3f} {r['save_claim_ms']:>9.3f} "
+                  f"{query}", flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -27,7 +27,18 @@ class BaseConfig(ABC):
     # Cosmos DB Settings
     COSMOS_DATABASE = os.environ.get('COSMOS_DATABASE', 'insurance-claims-db')
     COSMOS_CLAIMS_CONTAINER = os.environ.get('COSMOS_CLAIMS_CONTAINER', 'claims')
-    COSMOS_EVENTS_CONTAINER = os.environ.get('COSMOS_EVENTS_CONTAINER', 'events')
+    COSMOS_EVENTS_CONTAINER = os.environ.get('COSMOS_EVENTS_CONTAINER', 'events-by-entity')
+    # Events container partitioned on /event_id, read until its events are migrated
+    COSMOS_EVENTS_LEGACY_CONTAINER = os.environ.get('COSMOS_EVENTS_LEGACY_CONTAINER', '')
+    COSMOS_BULK_MAX_WORKERS = int(os.environ.get('COSMOS_BULK_MAX_WORKERS', '8'))
+    COSMOS_BULK_BATCH_SIZE = 100  # Cosmos DB caps transactional batches at 100
+    COSMOS_POOL_SIZE = int(os.environ.get('COSMOS_POOL_SIZE', '32'))
+    COSMOS_CONNECTION_TIMEOUT = int(os.environ.get('COSMOS_CONNECTION_TIMEOUT', '10'))
+    COSMOS_CIRCUIT_FAILURE_THRESHOLD = 5
+    COSMOS_CIRCUIT_RESET_SECONDS = 30.0
+    COSMOS_HEALTH_PROBE_INTERVAL = 10.0
+    COSMOS_SLOW_QUERY_REQUEST_CHARGE = float(os.environ.get('COSMOS_SLOW_QUERY_REQUEST_CHARGE', '50'))
+    COSMOS_SLOW_QUERY_MS = float(os.environ.get('COSMOS_SLOW_QUERY_MS', '500'))
     
     @abstractmethod
     def validate(self):
@@ -43,7 +54,8 @@ class DevelopmentConfig(BaseConfig):
     # Cosmos DB - Optional for development
     COSMOS_ENDPOINT = os.environ.get('COSMOS_ENDPOINT', '')
     COSMOS_KEY = os.environ.get('COSMOS_KEY', '')
-    USE_COSMOS = bool(COSMOS_ENDPOINT and COSMOS_KEY)
+    # fake:// endpoints select the in-memory Cosmos DB fake, which needs no key
+    USE_COSMOS = bool(COSMOS_ENDPOINT and (COSMOS_KEY or COSMOS_ENDPOINT.startswith('fake://')))
     USE_MANAGED_IDENTITY = False
     FALLBACK_TO_LOCAL = True
     
@@ -79,7 +91,7 @@ class StagingConfig(BaseConfig):
         if not self.COSMOS_ENDPOINT:
             raise ValueError("COSMOS_ENDPOINT is required for staging environment")
         
-        if not self.USE_MANAGED_IDENTITY and not self.COSMOS_KEY:
+        if not self.USE_MANAGED_IDENTITY and not self.COSMOS_KEY and not self.COSMOS_ENDPOINT.startswith('fake://'):
             raise ValueError("COSMOS_KEY required when not using managed identity")
         
         return True
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for the Flask app.
+
+Gunicorn loads this file from the working directory, so the startup
+command in terraform/flask_app_service.tf picks it up unchanged.
+
+The routes are synchronous Flask views. With hybrid.async_storage on, a
+request thread hands its storage calls to the worker's event loop and
+blocks until they finish, so the calls a worker keeps in flight are capped
+by its request threads. Workers then run threaded, with
+hybrid.async_request_threads threads each; the threads only wait, which
+keeps that cap high without serving the app from an ASGI server.
+"""
+from utils.config import Config
+
+_config = Config()
+if _config.get('hybrid.async_storage', False):
+    worker_class = 'gthread'
+    threads = _config.get('hybrid.async_request_threads', 128)
+
+
+def post_fork(server, worker):
+    """Give each worker its own warmed-up Cosmos DB client before it takes requests"""
+    import sys
+    app_module = sys.modules.get('app')
+    # Only set when the app was imported before forking (--preload); otherwise
+    # each worker imports it after the fork and warms up while creating it
+    if app_module is not None:
+        app_module.app.data_service.warm_up()
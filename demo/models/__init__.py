@@ -1,7 +1,7 @@
 """
 Package initialization for models.
 """
-from .claim import Claim, FileInfo
+from .claim import Claim, FileInfo, CLAIM_SUMMARY_FIELDS, claim_summary
 from .event import Event
 
-__all__ = ['Claim', 'FileInfo', 'Event']
+__all__ = ['Claim', 'FileInfo', 'Event', 'CLAIM_SUMMARY_FIELDS', 'claim_summary']
@@ -7,6 +7,11 @@ from datetime import datetime
 import uuid
 
 
+# Fields of the lightweight claim summary used by listings
+CLAIM_SUMMARY_FIELDS = ('claim_id', 'claim_amount', 'submission_time', 'updated_time',
+                        'status', 'fraud_score', 'files_count')
+
+
 @dataclass
 class FileInfo:
     """Represents an uploaded file in the system"""
@@ -15,6 +20,7 @@ class FileInfo:
     file_path: str
     file_type: str
     file_size: int
+    sha256: Optional[str] = None  # hex digest computed while the upload was received
 
 
 @dataclass
@@ -28,6 +34,8 @@ class Claim:
     updated_time: Optional[str] = None
     fraud_score: Optional[float] = None
     status: str = "pending"
+    # Saves so far; orders copies of the claim replicated between instances
+    revision: int = 0
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert the claim to a dictionary"""
@@ -39,9 +47,15 @@ class Claim:
             "submission_time": self.submission_time,
             "updated_time": self.updated_time,
             "fraud_score": self.fraud_score,
-            "status": self.status
+            "status": self.status,
+            "revision": self.revision
         }
     
+    def touch(self, updated_time: Optional[str] = None) -> None:
+        """Stamp the claim as modified now (or at updated_time) and count the save"""
+        self.updated_time = updated_time or datetime.now().isoformat()
+        self.revision += 1
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Claim':
         """Create a claim from a dictionary"""
@@ -54,5 +68,23 @@ class Claim:
             submission_time=data.get('submission_time', datetime.now().isoformat()),
             updated_time=data.get('updated_time'),
             fraud_score=data.get('fraud_score'),
-            status=data.get('status', 'pending')
+            status=data.get('status', 'pending'),
+            revision=data.get('revision') or 0
         )
+
+
+def claim_summary(claim_data: Dict[str, Any],
+                  fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Build the listing summary of a claim dictionary.
+
+    Args:
+        claim_data: Full claim dictionary, or an existing summary
+        fields: Summary fields to keep (defaults to all of CLAIM_SUMMARY_FIELDS)
+
+    Returns:
+        Dict[str, Any]: The summary, with files_count in place of uploaded_files
+    """
+    if 'files_count' not in claim_data:
+        claim_data = dict(claim_data, files_count=len(claim_data.get('uploaded_files') or []))
+    return {name: claim_data.get(name) for name in (fields or CLAIM_SUMMARY_FIELDS)}
@@ -2,7 +2,12 @@
 Package initialization for services.
 """
 from .data_service import LocalDataService
+from .segment_service import SegmentedDataService
+from .sqlite_service import SQLiteDataService
 from .cosmos_service import CosmosDBService
 from .hybrid_service import HybridDataService
+from .async_cosmos_service import AsyncCosmosDBService
+from .async_hybrid_service import AsyncHybridDataService, EventLoopThread
 
-__all__ = ['LocalDataService', 'CosmosDBService', 'HybridDataService']
+__all__ = ['LocalDataService', 'SegmentedDataService', 'SQLiteDataService', 'CosmosDBService', 'HybridDataService',
+           'AsyncCosmosDBService', 'AsyncHybridDataService', 'EventLoopThread']
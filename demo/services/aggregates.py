@@ -0,0 +1,349 @@
+"""
+Incrementally maintained claim aggregates for the dashboard (/stats).
+
+Each claim write turns into a delta of flat counters: the claim's previous
+version is subtracted and its new version added. A save, update or delete
+therefore costs O(1), and reading the totals never scans the claims. A
+replayed write adds nothing, because its previous version equals the new
+one. While the change feed keeps the local store complete, the hybrid
+service passes the version it read locally to the Cosmos DB write, so the
+write does not read it again. The counters are:
+
+    count, amount                             all claims
+    status_count/<status>, status_amount/<status>
+    day_count/<YYYY-MM-DD>, day_amount/<YYYY-MM-DD>   by submission day
+    fraud_score/<bucket>                      fraud score histogram
+
+Locally, AggregateStore keeps them in a journal of deltas next to the
+claim files. Every process using the store replays new journal records
+before reading, as with the claim index, and the journal is compacted into
+a snapshot once it grows. In Cosmos DB they live in a few shard documents
+of the aggregates container. Writers apply patch increments to a random
+shard, so concurrent writers do not contend on one document, and readers
+sum the shards.
+
+Two writers updating the same claim at the same moment can both subtract
+the same previous version, so totals can drift under such races. rebuild
+recomputes them from the claims (from the demo directory):
+    python -m services.aggregates rebuild
+    python -m services.aggregates show
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COUNTER_GROUPS = ('status_count', 'status_amount', 'day_count', 'day_amount', 'fraud_score')
+SCORE_BUCKETS = tuple(f"{i / 10:.1f}-{(i + 1) / 10:.1f}" for i in range(10))
+UNSCORED = 'unscored'
+
+# Cosmos DB accepts at most 10 operations per patch request
+MAX_PATCH_OPERATIONS = 10
+
+# Replaced version of a claim the caller did not read; the writer reads it itself
+REPLACED_UNREAD = object()
+
+
+def score_bucket(fraud_score: Any) -> str:
+    """Histogram bucket of a fraud score between 0 and 1"""
+    if fraud_score is None:
+        return UNSCORED
+    try:
+        index = int(float(fraud_score) * 10)
+    except (TypeError, ValueError):
+        return UNSCORED
+    return SCORE_BUCKETS[min(max(index, 0), len(SCORE_BUCKETS) - 1)]
+
+
+def claim_counters(claim: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Counters contributed by one claim (a full claim or its summary)"""
+    if not claim:
+        return {}
+    try:
+        amount = float(claim.get('claim_amount') or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    status = str(claim.get('status') or 'unknown')
+    day = str(claim.get('submission_time') or '')[:10] or 'unknown'
+    return {
+        'count': 1, 'amount': amount,
+        f"status_count/{status}": 1, f"status_amount/{status}": amount,
+        f"day_count/{day}": 1, f"day_amount/{day}": amount,
+        f"fraud_score/{score_bucket(claim.get('fraud_score'))}": 1,
+    }
+
+
+def merge_counters(counters: Dict[str, float], delta: Dict[str, float], sign: int = 1) -> Dict[str, float]:
+    """Add a delta to counters in place, dropping counters that reach zero"""
+    for key, value in delta.items():
+        total = counters.get(key, 0) + sign * value
+        if abs(total) < 1e-9:
+            counters.pop(key, None)
+        else:
+            counters[key] = total
+    return counters
+
+
+def claim_delta(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Counter changes of replacing a claim version with another.
+
+    Args:
+        previous: Version being replaced, or None for a new claim
+        current: New version, or None for a deletion
+
+    Returns:
+        Dict[str, float]: Non-zero counter changes
+    """
+    return merge_counters(merge_counters({}, claim_counters(current)), claim_counters(previous), sign=-1)
+
+
+def compute_counters(claims: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, float], int]:
+    """Counters of a full set of claims (or summaries) and the number of claims"""
+    counters: Dict[str, float] = {}
+    count = 0
+    for claim in claims:
+        merge_counters(counters, claim_counters(claim))
+        count += 1
+    return counters, count
+
+
+def summarize(counters: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Dashboard view of the counters.
+
+    Returns:
+        Dict[str, Any]: total, by_status and by_day (each with count and
+        amount) and the fraud_score_histogram
+    """
+    def grouped(kind: str) -> Dict[str, Dict[str, Any]]:
+        groups = {}
+        for key, value in counters.items():
+            if key.startswith(f"{kind}_count/") and round(value) > 0:
+                name = key.split('/', 1)[1]
+                groups[name] = {'count': int(round(value)),
+                                'amount': round(counters.get(f"{kind}_amount/{name}", 0.0), 2)}
+        return dict(sorted(groups.items()))
+
+    histogram = {bucket: int(round(counters.get(f"fraud_score/{bucket}", 0)))
+                 for bucket in SCORE_BUCKETS + (UNSCORED,)}
+    return {
+        'total': {'count': int(round(counters.get('count', 0))),
+                  'amount': round(counters.get('amount', 0.0), 2)},
+        'by_status': grouped('status'),
+        'by_day': grouped('day'),
+        'fraud_score_histogram': histogram,
+    }
+
+
+# Cosmos DB shard documents
+
+def shard_document(shard_id: str, counters: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Aggregates shard document holding counters, with every group present so patches can add to it"""
+    document: Dict[str, Any] = {'id': shard_id, 'count': 0, 'amount': 0.0}
+    document.update({group: {} for group in COUNTER_GROUPS})
+    for key, value in (counters or {}).items():
+        if '/' in key:
+            group, name = key.split('/', 1)
+            document[group][name] = value
+        else:
+            document[key] = value
+    return document
+
+
+def document_counters(document: Dict[str, Any]) -> Dict[str, float]:
+    """Counters held by a shard document"""
+    counters = {key: document.get(key) or 0 for key in ('count', 'amount')}
+    for group in COUNTER_GROUPS:
+        for name, value in (document.get(group) or {}).items():
+            counters[f"{group}/{name}"] = value
+    return counters
+
+
+def patch_operations(delta: Dict[str, float]) -> List[List[Dict[str, Any]]]:
+    """Increment operations applying a delta to a shard document, in requests of at most ten"""
+    operations = [{'op': 'incr', 'path': f"/{key}", 'value': value} for key, value in sorted(delta.items())]
+    return [operations[start:start + MAX_PATCH_OPERATIONS]
+            for start in range(0, len(operations), MAX_PATCH_OPERATIONS)]
+
+
+def shard_ids(shards: int) -> List[str]:
+    return [f"shard-{index}" for index in range(max(1, shards))]
+
+
+class AggregateStore:
+    """Journal-backed aggregate counters shared by the processes using one local store"""
+
+    def __init__(self, journal_path: str, compact_min_records: int = 1000):
+        """
+        Load the counters from the journal.
+
+        Args:
+            journal_path: Path of the delta journal
+            compact_min_records: Journal length below which it is never rewritten
+        """
+        self.journal_path = journal_path
+        self.compact_min_records = compact_min_records
+
+        self._lock = threading.RLock()
+        self._counters: Dict[str, float] = {}
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._updated_at: Optional[float] = None
+
+        with self._lock:
+            self._catch_up()
+
+    def exists(self) -> bool:
+        """Whether the journal has been written, i.e. the counters were ever built"""
+        return os.path.exists(self.journal_path)
+
+    @contextmanager
+    def _locked_file(self):
+        """Hold the cross-process lock guarding journal appends and rewrites"""
+        with open(f"{self.journal_path}.lock", 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def _reset(self) -> None:
+        self._counters = {}
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _catch_up(self) -> None:
+        """Apply journal records appended since the last read, by any process"""
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        if self._journal_inode is not None and stat.st_ino != self._journal_inode:
+            # Another process compacted or rebuilt the journal
+            self._reset()
+        if stat.st_size <= self._journal_offset and self._journal_inode == stat.st_ino:
+            return
+
+        with open(self.journal_path, 'rb') as f:
+            self._journal_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Record still being written by another process
+                    break
+                self._journal_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping corrupt aggregates record in {self.journal_path}")
+                    continue
+                self._journal_records += 1
+                if record.get('op') == 'snapshot':
+                    self._counters = dict(record['counters'])
+                else:
+                    merge_counters(self._counters, record['delta'])
+                self._updated_at = record.get('ts', self._updated_at)
+
+    def _write_snapshot(self, counters: Dict[str, float]) -> None:
+        """Atomically replace the journal with one snapshot record and reload it"""
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(json.dumps({'op': 'snapshot', 'counters': counters, 'ts': time.time()},
+                               separators=(',', ':')) + '\n')
+        os.replace(temp_path, self.journal_path)
+        self._reset()
+        self._catch_up()
+
+    def apply(self, delta: Dict[str, float]) -> None:
+        """Add a delta (see claim_delta) to the counters"""
+        if not delta:
+            return
+        line = (json.dumps({'op': 'delta', 'delta': delta, 'ts': time.time()},
+                           separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            with self._locked_file():
+                fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                self._catch_up()
+            if self._journal_records > self.compact_min_records:
+                self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the journal as a single snapshot of the current counters"""
+        with self._lock, self._locked_file():
+            self._catch_up()
+            self._write_snapshot(self._counters)
+
+    def replace(self, counters: Dict[str, float]) -> None:
+        """Replace all counters, e.g. with ones rebuilt from the claims"""
+        with self._lock, self._locked_file():
+            self._write_snapshot(counters)
+
+    def counters(self) -> Dict[str, float]:
+        """Current counters"""
+        with self._lock:
+            self._catch_up()
+            return dict(self._counters)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Dashboard view of the counters (see summarize) and when they last changed"""
+        with self._lock:
+            self._catch_up()
+            return dict(summarize(self._counters), updated_at=self._updated_at)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for rebuilding and showing the aggregates"""
+    from .cosmos_service import CosmosDBService
+    from .hybrid_service import HybridDataService
+
+    parser = argparse.ArgumentParser(description="Rebuild or show the dashboard aggregates")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild = subparsers.add_parser('rebuild', help="Recompute the aggregates from the claims")
+    rebuild.add_argument('--local-only', action='store_true', help="Leave the Cosmos DB aggregates alone")
+    subparsers.add_parser('show', help="Print the aggregates")
+    args = parser.parse_args(argv)
+
+    local_service = HybridDataService._create_local_service()
+    cosmos_service = None
+    if not getattr(args, 'local_only', False):
+        cosmos_service = CosmosDBService()
+        if not cosmos_service.is_connected() or cosmos_service.aggregates_container is None:
+            cosmos_service = None
+
+    try:
+        if args.command == 'show':
+            print(json.dumps({'local': local_service.get_aggregates(),
+                              'cosmos': cosmos_service.get_aggregates() if cosmos_service else None},
+                             indent=2))
+            return 0
+
+        print(f"Rebuilt local aggregates from {local_service.rebuild_aggregates()} claims")
+        if cosmos_service is not None:
+            if cosmos_service.rebuild_aggregates() is None:
+                print("Rebuilding the Cosmos DB aggregates failed")
+                return 1
+        return 0
+    finally:
+        local_service.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+"""
+Asynchronous Cosmos DB service built on azure.cosmos.aio.
+
+Mirrors the read and write methods of CosmosDBService that the request
+path uses, but every call is a coroutine, so one event loop can keep many
+Cosmos DB requests in flight over the client's shared connection pool.
+The aio client is bound to the event loop it was created on: create the
+service, call connect() and use it from that same loop. Calls are accounted
+in a circuit breaker, normally the synchronous service's, so both clients
+stop calling Cosmos DB while it is down. Events still in the legacy events
+container are only read by the synchronous service.
+"""
+import os
+import random
+from typing import Dict, List, Any, Optional, Tuple, Union
+import logging
+
+from azure.cosmos import exceptions
+from azure.cosmos.aio import CosmosClient
+from utils.config import Config
+from models.claim import Claim
+from models.event import Event
+from .aggregates import REPLACED_UNREAD, claim_delta, patch_operations, shard_document, shard_ids
+from .circuit_breaker import CircuitBreaker, GuardedContainer, OPEN
+from .cosmos_fake import is_fake_endpoint
+from .cosmos_metrics import InstrumentedContainer, instrumented
+from .cosmos_queries import (PAGE_ENTITY_EVENTS_QUERY, PAGE_RECENT_EVENTS_QUERY,
+                             claim_summaries_query, normalize_summaries)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCosmosDBService:
+    """Coroutine-based counterpart of CosmosDBService"""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None):
+        """
+        Read the connection settings; connect() opens the client
+
+        Args:
+            breaker: Circuit breaker to account calls in, normally the one of the
+                process's CosmosDBService so both clients see one circuit
+        """
+        config = Config()
+        self.endpoint = config.get('database.cosmos_endpoint', os.environ.get('COSMOS_ENDPOINT', ''))
+        self.key = config.get('database.cosmos_key', os.environ.get('COSMOS_KEY', ''))
+        self.database_name = config.get('database.cosmos_database',
+                                        os.environ.get('COSMOS_DATABASE', 'insurance-claims-db'))
+        self.claims_container_name = config.get('database.cosmos_claims_container', 'claims')
+        self.events_container_name = config.get('database.cosmos_events_container',
+                                                os.environ.get('COSMOS_EVENTS_CONTAINER', 'events-by-entity'))
+        self.aggregates_container_name = config.get('database.cosmos_aggregates_container',
+                                                    os.environ.get('COSMOS_AGGREGATES_CONTAINER', ''))
+        self.aggregate_shards = config.get('database.aggregate_shards', 8)
+        self.use_managed_identity = os.environ.get('USE_MANAGED_IDENTITY', 'false').lower() == 'true'
+        self.breaker = breaker or CircuitBreaker(
+            'cosmos',
+            failure_threshold=config.get('database.circuit_failure_threshold', 5),
+            reset_timeout=config.get('database.circuit_reset_seconds', 30.0))
+        self.client = None
+        self.credential = None
+        self.claims_container = None
+        self.events_container = None
+        self.aggregates_container = None
+
+    async def connect(self) -> bool:
+        """
+        Open the client and verify the database is reachable.
+
+        Returns:
+            bool: True if connected
+        """
+        if not self.endpoint:
+            logger.info("Async Cosmos DB connection not configured. Missing endpoint.")
+            return False
+        if is_fake_endpoint(self.endpoint):
+            # The in-memory fake has no coroutine client; the sync services use it
+            logger.info("Async Cosmos DB client is not available for fake:// endpoints.")
+            return False
+
+        try:
+            if self.use_managed_identity:
+                from azure.identity.aio import DefaultAzureCredential
+                self.credential = DefaultAzureCredential()
+                self.client = CosmosClient(self.endpoint, self.credential)
+            else:
+                if not self.key:
+                    raise ValueError("Cosmos DB key not found in configuration or environment variables")
+                self.client = CosmosClient(self.endpoint, self.key)
+
+            database = self.client.get_database_client(self.database_name)
+            self.claims_container = self._guarded_container(database, self.claims_container_name)
+            self.events_container = self._guarded_container(database, self.events_container_name)
+            if self.aggregates_container_name:
+                self.aggregates_container = self._guarded_container(database, self.aggregates_container_name)
+            await database.read()
+            logger.info(f"Async client connected to Cosmos DB: {self.database_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error connecting async client to Cosmos DB: {str(e)}")
+            await self.close()
+            return False
+
+    def _guarded_container(self, database: Any, name: str) -> GuardedContainer:
+        """Container client whose calls are accounted by the circuit breaker and metrics"""
+        return GuardedContainer(InstrumentedContainer(database.get_container_client(name)), self.breaker)
+
+    def is_connected(self) -> bool:
+        """Check if connected to Cosmos DB"""
+        return self.client is not None and self.claims_container is not None
+
+    def is_available(self) -> bool:
+        """Check if connected and the circuit is not open, without any I/O"""
+        return self.is_connected() and self.breaker.state != OPEN
+
+    async def close(self) -> None:
+        """Close the client and its connection pool"""
+        client, credential = self.client, self.credential
+        self.client = self.credential = None
+        self.claims_container = self.events_container = self.aggregates_container = None
+        try:
+            if client is not None:
+                await client.close()
+            if credential is not None:
+                await credential.close()
+        except Exception as e:
+            logger.error(f"Error closing async Cosmos DB client: {str(e)}")
+
+    async def _query_page(self, container, query: str, parameters: List[Dict[str, Any]],
+                          limit: int, continuation_token: Optional[str],
+                          partition_key: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Run a query and return one page plus the continuation token of the next"""
+        scope = {'partition_key': partition_key} if partition_key is not None else {}
+        pager = container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=limit,
+            **scope
+        ).by_page(continuation_token)
+        async for page in pager:
+            return [item async for item in page], pager.continuation_token
+        return [], None
+
+    @instrumented('get_claim')
+    async def get_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Get a claim from Cosmos DB by ID"""
+        if not self.is_connected():
+            return None
+
+        try:
+            return await self.claims_container.read_item(item=claim_id, partition_key=claim_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error getting claim from Cosmos DB: {str(e)}")
+            return None
+
+    @instrumented('save_claim')
+    async def save_claim(self, claim: Union[Claim, Dict[str, Any]], replaced: Any = REPLACED_UNREAD) -> bool:
+        """Save a claim to Cosmos DB, reading the version it replaces unless given (see CosmosDBService)"""
+        if not self.is_connected():
+            return False
+
+        try:
+            claim_data = claim.to_dict() if isinstance(claim, Claim) else claim
+            previous = None if replaced is REPLACED_UNREAD else replaced
+            if self.aggregates_container is not None and replaced is REPLACED_UNREAD:
+                try:
+                    previous = await self.claims_container.read_item(item=claim_data.get('claim_id'),
+                                                                     partition_key=claim_data.get('claim_id'))
+                except exceptions.CosmosResourceNotFoundError:
+                    pass
+            await self.claims_container.upsert_item(claim_data)
+            if self.aggregates_container is not None:
+                await self._update_aggregates(claim_delta(previous, claim_data))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving claim to Cosmos DB: {str(e)}")
+            return False
+
+    async def _update_aggregates(self, delta: Dict[str, float]) -> bool:
+        """Add a delta to the aggregates with atomic increments on a random shard (see CosmosDBService)"""
+        shard_id = random.choice(shard_ids(self.aggregate_shards))
+        try:
+            for operations in patch_operations(delta):
+                try:
+                    await self.aggregates_container.patch_item(item=shard_id, partition_key=shard_id,
+                                                               patch_operations=operations)
+                except exceptions.CosmosResourceNotFoundError:
+                    try:
+                        await self.aggregates_container.create_item(shard_document(shard_id))
+                    except exceptions.CosmosResourceExistsError:
+                        pass
+                    await self.aggregates_container.patch_item(item=shard_id, partition_key=shard_id,
+                                                               patch_operations=operations)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating aggregates in Cosmos DB (rebuild to correct them): {str(e)}")
+            return False
+
+    @instrumented('list_claim_summaries_page')
+    async def list_claim_summaries_page(self, limit: int = 100, continuation_token: Optional[str] = None,
+                                        fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of claim summaries, resuming from a Cosmos DB continuation token"""
+        if not self.is_connected():
+            return [], None
+
+        try:
+            items, token = await self._query_page(
+                self.claims_container, claim_summaries_query(fields, paged=True), [],
+                limit, continuation_token)
+            return normalize_summaries(items, fields), token
+        except Exception as e:
+            logger.error(f"Error listing claim summaries page from Cosmos DB: {str(e)}")
+            return [], None
+
+    @instrumented('save_event')
+    async def save_event(self, event: Union[Event, Dict[str, Any]]) -> bool:
+        """Save an event to Cosmos DB"""
+        if not self.is_connected():
+            return False
+
+        try:
+            event_data = event.to_dict() if isinstance(event, Event) else event
+            await self.events_container.upsert_item(event_data)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving event to Cosmos DB: {str(e)}")
+            return False
+
+    @instrumented('list_events_page')
+    async def list_events_page(self, entity_id: Optional[str] = None, limit: int = 100,
+                               continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of events, newest first, from the entity-partitioned container"""
+        if not self.is_connected():
+            return [], None
+
+        try:
+            if entity_id:
+                return await self._query_page(
+                    self.events_container, PAGE_ENTITY_EVENTS_QUERY,
+                    [{'name': '@entity_id', 'value': entity_id}], limit, continuation_token,
+                    partition_key=entity_id)
+            return await self._query_page(
+                self.events_container, PAGE_RECENT_EVENTS_QUERY, [], limit, continuation_token)
+        except Exception as e:
+            logger.error(f"Error listing events page from Cosmos DB: {str(e)}")
+            return [], None
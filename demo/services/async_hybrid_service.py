@@ -0,0 +1,320 @@
+"""
+Asynchronous request path over the hybrid storage.
+
+AsyncHybridDataService exposes the claim and event methods the routes use
+as coroutines. Cosmos DB calls go through AsyncCosmosDBService, so they
+wait on the network without holding a thread, and local storage calls run
+in the default thread pool via asyncio.to_thread (the local engines are
+synchronous). It shares the local engine, read cache and outbox of the
+HybridDataService it wraps, so both paths see the same data and queued
+cloud writes are replayed by the same sync worker.
+
+The aio client is bound to one event loop, and Flask runs each request on
+its own thread, so the service lives on an EventLoopThread: one loop per
+worker process that request threads hand their coroutines to. Storage
+calls from all requests of a worker are then multiplexed on that loop and
+its connection pool. The routes stay synchronous views, so each request
+thread still blocks until its calls finish: the calls in flight per worker
+are capped by its request threads (see gunicorn.conf.py), not by the loop.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import logging
+
+from models.claim import Claim
+from models.event import Event
+from utils.validation import validate_claim
+from .async_cosmos_service import AsyncCosmosDBService
+from .hybrid_service import HybridDataService, WriteResult
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread:
+    """An event loop running in a daemon thread, for use from synchronous code"""
+
+    def __init__(self, name: str = 'storage-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self) -> None:
+        """Stop the loop and wait for its thread to exit"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class AsyncHybridDataService:
+    """Coroutine-based request path sharing the state of a HybridDataService"""
+
+    def __init__(self, hybrid: HybridDataService, cosmos_service: Optional[AsyncCosmosDBService] = None):
+        """
+        Wrap a hybrid service.
+
+        Args:
+            hybrid: Provides the local engine, read cache, outbox and write settings
+            cosmos_service: Connected async Cosmos DB service, or None for local only
+        """
+        self.hybrid = hybrid
+        self.local_service = hybrid.local_service
+        self.claim_cache = hybrid.claim_cache
+        self.cosmos_service = cosmos_service if cosmos_service and cosmos_service.is_connected() else None
+
+    @classmethod
+    async def create(cls, hybrid: HybridDataService) -> 'AsyncHybridDataService':
+        """Create the service, connecting to Cosmos DB if the hybrid service uses it"""
+        cosmos_service = None
+        if hybrid.use_cosmos:
+            # One circuit for both clients: failures of either open it for both
+            cosmos_service = AsyncCosmosDBService(breaker=getattr(hybrid.cosmos_service, 'breaker', None))
+            if not await cosmos_service.connect():
+                cosmos_service = None
+        logger.info(f"Async hybrid data service initialized. Using Cosmos DB: {cosmos_service is not None}")
+        return cls(hybrid, cosmos_service)
+
+    async def close(self) -> None:
+        """Close the Cosmos DB client"""
+        if self.cosmos_service:
+            await self.cosmos_service.close()
+
+    def _cloud_readable(self) -> bool:
+        """Whether to try Cosmos DB: it is in use and its circuit, shared with the synchronous client, is not open"""
+        return self.cosmos_service is not None and self.cosmos_service.is_available()
+
+    def _list_from_cloud(self, source: Optional[str]) -> bool:
+        """Whether a listing should read Cosmos DB, as in HybridDataService._list_from_cloud"""
+        if source == 'local' or not self._cloud_readable():
+            return False
+        return source == 'cosmos' or self.hybrid.change_feed is None
+    
+    async def _has_pending_cloud_write(self, kind: str, entity_id: str) -> bool:
+        """Check the outbox without blocking the loop"""
+        if self.hybrid.outbox is None:
+            return False
+        return await asyncio.to_thread(self.hybrid._has_pending_cloud_write, kind, entity_id)
+
+    async def get_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Get a claim from the read cache, loading it on a miss"""
+        if self.claim_cache:
+            return await self.claim_cache.get_or_load_async(claim_id, self._load_claim)
+        return await self._load_claim(claim_id)
+
+    async def _load_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load a claim, trying cloud first then local fallback (local first with the change feed)"""
+        replicated = self.hybrid.change_feed is not None
+        if replicated:
+            claim = await asyncio.to_thread(self.local_service.get_claim, claim_id)
+            if claim:
+                return claim.to_dict() if isinstance(claim, Claim) else claim
+
+        if self._cloud_readable() and not await self._has_pending_cloud_write('claim', claim_id):
+            claim = await self.cosmos_service.get_claim(claim_id)
+            if claim:
+                return claim
+
+        if replicated:
+            return None
+        claim = await asyncio.to_thread(self.local_service.get_claim, claim_id)
+        return claim.to_dict() if isinstance(claim, Claim) else claim
+
+    async def get_claims(self, claim_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get several claims concurrently, in the order given"""
+        return list(await asyncio.gather(*(self.get_claim(claim_id) for claim_id in claim_ids)))
+
+    async def update_claim(self, claim_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update an existing claim in both storages"""
+        existing_claim = await self.get_claim(claim_id)
+        if not existing_claim:
+            return None
+
+        updated_claim_data = dict(existing_claim)
+        updated_claim_data.update(update_data)
+        try:
+            updated_claim = Claim.from_dict(updated_claim_data)
+            await self.save_claim(updated_claim)
+            return updated_claim.to_dict()
+        except Exception as e:
+            logger.error(f"Failed to update claim {claim_id}: {str(e)}")
+            return None
+
+    async def get_claim_history(self, claim_id: str) -> List[Dict[str, Any]]:
+        """List the stored revisions of a claim (kept in local storage only)"""
+        return await asyncio.to_thread(self.hybrid.get_claim_history, claim_id)
+
+    async def get_claim_at(self, claim_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Get a claim as it was at a given revision"""
+        return await asyncio.to_thread(self.hybrid.get_claim_at, claim_id, version)
+
+    async def get_aggregates(self) -> Dict[str, Any]:
+        """Dashboard aggregates (read by the synchronous service, see HybridDataService.get_aggregates)"""
+        return await asyncio.to_thread(self.hybrid.get_aggregates)
+
+    async def list_claim_summaries(self, limit: int = 100, offset: int = 0,
+                                   fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """List claim summaries with offset pagination (read by the synchronous service)"""
+        return await asyncio.to_thread(self.hybrid.list_claim_summaries, limit, offset, fields)
+
+    async def list_claim_summaries_page(self, limit: int = 100, cursor: Optional[str] = None,
+                                        fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of claim summaries; cursors match HybridDataService.list_claim_summaries_page"""
+        state = self.hybrid._decode_source_cursor(cursor)
+        source = state.get('source')
+
+        if self._list_from_cloud(source):
+            summaries, token = await self.cosmos_service.list_claim_summaries_page(
+                limit, state.get('token'), fields)
+            if summaries or source == 'cosmos':
+                return summaries, self.hybrid._encode_source_cursor('cosmos', token)
+        elif source == 'cosmos':
+            return [], None
+
+        summaries, token = await asyncio.to_thread(
+            self.local_service.list_claim_summaries_page, limit, state.get('token'), fields=fields)
+        return summaries, self.hybrid._encode_source_cursor('local', token)
+
+    async def list_events_page(self, entity_id: Optional[str] = None, limit: int = 100,
+                               cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of events; cursors match HybridDataService.list_events_page"""
+        state = self.hybrid._decode_source_cursor(cursor)
+        source = state.get('source')
+
+        if self._list_from_cloud(source):
+            events, token = await self.cosmos_service.list_events_page(entity_id, limit, state.get('token'))
+            if events or source == 'cosmos':
+                return events, self.hybrid._encode_source_cursor('cosmos', token)
+        elif source == 'cosmos':
+            return [], None
+
+        events, token = await asyncio.to_thread(
+            self.local_service.list_events_page, entity_id, limit, state.get('token'))
+        return ([event.to_dict() if isinstance(event, Event) else event for event in events],
+                self.hybrid._encode_source_cursor('local', token))
+
+    async def _dual_write(self, kind: str, entity_id: str, local_write: Callable[[], Any],
+                          cloud_write: Optional[Callable[[], Awaitable[bool]]],
+                          payload: Dict[str, Any]) -> Tuple[WriteResult, Optional[Exception]]:
+        """
+        Write an entity locally and to the cloud, as HybridDataService._dual_write does.
+
+        In concurrent mode the cloud write is awaited alongside the local
+        write, up to the write deadline; a write that misses it keeps running
+        and its outbox replay is held until it finishes.
+        """
+        hybrid = self.hybrid
+        start = time.monotonic()
+        deferred = cloud_write is not None and (
+            hybrid.write_mode == 'write_behind' or not self._cloud_readable() or
+            await self._has_pending_cloud_write(kind, entity_id))
+
+        task = None
+        if cloud_write is not None and not deferred and hybrid.write_mode == 'concurrent':
+            task = asyncio.ensure_future(cloud_write())
+
+        local_exception = None
+        try:
+            local_ok = bool(await asyncio.to_thread(local_write))
+        except Exception as e:
+            local_ok = False
+            local_exception = e
+
+        cloud_status, cloud_error = 'skipped', None
+        try:
+            if task is not None:
+                remaining = max(hybrid.write_deadline - (time.monotonic() - start), 0)
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+                if done:
+                    cloud_status = 'ok' if task.result() else 'failed'
+                else:
+                    cloud_status = 'timeout'
+                    cloud_error = f"no response within {hybrid.write_deadline}s"
+            elif deferred:
+                cloud_status = 'queued' if local_exception is None else 'skipped'
+            elif cloud_write is not None and local_exception is None:
+                cloud_status = 'ok' if await cloud_write() else 'failed'
+        except Exception as e:
+            cloud_status, cloud_error = 'failed', str(e)
+
+        queued = False
+        if cloud_status in ('queued', 'failed', 'timeout') and local_exception is None:
+            if cloud_status == 'timeout':
+                queued = await asyncio.to_thread(hybrid._queue_cloud_write, kind, entity_id, 'upsert',
+                                                 payload, hybrid.late_write_hold)
+                loop = asyncio.get_running_loop()
+                task.add_done_callback(lambda t: loop.run_in_executor(
+                    None, hybrid._on_late_cloud_write, kind, entity_id, t))
+            else:
+                queued = await asyncio.to_thread(
+                    hybrid._queue_cloud_write, kind, entity_id, 'upsert', payload,
+                    0.0 if cloud_status == 'queued' else hybrid.sync_retry_delay)
+
+        result = WriteResult(
+            entity_id=entity_id,
+            local_ok=local_ok,
+            cloud_status=cloud_status,
+            elapsed_ms=(time.monotonic() - start) * 1000,
+            local_error=str(local_exception) if local_exception else None,
+            cloud_error=cloud_error,
+            queued=queued
+        )
+        if not local_ok or cloud_status in ('failed', 'timeout'):
+            logger.warning(f"Partial write of {kind} {entity_id}: {result}")
+        return result, local_exception
+
+    async def save_claim(self, claim: Union[Claim, Dict[str, Any]]) -> str:
+        """Save a claim to both local and cloud storage"""
+        return (await self.save_claim_with_result(claim)).entity_id
+
+    async def save_claim_with_result(self, claim: Union[Claim, Dict[str, Any]]) -> WriteResult:
+        """
+        Save a claim to local and cloud storage, reporting both outcomes
+
+        Raises:
+            ValidationError: If the claim data is invalid
+            RuntimeError: If the local write fails
+        """
+        if isinstance(claim, Dict):
+            validate_claim(claim)
+            claim_obj = Claim.from_dict(claim)
+        else:
+            claim_obj = claim
+        # Stamp before either write starts, so local and cloud store the same version
+        claim_obj.touch()
+        claim_dict = claim_obj.to_dict()
+
+        cloud_write = None
+        if self.cosmos_service:
+            replaced = await asyncio.to_thread(self.hybrid._replaced_claim, claim_obj.claim_id)
+            cloud_write = lambda: self.cosmos_service.save_claim(claim_dict, replaced=replaced)
+
+        result, local_exception = await self._dual_write(
+            'claim', claim_obj.claim_id,
+            lambda: self.local_service.save_claim(claim_obj, stamped=True), cloud_write, claim_dict)
+
+        if local_exception is not None:
+            if self.claim_cache:
+                self.claim_cache.invalidate(claim_obj.claim_id)
+            raise local_exception
+
+        if self.claim_cache:
+            self.claim_cache.put(claim_obj.claim_id, claim_obj.to_dict())
+        return result
+
+    async def save_event(self, event: Union[Event, Dict[str, Any]]) -> str:
+        """Save an event to both local and cloud storage"""
+        event_obj = Event.from_dict(event) if isinstance(event, Dict) else event
+        event_dict = event if isinstance(event, Dict) else event.to_dict()
+
+        cloud_write = None
+        if self.cosmos_service:
+            cloud_write = lambda: self.cosmos_service.save_event(event_dict)
+
+        result, _ = await self._dual_write(
+            'event', event_obj.event_id,
+            lambda: self.local_service.save_event(event_obj), cloud_write, event_dict)
+        return result.entity_id if result.local_ok else ""
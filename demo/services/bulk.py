@@ -0,0 +1,114 @@
+"""
+Bulk writes for importing many claims or events at once.
+
+Items are grouped by partition key value. Each group is written as
+transactional batches of up to `batch_size` operations, so documents that
+share a partition cost one round trip per batch instead of one per item,
+and the groups are written in parallel by a bounded thread pool. A batch is
+all-or-nothing, so when one fails its items are retried one by one to find
+out which of them actually failed.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cosmos DB accepts at most 100 operations per transactional batch
+MAX_BATCH_OPERATIONS = 100
+
+
+@dataclass
+class BulkItemResult:
+    """Outcome of writing one item of a bulk request"""
+    item_id: str
+    ok: bool
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+def _upsert_one(container, item: Dict[str, Any], item_id: str) -> BulkItemResult:
+    """Upsert a single document, capturing any error"""
+    try:
+        container.upsert_item(item)
+        return BulkItemResult(item_id, True)
+    except Exception as e:
+        return BulkItemResult(item_id, False, error=str(e),
+                              status_code=getattr(e, 'status_code', None))
+
+
+def _write_chunk(container, items: List[Dict[str, Any]], partition_key: Any,
+                 id_field: str, use_batches: bool) -> List[BulkItemResult]:
+    """Write items sharing one partition key, as a batch when possible"""
+    ids = [str(item[id_field]) for item in items]
+    if use_batches and len(items) > 1 and hasattr(container, 'execute_item_batch'):
+        try:
+            container.execute_item_batch(
+                batch_operations=[('upsert', (item,)) for item in items],
+                partition_key=partition_key)
+            return [BulkItemResult(item_id, True) for item_id in ids]
+        except Exception as e:
+            logger.warning(f"Batch of {len(items)} items for partition {partition_key} "
+                           f"failed, retrying individually: {str(e)}")
+    return [_upsert_one(container, item, item_id) for item, item_id in zip(items, ids)]
+
+
+def bulk_upsert(container, items: List[Dict[str, Any]], id_field: str,
+                partition_key_field: str, max_workers: int = 8,
+                batch_size: int = MAX_BATCH_OPERATIONS,
+                use_batches: bool = True) -> List[BulkItemResult]:
+    """
+    Upsert many documents into a Cosmos DB container.
+
+    Args:
+        container: Container client to write to
+        items: Documents to upsert
+        id_field: Field identifying each document in the results
+        partition_key_field: Field holding the container's partition key
+        max_workers: Maximum number of concurrent requests
+        batch_size: Maximum operations per transactional batch
+        use_batches: Group same-partition items into transactional batches
+
+    Returns:
+        List[BulkItemResult]: One result per item, in input order
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_OPERATIONS))
+    results: List[Optional[BulkItemResult]] = [None] * len(items)
+
+    groups: Dict[Any, List[int]] = {}
+    for position, item in enumerate(items):
+        if not item.get(id_field) or item.get(partition_key_field) is None:
+            results[position] = BulkItemResult(
+                str(item.get(id_field) or ''), False,
+                error=f"missing {id_field if not item.get(id_field) else partition_key_field}")
+            continue
+        groups.setdefault(item[partition_key_field], []).append(position)
+
+    chunks: List[Tuple[Any, List[int]]] = [
+        (partition_key, positions[start:start + batch_size])
+        for partition_key, positions in groups.items()
+        for start in range(0, len(positions), batch_size)
+    ]
+
+    def run(chunk: Tuple[Any, List[int]]) -> Tuple[List[int], List[BulkItemResult]]:
+        partition_key, positions = chunk
+        return positions, _write_chunk(container, [items[p] for p in positions],
+                                       partition_key, id_field, use_batches)
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))),
+                                thread_name_prefix='bulk-write') as executor:
+            # Each chunk runs in a copy of the caller's context, so its requests
+            # are added to the caller's Cosmos DB operation metrics
+            contexts = [contextvars.copy_context() for _ in chunks]
+            for positions, chunk_results in executor.map(lambda context, chunk: context.run(run, chunk),
+                                                         contexts, chunks):
+                for position, result in zip(positions, chunk_results):
+                    results[position] = result
+
+    failed = sum(1 for result in results if not result.ok)
+    logger.info(f"Bulk upsert of {len(items)} items in {len(chunks)} requests "
+                f"({failed} failed)")
+    return results
@@ -0,0 +1,277 @@
+"""
+Change feed consumer keeping the local store in sync with Cosmos DB.
+
+Writes made by other app instances only reach this instance's local store
+through Cosmos DB. The processor reads the change feed of the claims and
+events containers page by page and applies each page to the local store
+(which also updates its claim index) and to the in-process claim cache.
+The continuation token of each container is saved to a checkpoint file
+after every applied page, so a restarted consumer resumes where it
+stopped. Re-applying a page is harmless: claims are only replaced by newer
+versions and events already stored are skipped.
+
+The latest-version change feed does not report deletions, so a claim
+deleted by another instance stays in the local store until it is deleted
+through this one.
+
+Instances sharing a local store must share one consumer. The processor
+takes an exclusive lock next to the checkpoint file before polling, so
+when several worker processes (or the command line consumer) run on the
+same store, one of them consumes and the others wait for the lock.
+
+Usage (from the demo directory):
+    python -m services.change_feed run [--once]
+    python -m services.change_feed status
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Any, Optional
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from .event_migration import SYSTEM_PROPERTIES
+
+logger = logging.getLogger(__name__)
+
+FEEDS = ('claims', 'events')
+
+
+def _strip_system_properties(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in document.items() if key not in SYSTEM_PROPERTIES}
+
+
+def load_checkpoint(path: str) -> Dict[str, Optional[str]]:
+    """Continuation token of each feed saved by an earlier run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f).get('continuation_tokens', {})
+
+
+def _save_checkpoint(path: str, tokens: Dict[str, Optional[str]]) -> None:
+    """Atomically record the continuation token of each feed"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'continuation_tokens': tokens, 'saved_at': time.time()}, f)
+    os.replace(temp_path, path)
+
+
+class ChangeFeedProcessor:
+    """Applies the Cosmos DB change feeds of claims and events to local storage"""
+
+    def __init__(self, cosmos_service, local_service, claim_cache=None,
+                 checkpoint_path: str = 'change_feed.checkpoint.json',
+                 page_size: int = 100, interval: float = 5.0):
+        """
+        Create the processor (call start() to run it in the background).
+
+        Args:
+            cosmos_service: Connected CosmosDBService whose containers are read
+            local_service: Local storage engine the changes are applied to
+            claim_cache: Read cache to refresh with changed claims, if any
+            checkpoint_path: File holding the continuation tokens
+            page_size: Changes read per request
+            interval: Seconds between polls once the feeds are drained
+        """
+        self.cosmos_service = cosmos_service
+        self.local_service = local_service
+        self.claim_cache = claim_cache
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+        self.interval = interval
+
+        self._tokens: Optional[Dict[str, Optional[str]]] = None
+        self._lock_file = None
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'claims_applied': 0, 'events_applied': 0, 'changes_read': 0,
+                       'last_poll_time': None, 'last_change_ts': None, 'last_error': None}
+
+    def _acquire(self) -> bool:
+        """Take the consumer lock of the local store, without waiting"""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(f"{self.checkpoint_path}.lock", 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+        # Another consumer may have moved the checkpoint while we waited
+        self._tokens = load_checkpoint(self.checkpoint_path)
+        return True
+
+    def _release(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _container(self, feed: str):
+        if feed == 'claims':
+            return self.cosmos_service.claims_container
+        return self.cosmos_service.events_container
+
+    def _read_feed(self, feed: str) -> int:
+        """Apply every change of one feed made since its checkpoint"""
+        token = self._tokens.get(feed)
+        if token:
+            changes = self._container(feed).query_items_change_feed(
+                continuation=token, max_item_count=self.page_size)
+        else:
+            changes = self._container(feed).query_items_change_feed(
+                is_start_from_beginning=True, max_item_count=self.page_size)
+
+        pager = changes.by_page()
+        read = 0
+        for page in pager:
+            documents = list(page)
+            if documents:
+                self._apply(feed, documents)
+                read += len(documents)
+            next_token = pager.continuation_token
+            if next_token and next_token != self._tokens.get(feed):
+                self._tokens[feed] = next_token
+                _save_checkpoint(self.checkpoint_path, self._tokens)
+            if not documents:
+                break
+        return read
+
+    def _apply(self, feed: str, documents: List[Dict[str, Any]]) -> None:
+        """Apply one page of changed documents to local storage and the cache"""
+        last_ts = max((document.get('_ts') or 0 for document in documents), default=0)
+        documents = [_strip_system_properties(document) for document in documents]
+        if feed == 'claims':
+            applied = self.local_service.apply_replicated_claims(documents)
+            if self.claim_cache:
+                for claim_data in applied:
+                    self.claim_cache.put(claim_data['claim_id'], claim_data)
+            counts = {'claims_applied': len(applied)}
+        else:
+            counts = {'events_applied': self.local_service.apply_replicated_events(documents)}
+
+        with self._stats_lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+            self._stats['changes_read'] += len(documents)
+            if last_ts:
+                self._stats['last_change_ts'] = max(self._stats['last_change_ts'] or 0, last_ts)
+
+    def run_once(self) -> Optional[int]:
+        """
+        Drain both change feeds.
+
+        Returns:
+            Optional[int]: Number of changes read, or None if another
+            consumer holds the lock of the local store
+        """
+        with self._poll_lock:
+            if not self._acquire():
+                return None
+            read = 0
+            for feed in FEEDS:
+                read += self._read_feed(feed)
+            with self._stats_lock:
+                self._stats['last_poll_time'] = time.time()
+            return read
+
+    def start(self) -> None:
+        """Start the background thread if it is not running"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread and release the consumer lock"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._poll_lock:
+            self._release()
+
+    def _run(self) -> None:
+        """Background loop"""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error reading the Cosmos DB change feed: {str(e)}")
+                with self._stats_lock:
+                    self._stats['last_error'] = str(e)
+            self._stop.wait(self.interval)
+
+    def is_consumer(self) -> bool:
+        """Whether this processor holds the consumer lock of the local store"""
+        return self._lock_file is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, and the age of the newest change applied"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['last_change_age_seconds'] = round(time.time() - stats['last_change_ts'], 1) \
+            if stats['last_change_ts'] else None
+        return dict(stats, consumer=self.is_consumer(),
+                    running=self._thread is not None and self._thread.is_alive())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point of the change feed consumer"""
+    from utils.config import Config
+    from .cosmos_service import CosmosDBService
+    from .hybrid_service import HybridDataService
+
+    config = Config()
+    parser = argparse.ArgumentParser(description="Apply Cosmos DB changes to the local store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('run', help="Consume the change feeds")
+    run.add_argument('--once', action='store_true', help="Drain the feeds once and exit")
+    run.add_argument('--interval', type=float, default=config.get('hybrid.change_feed_interval_seconds', 5.0),
+                     help="Seconds between polls")
+    subparsers.add_parser('status', help="Show the saved continuation tokens")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = config.get('hybrid.change_feed_checkpoint_path', 'change_feed.checkpoint.json')
+    if args.command == 'status':
+        tokens = load_checkpoint(checkpoint_path)
+        for feed in FEEDS:
+            print(f"{feed}: {'resumes from checkpoint' if tokens.get(feed) else 'starts from the beginning'}")
+        return 0
+
+    service = CosmosDBService()
+    if not service.is_connected():
+        print("Cosmos DB is not connected")
+        return 1
+
+    local_service = HybridDataService._create_local_service()
+    processor = ChangeFeedProcessor(service, local_service, checkpoint_path=checkpoint_path,
+                                    page_size=config.get('hybrid.change_feed_page_size', 100),
+                                    interval=args.interval)
+    try:
+        while True:
+            read = processor.run_once()
+            if read is None:
+                print("Another consumer holds the change feed lock; waiting")
+            elif args.once:
+                print(f"Read {read} changes")
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        processor.stop()
+        local_service.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
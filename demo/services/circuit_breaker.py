@@ -0,0 +1,320 @@
+"""
+Circuit breaker and background health probe for Cosmos DB.
+
+The breaker counts consecutive failed calls. After `failure_threshold` of
+them it opens, and calls are rejected at once with CircuitOpenError
+instead of each waiting out an SDK timeout. After `reset_timeout` seconds
+it turns half-open and lets a trial call through: success closes it,
+failure opens it again. Errors that prove the service answered (not found,
+conflicts, throttling) are not counted as failures.
+
+GuardedContainer wraps a container client so every SDK call, including
+the iteration of lazy query results, passes through a breaker. It wraps
+the azure.cosmos.aio clients too: awaiting a call, or iterating its async
+results, is accounted in the same way, so the sync and async clients of a
+process can share one breaker. The
+HealthProber keeps a cached snapshot of the service's health up to date
+from a background thread, and its probes also close the breaker as soon
+as the service is back.
+"""
+import inspect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Calls returning these statuses reached a working service
+HEALTHY_STATUS_CODES = {400, 401, 403, 404, 409, 412, 413, 429}
+
+# Container methods returning lazy results whose iteration does the I/O
+LAZY_METHODS = {'query_items', 'read_all_items', 'query_items_change_feed'}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an error means the service is unreachable or failing"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    return getattr(error, 'status_code', None) not in HEALTHY_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Thread-safe closed/open/half-open circuit breaker"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        Create the breaker.
+
+        Args:
+            name: Name used in errors and logs
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+            half_open_max_calls: Trial calls allowed at once while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    def _current_state(self) -> str:
+        """State after applying the reset timeout (lock must be held)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go ahead, taking a trial slot when half-open"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self) -> None:
+        """Record a call that reached a working service"""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit if needed"""
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._stats['opened'] += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} failures")
+
+    def record(self, error: Optional[BaseException]) -> None:
+        """Record the outcome of a call from the error it raised, if any"""
+        if error is None or not is_failure(error):
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current state and counters"""
+        with self._lock:
+            return dict(self._stats, state=self._current_state(), failures=self._failures)
+
+
+class _GuardedIterator:
+    """Lazy query result whose iteration is accounted by a breaker"""
+
+    def __init__(self, source: Any, breaker: CircuitBreaker):
+        self._source = source
+        self._breaker = breaker
+        self._iterator = None
+        self._recorded = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._source)
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self._record(None)
+            raise
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+        return item
+
+    def _record(self, error: Optional[BaseException]) -> None:
+        # Errors always count; success only once per result
+        if error is not None or not self._recorded:
+            self._breaker.record(error)
+            self._recorded = True
+
+    def by_page(self, continuation_token: Optional[str] = None) -> '_GuardedIterator':
+        return _GuardedIterator(self._source.by_page(continuation_token), self._breaker)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._iterator if self._iterator is not None else self._source, name)
+
+
+class _AsyncGuardedIterator:
+    """Lazy async query result whose iteration is accounted by a breaker"""
+
+    def __init__(self, source: Any, breaker: CircuitBreaker):
+        self._source = source
+        self._breaker = breaker
+        self._iterator = None
+        self._recorded = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._source.__aiter__()
+        try:
+            item = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._record(None)
+            raise
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+        return item
+
+    def _record(self, error: Optional[BaseException]) -> None:
+        # Errors always count; success only once per result
+        if error is not None or not self._recorded:
+            self._breaker.record(error)
+            self._recorded = True
+
+    def by_page(self, continuation_token: Optional[str] = None) -> '_AsyncGuardedIterator':
+        return _AsyncGuardedIterator(self._source.by_page(continuation_token), self._breaker)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._iterator if self._iterator is not None else self._source, name)
+
+
+async def _guarded_await(awaitable: Any, breaker: CircuitBreaker) -> Any:
+    """Await a coroutine call, recording its outcome"""
+    try:
+        result = await awaitable
+    except Exception as e:
+        breaker.record(e)
+        raise
+    breaker.record_success()
+    return result
+
+
+class GuardedContainer:
+    """Container client proxy that routes every call through a circuit breaker"""
+
+    def __init__(self, container: Any, breaker: CircuitBreaker):
+        self._container = container
+        self._breaker = breaker
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._container, name)
+        if not callable(attribute):
+            return attribute
+        breaker = self._breaker
+
+        def guarded(*args, **kwargs):
+            if not breaker.allow_request():
+                raise CircuitOpenError(breaker.name)
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                breaker.record(e)
+                raise
+            if inspect.isawaitable(result):
+                return _guarded_await(result, breaker)
+            if name in LAZY_METHODS:
+                if hasattr(result, '__aiter__'):
+                    return _AsyncGuardedIterator(result, breaker)
+                return _GuardedIterator(result, breaker)
+            breaker.record_success()
+            return result
+
+        return guarded
+
+
+class HealthProber:
+    """Background thread keeping a cached health snapshot of a service"""
+
+    def __init__(self, breaker: CircuitBreaker, probe: Callable[[], Any], interval: float = 10.0):
+        """
+        Create the prober; call start() to begin probing.
+
+        Args:
+            breaker: Breaker to report probe outcomes to
+            probe: Cheap call that raises if the service is unavailable
+            interval: Seconds between probes
+        """
+        self.breaker = breaker
+        self.probe = probe
+        self.interval = interval
+        self._snapshot: Dict[str, Any] = {'healthy': None, 'checked_at': None,
+                                          'latency_ms': None, 'error': None}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the probing thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.breaker.name}-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the probing thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def check(self) -> Dict[str, Any]:
+        """Probe once, update the breaker and the snapshot, and return the snapshot"""
+        start = time.monotonic()
+        error = None
+        try:
+            self.probe()
+        except Exception as e:
+            error = e
+        self.breaker.record(error)
+        with self._lock:
+            self._snapshot = {
+                'healthy': error is None or not is_failure(error),
+                'checked_at': datetime.now().isoformat(),
+                'latency_ms': round((time.monotonic() - start) * 1000, 1),
+                'error': str(error) if error is not None else None
+            }
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Last probe result and the breaker's state, without any I/O"""
+        with self._lock:
+            return dict(self._snapshot, circuit=self.breaker.stats())
@@ -0,0 +1,223 @@
+"""
+In-process read cache for claim documents.
+
+A bounded LRU cache with a per-entry TTL. Concurrent misses for the same
+claim are collapsed so only one caller loads it while the others wait for
+the result, which keeps a burst of requests for a hot claim from turning
+into a burst of storage round trips. Callers on an event loop use
+get_or_load_async, whose waiters are woken through the loop instead of
+blocking a thread.
+
+Writes through this process invalidate or replace their entries directly.
+Writes by other processes on the same store are noticed through a version
+callable (the store's write version): each entry remembers the version it
+was loaded at and is only served while that is still the current one.
+"""
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A load in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.stale = False
+        self.callbacks: List[Callable[[], None]] = []
+
+
+class ClaimCache:
+    """Bounded LRU/TTL cache of claim dictionaries with stampede protection"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0,
+                 version: Optional[Callable[[], Optional[str]]] = None):
+        """
+        Create the cache.
+
+        Args:
+            max_entries: Maximum number of claims kept
+            ttl_seconds: Seconds before a cached claim must be reloaded
+            version: Returns a token that changes whenever another process may
+                have written a claim; None from it disables caching until it
+                returns a token again
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Dict[str, Any], Optional[str]]]' = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'coalesced': 0,
+                       'evictions': 0, 'invalidations': 0, 'outdated': 0}
+
+    def _current_version(self) -> Optional[str]:
+        """Write version to check entries against ('' without a version callable)"""
+        return self.version() if self.version is not None else ''
+
+    def get(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Return a cached claim, or None on a miss"""
+        version = self._current_version()
+        with self._lock:
+            return self._lookup(claim_id, version)
+
+    def _lookup(self, claim_id: str, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Cache lookup with hit/miss accounting (lock must be held)"""
+        entry = self._entries.get(claim_id)
+        if entry is not None:
+            expires, value, entry_version = entry
+            if expires > time.monotonic():
+                if version is not None and entry_version == version:
+                    self._entries.move_to_end(claim_id)
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(value)
+                # Another process wrote since this entry was loaded
+                self._stats['outdated'] += 1
+            del self._entries[claim_id]
+        self._stats['misses'] += 1
+        return None
+
+    def get_or_load(self, claim_id: str,
+                    loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Return a claim from the cache, loading it once on a miss.
+
+        Concurrent callers that miss on the same claim wait for the first
+        caller's load instead of issuing their own. Missing claims (None)
+        are not cached.
+        """
+        # Read before loading, so a write made during the load outdates the entry
+        version = self._current_version()
+        with self._lock:
+            value = self._lookup(claim_id, version)
+            if value is not None:
+                return value
+            flight = self._flights.get(claim_id)
+            leader = flight is None
+            if leader:
+                flight = self._flights[claim_id] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        try:
+            flight.value = loader(claim_id)
+            with self._lock:
+                self._stats['loads'] += 1
+                # Skip caching if the claim was written while we were loading
+                if flight.value is not None and not flight.stale:
+                    self._store(claim_id, flight.value, version)
+            return copy.deepcopy(flight.value)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(claim_id, flight)
+
+    async def get_or_load_async(self, claim_id: str,
+                                loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """
+        Coroutine counterpart of get_or_load for callers on an event loop.
+
+        Loads are shared with synchronous callers of the same claim.
+        """
+        loop = asyncio.get_running_loop()
+        version = self._current_version()
+        with self._lock:
+            value = self._lookup(claim_id, version)
+            if value is not None:
+                return value
+            flight = self._flights.get(claim_id)
+            leader = flight is None
+            if leader:
+                flight = self._flights[claim_id] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+                waiter = loop.create_future()
+                flight.callbacks.append(lambda: loop.call_soon_threadsafe(
+                    lambda: waiter.done() or waiter.set_result(None)))
+
+        if not leader:
+            await waiter
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        try:
+            flight.value = await loader(claim_id)
+            with self._lock:
+                self._stats['loads'] += 1
+                if flight.value is not None and not flight.stale:
+                    self._store(claim_id, flight.value, version)
+            return copy.deepcopy(flight.value)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(claim_id, flight)
+
+    def _land(self, claim_id: str, flight: _Flight) -> None:
+        """Retire a finished load and wake everyone waiting on it"""
+        with self._lock:
+            self._flights.pop(claim_id, None)
+            callbacks = list(flight.callbacks)
+        flight.done.set()
+        for callback in callbacks:
+            callback()
+
+    def put(self, claim_id: str, value: Dict[str, Any]) -> None:
+        """Write-through: cache the latest version of a claim, right after it was stored"""
+        version = self._current_version()
+        with self._lock:
+            self._mark_stale(claim_id)
+            self._store(claim_id, value, version)
+
+    def _mark_stale(self, claim_id: str) -> None:
+        """Stop an in-progress load from caching what may now be old data"""
+        flight = self._flights.get(claim_id)
+        if flight is not None:
+            flight.stale = True
+
+    def _store(self, claim_id: str, value: Dict[str, Any], version: Optional[str]) -> None:
+        """Insert an entry and evict the least recently used (lock must be held)"""
+        if version is None:
+            return
+        self._entries[claim_id] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value), version)
+        self._entries.move_to_end(claim_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, claim_id: str) -> None:
+        """Drop a claim from the cache"""
+        with self._lock:
+            self._mark_stale(claim_id)
+            if self._entries.pop(claim_id, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        """Drop every cached claim"""
+        with self._lock:
+            for flight in self._flights.values():
+                flight.stale = True
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, size=len(self._entries), max_entries=self.max_entries,
+                        hit_ratio=(self._stats['hits'] / lookups) if lookups else 0.0)
@@ -0,0 +1,293 @@
+"""
+Persistent ordered index of claims for the file storage engine.
+
+The index keeps every claim's submission_time and updated_time in sorted
+in-memory lists, backed by an append-only journal next to the claim files.
+Listing a page is a slice of the sorted list, so the caller only opens the
+claim files it actually returns. Each entry also carries the claim's listing
+summary, so summary listings open no claim files at all. Journals written by other worker processes
+are picked up incrementally before each read, and the whole index is
+rebuilt from the claim files when the journal is missing.
+"""
+import bisect
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from models.claim import claim_summary
+from utils.pagination import keyset_page
+
+logger = logging.getLogger(__name__)
+
+SORT_FIELDS = ('submission_time', 'updated_time')
+
+
+class ClaimTimeIndex:
+    """Journal-backed index of claim ids ordered by submission and update time"""
+
+    def __init__(self, journal_path: str, claims_dir: str, compact_min_records: int = 1000):
+        """
+        Load the index, rebuilding it from the claim files if needed.
+
+        Args:
+            journal_path: Path of the index journal file
+            claims_dir: Directory of per-claim JSON files used for rebuilds
+            compact_min_records: Journal length below which it is never rewritten
+        """
+        self.journal_path = journal_path
+        self.claims_dir = claims_dir
+        self.compact_min_records = compact_min_records
+
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self._sorted: Dict[str, List[Tuple[str, str]]] = {field: [] for field in SORT_FIELDS}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._file_lock_depth = 0
+
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                self._reload()
+            else:
+                self.rebuild()
+
+    # Journal handling
+
+    @contextmanager
+    def _locked_file(self):
+        """Hold the cross-process lock guarding journal appends and rewrites"""
+        # Callers hold self._lock, so the depth counter is only touched by one thread
+        if self._file_lock_depth:
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+            return
+
+        with open(f"{self.journal_path}.lock", 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            self._file_lock_depth = 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth = 0
+
+    def _reset(self) -> None:
+        """Drop all in-memory state"""
+        self._entries = {}
+        self._sorted = {field: [] for field in SORT_FIELDS}
+        self._summaries = {}
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _reload(self) -> None:
+        """Load the whole journal from scratch"""
+        self._reset()
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Apply journal records appended since the last read, by any process"""
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            logger.warning(f"Claim index {self.journal_path} missing, rebuilding")
+            self.rebuild()
+            return
+
+        if self._journal_inode is not None and stat.st_ino != self._journal_inode:
+            # Another process rewrote the journal
+            self._reset()
+        if stat.st_size <= self._journal_offset and self._journal_inode == stat.st_ino:
+            return
+
+        with open(self.journal_path, 'rb') as f:
+            self._journal_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Record still being written by another process
+                    break
+                self._journal_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping corrupt claim index record in {self.journal_path}")
+                    continue
+                self._journal_records += 1
+                if record.get('op') == 'del':
+                    self._remove_entry(record['id'])
+                else:
+                    self._set_entry(record['id'], record)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Append one record to the journal"""
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._locked_file():
+            self._catch_up()
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self._catch_up()
+
+        if self._journal_records > max(self.compact_min_records, 2 * len(self._entries)):
+            self.compact()
+
+    def _write_snapshot(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically replace the journal with one record per claim and reload it"""
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, 'w') as f:
+            for claim_id, entry in entries.items():
+                f.write(json.dumps(dict(entry, op='put', id=claim_id),
+                                   separators=(',', ':')) + '\n')
+        os.replace(temp_path, self.journal_path)
+        self._reload()
+
+    def compact(self) -> None:
+        """Rewrite the journal so it holds one record per live claim"""
+        with self._lock, self._locked_file():
+            self._catch_up()
+            self._write_snapshot({
+                claim_id: dict(entry, summary=self._summaries[claim_id])
+                if claim_id in self._summaries else entry
+                for claim_id, entry in self._entries.items()
+            })
+        logger.info(f"Compacted claim index {self.journal_path} to {len(self._entries)} records")
+
+    def rebuild(self) -> int:
+        """
+        Rebuild the index from the claim files on disk.
+
+        Returns:
+            int: Number of claims indexed
+        """
+        with self._lock, self._locked_file():
+            entries = {}
+            for file_name in os.listdir(self.claims_dir):
+                if not file_name.endswith('.json') or file_name.startswith('.'):
+                    continue
+                try:
+                    with open(os.path.join(self.claims_dir, file_name), 'r') as f:
+                        claim_data = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error indexing claim from {file_name}: {str(e)}")
+                    continue
+                claim_id = claim_data.get('claim_id') or file_name[:-len('.json')]
+                entries[claim_id] = {field: claim_data.get(field) or '' for field in SORT_FIELDS}
+                entries[claim_id]['summary'] = claim_summary(claim_data)
+
+            self._write_snapshot(entries)
+
+        logger.info(f"Rebuilt claim index {self.journal_path} with {len(self._entries)} claims")
+        return len(self._entries)
+
+    # In-memory structure
+
+    def _set_entry(self, claim_id: str, record: Dict[str, Any]) -> None:
+        """Insert or move a claim in the sorted lists"""
+        self._remove_entry(claim_id)
+        entry = {field: record.get(field) or '' for field in SORT_FIELDS}
+        self._entries[claim_id] = entry
+        if record.get('summary') is not None:
+            self._summaries[claim_id] = record['summary']
+        for field in SORT_FIELDS:
+            bisect.insort(self._sorted[field], (entry[field], claim_id))
+
+    def _remove_entry(self, claim_id: str) -> None:
+        """Remove a claim from the sorted lists"""
+        entry = self._entries.pop(claim_id, None)
+        self._summaries.pop(claim_id, None)
+        if entry is None:
+            return
+        for field in SORT_FIELDS:
+            keys = self._sorted[field]
+            position = bisect.bisect_left(keys, (entry[field], claim_id))
+            if position < len(keys) and keys[position] == (entry[field], claim_id):
+                del keys[position]
+
+    # Public API
+
+    def put(self, claim_id: str, submission_time: Optional[str], updated_time: Optional[str],
+            summary: Optional[Dict[str, Any]] = None) -> None:
+        """Record a claim's current timestamps and, optionally, its listing summary"""
+        record = {'op': 'put', 'id': claim_id,
+                  'submission_time': submission_time or '',
+                  'updated_time': updated_time or ''}
+        if summary is not None:
+            record['summary'] = summary
+        with self._lock:
+            self._append(record)
+
+    def remove(self, claim_id: str) -> None:
+        """Forget a claim"""
+        with self._lock:
+            self._append({'op': 'del', 'id': claim_id})
+
+    def get(self, claim_id: str) -> Optional[Dict[str, str]]:
+        """Return the indexed timestamps for a claim"""
+        with self._lock:
+            self._catch_up()
+            entry = self._entries.get(claim_id)
+            return dict(entry) if entry is not None else None
+
+    def get_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Return the indexed listing summary of a claim, or None if it has none"""
+        with self._lock:
+            self._catch_up()
+            summary = self._summaries.get(claim_id)
+            return dict(summary) if summary is not None else None
+
+    def page(self, limit: int = 100, offset: int = 0, sort_by: str = 'submission_time',
+             after: Optional[Tuple[str, str]] = None) -> List[str]:
+        """
+        Return claim ids for one page, newest first.
+
+        Args:
+            limit: Maximum number of ids to return
+            offset: Number of ids to skip
+            sort_by: 'submission_time' or 'updated_time'
+            after: Only return claims ordered after this (sort value, claim_id) key
+
+        Returns:
+            List[str]: Claim ids in descending time order
+        """
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        with self._lock:
+            self._catch_up()
+            return [claim_id for _, claim_id in
+                    keyset_page(self._sorted[sort_by], limit, offset, after)]
+
+    def page_summaries(self, limit: int = 100, offset: int = 0, sort_by: str = 'submission_time',
+                       after: Optional[Tuple[str, str]] = None) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Return (claim_id, summary) pairs for one page, newest first.
+
+        The summary is None for claims indexed before summaries were recorded.
+        Arguments are the same as for page().
+        """
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        with self._lock:
+            self._catch_up()
+            return [(claim_id, dict(self._summaries[claim_id]) if claim_id in self._summaries else None)
+                    for _, claim_id in keyset_page(self._sorted[sort_by], limit, offset, after)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return len(self._entries)
@@ -1,20 +1,165 @@
 """
 Cosmos DB Client Factory with proper authentication strategies.
 Handles both key-based authentication (development) and managed identity (production).
+
+Clients are shared process-wide: CosmosClient is thread-safe and keeps a
+pool of persistent (keep-alive) HTTPS connections, so every service in a
+process reuses one client per endpoint and credential, and managed
+identity uses one DefaultAzureCredential whose token cache is shared too.
+The cache is keyed by process ID, so a worker forked from a process that
+already had a client builds its own instead of sharing inherited sockets.
+
+Endpoints starting with fake:// select the in-memory FakeCosmosClient of
+cosmos_fake instead, for offline benchmarks and tests; it needs no key.
 """
 import logging
-from typing import Optional
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
 from azure.cosmos import CosmosClient
+from azure.core.pipeline.transport import RequestsTransport
 from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
 from azure.core.exceptions import ClientAuthenticationError
 
+from .cosmos_fake import create_fake_client, is_fake_endpoint
+
 
 logger = logging.getLogger(__name__)
 
 
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECTION_TIMEOUT = 10
+
+
 class CosmosClientFactory:
     """Factory for creating properly authenticated Cosmos DB clients"""
     
+    _lock = threading.Lock()
+    _pid: Optional[int] = None
+    _clients: Dict[Tuple[str, str], CosmosClient] = {}
+    _credential: Optional[DefaultAzureCredential] = None
+    _warmed: Dict[Tuple[int, str, Tuple[str, ...]], Dict[str, Any]] = {}
+    
+    @classmethod
+    def _reset_if_forked(cls) -> None:
+        """Drop clients inherited from a parent process (lock must be held)"""
+        if cls._pid != os.getpid():
+            cls._clients = {}
+            cls._credential = None
+            cls._warmed = {}
+            cls._pid = os.getpid()
+    
+    @staticmethod
+    def _build_transport(pool_size: int, connection_timeout: float) -> RequestsTransport:
+        """HTTP transport whose connection pool holds up to pool_size keep-alive connections"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return RequestsTransport(session=session, session_owner=True,
+                                 connection_timeout=connection_timeout)
+    
+    @classmethod
+    def get_credential(cls) -> DefaultAzureCredential:
+        """The process-wide managed identity credential, which caches its tokens"""
+        with cls._lock:
+            cls._reset_if_forked()
+            if cls._credential is None:
+                cls._credential = DefaultAzureCredential()
+            return cls._credential
+    
+    @classmethod
+    def get_shared_client(cls, endpoint: str, key: Optional[str] = None,
+                          use_managed_identity: bool = False,
+                          pool_size: int = DEFAULT_POOL_SIZE,
+                          connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT) -> CosmosClient:
+        """
+        Return the process-wide client for an endpoint, creating it on first use.
+        
+        Args:
+            endpoint: Cosmos DB account endpoint
+            key: Account key, used unless use_managed_identity is set
+            use_managed_identity: Authenticate with DefaultAzureCredential
+            pool_size: Maximum pooled connections, applied when the client is created
+            connection_timeout: Seconds to wait for a connection to open
+            
+        Returns:
+            CosmosClient shared by every caller in this process
+            
+        Raises:
+            ValueError: If key-based authentication has no key
+        """
+        if is_fake_endpoint(endpoint):
+            with cls._lock:
+                cls._reset_if_forked()
+                client = cls._clients.get((endpoint, 'fake'))
+                if client is None:
+                    logger.info(f"Creating in-memory Cosmos client for {endpoint[:50]}")
+                    client = cls._clients[(endpoint, 'fake')] = create_fake_client(endpoint)
+                return client
+        if not use_managed_identity and not key:
+            raise ValueError("COSMOS_KEY is required for key-based authentication")
+        credential = cls.get_credential() if use_managed_identity else key
+        cache_key = (endpoint, 'managed-identity' if use_managed_identity else key)
+        
+        with cls._lock:
+            cls._reset_if_forked()
+            client = cls._clients.get(cache_key)
+            if client is None:
+                logger.info(f"Creating shared Cosmos client for {endpoint[:50]} "
+                            f"(pool size {pool_size}, pid {os.getpid()})")
+                client = CosmosClient(
+                    url=endpoint,
+                    credential=credential,
+                    consistency_level='Session',  # Good balance of performance and consistency
+                    transport=cls._build_transport(pool_size, connection_timeout)
+                )
+                cls._clients[cache_key] = client
+            return client
+    
+    @classmethod
+    def warm_up(cls, client: CosmosClient, database_name: str,
+                container_names: List[str]) -> Dict[str, Any]:
+        """
+        Open connections and load metadata before the first request needs them.
+        
+        Reads the database and container properties, which authenticates,
+        fills the connection pool and caches the account's routing
+        information. Runs once per process, client and set of containers;
+        later calls return the cached database properties.
+        
+        Returns:
+            Dict[str, Any]: Database properties
+            
+        Raises:
+            Exception: Whatever the Cosmos DB SDK raises if a resource cannot be read
+        """
+        warm_key = (id(client), database_name, tuple(container_names))
+        with cls._lock:
+            cls._reset_if_forked()
+            properties = cls._warmed.get(warm_key)
+        if properties is not None:
+            return properties
+        
+        database = client.get_database_client(database_name)
+        properties = database.read()
+        for container_name in container_names:
+            database.get_container_client(container_name).read()
+        with cls._lock:
+            cls._warmed[warm_key] = properties
+        logger.info(f"Warmed up Cosmos DB {database_name} ({len(container_names)} containers)")
+        return properties
+    
+    @classmethod
+    def reset(cls) -> None:
+        """Forget the shared clients and credential, e.g. after rotating keys"""
+        with cls._lock:
+            cls._clients = {}
+            cls._credential = None
+            cls._warmed = {}
+    
     @staticmethod
     def create_client(config) -> Optional[CosmosClient]:
         """
@@ -38,6 +183,8 @@ class CosmosClientFactory:
                 raise ValueError("COSMOS_ENDPOINT is required but not configured")
         
         try:
+            if is_fake_endpoint(config.COSMOS_ENDPOINT):
+                return CosmosClientFactory.get_shared_client(config.COSMOS_ENDPOINT)
             if config.USE_MANAGED_IDENTITY:
                 return CosmosClientFactory._create_managed_identity_client(config)
             else:
@@ -55,14 +202,13 @@ class CosmosClientFactory:
         """Create client using Azure Managed Identity"""
         logger.info("Creating Cosmos client with Managed Identity authentication")
         
-        # Use DefaultAzureCredential which tries multiple auth methods
-        credential = DefaultAzureCredential()
-        
         try:
-            client = CosmosClient(
-                url=config.COSMOS_ENDPOINT,
-                credential=credential,
-                consistency_level='Session'  # Good balance of performance and consistency
+            # DefaultAzureCredential tries multiple auth methods
+            client = CosmosClientFactory.get_shared_client(
+                config.COSMOS_ENDPOINT,
+                use_managed_identity=True,
+                pool_size=getattr(config, 'COSMOS_POOL_SIZE', DEFAULT_POOL_SIZE),
+                connection_timeout=getattr(config, 'COSMOS_CONNECTION_TIMEOUT', DEFAULT_CONNECTION_TIMEOUT)
             )
             
             logger.info("Successfully created Cosmos client with Managed Identity")
@@ -84,10 +230,11 @@ class CosmosClientFactory:
         logger.info("Creating Cosmos client with key-based authentication")
         
         try:
-            client = CosmosClient(
-                url=config.COSMOS_ENDPOINT,
-                credential=config.COSMOS_KEY,
-                consistency_level='Session'
+            client = CosmosClientFactory.get_shared_client(
+                config.COSMOS_ENDPOINT,
+                key=config.COSMOS_KEY,
+                pool_size=getattr(config, 'COSMOS_POOL_SIZE', DEFAULT_POOL_SIZE),
+                connection_timeout=getattr(config, 'COSMOS_CONNECTION_TIMEOUT', DEFAULT_CONNECTION_TIMEOUT)
             )
             
             logger.info("Successfully created Cosmos client with key-based authentication")
@@ -0,0 +1,556 @@
+"""
+In-memory stand-in for the Cosmos DB client, for offline benchmarks and tests.
+
+FakeCosmosClient implements the part of CosmosClient, DatabaseProxy and
+ContainerProxy this project uses: point reads, upserts, deletes,
+transactional batches, patch increments, the change feed, and queries of
+the shapes in cosmos_queries (SELECT * / projections / VALUE COUNT(1),
+equality and ARRAY_CONTAINS WHERE clauses with @-parameters, ORDER BY and
+OFFSET/LIMIT) with continuation tokens. Unsupported query text is rejected with a 400, as a syntax error
+would be.
+
+Each container spreads its items over a number of physical partitions by
+the hash of their partition key value. A query scoped to a partition key
+touches one of them, a cross-partition query fans out to all, and every
+request is charged synthetic request units from the partitions touched
+and the documents read and written (see the *_RU constants), which are
+reported through response_hook and the usual response headers. Latency
+and throttling (429) can be injected per request.
+
+CosmosClientFactory returns a shared FakeCosmosClient for endpoints
+starting with fake://, so the services run unchanged with e.g.
+COSMOS_ENDPOINT=fake://local (no key needed). Query parameters of the
+endpoint configure the fake:
+    fake://bench?latency_ms=5&throttle_rate=0.01&partitions=8&seed=1
+"""
+import copy
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import parse_qs, urlparse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from azure.cosmos import exceptions
+
+FAKE_ENDPOINT_PREFIX = 'fake://'
+
+# Synthetic request charges, in the range of what Cosmos DB charges
+POINT_READ_RU_PER_KB = 1.0
+WRITE_RU_PER_KB = 5.5
+DELETE_RU = 5.0
+PATCH_RU_PER_KB = 10.0
+QUERY_RU_PER_PARTITION = 2.5
+QUERY_RU_PER_DOCUMENT = 0.1
+
+MAX_BATCH_OPERATIONS = 100
+
+# Partition key path and ID field of the containers this project creates
+DEFAULT_CONTAINERS = {
+    'claims': ('/claim_id', 'claim_id'),
+    'events': ('/event_id', 'event_id'),
+    'events-by-entity': ('/entity_id', 'event_id'),
+}
+
+QUERY_PATTERN = re.compile(
+    r"^SELECT (?P<value>VALUE )?(?P<projection>.+?) FROM c"
+    r"(?: WHERE (?P<where>.+?))?"
+    r"(?: ORDER BY c\.(?P<order>\w+)(?: (?P<direction>ASC|DESC))?)?"
+    r"(?: OFFSET (?P<offset>@\w+|\d+) LIMIT (?P<limit>@\w+|\d+))?$")
+CONDITION_PATTERN = re.compile(r"^c\.(\w+) = (@\w+)$")
+ARRAY_CONTAINS_PATTERN = re.compile(r"^ARRAY_CONTAINS\((@\w+), c\.(\w+)\)$")
+FIELD_PATTERN = re.compile(r"^c\.(\w+)$")
+ARRAY_LENGTH_PATTERN = re.compile(r"^ARRAY_LENGTH\(c\.(\w+)\) AS (\w+)$")
+
+
+def is_fake_endpoint(endpoint: Optional[str]) -> bool:
+    """Whether an endpoint selects the in-memory fake"""
+    return bool(endpoint) and endpoint.startswith(FAKE_ENDPOINT_PREFIX)
+
+
+def create_fake_client(endpoint: str) -> 'FakeCosmosClient':
+    """
+    Create a fake client configured by the query parameters of a fake:// endpoint.
+
+    Args:
+        endpoint: Endpoint such as fake://local?latency_ms=5&throttle_rate=0.01
+
+    Returns:
+        FakeCosmosClient: New client with empty containers
+
+    Raises:
+        ValueError: If a parameter is unknown or not a number
+    """
+    settings = {name: values[-1] for name, values in parse_qs(urlparse(endpoint).query).items()}
+    unknown = set(settings) - {'latency_ms', 'throttle_rate', 'partitions', 'seed'}
+    if unknown:
+        raise ValueError(f"Unknown fake Cosmos DB settings: {', '.join(sorted(unknown))}")
+    return FakeCosmosClient(physical_partitions=int(settings.get('partitions', 4)),
+                            latency_ms=float(settings.get('latency_ms', 0)),
+                            throttle_rate=float(settings.get('throttle_rate', 0)),
+                            seed=int(settings['seed']) if 'seed' in settings else None)
+
+
+def _http_error(status_code: int, message: str, error_type=exceptions.CosmosHttpResponseError,
+                headers: Optional[Dict[str, str]] = None) -> exceptions.CosmosHttpResponseError:
+    error = error_type(status_code=status_code, message=message)
+    error.headers = headers or {}
+    return error
+
+
+def _size_kb(document: Dict[str, Any]) -> int:
+    return max(1, math.ceil(len(json.dumps(document, default=str)) / 1024))
+
+
+class _Query:
+    """A parsed query of one of the supported shapes"""
+
+    def __init__(self, text: str, parameters: Optional[List[Dict[str, Any]]]):
+        match = QUERY_PATTERN.match(' '.join(text.split()))
+        if match is None:
+            raise _http_error(400, f"Query not supported by the fake: {text}")
+        values = {parameter['name']: parameter['value'] for parameter in parameters or []}
+
+        def bind(token: Optional[str]) -> Any:
+            if token is None or not token.startswith('@'):
+                return token
+            if token not in values:
+                raise _http_error(400, f"Parameter {token} is not defined")
+            return values[token]
+
+        # (field, values) pairs; a document matches when its field is one of the values
+        self.conditions: List[Tuple[str, List[Any]]] = []
+        if match.group('where'):
+            for condition in match.group('where').split(' AND '):
+                parsed = CONDITION_PATTERN.match(condition.strip())
+                contains = ARRAY_CONTAINS_PATTERN.match(condition.strip())
+                if parsed is not None:
+                    self.conditions.append((parsed.group(1), [bind(parsed.group(2))]))
+                elif contains is not None:
+                    self.conditions.append((contains.group(2), list(bind(contains.group(1)))))
+                else:
+                    raise _http_error(400, f"Condition not supported by the fake: {condition}")
+
+        self.count = False
+        self.projection: Optional[List[Tuple[str, str, bool]]] = None
+        projection = match.group('projection')
+        if match.group('value'):
+            if projection != 'COUNT(1)':
+                raise _http_error(400, f"Projection not supported by the fake: {projection}")
+            self.count = True
+        elif projection != '*':
+            self.projection = []
+            for column in projection.split(', '):
+                field, length = FIELD_PATTERN.match(column), ARRAY_LENGTH_PATTERN.match(column)
+                if field:
+                    self.projection.append((field.group(1), field.group(1), False))
+                elif length:
+                    self.projection.append((length.group(2), length.group(1), True))
+                else:
+                    raise _http_error(400, f"Projection not supported by the fake: {column}")
+
+        self.order = match.group('order')
+        self.descending = match.group('direction') == 'DESC'
+        self.offset = int(bind(match.group('offset')) or 0)
+        self.limit = int(bind(match.group('limit'))) if match.group('limit') else None
+
+    def matches(self, document: Dict[str, Any]) -> bool:
+        return all(document.get(field) in values for field, values in self.conditions)
+
+    def project(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        if self.projection is None:
+            return copy.deepcopy(document)
+        result = {}
+        for name, field, length in self.projection:
+            value = document.get(field)
+            if length:
+                if isinstance(value, list):
+                    result[name] = len(value)
+            elif field in document:
+                # Like Cosmos DB, undefined properties are left out of projections
+                result[name] = copy.deepcopy(value)
+        return result
+
+
+class FakePager:
+    """Page iterator with the continuation_token attribute of the SDK's pagers"""
+
+    def __init__(self, fetch: Callable[[Optional[str]], Tuple[List[Any], Optional[str]]],
+                 continuation_token: Optional[str]):
+        self._fetch = fetch
+        self.continuation_token = continuation_token
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Iterator[Any]:
+        if self._done:
+            raise StopIteration
+        items, token = self._fetch(self.continuation_token)
+        self.continuation_token = token
+        self._done = token is None
+        if not items and self._done:
+            raise StopIteration
+        return iter(items)
+
+
+class FakeItemPaged:
+    """Lazy query result; iterating it reads every page"""
+
+    def __init__(self, fetch: Callable[[Optional[str]], Tuple[List[Any], Optional[str]]],
+                 continuation_token: Optional[str] = None):
+        self._fetch = fetch
+        self._continuation_token = continuation_token
+
+    def by_page(self, continuation_token: Optional[str] = None) -> FakePager:
+        return FakePager(self._fetch, continuation_token or self._continuation_token)
+
+    def __iter__(self) -> Iterator[Any]:
+        for page in self.by_page():
+            yield from page
+
+
+class FakeContainer:
+    """In-memory container with synthetic request charges"""
+
+    def __init__(self, client: 'FakeCosmosClient', name: str, partition_key_path: str, id_field: str):
+        self.client = client
+        self.id = name
+        self.partition_key_field = partition_key_path.lstrip('/')
+        self.id_field = id_field
+        self._items: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lsn = 0
+        self._lock = threading.RLock()
+        self.request_charge = 0.0
+        self.requests: Dict[str, int] = {}
+        self.last_response_headers: Dict[str, str] = {}
+
+    # Bookkeeping
+
+    def _partition_of(self, partition_key: Any) -> int:
+        return zlib.crc32(json.dumps(partition_key, default=str).encode('utf-8')) % \
+            self.client.physical_partitions
+
+    def _key(self, document: Dict[str, Any]) -> Tuple[str, str]:
+        item_id = document.get('id') or document.get(self.id_field)
+        if not item_id:
+            raise _http_error(400, f"Document has no id or {self.id_field}")
+        return json.dumps(document.get(self.partition_key_field), default=str), str(item_id)
+
+    def _respond(self, operation: str, charge: float, result: Any,
+                 response_hook: Optional[Callable] = None, item_count: Optional[int] = None) -> Any:
+        """Account one request and report its headers"""
+        headers = {
+            'x-ms-request-charge': f"{charge:.2f}",
+            'x-ms-activity-id': str(uuid.uuid4()),
+            'x-ms-request-duration-ms': f"{self.client.latency_ms:.3f}",
+        }
+        if item_count is not None:
+            headers['x-ms-item-count'] = str(item_count)
+        with self._lock:
+            self.request_charge += charge
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+            self.last_response_headers = headers
+        if response_hook is not None:
+            response_hook(headers, result)
+        return result
+
+    def read(self, **kwargs) -> Dict[str, Any]:
+        """Container properties"""
+        self.client.before_request()
+        return self._respond('read', 1.0, {'id': self.id, 'partitionKey': {
+            'paths': [f"/{self.partition_key_field}"], 'kind': 'Hash'}}, kwargs.get('response_hook'))
+
+    # Point operations
+
+    def upsert_item(self, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Insert or replace a document"""
+        self.client.before_request()
+        return self._store('upsert_item', body, kwargs.get('response_hook'))
+
+    def _store(self, operation: str, body: Dict[str, Any], response_hook: Optional[Callable]) -> Dict[str, Any]:
+        key = self._key(body)
+        with self._lock:
+            self._lsn += 1
+            stored = dict(copy.deepcopy(body), _rid=key[1], _etag=f'"{self._lsn}"',
+                          _ts=int(time.time()), _lsn=self._lsn)
+            self._items[key] = stored
+        return self._respond(operation, WRITE_RU_PER_KB * _size_kb(body), copy.deepcopy(stored), response_hook)
+
+    def create_item(self, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Insert a document, failing with 409 if it exists"""
+        self.client.before_request()
+        with self._lock:
+            exists = self._key(body) in self._items
+        if exists:
+            self._respond('create_item', 1.0, None, kwargs.get('response_hook'))
+            raise _http_error(409, "Entity with the specified id already exists in the system",
+                              exceptions.CosmosResourceExistsError)
+        return self._store('create_item', body, kwargs.get('response_hook'))
+
+    def patch_item(self, item: str, partition_key: Any, patch_operations: List[Dict[str, Any]],
+                   **kwargs) -> Dict[str, Any]:
+        """Apply set and incr operations atomically; parents of a path must exist"""
+        self.client.before_request()
+        if len(patch_operations) > 10:
+            raise _http_error(400, "Patch has more than 10 operations")
+        key = (json.dumps(partition_key, default=str), str(item))
+        with self._lock:
+            document = self._items.get(key)
+            if document is not None:
+                patched = copy.deepcopy(document)
+                for operation in patch_operations:
+                    *parents, name = operation['path'].strip('/').split('/')
+                    target = patched
+                    for parent in parents:
+                        target = target.get(parent) if isinstance(target, dict) else None
+                    if not isinstance(target, dict):
+                        raise _http_error(400, f"Parent of {operation['path']} does not exist")
+                    if operation['op'] == 'incr':
+                        target[name] = target.get(name, 0) + operation['value']
+                    elif operation['op'] == 'set':
+                        target[name] = operation['value']
+                    else:
+                        raise _http_error(400, f"Patch operation not supported by the fake: {operation['op']}")
+                self._lsn += 1
+                patched.update(_etag=f'"{self._lsn}"', _ts=int(time.time()), _lsn=self._lsn)
+                self._items[key] = patched
+        if document is None:
+            self._respond('patch_item', 1.0, None, kwargs.get('response_hook'))
+            raise _http_error(404, f"Entity with the specified id {item} does not exist",
+                              exceptions.CosmosResourceNotFoundError)
+        return self._respond('patch_item', PATCH_RU_PER_KB * _size_kb(patched),
+                             copy.deepcopy(patched), kwargs.get('response_hook'))
+
+    def read_item(self, item: str, partition_key: Any, **kwargs) -> Dict[str, Any]:
+        """Read a document by ID and partition key"""
+        self.client.before_request()
+        with self._lock:
+            document = self._items.get((json.dumps(partition_key, default=str), str(item)))
+        if document is None:
+            self._respond('read_item', 1.0, None, kwargs.get('response_hook'))
+            raise _http_error(404, f"Entity with the specified id {item} does not exist",
+                              exceptions.CosmosResourceNotFoundError,
+                              dict(self.last_response_headers))
+        return self._respond('read_item', POINT_READ_RU_PER_KB * _size_kb(document),
+                             copy.deepcopy(document), kwargs.get('response_hook'))
+
+    def delete_item(self, item: str, partition_key: Any, **kwargs) -> None:
+        """Delete a document by ID and partition key"""
+        self.client.before_request()
+        with self._lock:
+            document = self._items.pop((json.dumps(partition_key, default=str), str(item)), None)
+        self._respond('delete_item', DELETE_RU, None, kwargs.get('response_hook'))
+        if document is None:
+            raise _http_error(404, f"Entity with the specified id {item} does not exist",
+                              exceptions.CosmosResourceNotFoundError)
+
+    def execute_item_batch(self, batch_operations: List[Tuple[str, Tuple[Any, ...]]],
+                           partition_key: Any, **kwargs) -> List[Dict[str, Any]]:
+        """Apply up to 100 upserts of one partition key value atomically"""
+        self.client.before_request()
+        if len(batch_operations) > MAX_BATCH_OPERATIONS:
+            raise _http_error(400, f"Batch has more than {MAX_BATCH_OPERATIONS} operations")
+        documents = []
+        for operation, arguments in batch_operations:
+            if operation != 'upsert':
+                raise _http_error(400, f"Batch operation not supported by the fake: {operation}")
+            document = arguments[0]
+            if document.get(self.partition_key_field) != partition_key:
+                raise _http_error(400, "Batch operations must share the partition key value")
+            self._key(document)
+            documents.append(document)
+
+        results = []
+        with self._lock:
+            for document in documents:
+                self._lsn += 1
+                stored = dict(copy.deepcopy(document), _rid=self._key(document)[1],
+                              _etag=f'"{self._lsn}"', _ts=int(time.time()), _lsn=self._lsn)
+                self._items[self._key(document)] = stored
+                results.append({'statusCode': 200, 'resourceBody': copy.deepcopy(stored)})
+        charge = sum(WRITE_RU_PER_KB * _size_kb(document) for document in documents)
+        return self._respond('execute_item_batch', charge, results, kwargs.get('response_hook'))
+
+    # Queries
+
+    def _documents(self, partition_key: Any = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Documents in scope and the number of physical partitions touched"""
+        with self._lock:
+            documents = list(self._items.values())
+        if partition_key is None:
+            return documents, self.client.physical_partitions
+        return [document for document in documents
+                if document.get(self.partition_key_field) == partition_key], 1
+
+    @staticmethod
+    def _offset(continuation_token: Optional[str]) -> int:
+        if not continuation_token:
+            return 0
+        try:
+            return int(json.loads(continuation_token)['offset'])
+        except (ValueError, KeyError, TypeError):
+            raise _http_error(400, "Invalid continuation token")
+
+    def query_items(self, query: str, parameters: Optional[List[Dict[str, Any]]] = None,
+                    partition_key: Any = None, enable_cross_partition_query: Optional[bool] = None,
+                    max_item_count: Optional[int] = None, **kwargs) -> FakeItemPaged:
+        """Run a query lazily; each page is one request"""
+        parsed = _Query(query, parameters)
+        if partition_key is None and not enable_cross_partition_query:
+            raise _http_error(400, "Cross partition query is required but disabled")
+        response_hook = kwargs.get('response_hook')
+
+        def fetch(continuation_token: Optional[str]) -> Tuple[List[Any], Optional[str]]:
+            self.client.before_request()
+            documents, partitions = self._documents(partition_key)
+            matching = [document for document in documents if parsed.matches(document)]
+            if parsed.count:
+                return self._respond('query_items', QUERY_RU_PER_PARTITION * partitions +
+                                     QUERY_RU_PER_DOCUMENT * len(matching),
+                                     [len(matching)], response_hook, 1), None
+
+            if parsed.order:
+                # None sorts first, as undefined values do in Cosmos DB
+                matching.sort(key=lambda document: (document.get(parsed.order) is not None,
+                                                    document.get(parsed.order) or ''),
+                              reverse=parsed.descending)
+            end = len(matching) if parsed.limit is None else parsed.offset + parsed.limit
+            results = matching[parsed.offset:end]
+
+            start = self._offset(continuation_token)
+            page_size = max_item_count if max_item_count and max_item_count > 0 else len(results)
+            page = results[start:start + page_size]
+            next_start = start + len(page)
+            token = json.dumps({'offset': next_start}) if next_start < len(results) else None
+            # Skipped rows are read and charged, as with OFFSET in Cosmos DB
+            read = (parsed.offset if start == 0 else 0) + len(page)
+            charge = QUERY_RU_PER_PARTITION * partitions + QUERY_RU_PER_DOCUMENT * read
+            return self._respond('query_items', charge, [parsed.project(document) for document in page],
+                                 response_hook, len(page)), token
+
+        return FakeItemPaged(fetch)
+
+    def read_all_items(self, max_item_count: Optional[int] = None, **kwargs) -> FakeItemPaged:
+        """Every document of the container"""
+        return self.query_items("SELECT * FROM c", enable_cross_partition_query=True,
+                                max_item_count=max_item_count, **kwargs)
+
+    def query_items_change_feed(self, is_start_from_beginning: bool = False,
+                                continuation: Optional[str] = None,
+                                max_item_count: Optional[int] = None, **kwargs) -> FakeItemPaged:
+        """Latest version of every document changed after the continuation point"""
+        response_hook = kwargs.get('response_hook')
+        if continuation is None and not is_start_from_beginning:
+            with self._lock:
+                continuation = str(self._lsn)
+
+        def fetch(continuation_token: Optional[str]) -> Tuple[List[Any], Optional[str]]:
+            self.client.before_request()
+            after = int(continuation_token or 0)
+            with self._lock:
+                changed = sorted((document for document in self._items.values()
+                                  if document['_lsn'] > after), key=lambda document: document['_lsn'])
+            page = changed[:max_item_count] if max_item_count else changed
+            token = str(page[-1]['_lsn']) if page else str(after)
+            charge = QUERY_RU_PER_DOCUMENT * len(page) + (1.0 if page else 0.5)
+            # The change feed always returns a token; an empty page means caught up
+            return self._respond('query_items_change_feed', charge, copy.deepcopy(page),
+                                 response_hook, len(page)), token if page else None
+
+        return FakeItemPaged(fetch, continuation)
+
+    def stats(self) -> Dict[str, Any]:
+        """Documents stored, requests per operation and total request charge"""
+        with self._lock:
+            return {'documents': len(self._items), 'requests': dict(self.requests),
+                    'request_charge': round(self.request_charge, 2)}
+
+
+class FakeDatabase:
+    """In-memory database holding fake containers"""
+
+    def __init__(self, client: 'FakeCosmosClient', name: str):
+        self.client = client
+        self.id = name
+        self._containers: Dict[str, FakeContainer] = {}
+        self._lock = threading.Lock()
+
+    def read(self, **kwargs) -> Dict[str, Any]:
+        """Database properties"""
+        self.client.before_request()
+        return {'id': self.id, 'offer_throughput': 'fake'}
+
+    def get_container_client(self, container: str) -> FakeContainer:
+        """Container by name, created on first use"""
+        with self._lock:
+            if container not in self._containers:
+                partition_key_path, id_field = self.client.containers.get(container, ('/id', 'id'))
+                self._containers[container] = FakeContainer(self.client, container,
+                                                             partition_key_path, id_field)
+            return self._containers[container]
+
+    def list_containers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{'id': name} for name in self._containers]
+
+
+class FakeCosmosClient:
+    """In-memory CosmosClient with injectable latency and throttling"""
+
+    def __init__(self, physical_partitions: int = 4, latency_ms: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 containers: Optional[Dict[str, Tuple[str, str]]] = None,
+                 seed: Optional[int] = None):
+        """
+        Create the client.
+
+        Args:
+            physical_partitions: Physical partitions per container
+            latency_ms: Delay added to every request
+            throttle_rate: Fraction of requests rejected with 429
+            containers: Container name to (partition key path, ID field),
+                in addition to DEFAULT_CONTAINERS
+            seed: Seed of the throttling decisions
+        """
+        self.physical_partitions = max(1, physical_partitions)
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.containers = dict(DEFAULT_CONTAINERS, **(containers or {}))
+        self._random = random.Random(seed)
+        self._throttle_next = 0
+        self._databases: Dict[str, FakeDatabase] = {}
+        self._lock = threading.Lock()
+
+    def throttle_next(self, count: int = 1) -> None:
+        """Reject the next `count` requests with 429"""
+        with self._lock:
+            self._throttle_next += count
+
+    def before_request(self) -> None:
+        """Apply the injected latency and throttling to a request"""
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            throttled = self._throttle_next > 0 or \
+                (self.throttle_rate > 0 and self._random.random() < self.throttle_rate)
+            if self._throttle_next > 0:
+                self._throttle_next -= 1
+        if throttled:
+            raise _http_error(429, "Request rate is too large",
+                              headers={'x-ms-retry-after-ms': '100', 'x-ms-request-charge': '0'})
+
+    def get_database_client(self, database: str) -> FakeDatabase:
+        """Database by name, created on first use"""
+        with self._lock:
+            if database not in self._databases:
+                self._databases[database] = FakeDatabase(self, database)
+            return self._databases[database]
+
+    def close(self) -> None:
+        pass
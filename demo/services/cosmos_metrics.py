@@ -0,0 +1,303 @@
+"""
+Request-unit and latency instrumentation for Cosmos DB operations.
+
+Service methods decorated with @instrumented('name') are timed, and the
+containers they use are wrapped in InstrumentedContainer, which passes a
+response_hook to every SDK call. The hook adds the request charge, server
+duration and throttle retries from the response headers to the operation
+running in the current context (a ContextVar, so concurrent requests and
+coroutines do not mix their numbers). When the operation returns, its
+totals are added to per-operation histograms, and operations above the
+RU or latency threshold are written to the 'cosmos.slow' log.
+
+Work handed to thread pools needs the caller's context, see
+contextvars.copy_context.
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('cosmos.slow')
+
+REQUEST_CHARGE_HEADER = 'x-ms-request-charge'
+ACTIVITY_ID_HEADER = 'x-ms-activity-id'
+REQUEST_DURATION_HEADER = 'x-ms-request-duration-ms'
+THROTTLE_RETRY_COUNT_HEADER = 'x-ms-throttle-retry-count'
+
+RU_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ITEM_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Add one observation"""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def _quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (lock must be held)"""
+        if not self._count:
+            return None
+        rank, seen = q * self._count, 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self._max)
+        return self._max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum, max, approximate percentiles and cumulative bucket counts"""
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets['+Inf'] = self._count
+            return {
+                'count': self._count,
+                'sum': round(self._sum, 3),
+                'max': round(self._max, 3),
+                'p50': self._quantile(0.5),
+                'p95': self._quantile(0.95),
+                'p99': self._quantile(0.99),
+                'buckets': buckets
+            }
+
+
+class OperationStats:
+    """Histograms and counters of one operation"""
+
+    def __init__(self):
+        self.request_charge = Histogram(RU_BUCKETS)
+        self.client_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.server_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.item_count = Histogram(ITEM_BUCKETS)
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'errors': 0, 'throttled': 0, 'slow': 0}
+
+    def count(self, **increments: int) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters,
+                    request_charge=self.request_charge.snapshot(),
+                    client_latency_ms=self.client_latency_ms.snapshot(),
+                    server_latency_ms=self.server_latency_ms.snapshot(),
+                    item_count=self.item_count.snapshot())
+
+
+class _Call:
+    """Totals of the SDK requests made by one operation"""
+
+    def __init__(self):
+        self.request_charge = 0.0
+        self.server_ms = 0.0
+        self.requests = 0
+        self.throttles = 0
+        self.errors = 0
+        self.activity_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def add_headers(self, headers: Any) -> None:
+        if not headers:
+            return
+        with self._lock:
+            self.requests += 1
+            self.request_charge += _number(headers.get(REQUEST_CHARGE_HEADER))
+            self.server_ms += _number(headers.get(REQUEST_DURATION_HEADER))
+            self.throttles += int(_number(headers.get(THROTTLE_RETRY_COUNT_HEADER)))
+            if headers.get(ACTIVITY_ID_HEADER):
+                self.activity_ids.append(headers[ACTIVITY_ID_HEADER])
+
+    def add_error(self, error: BaseException) -> None:
+        with self._lock:
+            self.errors += 1
+            if getattr(error, 'status_code', None) == 429:
+                self.throttles += 1
+        response = getattr(error, 'response', None)
+        self.add_headers(getattr(response, 'headers', None))
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value) if value is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_current_call: contextvars.ContextVar[Optional[_Call]] = contextvars.ContextVar('cosmos_call', default=None)
+
+
+def record_response(headers: Any, result: Any = None) -> None:
+    """SDK response_hook adding a response's headers to the current operation"""
+    call = _current_call.get()
+    if call is not None:
+        call.add_headers(headers)
+
+
+def _item_count(result: Any) -> int:
+    """Number of items an operation returned"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) or result is True:
+        return 1
+    return 0
+
+
+class CosmosMetrics:
+    """Per-operation Cosmos DB metrics and the slow-query log"""
+
+    def __init__(self, slow_request_charge: float = 50.0, slow_latency_ms: float = 500.0):
+        self.slow_request_charge = slow_request_charge
+        self.slow_latency_ms = slow_latency_ms
+        self._operations: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, slow_request_charge: float, slow_latency_ms: float) -> None:
+        """Set the thresholds above which operations are logged as slow"""
+        self.slow_request_charge = slow_request_charge
+        self.slow_latency_ms = slow_latency_ms
+
+    def _stats(self, operation: str) -> OperationStats:
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = OperationStats()
+            return stats
+
+    def record(self, operation: str, call: _Call, client_ms: float, items: int) -> None:
+        """Add a finished operation to its histograms and log it if slow"""
+        stats = self._stats(operation)
+        stats.request_charge.observe(call.request_charge)
+        stats.client_latency_ms.observe(client_ms)
+        stats.server_latency_ms.observe(call.server_ms)
+        stats.item_count.observe(items)
+        slow = call.request_charge > self.slow_request_charge or client_ms > self.slow_latency_ms
+        stats.count(calls=1, errors=1 if call.errors else 0, throttled=call.throttles, slow=1 if slow else 0)
+        if slow:
+            slow_logger.warning(
+                f"Slow Cosmos DB operation {operation}: {call.request_charge:.2f} RU, "
+                f"{client_ms:.1f} ms client, {call.server_ms:.1f} ms server, {items} items, "
+                f"{call.requests} requests, {call.throttles} throttled, "
+                f"activity IDs {','.join(call.activity_ids[:5]) or '-'}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Metrics of every operation, by name"""
+        with self._lock:
+            operations = dict(self._operations)
+        return {
+            'slow_request_charge': self.slow_request_charge,
+            'slow_latency_ms': self.slow_latency_ms,
+            'operations': {name: stats.snapshot() for name, stats in sorted(operations.items())}
+        }
+
+    def reset(self) -> None:
+        """Forget all recorded operations"""
+        with self._lock:
+            self._operations = {}
+
+
+# Shared by every Cosmos DB service in the process
+cosmos_metrics = CosmosMetrics()
+
+
+def instrumented(operation: str) -> Callable:
+    """Decorator recording RU, latency, item count and throttling of a service method"""
+    def decorator(method: Callable) -> Callable:
+        def finish(call: _Call, start: float, result: Any) -> None:
+            # Calls that never reached Cosmos DB (not connected, circuit open) are not recorded
+            if call.requests or call.errors:
+                cosmos_metrics.record(operation, call, (time.perf_counter() - start) * 1000, _item_count(result))
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                call, start = _Call(), time.perf_counter()
+                token = _current_call.set(call)
+                result = None
+                try:
+                    result = await method(*args, **kwargs)
+                    return result
+                finally:
+                    _current_call.reset(token)
+                    finish(call, start, result)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            call, start = _Call(), time.perf_counter()
+            token = _current_call.set(call)
+            result = None
+            try:
+                result = method(*args, **kwargs)
+                return result
+            finally:
+                _current_call.reset(token)
+                finish(call, start, result)
+        return wrapper
+    return decorator
+
+
+class InstrumentedContainer:
+    """Container client proxy passing a response_hook to every call"""
+
+    def __init__(self, container: Any):
+        self._container = container
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._container, name)
+        if not callable(attribute):
+            return attribute
+
+        def hooked(*args, **kwargs):
+            kwargs.setdefault('response_hook', record_response)
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                _add_error(e)
+                raise
+            if inspect.isawaitable(result):
+                return _awaited(result)
+            return result
+
+        return hooked
+
+
+def _add_error(error: BaseException) -> None:
+    call = _current_call.get()
+    if call is not None:
+        call.add_error(error)
+
+
+async def _awaited(awaitable: Any) -> Any:
+    try:
+        return await awaitable
+    except Exception as e:
+        _add_error(e)
+        raise
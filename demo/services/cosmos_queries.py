@@ -0,0 +1,99 @@
+"""
+Query texts shared by the Cosmos DB services.
+
+Every query is a constant with @-parameters, so the text of repeated
+queries is identical and the gateway can reuse its cached plan, and user
+input never reaches the SQL. Entity lookups are meant to run against the
+events container partitioned on /entity_id with the entity ID passed as
+the partition key, which keeps them on a single partition.
+
+Claim listings select only the summary fields they return, so Cosmos DB
+sends a few hundred bytes per claim instead of the whole document. The
+projection is always built in CLAIM_SUMMARY_FIELDS order, so a given
+field set always produces the same query text.
+"""
+from typing import Dict, List, Any, Optional
+
+from models.claim import CLAIM_SUMMARY_FIELDS
+
+LIST_CLAIMS_QUERY = "SELECT * FROM c ORDER BY c.submission_time DESC OFFSET @offset LIMIT @limit"
+PAGE_CLAIMS_QUERY = "SELECT * FROM c ORDER BY c.submission_time DESC"
+# Current versions of the claims a bulk save replaces (at most BULK_READ_IDS per query)
+CLAIMS_BY_ID_QUERY = "SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.claim_id)"
+BULK_READ_IDS = 100
+AGGREGATE_SHARDS_QUERY = "SELECT * FROM c"
+
+# Projection of each claim summary field; anything else is rejected
+SUMMARY_PROJECTIONS = {
+    'claim_id': "c.claim_id",
+    'claim_amount': "c.claim_amount",
+    'submission_time': "c.submission_time",
+    'updated_time': "c.updated_time",
+    'status': "c.status",
+    'fraud_score': "c.fraud_score",
+    'files_count': "ARRAY_LENGTH(c.uploaded_files) AS files_count",
+}
+
+LIST_ENTITY_EVENTS_QUERY = ("SELECT * FROM c WHERE c.entity_id = @entity_id "
+                            "ORDER BY c.timestamp DESC OFFSET 0 LIMIT @limit")
+LIST_RECENT_EVENTS_QUERY = "SELECT * FROM c ORDER BY c.timestamp DESC OFFSET 0 LIMIT @limit"
+PAGE_ENTITY_EVENTS_QUERY = "SELECT * FROM c WHERE c.entity_id = @entity_id ORDER BY c.timestamp DESC"
+PAGE_RECENT_EVENTS_QUERY = "SELECT * FROM c ORDER BY c.timestamp DESC"
+
+# Continuation tokens of pages read from the legacy events container carry
+# this prefix so the next page is read from the same container
+LEGACY_TOKEN_PREFIX = 'legacy:'
+
+
+def event_query(entity_id: Optional[str], limit: int) -> Dict[str, Any]:
+    """Query text and parameters listing the newest events, optionally of one entity"""
+    parameters = [{'name': '@limit', 'value': int(limit)}]
+    if entity_id:
+        parameters.append({'name': '@entity_id', 'value': entity_id})
+        return {'query': LIST_ENTITY_EVENTS_QUERY, 'parameters': parameters}
+    return {'query': LIST_RECENT_EVENTS_QUERY, 'parameters': parameters}
+
+
+def merge_events(primary: List[Dict[str, Any]], legacy: List[Dict[str, Any]],
+                 limit: int) -> List[Dict[str, Any]]:
+    """
+    Merge events read from the current and the legacy events container.
+
+    Events already copied to the current container appear in both; the
+    current copy wins. The result is ordered newest first.
+    """
+    seen = {event.get('event_id') for event in primary}
+    merged = primary + [event for event in legacy if event.get('event_id') not in seen]
+    merged.sort(key=lambda event: event.get('timestamp') or '', reverse=True)
+    return merged[:limit]
+
+
+def claim_summaries_query(fields: Optional[List[str]] = None, paged: bool = False) -> str:
+    """
+    Query text selecting claim summary fields, newest first.
+
+    Args:
+        fields: Summary fields to select (defaults to all of CLAIM_SUMMARY_FIELDS)
+        paged: Omit OFFSET/LIMIT for use with continuation tokens
+
+    Raises:
+        ValueError: If a field is not a summary field
+    """
+    wanted = set(fields or CLAIM_SUMMARY_FIELDS)
+    unknown = wanted - set(SUMMARY_PROJECTIONS)
+    if unknown:
+        raise ValueError(f"Unsupported summary fields: {', '.join(sorted(unknown))}")
+    projection = ", ".join(SUMMARY_PROJECTIONS[name] for name in CLAIM_SUMMARY_FIELDS if name in wanted)
+    query = f"SELECT {projection} FROM c ORDER BY c.submission_time DESC"
+    return query if paged else f"{query} OFFSET @offset LIMIT @limit"
+
+
+def normalize_summaries(items: List[Dict[str, Any]],
+                        fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Fill in fields Cosmos DB leaves out of projections when they are undefined"""
+    names = fields or CLAIM_SUMMARY_FIELDS
+    summaries = [{name: item.get(name) for name in names} for item in items]
+    if 'files_count' in names:
+        for summary in summaries:
+            summary['files_count'] = summary['files_count'] or 0
+    return summaries
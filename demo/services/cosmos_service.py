@@ -3,12 +3,24 @@ Cosmos DB Service for the insurance fraud detection system.
 This service provides methods to interact with Azure Cosmos DB.
 """
 import os
-from typing import Dict, List, Any, Optional, Union
+import random
+from typing import Dict, List, Any, Optional, Tuple, Union
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
-from azure.identity import DefaultAzureCredential
 from utils.config import Config
 from models.claim import Claim
 from models.event import Event
+from .aggregates import (REPLACED_UNREAD, claim_delta, compute_counters, document_counters, merge_counters,
+                         patch_operations, shard_document, shard_ids, summarize)
+from .bulk import BulkItemResult, bulk_upsert
+from .cosmos_client_factory import CosmosClientFactory, DEFAULT_POOL_SIZE, DEFAULT_CONNECTION_TIMEOUT
+from .cosmos_fake import is_fake_endpoint
+from .circuit_breaker import CircuitBreaker, GuardedContainer, HealthProber, OPEN
+from .cosmos_metrics import InstrumentedContainer, cosmos_metrics, instrumented
+from .cosmos_queries import (LIST_CLAIMS_QUERY, PAGE_CLAIMS_QUERY, PAGE_ENTITY_EVENTS_QUERY,
+                             PAGE_RECENT_EVENTS_QUERY, LEGACY_TOKEN_PREFIX, CLAIMS_BY_ID_QUERY,
+                             BULK_READ_IDS, AGGREGATE_SHARDS_QUERY,
+                             claim_summaries_query, event_query, merge_events,
+                             normalize_summaries)
 
 
 class CosmosDBService:
@@ -20,10 +32,34 @@ class CosmosDBService:
         self.endpoint = config.get('database.cosmos_endpoint', os.environ.get('COSMOS_ENDPOINT', ''))
         self.database_name = config.get('database.cosmos_database', os.environ.get('COSMOS_DATABASE', 'insurance-claims-db'))
         self.claims_container_name = config.get('database.cosmos_claims_container', 'claims')
-        self.events_container_name = config.get('database.cosmos_events_container', 'events')
+        self.events_container_name = config.get('database.cosmos_events_container',
+                                                os.environ.get('COSMOS_EVENTS_CONTAINER', 'events-by-entity'))
+        # Events container partitioned on /event_id, still read until its events are migrated
+        self.legacy_events_container_name = config.get('database.cosmos_events_legacy_container',
+                                                       os.environ.get('COSMOS_EVENTS_LEGACY_CONTAINER', ''))
+        self.legacy_events_container = None
+        # Shard documents of the dashboard aggregates; unset to not maintain them
+        self.aggregates_container_name = config.get('database.cosmos_aggregates_container',
+                                                    os.environ.get('COSMOS_AGGREGATES_CONTAINER', ''))
+        self.aggregate_shards = config.get('database.aggregate_shards', 8)
+        self.aggregates_container = None
         
         # Check for managed identity usage
-        use_managed_identity = os.environ.get('USE_MANAGED_IDENTITY', 'false').lower() == 'true'
+        self.use_managed_identity = os.environ.get('USE_MANAGED_IDENTITY', 'false').lower() == 'true'
+        self.pool_size = config.get('database.cosmos_pool_size', DEFAULT_POOL_SIZE)
+        self.connection_timeout = config.get('database.cosmos_connection_timeout', DEFAULT_CONNECTION_TIMEOUT)
+        
+        # Every container call goes through the breaker, so an outage fails fast
+        self.breaker = CircuitBreaker(
+            'cosmos',
+            failure_threshold=config.get('database.circuit_failure_threshold', 5),
+            reset_timeout=config.get('database.circuit_reset_seconds', 30.0))
+        self.health_probe_interval = config.get('database.health_probe_interval_seconds', 10.0)
+        self.prober: Optional[HealthProber] = None
+        
+        # Operations above either threshold go to the 'cosmos.slow' log
+        cosmos_metrics.configure(config.get('database.slow_query_request_charge', 50.0),
+                                 config.get('database.slow_query_ms', 500.0))
         
         # Check if we have the necessary configuration
         if not self.endpoint:
@@ -35,29 +71,16 @@ class CosmosDBService:
             return
             
         try:
-            # Initialize the Cosmos client
-            print(f"Connecting to Cosmos DB at {self.endpoint[:50]}...")
-            
-            if use_managed_identity:
-                print("Using Managed Identity for Cosmos DB authentication")
-                credential = DefaultAzureCredential()
-                self.client = CosmosClient(self.endpoint, credential)
+            if self.use_managed_identity:
+                self.key = None
             else:
-                print("Using key-based authentication for Cosmos DB")
                 self.key = config.get('database.cosmos_key', os.environ.get('COSMOS_KEY', ''))
-                if not self.key:
+                if not self.key and not is_fake_endpoint(self.endpoint):
                     raise ValueError("Cosmos DB key not found in configuration or environment variables")
-                self.client = CosmosClient(self.endpoint, self.key)
+            self._bind_client()
             
-            # Get database
-            self.database = self.client.get_database_client(self.database_name)
-            
-            # Get containers
-            self.claims_container = self.database.get_container_client(self.claims_container_name)
-            self.events_container = self.database.get_container_client(self.events_container_name)
-            
-            # Verify connection with a simple operation
-            database_properties = self.database.read()
+            # Verify the connection; only the first service in a process pays for it
+            database_properties = self.warm_up()
             print(f"Connected to Cosmos DB: {self.database_name} (RU/s: {database_properties.get('offer_throughput', 'autoscale')})")
         except exceptions.CosmosResourceNotFoundError as e:
             print(f"Cosmos DB resource not found: {str(e)}")
@@ -65,19 +88,91 @@ class CosmosDBService:
             self.database = None
             self.claims_container = None
             self.events_container = None
+            self.legacy_events_container = None
+            self.aggregates_container = None
         except Exception as e:
             print(f"Error connecting to Cosmos DB: {str(e)}")
             self.client = None
             self.database = None
             self.claims_container = None
             self.events_container = None
+            self.legacy_events_container = None
+            self.aggregates_container = None
+    
+    def _bind_client(self) -> None:
+        """Take this process's shared client and look up the database and containers"""
+        # Reuse the process-wide client, which keeps its connections open
+        self.client = CosmosClientFactory.get_shared_client(
+            self.endpoint, key=self.key, use_managed_identity=self.use_managed_identity,
+            pool_size=self.pool_size, connection_timeout=self.connection_timeout)
+        self._client_pid = os.getpid()
+        
+        # Get database
+        self.database = self.client.get_database_client(self.database_name)
+        
+        # Get containers
+        self.claims_container = self._guarded_container(self.claims_container_name)
+        self.events_container = self._guarded_container(self.events_container_name)
+        if self.legacy_events_container_name:
+            self.legacy_events_container = self._guarded_container(self.legacy_events_container_name)
+        if self.aggregates_container_name:
+            self.aggregates_container = self._guarded_container(self.aggregates_container_name)
+    
+    def _guarded_container(self, name: str) -> GuardedContainer:
+        """Container client whose calls are accounted by the circuit breaker and metrics"""
+        return GuardedContainer(InstrumentedContainer(self.database.get_container_client(name)), self.breaker)
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Read the database and containers once so the first request finds the client ready
+        
+        Call it in each worker after forking (see gunicorn.conf.py): a service
+        created before the fork is rebound to the worker's own client first.
+        """
+        if self.client is not None and self._client_pid != os.getpid():
+            self._bind_client()
+        return CosmosClientFactory.warm_up(
+            self.client, self.database_name,
+            [self.claims_container_name, self.events_container_name])
     
     def is_connected(self) -> bool:
         """Check if connected to Cosmos DB"""
         return self.client is not None and self.claims_container is not None
     
-    def save_claim(self, claim: Union[Claim, Dict[str, Any]]) -> bool:
-        """Save a claim to Cosmos DB"""
+    def is_available(self) -> bool:
+        """Check if connected and the circuit is not open, without any I/O"""
+        return self.is_connected() and self.breaker.state != OPEN
+    
+    def start_health_probe(self) -> None:
+        """Probe Cosmos DB in the background with one database read per interval"""
+        if self.prober is None and self.is_connected() and self.health_probe_interval > 0:
+            self.prober = HealthProber(self.breaker, lambda: self.database.read(),
+                                       interval=self.health_probe_interval)
+            self.prober.start()
+    
+    def stop_health_probe(self) -> None:
+        """Stop the background health probe"""
+        if self.prober is not None:
+            self.prober.stop()
+            self.prober = None
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Cached health of the Cosmos DB connection, without any I/O"""
+        if not self.is_connected():
+            return {'connected': False}
+        health = self.prober.snapshot() if self.prober else {'circuit': self.breaker.stats()}
+        return dict(health, connected=True, available=self.is_available())
+    
+    @instrumented('save_claim')
+    def save_claim(self, claim: Union[Claim, Dict[str, Any]], replaced: Any = REPLACED_UNREAD) -> bool:
+        """
+        Save a claim to Cosmos DB
+        
+        Args:
+            claim: The claim object or dictionary to save
+            replaced: Version (or summary) of the claim the save replaces, None
+                for a new claim; read from Cosmos DB when not given
+        """
         if not self.is_connected():
             return False
             
@@ -85,14 +180,153 @@ class CosmosDBService:
             # Convert to dict if it's a Claim object
             claim_data = claim.to_dict() if isinstance(claim, Claim) else claim
             
-            # Save to Cosmos DB
+            # Save to Cosmos DB, reading the version it replaces when aggregates are kept
+            tracked = self.aggregates_container is not None
+            previous = self._replaced_claim(claim_data.get('claim_id'), replaced) if tracked else {}
             self.claims_container.upsert_item(claim_data)
+            if tracked:
+                self._update_aggregates(claim_delta(previous.get(claim_data.get('claim_id')), claim_data))
             print(f"Claim {claim_data.get('claim_id')} saved to Cosmos DB")
             return True
         except Exception as e:
             print(f"Error saving claim to Cosmos DB: {str(e)}")
             return False
     
+    def _bulk_upsert(self, container, items: List[Dict[str, Any]], id_field: str,
+                     partition_key_field: str) -> List[BulkItemResult]:
+        """Bulk upsert with the configured concurrency and batch size"""
+        config = Config()
+        return bulk_upsert(container, items, id_field, partition_key_field,
+                           max_workers=config.get('database.bulk_max_workers', 8),
+                           batch_size=config.get('database.bulk_batch_size', 100))
+    
+    @instrumented('save_claims_bulk')
+    def save_claims_bulk(self, claims: List[Union[Claim, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """Save many claims to Cosmos DB, returning one result per claim in input order"""
+        claims_data = [claim.to_dict() if isinstance(claim, Claim) else claim for claim in claims]
+        if not self.is_connected():
+            return [BulkItemResult(str(claim_data.get('claim_id', '')), False, error="not connected")
+                    for claim_data in claims_data]
+        
+        previous: Dict[str, Dict[str, Any]] = {}
+        if self.aggregates_container is not None:
+            try:
+                previous = self._read_replaced_claims([claim_data.get('claim_id') for claim_data in claims_data])
+            except Exception as e:
+                # Without the replaced versions the aggregates would drift, so write nothing
+                print(f"Error reading claims replaced by a bulk save: {str(e)}")
+                return [BulkItemResult(str(claim_data.get('claim_id', '')), False, error=str(e),
+                                       status_code=getattr(e, 'status_code', None))
+                        for claim_data in claims_data]
+        
+        results = self._bulk_upsert(self.claims_container, claims_data, 'claim_id', 'claim_id')
+        if self.aggregates_container is not None:
+            delta: Dict[str, float] = {}
+            for claim_data, result in zip(claims_data, results):
+                if result.ok:
+                    merge_counters(delta, claim_delta(previous.get(result.item_id), claim_data))
+                    previous[result.item_id] = claim_data
+            self._update_aggregates(delta)
+        print(f"Bulk saved {sum(r.ok for r in results)}/{len(results)} claims to Cosmos DB")
+        return results
+    
+    def _replaced_claim(self, claim_id: str, replaced: Any) -> Dict[str, Dict[str, Any]]:
+        """The version given by the caller, by ID, or the one read from Cosmos DB"""
+        if replaced is REPLACED_UNREAD:
+            return self._read_replaced_claims([claim_id])
+        return {claim_id: replaced} if replaced is not None else {}
+    
+    def _read_replaced_claims(self, claim_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Current versions of the given claims, by ID (absent claims are left out)"""
+        if len(claim_ids) == 1:
+            try:
+                return {claim_ids[0]: self.claims_container.read_item(item=claim_ids[0],
+                                                                      partition_key=claim_ids[0])}
+            except exceptions.CosmosResourceNotFoundError:
+                return {}
+        
+        claims = {}
+        unique_ids = list(dict.fromkeys(claim_ids))
+        for start in range(0, len(unique_ids), BULK_READ_IDS):
+            for claim in self.claims_container.query_items(
+                    query=CLAIMS_BY_ID_QUERY,
+                    parameters=[{'name': '@ids', 'value': unique_ids[start:start + BULK_READ_IDS]}],
+                    enable_cross_partition_query=True):
+                claims[claim['claim_id']] = claim
+        return claims
+    
+    def _update_aggregates(self, delta: Dict[str, float]) -> bool:
+        """
+        Add a delta to the aggregates with atomic increments on a random shard
+        
+        Returns:
+            bool: True if every increment was applied
+        """
+        shard_id = random.choice(shard_ids(self.aggregate_shards))
+        try:
+            for operations in patch_operations(delta):
+                try:
+                    self.aggregates_container.patch_item(item=shard_id, partition_key=shard_id,
+                                                         patch_operations=operations)
+                except exceptions.CosmosResourceNotFoundError:
+                    # First write to this shard
+                    try:
+                        self.aggregates_container.create_item(shard_document(shard_id))
+                    except exceptions.CosmosResourceExistsError:
+                        pass
+                    self.aggregates_container.patch_item(item=shard_id, partition_key=shard_id,
+                                                         patch_operations=operations)
+            return True
+        except Exception as e:
+            print(f"Error updating aggregates in Cosmos DB (rebuild to correct them): {str(e)}")
+            return False
+    
+    @instrumented('get_aggregates')
+    def get_aggregates(self) -> Optional[Dict[str, Any]]:
+        """Dashboard aggregates summed over the shard documents, or None if unavailable"""
+        if not self.is_connected() or self.aggregates_container is None:
+            return None
+        
+        try:
+            counters: Dict[str, float] = {}
+            for document in self.aggregates_container.query_items(
+                    query=AGGREGATE_SHARDS_QUERY, enable_cross_partition_query=True):
+                merge_counters(counters, document_counters(document))
+            return summarize(counters)
+        except Exception as e:
+            print(f"Error reading aggregates from Cosmos DB: {str(e)}")
+            return None
+    
+    @instrumented('rebuild_aggregates')
+    def rebuild_aggregates(self) -> Optional[int]:
+        """
+        Recompute the aggregates from every claim, replacing all shard documents
+        
+        Returns:
+            Optional[int]: Number of claims counted, or None on failure
+        """
+        if not self.is_connected() or self.aggregates_container is None:
+            return None
+        
+        try:
+            summaries = self.claims_container.query_items(
+                query=claim_summaries_query(['claim_id', 'claim_amount', 'submission_time',
+                                             'status', 'fraud_score'], paged=True),
+                enable_cross_partition_query=True, max_item_count=1000)
+            counters, count = compute_counters(summaries)
+            existing = {document['id'] for document in self.aggregates_container.query_items(
+                query=AGGREGATE_SHARDS_QUERY, enable_cross_partition_query=True)}
+            shards = shard_ids(self.aggregate_shards)
+            for shard_id in shards + sorted(existing - set(shards)):
+                self.aggregates_container.upsert_item(
+                    shard_document(shard_id, counters if shard_id == shards[0] else None))
+            print(f"Rebuilt Cosmos DB aggregates from {count} claims")
+            return count
+        except Exception as e:
+            print(f"Error rebuilding aggregates in Cosmos DB: {str(e)}")
+            return None
+    
+    @instrumented('get_claim')
     def get_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
         """Get a claim from Cosmos DB by ID"""
         if not self.is_connected():
@@ -109,16 +343,17 @@ class CosmosDBService:
             print(f"Error getting claim from Cosmos DB: {str(e)}")
             return None
     
-    def list_claims(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """List claims from Cosmos DB"""
+    @instrumented('list_claims')
+    def list_claims(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """List claims from Cosmos DB (prefer list_claims_page for deep pages)"""
         if not self.is_connected():
             return []
             
         try:
-            # Query all claims with a limit
-            query = f"SELECT * FROM c ORDER BY c.submission_time DESC OFFSET 0 LIMIT {limit}"
             items = list(self.claims_container.query_items(
-                query=query,
+                query=LIST_CLAIMS_QUERY,
+                parameters=[{'name': '@offset', 'value': int(offset)},
+                            {'name': '@limit', 'value': int(limit)}],
                 enable_cross_partition_query=True
             ))
             return items
@@ -126,22 +361,110 @@ class CosmosDBService:
             print(f"Error listing claims from Cosmos DB: {str(e)}")
             return []
     
-    def delete_claim(self, claim_id: str) -> bool:
-        """Delete a claim from Cosmos DB"""
+    def _query(self, container, query: str, parameters: List[Dict[str, Any]],
+               partition_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run a query, scoped to one partition when a partition key is given"""
+        if partition_key is not None:
+            return list(container.query_items(query=query, parameters=parameters,
+                                              partition_key=partition_key))
+        return list(container.query_items(query=query, parameters=parameters,
+                                          enable_cross_partition_query=True))
+    
+    def _query_page(self, container, query: str, parameters: List[Dict[str, Any]],
+                    limit: int, continuation_token: Optional[str],
+                    partition_key: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Run a query and return one page plus the continuation token of the next"""
+        if partition_key is not None:
+            scope = {'partition_key': partition_key}
+        else:
+            scope = {'enable_cross_partition_query': True}
+        pager = container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=limit,
+            **scope
+        ).by_page(continuation_token)
+        items = list(next(pager, []))
+        return items, pager.continuation_token
+    
+    @instrumented('list_claims_page')
+    def list_claims_page(self, limit: int = 100,
+                         continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of claims, resuming from a Cosmos DB continuation token"""
+        if not self.is_connected():
+            return [], None
+            
+        try:
+            return self._query_page(
+                self.claims_container, PAGE_CLAIMS_QUERY, [], limit, continuation_token
+            )
+        except Exception as e:
+            print(f"Error listing claims page from Cosmos DB: {str(e)}")
+            return [], None
+    
+    @instrumented('list_claim_summaries')
+    def list_claim_summaries(self, limit: int = 100, offset: int = 0,
+                             fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """List claim summaries from Cosmos DB, selecting only the requested fields"""
+        if not self.is_connected():
+            return []
+            
+        try:
+            items = self._query(self.claims_container, claim_summaries_query(fields),
+                                [{'name': '@offset', 'value': int(offset)},
+                                 {'name': '@limit', 'value': int(limit)}])
+            return normalize_summaries(items, fields)
+        except Exception as e:
+            print(f"Error listing claim summaries from Cosmos DB: {str(e)}")
+            return []
+    
+    @instrumented('list_claim_summaries_page')
+    def list_claim_summaries_page(self, limit: int = 100, continuation_token: Optional[str] = None,
+                                  fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of claim summaries, resuming from a Cosmos DB continuation token"""
+        if not self.is_connected():
+            return [], None
+            
+        try:
+            items, token = self._query_page(
+                self.claims_container, claim_summaries_query(fields, paged=True), [],
+                limit, continuation_token
+            )
+            return normalize_summaries(items, fields), token
+        except Exception as e:
+            print(f"Error listing claim summaries page from Cosmos DB: {str(e)}")
+            return [], None
+    
+    @instrumented('delete_claim')
+    def delete_claim(self, claim_id: str, missing_ok: bool = False, replaced: Any = REPLACED_UNREAD) -> bool:
+        """
+        Delete a claim from Cosmos DB
+        
+        Args:
+            claim_id: The ID of the claim to delete
+            missing_ok: Treat an absent claim as deleted
+            replaced: Version (or summary) of the claim being deleted; read from
+                Cosmos DB when not given
+        """
         if not self.is_connected():
             return False
             
         try:
+            tracked = self.aggregates_container is not None
+            previous = self._replaced_claim(claim_id, replaced) if tracked else {}
             self.claims_container.delete_item(item=claim_id, partition_key=claim_id)
+            if tracked:
+                self._update_aggregates(claim_delta(previous.get(claim_id), None))
             print(f"Claim {claim_id} deleted from Cosmos DB")
             return True
         except exceptions.CosmosResourceNotFoundError:
             print(f"Claim {claim_id} not found in Cosmos DB")
-            return False
+            return missing_ok
         except Exception as e:
             print(f"Error deleting claim from Cosmos DB: {str(e)}")
             return False
     
+    @instrumented('save_event')
     def save_event(self, event: Union[Event, Dict[str, Any]]) -> bool:
         """Save an event to Cosmos DB"""
         if not self.is_connected():
@@ -159,23 +482,78 @@ class CosmosDBService:
             print(f"Error saving event to Cosmos DB: {str(e)}")
             return False
     
+    @instrumented('save_events_bulk')
+    def save_events_bulk(self, events: List[Union[Event, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """Save many events to Cosmos DB, returning one result per event in input order"""
+        events_data = [event.to_dict() if isinstance(event, Event) else event for event in events]
+        if not self.is_connected():
+            return [BulkItemResult(str(event_data.get('event_id', '')), False, error="not connected")
+                    for event_data in events_data]
+        
+        # Events of one claim share a partition, so they are written as batches
+        results = self._bulk_upsert(self.events_container, events_data, 'event_id', 'entity_id')
+        print(f"Bulk saved {sum(r.ok for r in results)}/{len(results)} events to Cosmos DB")
+        return results
+    
+    @instrumented('list_events')
     def list_events(self, entity_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
-        """List events from Cosmos DB, optionally filtered by entity_id"""
+        """List events from Cosmos DB, newest first, optionally filtered by entity_id"""
         if not self.is_connected():
             return []
             
         try:
-            # Query events with optional entity_id filter
-            if entity_id:
-                query = f"SELECT * FROM c WHERE c.entity_id = '{entity_id}' ORDER BY c.timestamp DESC OFFSET 0 LIMIT {limit}"
-            else:
-                query = f"SELECT * FROM c ORDER BY c.timestamp DESC OFFSET 0 LIMIT {limit}"
-                
-            items = list(self.events_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
+            query = event_query(entity_id, limit)
+            # Events are partitioned by entity, so one entity's events live in one partition
+            items = self._query(self.events_container, query['query'], query['parameters'],
+                                partition_key=entity_id or None)
+            if self.legacy_events_container is not None:
+                # The legacy container is partitioned on event_id and needs a fan-out query
+                legacy = self._query(self.legacy_events_container, query['query'], query['parameters'])
+                items = merge_events(items, legacy, limit)
             return items
         except Exception as e:
             print(f"Error listing events from Cosmos DB: {str(e)}")
             return []
+    
+    @instrumented('list_events_page')
+    def list_events_page(self, entity_id: Optional[str] = None, limit: int = 100,
+                         continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of events, resuming from a Cosmos DB continuation token
+        
+        While a legacy events container is configured, an entity that has no
+        events in the current container yet is paged from the legacy one.
+        """
+        if not self.is_connected():
+            return [], None
+            
+        try:
+            if entity_id:
+                query = PAGE_ENTITY_EVENTS_QUERY
+                parameters = [{'name': '@entity_id', 'value': entity_id}]
+            else:
+                query = PAGE_RECENT_EVENTS_QUERY
+                parameters = []
+            
+            if continuation_token and continuation_token.startswith(LEGACY_TOKEN_PREFIX):
+                return self._legacy_events_page(query, parameters, limit,
+                                                continuation_token[len(LEGACY_TOKEN_PREFIX):])
+            
+            items, token = self._query_page(self.events_container, query, parameters, limit,
+                                            continuation_token, partition_key=entity_id or None)
+            if not items and not continuation_token and entity_id and \
+                    self.legacy_events_container is not None:
+                return self._legacy_events_page(query, parameters, limit, None)
+            return items, token
+        except Exception as e:
+            print(f"Error listing events page from Cosmos DB: {str(e)}")
+            return [], None
+    
+    def _legacy_events_page(self, query: str, parameters: List[Dict[str, Any]], limit: int,
+                            continuation_token: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Read a page of events from the legacy container, tagging its continuation token"""
+        if self.legacy_events_container is None:
+            return [], None
+        items, token = self._query_page(self.legacy_events_container, query, parameters,
+                                        limit, continuation_token)
+        return items, f"{LEGACY_TOKEN_PREFIX}{token}" if token else None
@@ -9,8 +9,13 @@ from typing import Dict, List, Any, Optional, Union
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
 from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
 from services.cosmos_client_factory import CosmosClientFactory
+from services.circuit_breaker import CircuitBreaker, GuardedContainer, HealthProber, OPEN
+from services.cosmos_metrics import InstrumentedContainer, cosmos_metrics, instrumented
 from models.claim import Claim
 from models.event import Event
+from services.bulk import BulkItemResult, bulk_upsert
+from services.cosmos_queries import (LIST_CLAIMS_QUERY, claim_summaries_query, event_query,
+                                     merge_events, normalize_summaries)
 
 
 logger = logging.getLogger(__name__)
@@ -26,8 +31,16 @@ class CosmosDBService:
         self.database = None
         self.claims_container = None
         self.events_container = None
+        self.legacy_events_container = None
         self._connection_healthy = False
         self._last_health_check = None
+        self.breaker = CircuitBreaker(
+            'cosmos',
+            failure_threshold=getattr(config, 'COSMOS_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=getattr(config, 'COSMOS_CIRCUIT_RESET_SECONDS', 30.0))
+        self.prober: Optional[HealthProber] = None
+        cosmos_metrics.configure(getattr(config, 'COSMOS_SLOW_QUERY_REQUEST_CHARGE', 50.0),
+                                 getattr(config, 'COSMOS_SLOW_QUERY_MS', 500.0))
         
         # Initialize if configuration allows
         if config.USE_COSMOS:
@@ -52,17 +65,23 @@ class CosmosDBService:
             
             # Get database and containers
             self.database = self.client.get_database_client(self.config.COSMOS_DATABASE)
-            self.claims_container = self.database.get_container_client(self.config.COSMOS_CLAIMS_CONTAINER)
-            self.events_container = self.database.get_container_client(self.config.COSMOS_EVENTS_CONTAINER)
-            
-            # Perform health check
-            if self._perform_health_check():
-                self._connection_healthy = True
-                logger.info("Cosmos DB service initialized successfully")
-                return True
-            else:
-                logger.error("Cosmos DB health check failed during initialization")
-                return False
+            self.claims_container = GuardedContainer(InstrumentedContainer(
+                self.database.get_container_client(self.config.COSMOS_CLAIMS_CONTAINER)), self.breaker)
+            self.events_container = GuardedContainer(InstrumentedContainer(
+                self.database.get_container_client(self.config.COSMOS_EVENTS_CONTAINER)), self.breaker)
+            legacy_events_container = getattr(self.config, 'COSMOS_EVENTS_LEGACY_CONTAINER', '')
+            if legacy_events_container:
+                self.legacy_events_container = GuardedContainer(InstrumentedContainer(
+                    self.database.get_container_client(legacy_events_container)), self.breaker)
+            
+            # Connect and load metadata once per process; services created
+            # later reuse the warmed-up shared client without a round trip
+            CosmosClientFactory.warm_up(self.client, self.config.COSMOS_DATABASE,
+                                        [self.config.COSMOS_CLAIMS_CONTAINER,
+                                         self.config.COSMOS_EVENTS_CONTAINER])
+            self._connection_healthy = True
+            logger.info("Cosmos DB service initialized successfully")
+            return True
                 
         except Exception as e:
             logger.error(f"Failed to initialize Cosmos DB service: {e}")
@@ -80,33 +99,39 @@ class CosmosDBService:
         Returns:
             True if healthy, False otherwise
         """
-        try:
-            if not self.client or not self.database:
-                return False
-            
-            # Test connection with lightweight operation
-            is_healthy = CosmosClientFactory.test_connection(self.client, self.config.COSMOS_DATABASE)
-            
-            if is_healthy:
-                # Test container access
-                self.claims_container.read()
-                self.events_container.read()
-                logger.debug("Cosmos DB health check passed")
-            
-            return is_healthy
-            
-        except Exception as e:
-            logger.error(f"Cosmos DB health check failed: {e}")
+        if not self.client or not self.database:
             return False
+        
+        # One database read; container access was verified by the warm-up
+        if self.prober is None:
+            self.prober = HealthProber(self.breaker, lambda: self.database.read(),
+                                       interval=getattr(self.config, 'COSMOS_HEALTH_PROBE_INTERVAL', 10.0))
+        snapshot = self.prober.check()
+        self._last_health_check = snapshot['checked_at']
+        if not snapshot['healthy']:
+            logger.error(f"Cosmos DB health check failed: {snapshot['error']}")
+        return snapshot['healthy']
+    
+    def start_health_probe(self) -> None:
+        """Run the health check in the background, updating the circuit breaker"""
+        if self.client and self.database:
+            if self.prober is None:
+                self._perform_health_check()
+            self.prober.start()
+    
+    def stop_health_probe(self) -> None:
+        """Stop the background health probe"""
+        if self.prober is not None:
+            self.prober.stop()
     
     def is_healthy(self) -> bool:
         """
         Check if Cosmos DB service is healthy.
         
         Returns:
-            True if service is healthy and connected
+            True if service is healthy, connected and its circuit is not open
         """
-        return self._connection_healthy and self.client is not None
+        return self._connection_healthy and self.client is not None and self.breaker.state != OPEN
     
     def get_health_status(self) -> Dict[str, Any]:
         """
@@ -122,13 +147,16 @@ class CosmosDBService:
             'database_name': self.config.COSMOS_DATABASE,
             'endpoint': self.config.COSMOS_ENDPOINT[:50] + '...' if self.config.COSMOS_ENDPOINT else None,
             'auth_method': 'managed_identity' if self.config.USE_MANAGED_IDENTITY else 'key_based',
-            'fallback_enabled': self.config.FALLBACK_TO_LOCAL
+            'fallback_enabled': self.config.FALLBACK_TO_LOCAL,
+            'last_health_check': self._last_health_check,
+            'circuit': self.breaker.stats()
         }
     
     def is_connected(self) -> bool:
         """Check if connected to Cosmos DB (backwards compatibility)"""
         return self.is_healthy()
     
+    @instrumented('save_claim')
     def save_claim(self, claim: Union[Claim, Dict[str, Any]]) -> bool:
         """
         Save a claim to Cosmos DB.
@@ -161,6 +189,35 @@ class CosmosDBService:
             logger.error(f"Error saving claim to Cosmos DB: {e}")
             return False
     
+    def _bulk_upsert(self, container, items: List[Dict[str, Any]], id_field: str,
+                     partition_key_field: str) -> List[BulkItemResult]:
+        """Bulk upsert with the configured concurrency and batch size"""
+        return bulk_upsert(container, items, id_field, partition_key_field,
+                           max_workers=getattr(self.config, 'COSMOS_BULK_MAX_WORKERS', 8),
+                           batch_size=getattr(self.config, 'COSMOS_BULK_BATCH_SIZE', 100))
+    
+    @instrumented('save_claims_bulk')
+    def save_claims_bulk(self, claims: List[Union[Claim, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """
+        Save many claims to Cosmos DB.
+        
+        Args:
+            claims: Claim objects or dictionaries to save
+            
+        Returns:
+            One result per claim, in input order
+        """
+        claims_data = [claim.to_dict() if isinstance(claim, Claim) else claim for claim in claims]
+        if not self.is_healthy():
+            logger.warning("Cannot bulk save claims: Cosmos DB service not healthy")
+            return [BulkItemResult(str(claim_data.get('claim_id', '')), False, error="not healthy")
+                    for claim_data in claims_data]
+        
+        results = self._bulk_upsert(self.claims_container, claims_data, 'claim_id', 'claim_id')
+        logger.info(f"Bulk saved {sum(r.ok for r in results)}/{len(results)} claims to Cosmos DB")
+        return results
+    
+    @instrumented('get_claim')
     def get_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a claim from Cosmos DB by ID.
@@ -188,6 +245,7 @@ class CosmosDBService:
             logger.error(f"Error getting claim from Cosmos DB: {e}")
             return None
     
+    @instrumented('list_claims')
     def list_claims(self, limit: int = 100) -> List[Dict[str, Any]]:
         """
         List claims from Cosmos DB.
@@ -204,9 +262,10 @@ class CosmosDBService:
             
         try:
             # Query all claims with a limit, ordered by submission time
-            query = f"SELECT * FROM c ORDER BY c.submission_time DESC OFFSET 0 LIMIT {limit}"
             items = list(self.claims_container.query_items(
-                query=query,
+                query=LIST_CLAIMS_QUERY,
+                parameters=[{'name': '@offset', 'value': 0},
+                            {'name': '@limit', 'value': int(limit)}],
                 enable_cross_partition_query=True
             ))
             logger.debug(f"Successfully retrieved {len(items)} claims from Cosmos DB")
@@ -216,6 +275,38 @@ class CosmosDBService:
             logger.error(f"Error listing claims from Cosmos DB: {e}")
             return []
     
+    @instrumented('list_claim_summaries')
+    def list_claim_summaries(self, limit: int = 100,
+                             fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        List claim summaries from Cosmos DB, selecting only the requested fields.
+        
+        Args:
+            limit: Maximum number of claims to return
+            fields: Summary fields to return (defaults to all of CLAIM_SUMMARY_FIELDS)
+            
+        Returns:
+            List of claim summary dictionaries
+        """
+        if not self.is_healthy():
+            logger.warning("Cannot list claim summaries: Cosmos DB service not healthy")
+            return []
+            
+        try:
+            items = list(self.claims_container.query_items(
+                query=claim_summaries_query(fields),
+                parameters=[{'name': '@offset', 'value': 0},
+                            {'name': '@limit', 'value': int(limit)}],
+                enable_cross_partition_query=True
+            ))
+            logger.debug(f"Successfully retrieved {len(items)} claim summaries from Cosmos DB")
+            return normalize_summaries(items, fields)
+            
+        except Exception as e:
+            logger.error(f"Error listing claim summaries from Cosmos DB: {e}")
+            return []
+    
+    @instrumented('delete_claim')
     def delete_claim(self, claim_id: str) -> bool:
         """
         Delete a claim from Cosmos DB.
@@ -242,6 +333,7 @@ class CosmosDBService:
             logger.error(f"Error deleting claim from Cosmos DB: {e}")
             return False
     
+    @instrumented('save_event')
     def save_event(self, event: Union[Event, Dict[str, Any]]) -> bool:
         """
         Save an event to Cosmos DB.
@@ -274,6 +366,29 @@ class CosmosDBService:
             logger.error(f"Error saving event to Cosmos DB: {e}")
             return False
     
+    @instrumented('save_events_bulk')
+    def save_events_bulk(self, events: List[Union[Event, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """
+        Save many events to Cosmos DB.
+        
+        Args:
+            events: Event objects or dictionaries to save
+            
+        Returns:
+            One result per event, in input order
+        """
+        events_data = [event.to_dict() if isinstance(event, Event) else event for event in events]
+        if not self.is_healthy():
+            logger.warning("Cannot bulk save events: Cosmos DB service not healthy")
+            return [BulkItemResult(str(event_data.get('event_id', '')), False, error="not healthy")
+                    for event_data in events_data]
+        
+        # Events of one claim share a partition, so they are written as batches
+        results = self._bulk_upsert(self.events_container, events_data, 'event_id', 'entity_id')
+        logger.info(f"Bulk saved {sum(r.ok for r in results)}/{len(results)} events to Cosmos DB")
+        return results
+    
+    @instrumented('list_events')
     def list_events(self, entity_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
         """
         List events from Cosmos DB, optionally filtered by entity_id.
@@ -290,16 +405,30 @@ class CosmosDBService:
             return []
             
         try:
-            # Query events with optional entity_id filter
+            query = event_query(entity_id, limit)
             if entity_id:
-                query = f"SELECT * FROM c WHERE c.entity_id = '{entity_id}' ORDER BY c.timestamp DESC OFFSET 0 LIMIT {limit}"
+                # Events are partitioned by entity, so this stays on one partition
+                items = list(self.events_container.query_items(
+                    query=query['query'],
+                    parameters=query['parameters'],
+                    partition_key=entity_id
+                ))
             else:
-                query = f"SELECT * FROM c ORDER BY c.timestamp DESC OFFSET 0 LIMIT {limit}"
-                
-            items = list(self.events_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
+                items = list(self.events_container.query_items(
+                    query=query['query'],
+                    parameters=query['parameters'],
+                    enable_cross_partition_query=True
+                ))
+            
+            if self.legacy_events_container is not None:
+                # Events not yet migrated from the container partitioned on /event_id
+                legacy = list(self.legacy_events_container.query_items(
+                    query=query['query'],
+                    parameters=query['parameters'],
+                    enable_cross_partition_query=True
+                ))
+                items = merge_events(items, legacy, limit)
+            
             logger.debug(f"Successfully retrieved {len(items)} events from Cosmos DB")
             return items
             
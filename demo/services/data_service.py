@@ -3,20 +3,43 @@ Local data service for the insurance fraud detection system.
 """
 import json
 import os
-import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 import logging
 
-from models import Claim, Event
+from models import Claim, Event, claim_summary
 from utils import validate_claim, ValidationError, Config
+from utils.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from .aggregates import AggregateStore, claim_delta, compute_counters, merge_counters
+from .bulk import BulkItemResult
+from .claim_index import ClaimTimeIndex
+from .event_store import EntityEventStore
+from .event_writer import BufferedEventWriter
+from .history_store import ClaimHistoryStore
+from .write_version import WriteVersion
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Recent events of an entity searched for duplicates of replicated events
+REPLICA_EVENT_WINDOW = 1000
+
+
+def replica_order(claim_data: Dict[str, Any]) -> Tuple[int, str]:
+    """
+    Sort key of copies of one claim: its save count, then its updated_time
+    
+    Every save of a claim counts one more revision than the copy it started
+    from, on whichever instance it runs, so the newer of two copies wins even
+    when the instances' clocks disagree. updated_time only breaks ties between
+    concurrent saves of the same revision, and orders claims saved before
+    revisions were counted.
+    """
+    return claim_data.get('revision') or 0, claim_data.get('updated_time') or ''
+
 
 class LocalDataService:
     """Service for managing local data storage"""
@@ -32,14 +55,54 @@ class LocalDataService:
         for directory in [self.claims_dir, self.events_dir, self.backup_dir]:
             os.makedirs(directory, exist_ok=True)
         
+        self._claim_index = None
+        self._aggregates = None
+        self._write_versions: Dict[str, WriteVersion] = {}
+        self.history_store = ClaimHistoryStore(
+            os.path.join(self.backup_dir, 'history'),
+            keyframe_interval=self.config.get('storage.history_keyframe_interval', 20)
+        )
+        self.event_store = self._open_event_store()
+        self.event_writer = BufferedEventWriter(
+            self._store_events,
+            durability=self.config.get('storage.event_durability', 'async'),
+            max_batch=self.config.get('storage.event_batch_size', 256),
+            flush_interval=self.config.get('storage.event_flush_interval', 0.05)
+        )
+        
         logger.info(f"LocalDataService initialized with claims directory: {self.claims_dir}")
     
-    def save_claim(self, claim: Union[Claim, Dict[str, Any]]) -> str:
+    @property
+    def claim_index(self) -> ClaimTimeIndex:
+        """Ordered index of the claim files, loaded on first use"""
+        if self._claim_index is None:
+            self._claim_index = ClaimTimeIndex(
+                os.path.join(self.claims_dir, '.claim_index.jsonl'), self.claims_dir)
+        return self._claim_index
+    
+    def _open_aggregates(self) -> AggregateStore:
+        """Dashboard aggregates of the stored claims, built from them on first use"""
+        if self._aggregates is None:
+            aggregates = AggregateStore(self._aggregates_path())
+            self._aggregates = aggregates
+            if not aggregates.exists():
+                self.rebuild_aggregates()
+        return self._aggregates
+    
+    def _replaced_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of the stored claim version a write is about to replace"""
+        # Build missing aggregates before the write, so they do not count it twice
+        self._open_aggregates()
+        return self._read_claim_summary(claim_id)
+    
+    def save_claim(self, claim: Union[Claim, Dict[str, Any]], stamped: bool = False) -> str:
         """
         Save a claim to the local storage
         
         Args:
             claim: The claim object or dictionary to save
+            stamped: The caller already called Claim.touch, e.g. to send the
+                same version to Cosmos DB; otherwise the claim is stamped here
             
         Returns:
             str: The claim ID
@@ -57,23 +120,16 @@ class LocalDataService:
                 claim_obj = claim
             
             # Set updated time
-            claim_obj.updated_time = datetime.now().isoformat()
+            if not stamped:
+                claim_obj.touch()
             
             # Convert to dictionary for storage
             claim_data = claim_obj.to_dict()
-            
-            # Create backup if file exists
-            claim_file_path = os.path.join(self.claims_dir, f"{claim_obj.claim_id}.json")
-            if os.path.exists(claim_file_path):
-                self._backup_file(claim_file_path)
-            
-            # Save to file atomically
-            temp_file_path = f"{claim_file_path}.tmp"
-            with open(temp_file_path, 'w') as f:
-                json.dump(claim_data, f, indent=2)
-            
-            # Atomically replace the file
-            os.replace(temp_file_path, claim_file_path)
+            previous = self._replaced_summary(claim_obj.claim_id)
+            self._write_claim_record(claim_obj.claim_id, claim_data)
+            self._record_history(claim_obj.claim_id, claim_data)
+            self._update_aggregates([(previous, claim_data)])
+            self._bump_write_version('claims')
             
             # Log event
             self.save_event(Event(
@@ -92,6 +148,70 @@ class LocalDataService:
             logger.error(f"Error saving claim: {str(e)}")
             raise RuntimeError(f"Failed to save claim: {str(e)}")
     
+    def save_claims_bulk(self, claims: List[Union[Claim, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """
+        Save many claims at once
+        
+        Invalid claims are reported in the results rather than raised, so one
+        bad record does not abort an import. Valid claims are stored with a
+        single call to _write_claim_records, which storage engines can
+        override to write them in one transaction.
+        
+        Args:
+            claims: Claim objects or dictionaries to save
+            
+        Returns:
+            List[BulkItemResult]: One result per claim, in input order
+        """
+        results: List[BulkItemResult] = []
+        records: List[Tuple[int, str, Dict[str, Any]]] = []
+        updated_time = datetime.now().isoformat()
+        for claim in claims:
+            try:
+                if isinstance(claim, dict):
+                    validate_claim(claim)
+                    claim_obj = Claim.from_dict(claim)
+                else:
+                    claim_obj = claim
+                claim_obj.touch(updated_time)
+                records.append((len(results), claim_obj.claim_id, claim_obj.to_dict()))
+                results.append(BulkItemResult(claim_obj.claim_id, True))
+            except Exception as e:
+                claim_id = claim.get('claim_id', '') if isinstance(claim, dict) else ''
+                error = e.message if isinstance(e, ValidationError) else str(e)
+                results.append(BulkItemResult(str(claim_id), False, error=error))
+        
+        # Versions replaced by each write, chained when a claim repeats
+        changes = []
+        latest: Dict[str, Optional[Dict[str, Any]]] = {}
+        for _, claim_id, claim_data in records:
+            previous = latest[claim_id] if claim_id in latest else self._replaced_summary(claim_id)
+            changes.append((previous, claim_data))
+            latest[claim_id] = claim_data
+        
+        try:
+            self._write_claim_records([(claim_id, claim_data) for _, claim_id, claim_data in records])
+        except Exception as e:
+            logger.error(f"Error bulk saving claims: {str(e)}")
+            for position, claim_id, _ in records:
+                results[position] = BulkItemResult(claim_id, False, error=str(e))
+            # Part of the batch may have been written
+            self._bump_write_version('claims')
+            return results
+        self._update_aggregates(changes)
+        self._bump_write_version('claims')
+        
+        for _, claim_id, claim_data in records:
+            self._record_history(claim_id, claim_data)
+            self.save_event(Event(
+                event_type="claim_saved",
+                entity_id=claim_id,
+                data={"action": "save"}
+            ))
+        
+        logger.info(f"Bulk saved {len(records)} of {len(results)} claims")
+        return results
+    
     def get_claim(self, claim_id: str) -> Optional[Claim]:
         """
         Retrieve a claim by ID
@@ -103,14 +223,11 @@ class LocalDataService:
             Optional[Claim]: The claim object if found, None otherwise
         """
         try:
-            claim_file_path = os.path.join(self.claims_dir, f"{claim_id}.json")
-            if not os.path.exists(claim_file_path):
+            claim_data = self._read_claim_record(claim_id)
+            if claim_data is None:
                 logger.warning(f"Claim {claim_id} not found")
                 return None
             
-            with open(claim_file_path, 'r') as f:
-                claim_data = json.load(f)
-            
             # Log event
             self.save_event(Event(
                 event_type="claim_accessed",
@@ -125,46 +242,147 @@ class LocalDataService:
             logger.error(f"Error retrieving claim {claim_id}: {str(e)}")
             return None
     
-    def list_claims(self, limit: int = 100, offset: int = 0) -> List[Claim]:
+    def list_claims(self, limit: int = 100, offset: int = 0,
+                    sort_by: str = 'submission_time') -> List[Claim]:
         """
-        List all claims, paginated
+        List all claims, paginated, newest first
         
         Args:
             limit: Maximum number of claims to return
             offset: Number of claims to skip
+            sort_by: Either 'submission_time' or 'updated_time'
             
         Returns:
             List[Claim]: List of claim objects
         """
         try:
-            claims = []
+            claims = [Claim.from_dict(claim_data)
+                      for claim_data in self._list_claim_records(limit, offset, sort_by)]
             
-            # Get all claim files
-            claim_files = [f for f in os.listdir(self.claims_dir) 
-                         if f.endswith('.json') and not f.startswith('.')]
+            logger.info(f"Retrieved {len(claims)} claims")
+            return claims
             
-            # Sort by modification time (newest first)
-            claim_files.sort(key=lambda x: os.path.getmtime(os.path.join(self.claims_dir, x)), 
-                           reverse=True)
+        except Exception as e:
+            logger.error(f"Error listing claims: {str(e)}")
+            return []
+    
+    def list_claims_page(self, limit: int = 100, cursor: Optional[str] = None,
+                         sort_by: str = 'submission_time') -> Tuple[List[Claim], Optional[str]]:
+        """
+        List one page of claims, newest first, using keyset pagination
+        
+        Args:
+            limit: Maximum number of claims to return
+            cursor: Cursor returned with the previous page, or None for the first page
+            sort_by: Either 'submission_time' or 'updated_time' (ignored when
+                continuing from a cursor, which remembers its ordering)
             
-            # Apply pagination
-            paginated_files = claim_files[offset:offset+limit]
+        Returns:
+            Tuple[List[Claim], Optional[str]]: The claims and the cursor of the
+            next page, or None when this is the last page
             
-            for file_name in paginated_files:
-                try:
-                    with open(os.path.join(self.claims_dir, file_name), 'r') as f:
-                        claim_data = json.load(f)
-                        claims.append(Claim.from_dict(claim_data))
-                except Exception as e:
-                    logger.error(f"Error loading claim from {file_name}: {str(e)}")
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        sort_by, after = self._decode_claims_cursor(cursor, sort_by)
+        
+        try:
+            # Fetch one extra record to learn whether another page exists
+            records = self._list_claim_records(limit + 1, 0, sort_by, after)
+            claims = [Claim.from_dict(claim_data) for claim_data in records[:limit]]
+            next_cursor = self._next_claims_cursor(records, limit, sort_by)
             
-            logger.info(f"Retrieved {len(claims)} claims")
-            return claims
+            logger.info(f"Retrieved page of {len(claims)} claims")
+            return claims, next_cursor
             
         except Exception as e:
-            logger.error(f"Error listing claims: {str(e)}")
+            logger.error(f"Error listing claims page: {str(e)}")
+            return [], None
+    
+    def list_claim_summaries(self, limit: int = 100, offset: int = 0,
+                             sort_by: str = 'submission_time',
+                             fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        List claim summaries, paginated, newest first
+        
+        Summaries are read from the summary records kept alongside the
+        claims, so full claim documents are not loaded.
+        
+        Args:
+            limit: Maximum number of claims to return
+            offset: Number of claims to skip
+            sort_by: Either 'submission_time' or 'updated_time'
+            fields: Summary fields to return (defaults to all of CLAIM_SUMMARY_FIELDS)
+            
+        Returns:
+            List[Dict[str, Any]]: Claim summaries
+        """
+        try:
+            summaries = [claim_summary(summary, fields)
+                         for summary in self._list_claim_summaries(limit, offset, sort_by)]
+            logger.info(f"Retrieved {len(summaries)} claim summaries")
+            return summaries
+            
+        except Exception as e:
+            logger.error(f"Error listing claim summaries: {str(e)}")
             return []
     
+    def list_claim_summaries_page(self, limit: int = 100, cursor: Optional[str] = None,
+                                  sort_by: str = 'submission_time',
+                                  fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of claim summaries, newest first, using keyset pagination
+        
+        Cursors are interchangeable with those of list_claims_page.
+        
+        Args:
+            limit: Maximum number of claims to return
+            cursor: Cursor returned with the previous page, or None for the first page
+            sort_by: Either 'submission_time' or 'updated_time'
+            fields: Summary fields to return (defaults to all of CLAIM_SUMMARY_FIELDS)
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The summaries and the
+            cursor of the next page, or None when this is the last page
+            
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        sort_by, after = self._decode_claims_cursor(cursor, sort_by)
+        
+        try:
+            summaries = self._list_claim_summaries(limit + 1, 0, sort_by, after)
+            next_cursor = self._next_claims_cursor(summaries, limit, sort_by)
+            
+            logger.info(f"Retrieved page of {min(len(summaries), limit)} claim summaries")
+            return [claim_summary(summary, fields) for summary in summaries[:limit]], next_cursor
+            
+        except Exception as e:
+            logger.error(f"Error listing claim summaries page: {str(e)}")
+            return [], None
+    
+    @staticmethod
+    def _decode_claims_cursor(cursor: Optional[str], sort_by: str) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """Decode a claims cursor into its sort field and the last key of the previous page"""
+        if not cursor:
+            return sort_by, None
+        state = decode_cursor(cursor)
+        try:
+            return state['sort_by'], (str(state['after'][0]), str(state['after'][1]))
+        except (KeyError, IndexError, TypeError):
+            raise InvalidCursorError("Invalid claims cursor")
+    
+    @staticmethod
+    def _next_claims_cursor(records: List[Dict[str, Any]], limit: int, sort_by: str) -> Optional[str]:
+        """Cursor of the page after `limit` records, if one more record was fetched"""
+        if len(records) <= limit or limit <= 0:
+            return None
+        last = records[limit - 1]
+        return encode_cursor({
+            'sort_by': sort_by,
+            'after': [last.get(sort_by) or '', last.get('claim_id')]
+        })
+    
     def update_claim(self, claim_id: str, updates: Dict[str, Any]) -> Optional[Claim]:
         """
         Update a claim with new data
@@ -216,16 +434,13 @@ class LocalDataService:
             bool: True if successful, False otherwise
         """
         try:
-            claim_file_path = os.path.join(self.claims_dir, f"{claim_id}.json")
-            if not os.path.exists(claim_file_path):
+            previous = self._replaced_summary(claim_id)
+            if not self._delete_claim_record(claim_id):
                 logger.warning(f"Claim {claim_id} not found for deletion")
                 return False
-            
-            # Backup before deletion
-            self._backup_file(claim_file_path)
-            
-            # Delete the file
-            os.remove(claim_file_path)
+            self._record_history(claim_id, None)
+            self._update_aggregates([(previous, None)])
+            self._bump_write_version('claims')
             
             # Log event
             self.save_event(Event(
@@ -261,10 +476,9 @@ class LocalDataService:
             # Convert to dictionary for storage
             event_data = event_obj.to_dict()
             
-            # Save to file
-            event_file_path = os.path.join(self.events_dir, f"{event_obj.event_id}.json")
-            with open(event_file_path, 'w') as f:
-                json.dump(event_data, f, indent=2)
+            # Queue for the entity's event log
+            if not self.event_writer.write(event_data):
+                return ""
             
             return event_obj.event_id
             
@@ -273,18 +487,389 @@ class LocalDataService:
             # Don't raise here, events are secondary
             return ""
     
-    def _backup_file(self, file_path: str) -> None:
-        """Create a backup of a file"""
+    def save_events_bulk(self, events: List[Union[Event, Dict[str, Any]]]) -> List[BulkItemResult]:
+        """
+        Save many events at once, bypassing the event queue
+        
+        Events are appended in batches of storage.event_batch_size and are
+        durable when this returns, whatever the event durability mode.
+        
+        Args:
+            events: Event objects or dictionaries to save
+            
+        Returns:
+            List[BulkItemResult]: One result per event, in input order
+        """
+        results: List[BulkItemResult] = []
+        records: List[Tuple[int, Dict[str, Any]]] = []
+        for event in events:
+            try:
+                event_obj = Event.from_dict(event) if isinstance(event, dict) else event
+                records.append((len(results), event_obj.to_dict()))
+                results.append(BulkItemResult(event_obj.event_id, True))
+            except Exception as e:
+                event_id = event.get('event_id', '') if isinstance(event, dict) else ''
+                results.append(BulkItemResult(str(event_id), False, error=str(e)))
+        
+        # Keep events queued earlier ahead of the imported ones
+        self.event_writer.flush()
+        batch_size = self.config.get('storage.event_batch_size', 256)
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            try:
+                self._store_events([event_data for _, event_data in batch])
+            except Exception as e:
+                logger.error(f"Error bulk saving events: {str(e)}")
+                for position, event_data in batch:
+                    results[position] = BulkItemResult(event_data['event_id'], False, error=str(e))
+        
+        logger.info(f"Bulk saved {sum(r.ok for r in results)} of {len(results)} events")
+        return results
+    
+    def apply_replicated_claims(self, claims: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Store claims copied from Cosmos DB, keeping their timestamps
+        
+        A claim is skipped when the local copy is the same or a later version
+        (see replica_order), so replaying changes is harmless and local writes
+        that have not reached the cloud yet are kept. No events are logged; events are
+        replicated separately.
+        
+        Args:
+            claims: Claim documents
+        
+        Returns:
+            List[Dict[str, Any]]: The claims that were stored
+        """
+        self._open_aggregates()
+        records: Dict[str, Dict[str, Any]] = {}
+        changes = []
+        for claim in claims:
+            try:
+                claim_data = Claim.from_dict(claim).to_dict()
+                current = records.get(claim_data['claim_id']) or \
+                    self._read_claim_record(claim_data['claim_id'])
+            except Exception as e:
+                logger.error(f"Skipping replicated claim {claim.get('claim_id')}: {str(e)}")
+                continue
+            if current is not None and replica_order(current) >= replica_order(claim_data):
+                continue
+            records[claim_data['claim_id']] = claim_data
+            changes.append((current, claim_data))
+        
+        if records:
+            self._write_claim_records(list(records.items()))
+            for claim_id, claim_data in records.items():
+                self._record_history(claim_id, claim_data)
+            self._update_aggregates(changes)
+            self._bump_write_version('claims')
+            logger.info(f"Applied {len(records)} replicated claims")
+        return list(records.values())
+    
+    def apply_replicated_events(self, events: List[Dict[str, Any]]) -> int:
+        """
+        Store events copied from Cosmos DB, skipping those already stored
+        
+        Duplicates are looked for among the last REPLICA_EVENT_WINDOW events
+        of each entity, which covers events written through this store and
+        replayed changes.
+        
+        Args:
+            events: Event documents
+        
+        Returns:
+            int: Number of events stored
+        """
+        self.event_writer.flush()
+        by_entity: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_entity.setdefault(event.get('entity_id') or '', []).append(event)
+        
+        new_events = []
+        for entity_id, entity_events in by_entity.items():
+            known = {event_data.get('event_id')
+                     for _, event_data in self._list_event_records(entity_id, REPLICA_EVENT_WINDOW)}
+            for event in entity_events:
+                if event.get('event_id') in known:
+                    continue
+                try:
+                    new_events.append(Event.from_dict(event).to_dict())
+                except Exception as e:
+                    logger.error(f"Skipping replicated event {event.get('event_id')}: {str(e)}")
+                    continue
+                known.add(event.get('event_id'))
+        
+        if new_events:
+            self._store_events(new_events)
+            logger.info(f"Applied {len(new_events)} replicated events")
+        return len(new_events)
+    
+    # Claim storage hooks. The public claim methods handle validation,
+    # timestamps and events; alternative storage engines override these.
+    
+    def _claim_file_path(self, claim_id: str) -> str:
+        """Path of the JSON file holding a claim"""
+        return os.path.join(self.claims_dir, f"{claim_id}.json")
+    
+    def _write_claim_record(self, claim_id: str, claim_data: Dict[str, Any]) -> None:
+        """Persist a claim document, replacing any previous version"""
+        # Save to file atomically
+        claim_file_path = self._claim_file_path(claim_id)
+        temp_file_path = f"{claim_file_path}.tmp"
+        with open(temp_file_path, 'w') as f:
+            json.dump(claim_data, f, indent=2)
+        
+        # Atomically replace the file
+        os.replace(temp_file_path, claim_file_path)
+        self.claim_index.put(claim_id, claim_data.get('submission_time'),
+                             claim_data.get('updated_time'), claim_summary(claim_data))
+    
+    def _write_claim_records(self, records: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Persist many (claim_id, claim document) pairs"""
+        for claim_id, claim_data in records:
+            self._write_claim_record(claim_id, claim_data)
+    
+    def _read_claim_record(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load a claim document, or None if it does not exist"""
+        claim_file_path = self._claim_file_path(claim_id)
+        if not os.path.exists(claim_file_path):
+            return None
+        
+        with open(claim_file_path, 'r') as f:
+            return json.load(f)
+    
+    def _delete_claim_record(self, claim_id: str) -> bool:
+        """Remove a claim document, returning False if it does not exist"""
+        claim_file_path = self._claim_file_path(claim_id)
+        if not os.path.exists(claim_file_path):
+            return False
+        
+        # Delete the file
+        os.remove(claim_file_path)
+        self.claim_index.remove(claim_id)
+        return True
+    
+    def _read_claim_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load the listing summary of a claim, or None if it does not exist"""
+        summary = self.claim_index.get_summary(claim_id)
+        if summary is not None:
+            return summary
+        claim_data = self._read_claim_record(claim_id)
+        return claim_summary(claim_data) if claim_data is not None else None
+    
+    def _aggregates_path(self) -> str:
+        """Path of the aggregates journal of this storage engine"""
+        return os.path.join(self.claims_dir, '.claim_aggregates.jsonl')
+    
+    def _write_version_path(self, kind: str) -> str:
+        """Path of the write version marker of the claims or the events"""
+        directory = self.claims_dir if kind == 'claims' else self.events_dir
+        return os.path.join(directory, f".{kind}.version")
+    
+    def _list_claim_records(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                            after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Load a page of claim documents, newest first
+        
+        When `after` is given, only claims ordered strictly after that
+        (sort value, claim_id) key are returned, so a page can continue where
+        the previous one ended without skipping rows.
+        """
+        records = []
+        for claim_id in self.claim_index.page(limit, offset, sort_by, after):
+            try:
+                claim_data = self._read_claim_record(claim_id)
+            except Exception as e:
+                logger.error(f"Error loading claim {claim_id}: {str(e)}")
+                continue
+            if claim_data is None:
+                # The file was removed outside this service; heal the index
+                logger.warning(f"Indexed claim {claim_id} has no claim file")
+                self.claim_index.remove(claim_id)
+                continue
+            records.append(claim_data)
+        return records
+    
+    def _list_claim_summaries(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                              after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Load a page of claim summaries, newest first
+        
+        Takes the same arguments as _list_claim_records. The file engine
+        reads summaries from the claim index; other engines override this
+        along with _list_claim_records.
+        """
+        summaries = []
+        for claim_id, summary in self.claim_index.page_summaries(limit, offset, sort_by, after):
+            if summary is None:
+                # Indexed before summaries were recorded; fall back to the claim file
+                try:
+                    claim_data = self._read_claim_record(claim_id)
+                except Exception as e:
+                    logger.error(f"Error loading claim {claim_id}: {str(e)}")
+                    continue
+                if claim_data is None:
+                    logger.warning(f"Indexed claim {claim_id} has no claim file")
+                    self.claim_index.remove(claim_id)
+                    continue
+                summary = claim_summary(claim_data)
+            summaries.append(summary)
+        return summaries
+    
+    # Event storage hooks, called by the buffered event writer and list_events
+    
+    def _open_event_store(self) -> Optional[EntityEventStore]:
+        """Open the event logs, moving in events saved as one file each by older versions"""
+        event_store = EntityEventStore(self.events_dir)
+        event_store.migrate_legacy_files()
+        return event_store
+    
+    def _store_events(self, events: List[Dict[str, Any]]) -> None:
+        """Persist a batch of events and move the events write version past it"""
+        try:
+            self._append_event_records(events)
+        finally:
+            self._bump_write_version('events')
+    
+    def _append_event_records(self, events: List[Dict[str, Any]]) -> None:
+        """Persist a batch of event documents"""
+        self.event_store.append_many(events)
+    
+    def _list_event_records(self, entity_id: Optional[str], limit: int,
+                            before: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Load the most recent events, newest first, as (position, event) pairs
+        
+        A position can be passed back as `before` to continue with older events.
+        """
+        if entity_id is None:
+            return self.event_store.page_recent(limit, before)
+        return self.event_store.page_entity(entity_id, limit, before)
+    
+    def _update_aggregates(self, changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+        """Apply (previous, current) claim versions to the aggregates"""
+        try:
+            delta: Dict[str, float] = {}
+            for previous, current in changes:
+                merge_counters(delta, claim_delta(previous, current))
+            self._open_aggregates().apply(delta)
+        except Exception as e:
+            logger.error(f"Error updating claim aggregates: {str(e)}")
+    
+    def _write_version(self, kind: str) -> WriteVersion:
+        """Write version marker of the claims or the events, opened on first use"""
+        version = self._write_versions.get(kind)
+        if version is None:
+            version = self._write_versions.setdefault(kind, WriteVersion(
+                self._write_version_path(kind),
+                max_bytes=self.config.get('storage.write_version_max_bytes', 1 << 20)))
+        return version
+    
+    def _bump_write_version(self, kind: str) -> None:
+        """Record that the claims or the events changed, after the write is stored"""
+        self._write_version(kind).bump()
+    
+    def get_write_version(self, kind: str) -> Optional[str]:
+        """
+        Cheap token that changes whenever the claims or the events change
+        
+        Shared by every process using the same storage and read with a single
+        stat(), so callers can validate cached responses without loading data.
+        
+        Args:
+            kind: 'claims' or 'events'
+            
+        Returns:
+            Optional[str]: The token, or None if it is unavailable
+        """
+        return self._write_version(kind).token()
+    
+    def get_claim_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Listing summary of a stored claim, from the index when it has one
+        
+        Args:
+            claim_id: The ID of the claim
+            
+        Returns:
+            Optional[Dict[str, Any]]: The summary, or None if the claim does not exist
+        """
+        return self._read_claim_summary(claim_id)
+    
+    def get_aggregates(self) -> Dict[str, Any]:
+        """
+        Claim counts and amounts by status and submission day, and the fraud score histogram
+        
+        Returns:
+            Dict[str, Any]: See services.aggregates.summarize
+        """
+        return self._open_aggregates().snapshot()
+    
+    def rebuild_aggregates(self, page_size: int = 1000) -> int:
+        """
+        Recompute the aggregates from every stored claim
+        
+        Returns:
+            int: Number of claims counted
+        """
+        counters, count = compute_counters(self._iter_claim_summaries(page_size))
+        self._open_aggregates().replace(counters)
+        logger.info(f"Rebuilt claim aggregates from {count} claims")
+        return count
+    
+    def _iter_claim_summaries(self, page_size: int = 1000):
+        """Yield the summary of every stored claim, a page at a time"""
+        after = None
+        while True:
+            page = self._list_claim_summaries(page_size, 0, 'submission_time', after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1].get('submission_time') or '', page[-1].get('claim_id'))
+    
+    def _record_history(self, claim_id: str, claim_data: Optional[Dict[str, Any]]) -> None:
+        """Record a claim revision (or deletion when claim_data is None)"""
+        try:
+            if claim_data is None:
+                self.history_store.record_deletion(claim_id)
+            else:
+                self.history_store.record(claim_id, claim_data)
+        except Exception as e:
+            logger.error(f"Error recording history for claim {claim_id}: {str(e)}")
+    
+    def get_claim_history(self, claim_id: str) -> List[Dict[str, Any]]:
+        """
+        List the stored revisions of a claim
+        
+        Args:
+            claim_id: The ID of the claim
+            
+        Returns:
+            List[Dict[str, Any]]: Revision metadata, oldest first
+        """
+        try:
+            return self.history_store.get_history(claim_id)
+        except Exception as e:
+            logger.error(f"Error reading history for claim {claim_id}: {str(e)}")
+            return []
+    
+    def get_claim_at(self, claim_id: str, version: int) -> Optional[Claim]:
+        """
+        Reconstruct a claim as it was at a given revision
+        
+        Args:
+            claim_id: The ID of the claim
+            version: Revision number from get_claim_history
+            
+        Returns:
+            Optional[Claim]: The claim at that revision, or None if unavailable
+        """
         try:
-            if os.path.exists(file_path):
-                filename = os.path.basename(file_path)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_filename = f"{filename}_{timestamp}.bak"
-                backup_path = os.path.join(self.backup_dir, backup_filename)
-                shutil.copy2(file_path, backup_path)
-                logger.info(f"Created backup of {file_path} at {backup_path}")
+            claim_data = self.history_store.get_version(claim_id, version)
+            return Claim.from_dict(claim_data) if claim_data is not None else None
         except Exception as e:
-            logger.error(f"Error creating backup of {file_path}: {str(e)}")
+            logger.error(f"Error reading version {version} of claim {claim_id}: {str(e)}")
+            return None
     
     def list_events(self, entity_id: Optional[str] = None, limit: int = 100) -> List[Event]:
         """
@@ -298,32 +883,11 @@ class LocalDataService:
             List[Event]: List of event objects
         """
         try:
-            events = []
-            
-            # Get all event files
-            event_files = [f for f in os.listdir(self.events_dir) 
-                         if f.endswith('.json') and not f.startswith('.')]
+            # Make queued events visible to this read
+            self.event_writer.flush()
             
-            # Sort by modification time (newest first)
-            event_files.sort(key=lambda x: os.path.getmtime(os.path.join(self.events_dir, x)), 
-                           reverse=True)
-            
-            count = 0
-            for file_name in event_files:
-                if count >= limit:
-                    break
-                    
-                try:
-                    with open(os.path.join(self.events_dir, file_name), 'r') as f:
-                        event_data = json.load(f)
-                        
-                        # Filter by entity_id if provided
-                        if entity_id is None or event_data.get('entity_id') == entity_id:
-                            events.append(Event.from_dict(event_data))
-                            count += 1
-                            
-                except Exception as e:
-                    logger.error(f"Error loading event from {file_name}: {str(e)}")
+            events = [Event.from_dict(event_data)
+                      for _, event_data in self._list_event_records(entity_id, limit)]
             
             logger.info(f"Retrieved {len(events)} events")
             return events
@@ -331,3 +895,48 @@ class LocalDataService:
         except Exception as e:
             logger.error(f"Error listing events: {str(e)}")
             return []
+    
+    def list_events_page(self, entity_id: Optional[str] = None, limit: int = 100,
+                         cursor: Optional[str] = None) -> Tuple[List[Event], Optional[str]]:
+        """
+        List one page of events, newest first, using keyset pagination
+        
+        Args:
+            entity_id: Optional entity ID to filter events by
+            limit: Maximum number of events to return
+            cursor: Cursor returned with the previous page, or None for the first page
+            
+        Returns:
+            Tuple[List[Event], Optional[str]]: The events and the cursor of the
+            next page, or None when this is the last page
+            
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        before = None
+        if cursor:
+            state = decode_cursor(cursor)
+            if not isinstance(state.get('before'), int) or state.get('entity_id') != entity_id:
+                raise InvalidCursorError("Invalid events cursor")
+            before = state['before']
+        
+        try:
+            self.event_writer.flush()
+            records = self._list_event_records(entity_id, limit + 1, before)
+            events = [Event.from_dict(event_data) for _, event_data in records[:limit]]
+            
+            next_cursor = None
+            if len(records) > limit and events:
+                next_cursor = encode_cursor({'entity_id': entity_id,
+                                             'before': records[limit - 1][0]})
+            
+            logger.info(f"Retrieved page of {len(events)} events")
+            return events, next_cursor
+            
+        except Exception as e:
+            logger.error(f"Error listing events page: {str(e)}")
+            return [], None
+    
+    def close(self) -> None:
+        """Flush queued events and stop background workers"""
+        self.event_writer.close()
@@ -0,0 +1,136 @@
+"""
+Copy events from the legacy Cosmos DB events container to the one
+partitioned on /entity_id.
+
+The legacy container is read page by page and each page is bulk upserted
+into the new container, where events of the same claim are written
+together as transactional batches. The continuation token of the last
+fully copied page is saved to a checkpoint file, so an interrupted run
+resumes where it stopped. Upserts keep the event IDs, so re-copying a page
+is harmless.
+
+Usage (from the demo directory):
+    python -m services.event_migration migrate
+    python -m services.event_migration verify
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Any, Optional
+import logging
+
+from .bulk import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+# Properties Cosmos DB adds to stored documents, which must not be copied
+SYSTEM_PROPERTIES = ('_rid', '_self', '_etag', '_attachments', '_ts')
+COUNT_QUERY = "SELECT VALUE COUNT(1) FROM c"
+
+
+def _load_checkpoint(path: Optional[str]) -> Optional[str]:
+    """Continuation token saved by an earlier run, if any"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f).get('continuation_token')
+
+
+def _save_checkpoint(path: Optional[str], token: Optional[str], copied: int) -> None:
+    """Atomically record how far the migration got"""
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'continuation_token': token, 'copied': copied}, f)
+    os.replace(temp_path, path)
+
+
+def migrate_events(source, target, page_size: int = 500, max_workers: int = 8,
+                   checkpoint_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Copy every event from the source container to the target container.
+
+    Args:
+        source: Legacy events container client
+        target: Events container client partitioned on /entity_id
+        page_size: Events read per page
+        max_workers: Concurrent write requests per page
+        checkpoint_path: File recording progress, or None to always start over
+
+    Returns:
+        Dict[str, Any]: Counts of copied and failed events and whether the
+        migration finished. It stops at the first page with failures, so
+        re-running it retries that page.
+    """
+    token = _load_checkpoint(checkpoint_path)
+    pager = source.query_items(
+        query="SELECT * FROM c",
+        enable_cross_partition_query=True,
+        max_item_count=page_size
+    ).by_page(token)
+
+    copied = 0
+    for page in pager:
+        events: List[Dict[str, Any]] = []
+        for item in page:
+            event = {key: value for key, value in item.items() if key not in SYSTEM_PROPERTIES}
+            event.setdefault('entity_id', '')
+            events.append(event)
+
+        results = bulk_upsert(target, events, 'event_id', 'entity_id', max_workers=max_workers)
+        failed = [result for result in results if not result.ok]
+        copied += len(results) - len(failed)
+        if failed:
+            logger.error(f"{len(failed)} events failed to copy (first: {failed[0].item_id}: "
+                         f"{failed[0].error}); re-run to retry from the last checkpoint")
+            return {'copied': copied, 'failed': len(failed), 'complete': False}
+
+        token = pager.continuation_token
+        _save_checkpoint(checkpoint_path, token, copied)
+        logger.info(f"Copied {copied} events")
+
+    _save_checkpoint(checkpoint_path, None, copied)
+    return {'copied': copied, 'failed': 0, 'complete': True}
+
+
+def count_events(container) -> int:
+    """Number of documents in a container"""
+    return next(iter(container.query_items(query=COUNT_QUERY, enable_cross_partition_query=True)), 0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for the events container migration"""
+    from .cosmos_service import CosmosDBService
+
+    parser = argparse.ArgumentParser(description="Migrate events to the entity-partitioned container")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Copy legacy events into the new container")
+    migrate.add_argument('--page-size', type=int, default=500, help="Events read per page")
+    migrate.add_argument('--workers', type=int, default=8, help="Concurrent write requests")
+    migrate.add_argument('--checkpoint', default='event_migration.checkpoint.json',
+                         help="Progress file used to resume an interrupted run")
+    subparsers.add_parser('verify', help="Compare event counts of both containers")
+
+    args = parser.parse_args(argv)
+    service = CosmosDBService()
+    if not service.is_connected() or service.legacy_events_container is None:
+        print("Cosmos DB is not connected or database.cosmos_events_legacy_container is not set")
+        return 1
+
+    if args.command == 'migrate':
+        result = migrate_events(service.legacy_events_container, service.events_container,
+                                page_size=args.page_size, max_workers=args.workers,
+                                checkpoint_path=args.checkpoint)
+        print(f"Copied {result['copied']} events, {result['failed']} failed")
+        return 0 if result['complete'] else 1
+
+    legacy, current = count_events(service.legacy_events_container), count_events(service.events_container)
+    print(f"{service.legacy_events_container_name}: {legacy} events, "
+          f"{service.events_container_name}: {current} events")
+    return 0 if current >= legacy else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+"""
+Entity-partitioned event storage for the insurance fraud detection system.
+
+Each entity (usually a claim) has its own append-only log of JSON lines,
+so an entity's history is read from the tail of one file in time
+proportional to the number of events requested. A small global timeline
+holds one pointer per event (entity log + byte range) for system-wide
+"most recent events" queries.
+
+Layout under the events directory:
+    entities/<h[:2]>/<h>.log   events of one entity, h = sha1(entity_id)
+    timeline.log               pointers to every event in append order
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 8192
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    """Serialize a record as one compact JSON line"""
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def read_lines_backwards(path: str, count: int,
+                         end_offset: Optional[int] = None) -> List[Tuple[int, bytes]]:
+    """
+    Read up to `count` complete lines ending before `end_offset`, last line first.
+
+    Args:
+        path: File to read
+        count: Maximum number of lines to return
+        end_offset: Byte offset to stop at (defaults to the end of the file)
+
+    Returns:
+        List of (offset, line) tuples, newest first
+    """
+    lines: List[Tuple[int, bytes]] = []
+    if count <= 0:
+        return lines
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return lines
+
+    with f:
+        position = os.fstat(f.fileno()).st_size if end_offset is None else end_offset
+        buffer = b''  # bytes [position, position + len(buffer)), ending at a line boundary
+        trimmed = False
+        while len(lines) < count:
+            if position > 0:
+                read_size = min(READ_CHUNK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + buffer
+                if not trimmed:
+                    # Ignore a trailing line that is still being written
+                    cut = buffer.rfind(b'\n')
+                    if cut == -1 and position > 0:
+                        continue
+                    buffer = buffer[:cut + 1]
+                    trimmed = True
+
+            while buffer and len(lines) < count:
+                start = buffer.rfind(b'\n', 0, len(buffer) - 1)
+                if start == -1:
+                    if position > 0:
+                        break  # the line starts in an earlier chunk
+                    lines.append((0, buffer))
+                    buffer = b''
+                else:
+                    lines.append((position + start + 1, buffer[start + 1:]))
+                    buffer = buffer[:start + 1]
+
+            if position == 0 and not buffer:
+                break
+    return lines
+
+
+class EntityEventStore:
+    """Append-only event logs partitioned by entity_id, plus a global timeline"""
+
+    def __init__(self, events_dir: str, fsync: bool = False):
+        """
+        Open the event store.
+
+        Args:
+            events_dir: Root directory of the store
+            fsync: Whether to fsync logs after every append batch
+        """
+        self.events_dir = events_dir
+        self.entities_dir = os.path.join(events_dir, 'entities')
+        self.timeline_path = os.path.join(events_dir, 'timeline.log')
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        os.makedirs(self.entities_dir, exist_ok=True)
+
+    def entity_log_path(self, entity_id: str) -> str:
+        """Path of the log holding one entity's events"""
+        digest = hashlib.sha1(entity_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.entities_dir, digest[:2], f"{digest}.log")
+
+    def _append_lines(self, path: str, lines: List[bytes]) -> List[int]:
+        """Append lines to a file under an exclusive lock, returning their offsets"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            offset = os.fstat(fd).st_size
+            os.write(fd, b''.join(lines))
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        offsets = []
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line)
+        return offsets
+
+    def append(self, event_data: Dict[str, Any]) -> None:
+        """Append one event"""
+        self.append_many([event_data])
+
+    def append_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append a batch of events with one write per entity log.
+
+        Args:
+            events: Event dictionaries, each with an entity_id
+
+        Returns:
+            int: Number of events written
+        """
+        by_entity: Dict[str, List[Dict[str, Any]]] = {}
+        for event_data in events:
+            by_entity.setdefault(event_data.get('entity_id') or '', []).append(event_data)
+        if not by_entity:
+            return 0
+
+        written = 0
+        with self._lock:
+            pointers = []
+            for entity_id, entity_events in by_entity.items():
+                path = self.entity_log_path(entity_id)
+                lines = [_encode(event_data) for event_data in entity_events]
+                offsets = self._append_lines(path, lines)
+                for event_data, offset, line in zip(entity_events, offsets, lines):
+                    pointers.append(_encode({
+                        'entity_id': entity_id,
+                        'offset': offset,
+                        'length': len(line),
+                        'timestamp': event_data.get('timestamp')
+                    }))
+                written += len(lines)
+            self._append_lines(self.timeline_path, pointers)
+        return written
+
+    def read_timeline(self, start: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Read every event appended after a timeline position, oldest first.
+
+        Args:
+            start: Timeline offset returned by an earlier call (0 for all events)
+
+        Returns:
+            Tuple of the events and the offset to pass next time
+        """
+        events = []
+        try:
+            with open(self.timeline_path, 'rb') as timeline:
+                if os.fstat(timeline.fileno()).st_size < start:
+                    start = 0  # the timeline was recreated
+                timeline.seek(start)
+                end = start
+                for line in timeline:
+                    if not line.endswith(b'\n'):
+                        break  # still being written
+                    end += len(line)
+                    try:
+                        pointer = json.loads(line)
+                        with open(self.entity_log_path(pointer['entity_id']), 'rb') as f:
+                            f.seek(pointer['offset'])
+                            events.append(json.loads(f.read(pointer['length'])))
+                    except (ValueError, KeyError, OSError) as e:
+                        logger.error(f"Skipping unreadable timeline entry: {str(e)}")
+        except FileNotFoundError:
+            return events, 0
+        return events, end
+
+    def list_entity(self, entity_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return an entity's most recent events, newest first"""
+        return [event_data for _, event_data in self.page_entity(entity_id, limit)]
+
+    def list_recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent events across all entities, newest first"""
+        return [event_data for _, event_data in self.page_recent(limit)]
+
+    def page_entity(self, entity_id: str, limit: int = 100,
+                    before: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Return an entity's events older than a log position, newest first.
+
+        Args:
+            entity_id: Entity whose log is read
+            limit: Maximum number of events to return
+            before: Byte offset returned with the last event of the previous page
+
+        Returns:
+            List of (position, event) tuples
+        """
+        events = []
+        for offset, line in read_lines_backwards(self.entity_log_path(entity_id), limit, before):
+            try:
+                events.append((offset, json.loads(line)))
+            except ValueError:
+                logger.error(f"Skipping corrupt event record for entity {entity_id}")
+        return events
+
+    def page_recent(self, limit: int = 100,
+                    before: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Return events across all entities older than a timeline position, newest first.
+
+        Args:
+            limit: Maximum number of events to return
+            before: Timeline offset returned with the last event of the previous page
+
+        Returns:
+            List of (position, event) tuples
+        """
+        events = []
+        for offset, line in read_lines_backwards(self.timeline_path, limit, before):
+            try:
+                pointer = json.loads(line)
+                with open(self.entity_log_path(pointer['entity_id']), 'rb') as f:
+                    f.seek(pointer['offset'])
+                    events.append((offset, json.loads(f.read(pointer['length']))))
+            except (ValueError, KeyError, OSError) as e:
+                logger.error(f"Skipping unreadable timeline entry: {str(e)}")
+        return events
+
+    def migrate_legacy_files(self) -> int:
+        """
+        Move events stored as one JSON file each into the entity logs.
+
+        Safe to call from several processes at once; the first one to take
+        the migration lock does the work.
+
+        Returns:
+            int: Number of events migrated
+        """
+        if not any(f.endswith('.json') and not f.startswith('.') for f in os.listdir(self.events_dir)):
+            return 0
+
+        with open(os.path.join(self.events_dir, '.migrate.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            events = []
+            migrated_files = []
+            for file_name in os.listdir(self.events_dir):
+                if not file_name.endswith('.json') or file_name.startswith('.'):
+                    continue
+                try:
+                    with open(os.path.join(self.events_dir, file_name), 'r') as f:
+                        events.append(json.load(f))
+                    migrated_files.append(file_name)
+                except Exception as e:
+                    logger.error(f"Error loading legacy event from {file_name}: {str(e)}")
+
+            events.sort(key=lambda event_data: event_data.get('timestamp') or '')
+            self.append_many(events)
+            for file_name in migrated_files:
+                os.remove(os.path.join(self.events_dir, file_name))
+
+        logger.info(f"Migrated {len(events)} legacy event files into entity logs")
+        return len(events)
@@ -0,0 +1,184 @@
+"""
+Buffered group-commit writer for events.
+
+Events are queued in memory and handed to a sink in batches by a
+background thread, either when a batch fills up or when the oldest queued
+event has waited `flush_interval` seconds. The durability mode decides
+what save_event waits for:
+
+    sync   write inline, one sink call per event
+    group  queue the event and wait until its batch is committed
+    async  queue the event and return immediately
+
+Pending events are flushed when the writer is closed, including at
+interpreter shutdown.
+"""
+import atexit
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ('sync', 'group', 'async')
+
+
+class BufferedEventWriter:
+    """Queues events and commits them to a sink in batches from a background thread"""
+
+    def __init__(self, sink: Callable[[List[Dict[str, Any]]], Any], durability: str = 'async',
+                 max_batch: int = 256, flush_interval: float = 0.05, max_queue: int = 10000):
+        """
+        Start the writer.
+
+        Args:
+            sink: Callable that persists a list of event dictionaries
+            durability: One of 'sync', 'group' or 'async'
+            max_batch: Maximum number of events per sink call
+            flush_interval: Seconds an event may wait before its batch is flushed
+            max_queue: Queue length at which writers block until a flush completes
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown event durability mode: {durability}")
+        self.sink = sink
+        self.durability = durability
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Optional[Dict[str, Any]], Optional[Future]]] = []
+        self._first_enqueued = 0.0
+        self._flush_markers = 0
+        self._in_flight = False
+        self._closing = False
+        self._stats = {'written': 0, 'batches': 0, 'failed': 0}
+
+        self._thread = None
+        if durability != 'sync':
+            self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def write(self, event_data: Dict[str, Any]) -> bool:
+        """
+        Submit an event for persistence.
+
+        Returns:
+            bool: False if the event is known to have failed; in async mode
+            failures are only logged and counted.
+        """
+        if self._thread is None or self._closing:
+            return self._commit([(event_data, None)])
+
+        with self._cond:
+            queue_full = len(self._pending) >= self.max_queue
+        if queue_full:
+            self.flush()
+
+        future = Future() if self.durability == 'group' else None
+        with self._cond:
+            if not self._pending:
+                self._first_enqueued = time.monotonic()
+            self._pending.append((event_data, future))
+            self._cond.notify()
+
+        if future is not None:
+            return future.result()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every event queued before this call has been committed.
+
+        Returns:
+            bool: False if the batch committed with it failed or the timeout expired first
+        """
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                batch, self._pending = self._pending, []
+            return self._commit(batch) if batch else True
+
+        marker = Future()
+        with self._cond:
+            if not self._pending and not self._in_flight:
+                return True
+            self._pending.append((None, marker))
+            self._flush_markers += 1
+            self._cond.notify()
+        try:
+            return marker.result(timeout)
+        except FutureTimeoutError:
+            return False
+
+    def close(self) -> None:
+        """Flush pending events and stop the background thread"""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        # Otherwise the exit hook keeps every closed writer and its sink alive
+        atexit.unregister(self.close)
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        # Anything queued after the thread exited
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing writer activity"""
+        with self._cond:
+            return dict(self._stats, queued=len(self._pending), durability=self.durability)
+
+    def _run(self) -> None:
+        """Background loop that cuts batches and commits them"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                # Let the batch fill up unless someone is waiting on a flush
+                deadline = self._first_enqueued + self.flush_interval
+                while len(self._pending) < self.max_batch and not self._flush_markers \
+                        and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._flush_markers -= sum(1 for event_data, _ in batch if event_data is None)
+                if self._pending:
+                    self._first_enqueued = time.monotonic()
+                self._in_flight = True
+
+            try:
+                self._commit(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = False
+
+    def _commit(self, batch: List[Tuple[Optional[Dict[str, Any]], Optional[Future]]]) -> bool:
+        """Write one batch to the sink and resolve its waiters"""
+        events = [event_data for event_data, _ in batch if event_data is not None]
+        success = True
+        if events:
+            try:
+                self.sink(events)
+            except Exception as e:
+                logger.error(f"Error writing batch of {len(events)} events: {str(e)}")
+                success = False
+            with self._cond:
+                self._stats['batches'] += 1
+                self._stats['written' if success else 'failed'] += len(events)
+
+        # Flush markers report the batch they were committed with
+        for _, future in batch:
+            if future is not None:
+                future.set_result(success)
+        return success
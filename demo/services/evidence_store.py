@@ -0,0 +1,432 @@
+"""
+Evidence file storage for claim uploads.
+
+Uploads are streamed to disk as the multipart body is parsed: the request
+hands the parser an UploadSpool for each file part, which writes every
+chunk to a temporary file in the upload folder and feeds the same chunk to
+a SHA-256 digest. Once the claim is known, saving a spooled file is a
+rename, so its bytes are written once and never re-read to learn their
+size or checksum. Streams that were not spooled (e.g. a FileStorage built
+in code) are copied in fixed-size chunks with the same single-pass hashing.
+The files of one claim are persisted concurrently on a shared pool.
+
+Stored files are content-addressed: the bytes live once under
+objects/<aa>/<bb>/<sha256>, sharded by hash prefix so no directory grows
+large, however many claims reference them. A SQLite index next to the
+objects records each reference, i.e. each FileInfo (claim ID and saved
+name), and a reference count per object. The same police report or photo
+uploaded for several claims is therefore stored once, the claims sharing
+a file are one indexed lookup away, and an object is deleted when its last
+reference is released, i.e. when the last claim using it is deleted.
+Files saved before content addressing stay in pdfs/ and images/, and are
+still served from there, until migrate_legacy imports them.
+
+Usage (from the demo directory):
+    python -m services.evidence_store migrate [--keep-source]
+    python -m services.evidence_store stats
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+INCOMING_DIR = '.incoming'
+OBJECTS_DIR = 'objects'
+INDEX_NAME = 'evidence.db'
+# Folders of files saved before content addressing
+SUBFOLDERS = {'pdf': 'pdfs', 'image': 'images'}
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS evidence_objects (
+        sha256 TEXT PRIMARY KEY,
+        file_size INTEGER NOT NULL,
+        refcount INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS evidence_refs (
+        claim_id TEXT NOT NULL,
+        saved_name TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        file_type TEXT NOT NULL,
+        original_name TEXT,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (claim_id, saved_name)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_evidence_refs_sha256 ON evidence_refs(sha256)",
+)
+
+ADD_OBJECT_REF = """INSERT INTO evidence_objects (sha256, file_size, refcount, created_at)
+    VALUES (?, ?, 1, ?)
+    ON CONFLICT(sha256) DO UPDATE SET refcount = evidence_objects.refcount + 1"""
+INSERT_REF = """INSERT INTO evidence_refs (claim_id, saved_name, sha256, file_type, original_name, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+SELECT_REF = "SELECT sha256 FROM evidence_refs WHERE claim_id = ? AND saved_name = ?"
+SELECT_CLAIM_REFS = "SELECT saved_name, sha256 FROM evidence_refs WHERE claim_id = ?"
+SELECT_HASH_REFS = """SELECT claim_id, saved_name, file_type, original_name, created_at
+    FROM evidence_refs WHERE sha256 = ? ORDER BY created_at"""
+DELETE_CLAIM_REFS = "DELETE FROM evidence_refs WHERE claim_id = ?"
+DELETE_REF = "DELETE FROM evidence_refs WHERE claim_id = ? AND saved_name = ?"
+DROP_OBJECT_REF = "UPDATE evidence_objects SET refcount = refcount - 1 WHERE sha256 = ?"
+SELECT_UNREFERENCED = "SELECT sha256 FROM evidence_objects WHERE refcount <= 0"
+DELETE_UNREFERENCED = "DELETE FROM evidence_objects WHERE refcount <= 0"
+SELECT_STATS = """SELECT COUNT(*), COALESCE(SUM(file_size), 0), COALESCE(SUM(refcount), 0),
+    COALESCE(SUM(file_size * refcount), 0) FROM evidence_objects"""
+
+
+class UploadSpool:
+    """Writable file for one upload part that hashes and counts bytes as they are written"""
+
+    def __init__(self, directory: str):
+        """
+        Open a temporary file in directory, which must be on the same file
+        system as the final location so persisting it is a rename.
+        """
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.persisted = False
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of everything written so far"""
+        return self._digest.hexdigest()
+
+    def sync(self, fsync: bool = False) -> None:
+        """Flush the spooled bytes, to disk with fsync, and close the file for reading"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+    def persist(self, path: str, fsync: bool = False) -> None:
+        """Move the spooled bytes to path; the spool can no longer be read afterwards"""
+        self.sync(fsync)
+        os.replace(self.path, path)
+        self.persisted = True
+
+    def close(self) -> None:
+        """Close the file, deleting it unless it was persisted"""
+        if not self._file.closed:
+            self._file.close()
+        if not self.persisted:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name: str) -> Any:
+        # read, seek, tell, readline... of the underlying file
+        return getattr(self._file, name)
+
+
+class EvidenceStore:
+    """Persists uploaded evidence files under the upload folder"""
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_pid: Optional[int] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, upload_folder: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: int = 4, fsync: bool = False):
+        """
+        Create the upload folder layout and open the reference index.
+
+        Args:
+            upload_folder: Root folder of the uploads
+            chunk_size: Bytes per read when copying a stream that was not spooled
+            workers: Threads persisting the files of one submission concurrently
+            fsync: Whether to flush each file to disk before it is moved into place
+        """
+        self.upload_folder = upload_folder
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.fsync = fsync
+        self.incoming_dir = os.path.join(upload_folder, INCOMING_DIR)
+        self.objects_dir = os.path.join(upload_folder, OBJECTS_DIR)
+        for directory in (self.incoming_dir, self.objects_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by the store's threads; writes take SQLite's
+        # write lock before touching objects, which serializes them across processes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(upload_folder, INDEX_NAME), timeout=5.0,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    @classmethod
+    def _get_executor(cls, workers: int) -> ThreadPoolExecutor:
+        """Return the executor shared by all stores for persisting files"""
+        with cls._executor_lock:
+            # Executor threads do not survive fork, so each worker process builds its own
+            if cls._executor is None or cls._executor_pid != os.getpid():
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='evidence-write')
+                cls._executor_pid = os.getpid()
+            return cls._executor
+
+    def spool(self) -> UploadSpool:
+        """New spool for a file part being received"""
+        return UploadSpool(self.incoming_dir)
+
+    def object_path(self, sha256: str) -> str:
+        """Path of the object holding the content with this hash"""
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256)
+
+    def legacy_path(self, saved_name: str) -> str:
+        """Path a file saved before content addressing was stored at"""
+        subfolder = 'pdfs' if saved_name.rsplit('.', 1)[-1].lower() == 'pdf' else 'images'
+        return os.path.join(self.upload_folder, subfolder, saved_name)
+
+    def locate(self, claim_id: str, saved_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Path and content hash of a claim's file.
+
+        Args:
+            claim_id: Claim the file belongs to
+            saved_name: saved_name of its FileInfo
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: Path of the file (None if there
+            is no such file) and its SHA-256 (None for files saved before
+            content addressing)
+        """
+        with self._lock:
+            row = self._conn.execute(SELECT_REF, (claim_id, saved_name)).fetchone()
+        if row is not None:
+            return self.object_path(row[0]), row[0]
+        legacy_path = self.legacy_path(saved_name)
+        if os.path.basename(saved_name) == saved_name and os.path.exists(legacy_path):
+            return legacy_path, None
+        return None, None
+
+    def resolve(self, claim_id: str, saved_name: str) -> Optional[str]:
+        """Path of the content of a claim's file, or None if there is no such file"""
+        return self.locate(claim_id, saved_name)[0]
+
+    def claims_for(self, sha256: str) -> List[Dict[str, Any]]:
+        """References to the content with this hash, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(SELECT_HASH_REFS, (sha256,)).fetchall()
+        return [{'claim_id': claim_id, 'saved_name': saved_name, 'file_type': file_type,
+                 'original_name': original_name, 'created_at': created_at}
+                for claim_id, saved_name, file_type, original_name, created_at in rows]
+
+    def _add(self, spool: UploadSpool, claim_id: str, saved_name: str,
+             file_type: str, original_name: str) -> str:
+        """Reference the spooled content from a claim, storing it unless an object already holds it"""
+        sha256 = spool.sha256
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            # The slow part runs unlocked, so the files of a submission reach the disk concurrently
+            spool.sync(fsync=self.fsync)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, self._conn:
+            now = time.time()
+            self._conn.execute(ADD_OBJECT_REF, (sha256, spool.size, now))
+            self._conn.execute(INSERT_REF, (claim_id, saved_name, sha256, file_type, original_name, now))
+            # Renamed under the lock, so release_claim cannot delete the object before it is referenced
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                spool.persist(path, fsync=self.fsync)
+        return path
+
+    def release_claim(self, claim_id: str) -> int:
+        """
+        Drop the references of a claim, deleting objects no other claim references.
+
+        Returns:
+            int: Number of objects deleted
+        """
+        with self._lock, self._conn:
+            hashes = [sha256 for _, sha256 in self._conn.execute(SELECT_CLAIM_REFS, (claim_id,))]
+            self._conn.execute(DELETE_CLAIM_REFS, (claim_id,))
+            return self._drop_object_refs(hashes)
+
+    def release_files(self, claim_id: str, saved_names: List[str]) -> int:
+        """
+        Drop the references of some files of a claim, e.g. of a submission that
+        was never stored, leaving the claim's other files referenced.
+
+        Returns:
+            int: Number of objects deleted
+        """
+        with self._lock, self._conn:
+            hashes = []
+            for saved_name in saved_names:
+                row = self._conn.execute(SELECT_REF, (claim_id, saved_name)).fetchone()
+                if row is not None:
+                    self._conn.execute(DELETE_REF, (claim_id, saved_name))
+                    hashes.append(row[0])
+            return self._drop_object_refs(hashes)
+
+    def _drop_object_refs(self, hashes: List[str]) -> int:
+        """Decrement the objects' reference counts and delete the unreferenced ones (lock held)"""
+        self._conn.executemany(DROP_OBJECT_REF, [(sha256,) for sha256 in hashes])
+        unreferenced = [row[0] for row in self._conn.execute(SELECT_UNREFERENCED)]
+        self._conn.execute(DELETE_UNREFERENCED)
+        for sha256 in unreferenced:
+            try:
+                os.remove(self.object_path(sha256))
+            except FileNotFoundError:
+                pass
+        return len(unreferenced)
+
+    def stats(self) -> Dict[str, Any]:
+        """Object and reference counts, and the bytes stored against the bytes referenced"""
+        with self._lock:
+            objects, stored, references, referenced = self._conn.execute(SELECT_STATS).fetchone()
+        return {'objects': objects, 'references': references, 'bytes_stored': stored,
+                'bytes_referenced': referenced, 'bytes_deduplicated': referenced - stored}
+
+    def _spooled(self, stream: Any) -> UploadSpool:
+        """The stream itself if it was spooled, otherwise a spool filled from it chunk by chunk"""
+        if isinstance(stream, UploadSpool) and not stream.persisted:
+            return stream
+        spool = self.spool()
+        try:
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        return spool
+
+    def save(self, file: Any, file_type: str, claim_id: str) -> Dict[str, Any]:
+        """
+        Store one uploaded file of a claim.
+
+        Args:
+            file: Uploaded file (werkzeug FileStorage)
+            file_type: 'pdf' or 'image'
+            claim_id: Claim the file belongs to
+
+        Returns:
+            Dict[str, Any]: FileInfo fields, including the file's sha256
+        """
+        original_filename = file.filename
+        file_extension = original_filename.rsplit('.', 1)[1].lower()
+        unique_filename = f"{claim_id}_{uuid.uuid4().hex}.{file_extension}"
+
+        spool = self._spooled(file.stream)
+        try:
+            filepath = self._add(spool, claim_id, unique_filename, file_type, original_filename)
+        finally:
+            spool.close()
+
+        return {
+            'original_name': original_filename,
+            'saved_name': unique_filename,
+            'file_path': filepath,
+            'file_type': file_type,
+            'file_size': spool.size,
+            'sha256': spool.sha256
+        }
+
+    def save_all(self, uploads: List[Tuple[Any, str]], claim_id: str) -> List[Dict[str, Any]]:
+        """
+        Store the uploaded files of a claim concurrently.
+
+        Args:
+            uploads: (file, file_type) pairs
+            claim_id: Claim the files belong to
+
+        Returns:
+            List[Dict[str, Any]]: FileInfo fields of each file, in the order given
+        """
+        if len(uploads) <= 1 or self.workers <= 1:
+            return [self.save(file, file_type, claim_id) for file, file_type in uploads]
+        executor = self._get_executor(self.workers)
+        futures = [executor.submit(self.save, file, file_type, claim_id) for file, file_type in uploads]
+        return [future.result() for future in futures]
+
+    def migrate_legacy(self, remove_source: bool = True) -> int:
+        """
+        Import the files saved before content addressing, named {claim_id}_{uuid}.{ext}.
+
+        Files already referenced are skipped, so the migration can be re-run safely.
+
+        Args:
+            remove_source: Whether to delete each legacy file once imported
+
+        Returns:
+            int: Number of files imported
+        """
+        imported = 0
+        for file_type, subfolder in SUBFOLDERS.items():
+            directory = os.path.join(self.upload_folder, subfolder)
+            if not os.path.isdir(directory):
+                continue
+            for saved_name in sorted(os.listdir(directory)):
+                claim_id = saved_name.rsplit('_', 1)[0]
+                if '_' not in saved_name or self.resolve(claim_id, saved_name) != self.legacy_path(saved_name):
+                    continue
+                try:
+                    with open(os.path.join(directory, saved_name), 'rb') as f:
+                        spool = self._spooled(f)
+                    try:
+                        self._add(spool, claim_id, saved_name, file_type, saved_name)
+                    finally:
+                        spool.close()
+                    if remove_source:
+                        os.remove(os.path.join(directory, saved_name))
+                    imported += 1
+                except Exception as e:
+                    logger.error(f"Error migrating evidence file {saved_name}: {str(e)}")
+
+        logger.info(f"Migrated {imported} evidence files into {self.objects_dir}")
+        return imported
+
+    def close(self) -> None:
+        """Close the reference index"""
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for evidence store maintenance"""
+    from utils.config import Config
+
+    parser = argparse.ArgumentParser(description="Evidence file store maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help="Import files saved before content addressing")
+    migrate.add_argument('--keep-source', action='store_true',
+                         help="Leave the imported files in pdfs/ and images/")
+    subparsers.add_parser('stats', help="Print object and reference counts")
+    args = parser.parse_args(argv)
+
+    store = EvidenceStore(Config().get('app.upload_folder', 'uploads'))
+    try:
+        if args.command == 'migrate':
+            print(f"Imported {store.migrate_legacy(remove_source=not args.keep_source)} evidence files")
+        else:
+            print(json.dumps(store.stats(), indent=2))
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
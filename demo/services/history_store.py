@@ -0,0 +1,244 @@
+"""
+Delta-encoded version history for claims.
+
+Each claim has an append-only history log with one JSON line per
+revision. A revision is stored as one of:
+
+    full     zlib-compressed snapshot of the claim
+    delta    zlib-compressed set/unset of top-level fields since the previous revision
+    ref      no payload; the content is identical to an earlier revision
+    deleted  tombstone written when the claim is deleted
+
+Content is hashed without `updated_time` and the claim's save counter
+`revision`, which change on every save and are kept as revision metadata
+instead, so re-saving unchanged content only
+costs a small `ref` line. A full snapshot is written every
+`keyframe_interval` revisions to bound reconstruction cost.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from .event_store import read_lines_backwards
+
+logger = logging.getLogger(__name__)
+
+VOLATILE_FIELDS = ('updated_time', 'revision')
+
+
+def _canonical(doc: Dict[str, Any]) -> bytes:
+    """Stable serialization used for hashing"""
+    return json.dumps(doc, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _pack(value: Any) -> str:
+    """Compress a JSON value into a base64 string"""
+    return base64.b64encode(zlib.compress(_canonical(value), 9)).decode('ascii')
+
+
+def _unpack(payload: str) -> Any:
+    """Inverse of _pack"""
+    return json.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+class ClaimHistoryStore:
+    """Per-claim revision logs storing compressed deltas deduplicated by content hash"""
+
+    def __init__(self, history_dir: str, keyframe_interval: int = 20, cache_size: int = 1024):
+        """
+        Open the history store.
+
+        Args:
+            history_dir: Directory holding the per-claim history logs
+            keyframe_interval: Revisions between full snapshots
+            cache_size: Number of claims whose latest revision is kept in memory
+        """
+        self.history_dir = history_dir
+        self.keyframe_interval = keyframe_interval
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._latest: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        os.makedirs(history_dir, exist_ok=True)
+
+    def _log_path(self, claim_id: str) -> str:
+        """Path of a claim's history log"""
+        digest = hashlib.sha1(claim_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.history_dir, digest[:2], f"{digest}.log")
+
+    def _read_records(self, claim_id: str) -> List[Dict[str, Any]]:
+        """Load every revision record of a claim, oldest first"""
+        try:
+            with open(self._log_path(claim_id), 'rb') as f:
+                return [json.loads(line) for line in f if line.endswith(b'\n')]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _materialize(records: List[Dict[str, Any]], version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the content (without the volatile fields) of one revision"""
+        by_version = {record['v']: record for record in records}
+        record = by_version.get(version)
+        if record is None or record['kind'] == 'deleted':
+            return None
+        if record['kind'] == 'ref':
+            return ClaimHistoryStore._materialize(records, record['ref'])
+
+        # Walk back to the nearest full snapshot, then replay deltas forward
+        chain = []
+        current = record
+        while current['kind'] == 'delta':
+            chain.append(current)
+            current = by_version[current['base']]
+        if current['kind'] == 'ref':
+            content = ClaimHistoryStore._materialize(records, current['ref'])
+        else:
+            content = _unpack(current['payload'])
+        for delta_record in reversed(chain):
+            delta = _unpack(delta_record['payload'])
+            content.update(delta.get('set', {}))
+            for key in delta.get('unset', []):
+                content.pop(key, None)
+        return content
+
+    def _latest_state(self, claim_id: str) -> Dict[str, Any]:
+        """
+        Describe the latest revision of a claim.
+
+        The cached state is only trusted if the log's last line still
+        matches it, so revisions appended by other processes are noticed.
+
+        Returns:
+            Dict with version, hash, content, since_keyframe and hashes
+            (content hash -> first revision storing it)
+        """
+        tail = read_lines_backwards(self._log_path(claim_id), 1)
+        if not tail:
+            return {'version': 0, 'hash': '', 'content': None, 'since_keyframe': 0, 'hashes': {}}
+        last = json.loads(tail[0][1])
+
+        cached = self._latest.get(claim_id)
+        if cached is not None and cached['version'] == last['v']:
+            return cached
+
+        records = self._read_records(claim_id)
+        hashes: Dict[str, int] = {}
+        since_keyframe = 0
+        for record in records:
+            if record['kind'] in ('full', 'delta'):
+                hashes.setdefault(record['hash'], record['v'])
+            since_keyframe = 0 if record['kind'] == 'full' else since_keyframe + 1
+        return {
+            'version': last['v'],
+            'hash': last.get('hash', ''),
+            'content': self._materialize(records, last['v']),
+            'since_keyframe': since_keyframe,
+            'hashes': hashes
+        }
+
+    def _append(self, claim_id: str, build_record) -> Dict[str, Any]:
+        """Append the record produced by build_record(latest state) under a file lock"""
+        path = self._log_path(claim_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, open(path, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            state = self._latest_state(claim_id)
+            record, content = build_record(state)
+            if record is None:
+                return {}
+            f.write((json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8'))
+            f.flush()
+
+            # Cache the new latest state
+            hashes = state['hashes']
+            if record['kind'] in ('full', 'delta'):
+                hashes.setdefault(record['hash'], record['v'])
+            self._latest[claim_id] = {
+                'version': record['v'],
+                'hash': record.get('hash', ''),
+                'content': content,
+                'since_keyframe': 0 if record['kind'] == 'full' else state['since_keyframe'] + 1,
+                'hashes': hashes
+            }
+            self._latest.move_to_end(claim_id)
+            while len(self._latest) > self.cache_size:
+                self._latest.popitem(last=False)
+            return record
+
+    def record(self, claim_id: str, claim_data: Dict[str, Any]) -> int:
+        """
+        Record a new revision of a claim.
+
+        Returns:
+            int: The new revision number
+        """
+        content = {key: value for key, value in claim_data.items() if key not in VOLATILE_FIELDS}
+        content_hash = hashlib.sha256(_canonical(content)).hexdigest()
+
+        def build(state):
+            record = {'v': state['version'] + 1, 'ts': datetime.now().isoformat(), 'hash': content_hash}
+            record.update({key: claim_data.get(key) for key in VOLATILE_FIELDS if key in claim_data})
+            latest = state['content']
+
+            if content_hash in state['hashes']:
+                record.update(kind='ref', ref=state['hashes'][content_hash])
+            elif latest is None or state['since_keyframe'] + 1 >= self.keyframe_interval:
+                record.update(kind='full', payload=_pack(content))
+            else:
+                delta = {
+                    'set': {key: value for key, value in content.items()
+                            if key not in latest or latest[key] != value},
+                    'unset': [key for key in latest if key not in content]
+                }
+                record.update(kind='delta', base=state['version'], payload=_pack(delta))
+            return record, content
+
+        return self._append(claim_id, build).get('v', 0)
+
+    def record_deletion(self, claim_id: str) -> int:
+        """
+        Record that a claim was deleted.
+
+        Returns:
+            int: The tombstone's revision number, or 0 if the claim has no history
+        """
+        def build(state):
+            if state['version'] == 0:
+                return None, None
+            record = {'v': state['version'] + 1, 'ts': datetime.now().isoformat(), 'kind': 'deleted'}
+            return record, None
+
+        return self._append(claim_id, build).get('v', 0)
+
+    def get_history(self, claim_id: str) -> List[Dict[str, Any]]:
+        """List revision metadata for a claim, oldest first"""
+        return [{
+            'version': record['v'],
+            'timestamp': record['ts'],
+            'kind': record['kind'],
+            'content_hash': record.get('hash'),
+            'updated_time': record.get('updated_time'),
+            'stored_bytes': len(record.get('payload', ''))
+        } for record in self._read_records(claim_id)]
+
+    def get_version(self, claim_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Reconstruct a claim as it was at a revision, or None"""
+        records = self._read_records(claim_id)
+        content = self._materialize(records, version)
+        if content is None:
+            return None
+        record = next(record for record in records if record['v'] == version)
+        content.update({key: record[key] for key in VOLATILE_FIELDS if key in record})
+        return content
@@ -2,20 +2,87 @@
 Hybrid Data Service for the insurance fraud detection system.
 This service provides a unified interface for both local and cloud storage.
 """
-from typing import Dict, List, Any, Optional, Union
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+import logging
 from models.claim import Claim
 from models.event import Event
+from utils.config import Config
+from utils.validation import validate_claim
+from utils.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from .aggregates import REPLACED_UNREAD
 from .data_service import LocalDataService
+from .segment_service import SegmentedDataService
+from .sqlite_service import SQLiteDataService
+from .claim_cache import ClaimCache
 from .cosmos_service import CosmosDBService
+from .cosmos_metrics import cosmos_metrics
+from .outbox import CloudOutbox, CloudSyncWorker
+from .change_feed import ChangeFeedProcessor
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODES = ('concurrent', 'sequential', 'write_behind')
+
+
+@dataclass
+class WriteResult:
+    """Outcome of writing one entity to local and cloud storage"""
+    entity_id: str
+    local_ok: bool
+    cloud_status: str  # 'ok', 'failed', 'timeout', 'queued' or 'skipped'
+    elapsed_ms: float
+    local_error: Optional[str] = None
+    cloud_error: Optional[str] = None
+    queued: bool = False  # recorded in the outbox for replay
+    
+    @property
+    def cloud_ok(self) -> bool:
+        """Whether the cloud copy is known to be written"""
+        return self.cloud_status == 'ok'
 
 
 class HybridDataService:
     """Service that combines local and cloud storage for data persistence"""
     
+    _write_executor: Optional[ThreadPoolExecutor] = None
+    _write_executor_pid: Optional[int] = None
+    _write_executor_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize the hybrid data service"""
-        self.local_service = LocalDataService()
+        self.local_service = self._create_local_service()
+        
+        config = Config()
+        self.write_mode = config.get('hybrid.write_mode', 'concurrent')
+        if self.write_mode not in WRITE_MODES:
+            raise ValueError(f"Unknown hybrid write mode: {self.write_mode}")
+        self.write_deadline = config.get('hybrid.write_deadline_seconds', 5.0)
+        self.write_workers = config.get('hybrid.write_workers', 8)
+        self.outbox_path = config.get('hybrid.outbox_path', 'outbox.db')
+        self.late_write_hold = config.get('hybrid.late_write_hold_seconds', 60.0)
+        self.sync_batch_size = config.get('hybrid.sync_batch_size', 100)
+        self.sync_interval = config.get('hybrid.sync_interval_seconds', 1.0)
+        self.sync_retry_delay = config.get('hybrid.sync_retry_delay_seconds', 1.0)
+        self.sync_max_backoff = config.get('hybrid.sync_max_backoff_seconds', 300.0)
+        self.outbox: Optional[CloudOutbox] = None
+        self.sync_worker: Optional[CloudSyncWorker] = None
+        self._outbox_lock = threading.Lock()
+        
+        self.claim_cache = None
+        if config.get('cache.enabled', True):
+            # Entries are checked against the local write version, which moves on
+            # writes by any worker process on this store and on change feed updates
+            self.claim_cache = ClaimCache(
+                max_entries=config.get('cache.max_entries', 1024),
+                ttl_seconds=config.get('cache.ttl_seconds', 30.0),
+                version=lambda: self.local_service.get_write_version('claims')
+            )
         
         # Only create Cosmos service if properly configured
         self.cosmos_service = CosmosDBService()
@@ -25,69 +92,523 @@ class HybridDataService:
             self.use_cosmos = False
             self.cosmos_service = None
         
+        # Resume replaying writes queued by a previous run
+        if self.use_cosmos and os.path.exists(self.outbox_path):
+            self._get_outbox()
+        
+        # Keep a cached health snapshot fresh, and notice recovery while the circuit is open
+        if self.use_cosmos:
+            self.cosmos_service.start_health_probe()
+        
+        # Apply writes of other instances from the change feed, so local reads can go first
+        self.change_feed: Optional[ChangeFeedProcessor] = None
+        # Set by the app, which owns the upload folder; deleting a claim releases its files
+        self.evidence_store = None
+        if self.use_cosmos and config.get('hybrid.change_feed_enabled', False):
+            self.change_feed = ChangeFeedProcessor(
+                self.cosmos_service, self.local_service, self.claim_cache,
+                checkpoint_path=config.get('hybrid.change_feed_checkpoint_path', 'change_feed.checkpoint.json'),
+                page_size=config.get('hybrid.change_feed_page_size', 100),
+                interval=config.get('hybrid.change_feed_interval_seconds', 5.0))
+            self.change_feed.start()
+        
         print(f"Hybrid Data Service initialized. Using Cosmos DB: {self.use_cosmos}")
     
+    @staticmethod
+    def _create_local_service() -> LocalDataService:
+        """Create the local storage engine selected by storage.engine"""
+        engine = Config().get('storage.engine', 'file')
+        if engine == 'segment':
+            return SegmentedDataService()
+        elif engine == 'sqlite':
+            return SQLiteDataService()
+        return LocalDataService()
+    
+    @classmethod
+    def _get_write_executor(cls, workers: int) -> ThreadPoolExecutor:
+        """Return the executor shared by all instances for cloud writes"""
+        with cls._write_executor_lock:
+            # Executor threads do not survive fork, so each worker process builds its own
+            if cls._write_executor is None or cls._write_executor_pid != os.getpid():
+                cls._write_executor = ThreadPoolExecutor(max_workers=workers,
+                                                         thread_name_prefix='cloud-write')
+                cls._write_executor_pid = os.getpid()
+            return cls._write_executor
+    
+    def _get_outbox(self) -> CloudOutbox:
+        """Open the outbox and start its sync worker on first use"""
+        with self._outbox_lock:
+            if self.outbox is None:
+                self.outbox = CloudOutbox(self.outbox_path)
+                self.sync_worker = CloudSyncWorker(
+                    self.outbox,
+                    {
+                        'claim:upsert': lambda entry: self.cosmos_service.save_claim(entry['payload']),
+                        'claim:delete': lambda entry: self.cosmos_service.delete_claim(
+                            entry['entity_id'], missing_ok=True),
+                        'event:upsert': lambda entry: self.cosmos_service.save_event(entry['payload'])
+                    },
+                    batch_size=self.sync_batch_size,
+                    interval=self.sync_interval,
+                    max_backoff=self.sync_max_backoff
+                )
+                self.sync_worker.start()
+            return self.outbox
+    
+    def _cloud_readable(self) -> bool:
+        """Whether reads should try Cosmos DB: it is in use and its circuit is not open"""
+        return bool(self.use_cosmos and self.cosmos_service and self.cosmos_service.is_available())
+    
+    def _list_from_cloud(self, source: Optional[str]) -> bool:
+        """
+        Whether a listing should read Cosmos DB, given the source of its cursor
+        
+        While the change feed keeps the local store in sync, new listings are
+        served locally; listings already paging through Cosmos DB stay there.
+        """
+        if source == 'local' or not self._cloud_readable():
+            return False
+        return source == 'cosmos' or self.change_feed is None
+    
+    def _defer_cloud_write(self, kind: str, entity_id: str) -> bool:
+        """
+        Whether a cloud write should go straight to the outbox
+        
+        That is the case in write-behind mode, while the Cosmos DB circuit is
+        open, and while an earlier write of the same entity is still queued
+        (so writes reach the cloud in order).
+        """
+        return (self.write_mode == 'write_behind' or not self.cosmos_service.is_available() or
+                self._has_pending_cloud_write(kind, entity_id))
+    
+    def _has_pending_cloud_write(self, kind: str, entity_id: str) -> bool:
+        """Check whether an entity's cloud copy is waiting on the outbox"""
+        return self.outbox is not None and self.outbox.is_pending(kind, entity_id)
+    
+    def _queue_cloud_write(self, kind: str, entity_id: str, op: str,
+                           payload: Optional[Dict[str, Any]] = None, delay: float = 0.0) -> bool:
+        """Record a cloud write in the outbox, returning False if that fails too"""
+        try:
+            self._get_outbox().enqueue(kind, entity_id, op, payload, delay)
+            if delay <= 0:
+                self.sync_worker.wake()
+            return True
+        except Exception as e:
+            logger.error(f"Could not queue cloud {op} of {kind} {entity_id}: {str(e)}")
+            return False
+    
+    def _dual_write(self, kind: str, entity_id: str, local_write: Callable[[], Any],
+                    cloud_write: Optional[Callable[[], bool]],
+                    payload: Optional[Dict[str, Any]] = None) -> Tuple[WriteResult, Optional[Exception]]:
+        """
+        Write an entity locally and to the cloud.
+        
+        In concurrent mode the cloud write runs on the shared executor while
+        the local write runs in the calling thread, and the caller waits for
+        the cloud side only until the write deadline. Cloud writes that fail
+        or miss the deadline are recorded in the outbox and replayed by the
+        sync worker. In write-behind mode, while the Cosmos DB circuit is open,
+        and while an earlier write of the same entity is still queued, the
+        cloud write goes straight to the outbox (see _defer_cloud_write).
+        
+        Args:
+            kind: 'claim' or 'event'
+            entity_id: ID of the entity being written
+            local_write: Performs the local write, returning a truthy value on success
+            cloud_write: Performs the cloud write, or None if cloud storage is not in use
+            payload: Document the cloud write upserts, used for replay
+            
+        Returns:
+            The write result and the exception raised by the local write, if any
+        """
+        start = time.monotonic()
+        deferred = cloud_write is not None and self._defer_cloud_write(kind, entity_id)
+        
+        future = None
+        if cloud_write is not None and not deferred and self.write_mode == 'concurrent':
+            future = self._get_write_executor(self.write_workers).submit(cloud_write)
+        
+        local_exception = None
+        try:
+            local_ok = bool(local_write())
+        except Exception as e:
+            local_ok = False
+            local_exception = e
+        
+        cloud_status, cloud_error = 'skipped', None
+        try:
+            if future is not None:
+                remaining = max(self.write_deadline - (time.monotonic() - start), 0)
+                cloud_status = 'ok' if future.result(timeout=remaining) else 'failed'
+            elif deferred:
+                cloud_status = 'queued' if local_exception is None else 'skipped'
+            elif cloud_write is not None and local_exception is None:
+                cloud_status = 'ok' if cloud_write() else 'failed'
+        except FutureTimeoutError:
+            cloud_status = 'timeout'
+            cloud_error = f"no response within {self.write_deadline}s"
+        except Exception as e:
+            cloud_status, cloud_error = 'failed', str(e)
+        
+        queued = False
+        if cloud_status in ('queued', 'failed', 'timeout') and local_exception is None:
+            if cloud_status == 'timeout':
+                # Hold the replay until the late write finishes, so it cannot
+                # land on top of the replayed (newer) document
+                queued = self._queue_cloud_write(kind, entity_id, 'upsert', payload,
+                                                 delay=self.late_write_hold)
+                future.add_done_callback(
+                    lambda f: self._on_late_cloud_write(kind, entity_id, f))
+            else:
+                queued = self._queue_cloud_write(
+                    kind, entity_id, 'upsert', payload,
+                    delay=0.0 if cloud_status == 'queued' else self.sync_retry_delay)
+        
+        result = WriteResult(
+            entity_id=entity_id,
+            local_ok=local_ok,
+            cloud_status=cloud_status,
+            elapsed_ms=(time.monotonic() - start) * 1000,
+            local_error=str(local_exception) if local_exception else None,
+            cloud_error=cloud_error,
+            queued=queued
+        )
+        if not local_ok or cloud_status in ('failed', 'timeout'):
+            logger.warning(f"Partial write of {kind} {entity_id}: {result}")
+        else:
+            logger.info(f"Wrote {kind} {entity_id} (cloud: {cloud_status}) in {result.elapsed_ms:.1f} ms")
+        return result, local_exception
+    
+    def _queue_cloud_writes(self, kind: str, entries: List[Tuple[str, Dict[str, Any]]],
+                            delay: float = 0.0) -> bool:
+        """Record many cloud upserts in the outbox in one transaction"""
+        if not entries:
+            return True
+        try:
+            self._get_outbox().enqueue_many(kind, entries, 'upsert', delay)
+            if delay <= 0:
+                self.sync_worker.wake()
+            return True
+        except Exception as e:
+            logger.error(f"Could not queue {len(entries)} cloud writes of {kind}s: {str(e)}")
+            return False
+    
+    def _bulk_cloud_write(self, kind: str, stored: List[Tuple[int, str, Dict[str, Any]]],
+                          cloud_bulk_write: Optional[Callable[[List[Dict[str, Any]]], List[Any]]],
+                          results: List[Optional[WriteResult]], start: float) -> None:
+        """
+        Upsert locally stored entities to the cloud in bulk and fill in their results.
+        
+        Entities are deferred to the outbox in write-behind mode or when an
+        earlier write of the same entity is still queued; cloud failures are
+        queued for replay after the retry delay.
+        
+        Args:
+            kind: 'claim' or 'event'
+            stored: (input position, entity ID, payload) of each locally stored entity
+            cloud_bulk_write: Bulk cloud write returning one result per payload,
+                or None if cloud storage is not in use
+            results: Per-input results to fill in
+            start: time.monotonic() at the start of the bulk request
+        """
+        statuses: Dict[int, Tuple[str, Optional[str]]] = {}
+        direct, deferred = [], []
+        for entry in stored:
+            if cloud_bulk_write is None:
+                statuses[entry[0]] = ('skipped', None)
+            elif self._defer_cloud_write(kind, entry[1]):
+                deferred.append(entry)
+            else:
+                direct.append(entry)
+        
+        if direct:
+            try:
+                cloud_results = cloud_bulk_write([payload for _, _, payload in direct])
+                for (position, _, _), cloud_result in zip(direct, cloud_results):
+                    statuses[position] = ('ok', None) if cloud_result.ok else ('failed', cloud_result.error)
+            except Exception as e:
+                for position, _, _ in direct:
+                    statuses[position] = ('failed', str(e))
+        
+        failed = [entry for entry in direct if statuses[entry[0]][0] == 'failed']
+        queued_deferred = self._queue_cloud_writes(
+            kind, [(entity_id, payload) for _, entity_id, payload in deferred])
+        queued_failed = self._queue_cloud_writes(
+            kind, [(entity_id, payload) for _, entity_id, payload in failed],
+            delay=self.sync_retry_delay)
+        for position, _, _ in deferred:
+            statuses[position] = ('queued', None)
+        
+        elapsed_ms = (time.monotonic() - start) * 1000
+        for position, entity_id, _ in stored:
+            cloud_status, cloud_error = statuses[position]
+            results[position] = WriteResult(
+                entity_id=entity_id,
+                local_ok=True,
+                cloud_status=cloud_status,
+                elapsed_ms=elapsed_ms,
+                cloud_error=cloud_error,
+                queued=(cloud_status == 'queued' and queued_deferred) or
+                       (cloud_status == 'failed' and queued_failed)
+            )
+        logger.info(f"Bulk wrote {len(stored)} {kind}s locally ({len(direct) - len(failed)} to cloud, "
+                    f"{len(failed)} failed, {len(deferred)} deferred) in {elapsed_ms:.1f} ms")
+    
+    def _on_late_cloud_write(self, kind: str, entity_id: str, future) -> None:
+        """Release the held replay of a cloud write that finished after its deadline"""
+        error = future.exception()
+        if error is None and future.result():
+            logger.info(f"Late cloud write of {kind} {entity_id} succeeded")
+        else:
+            logger.error(f"Late cloud write of {kind} {entity_id} failed: {error}")
+        try:
+            self.outbox.release(kind, entity_id)
+            self.sync_worker.wake()
+        except Exception as e:
+            logger.error(f"Could not release queued write of {kind} {entity_id}: {str(e)}")
+    
+    def _replaced_claim(self, claim_id: str) -> Any:
+        """
+        Local summary of the claim version a cloud write replaces, read before the local write
+        
+        Only while the change feed runs does the local store hold the claims
+        other instances wrote; writes of a claim with queued cloud writes are
+        deferred to the outbox, so a direct cloud write then replaces the
+        version stored locally, and Cosmos DB can update its aggregates without
+        reading it again. Otherwise Cosmos DB reads the version itself.
+        """
+        if self.change_feed is None:
+            return REPLACED_UNREAD
+        try:
+            return self.local_service.get_claim_summary(claim_id)
+        except Exception as e:
+            logger.error(f"Could not read the local version of claim {claim_id}: {str(e)}")
+            return REPLACED_UNREAD
+    
     def save_claim(self, claim: Union[Claim, Dict[str, Any]]) -> str:
         """Save a claim to both local and cloud storage"""
-        # Always save locally first
+        return self.save_claim_with_result(claim).entity_id
+    
+    def save_claim_with_result(self, claim: Union[Claim, Dict[str, Any]]) -> WriteResult:
+        """
+        Save a claim to local and cloud storage, reporting both outcomes
+        
+        Raises:
+            ValidationError: If the claim data is invalid
+            RuntimeError: If the local write fails
+        """
         if isinstance(claim, Dict):
+            # Validate before the cloud write starts, since both run at once
+            validate_claim(claim)
             claim_obj = Claim.from_dict(claim)
-            claim_id = self.local_service.save_claim(claim_obj)
         else:
-            claim_id = self.local_service.save_claim(claim)
+            claim_obj = claim
+        # Stamp before either write starts, so local and cloud store the same version
+        claim_obj.touch()
+        claim_dict = claim_obj.to_dict()
         
-        # Try to save to Cosmos DB if available
+        cloud_write = None
         if self.use_cosmos and self.cosmos_service:
+            replaced = self._replaced_claim(claim_obj.claim_id)
+            cloud_write = lambda: self.cosmos_service.save_claim(claim_dict, replaced=replaced)
+        
+        result, local_exception = self._dual_write(
+            'claim', claim_obj.claim_id,
+            lambda: self.local_service.save_claim(claim_obj, stamped=True), cloud_write, claim_dict)
+        
+        if local_exception is not None:
+            if self.claim_cache:
+                self.claim_cache.invalidate(claim_obj.claim_id)
+            raise local_exception
+        
+        # Write through to the read cache
+        if self.claim_cache:
+            self.claim_cache.put(claim_obj.claim_id, claim_obj.to_dict())
+        return result
+    
+    def save_claims_bulk(self, claims: List[Union[Claim, Dict[str, Any]]]) -> List[WriteResult]:
+        """
+        Save many claims to local and cloud storage
+        
+        Claims are validated and written locally in one bulk call, then the
+        ones stored locally are upserted to Cosmos DB in partition-grouped
+        batches. Invalid claims are reported in the results rather than raised.
+        
+        Returns:
+            One WriteResult per claim, in input order
+        """
+        start = time.monotonic()
+        results: List[Optional[WriteResult]] = [None] * len(claims)
+        pending: List[Tuple[int, Claim]] = []
+        for position, claim in enumerate(claims):
             try:
-                if isinstance(claim, Claim):
-                    claim_dict = claim.to_dict()
-                else:
-                    claim_dict = claim
-                
-                cosmos_success = self.cosmos_service.save_claim(claim_dict)
-                
-                if cosmos_success:
-                    print(f"Claim {claim_id} saved to both local and cloud storage")
-                else:
-                    print(f"Claim {claim_id} saved locally only (cloud failed)")
+                if isinstance(claim, Dict):
+                    validate_claim(claim)
+                    claim = Claim.from_dict(claim)
+                pending.append((position, claim))
             except Exception as e:
-                print(f"Claim {claim_id} saved locally only (cloud error: {str(e)})")
+                results[position] = WriteResult(
+                    entity_id=str(claim.get('claim_id', '')) if isinstance(claim, Dict) else '',
+                    local_ok=False, cloud_status='skipped',
+                    elapsed_ms=(time.monotonic() - start) * 1000,
+                    local_error=getattr(e, 'message', str(e)))
         
-        return claim_id
+        local_results = self.local_service.save_claims_bulk([claim_obj for _, claim_obj in pending])
+        stored = []
+        for (position, claim_obj), local_result in zip(pending, local_results):
+            if self.claim_cache:
+                self.claim_cache.invalidate(claim_obj.claim_id)
+            if local_result.ok:
+                # The local save stamped updated_time, so the cloud copy matches
+                stored.append((position, claim_obj.claim_id, claim_obj.to_dict()))
+            else:
+                results[position] = WriteResult(
+                    entity_id=claim_obj.claim_id, local_ok=False, cloud_status='skipped',
+                    elapsed_ms=(time.monotonic() - start) * 1000, local_error=local_result.error)
+        
+        cloud_bulk_write = None
+        if self.use_cosmos and self.cosmos_service:
+            cloud_bulk_write = self.cosmos_service.save_claims_bulk
+        self._bulk_cloud_write('claim', stored, cloud_bulk_write, results, start)
+        return results
     
     def get_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
-        """Get a claim, trying cloud first then local fallback"""
-        if self.use_cosmos and self.cosmos_service:
+        """Get a claim from the read cache, loading it on a miss"""
+        if self.claim_cache:
+            return self.claim_cache.get_or_load(claim_id, self._load_claim)
+        return self._load_claim(claim_id)
+    
+    def _load_claim(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load a claim, trying cloud first then local fallback (local first with the change feed)"""
+        if self.change_feed is not None:
+            claim = self.local_service.get_claim(claim_id)
+            if claim:
+                return claim.to_dict() if isinstance(claim, Claim) else claim
+        
+        # The cloud copy is stale while a write of this claim is queued
+        if self._cloud_readable() and \
+                not self._has_pending_cloud_write('claim', claim_id):
             # Try to get from Cosmos DB first
             claim = self.cosmos_service.get_claim(claim_id)
             if claim:
                 return claim
         
         # Fallback to local
-        claim = self.local_service.get_claim(claim_id)
-        if claim:
-            return claim.to_dict() if isinstance(claim, Claim) else claim
+        if self.change_feed is None:
+            claim = self.local_service.get_claim(claim_id)
+            if claim:
+                return claim.to_dict() if isinstance(claim, Claim) else claim
             
         return None
     
-    def list_claims(self, limit: int = 100) -> List[Dict[str, Any]]:
+    def list_claims(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """List claims from primary storage"""
-        if self.use_cosmos and self.cosmos_service:
+        if self._list_from_cloud(None):
             # Try to list from Cosmos DB first
-            claims = self.cosmos_service.list_claims(limit)
+            claims = self.cosmos_service.list_claims(limit, offset)
             if claims:
                 return claims
         
         # Fallback to local
-        claims = self.local_service.list_claims()
+        claims = self.local_service.list_claims(limit=limit, offset=offset)
         return [claim.to_dict() if isinstance(claim, Claim) else claim for claim in claims]
     
+    @staticmethod
+    def _decode_source_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+        """Decode a hybrid cursor into the storage that issued it and its own token"""
+        if not cursor:
+            return {}
+        state = decode_cursor(cursor)
+        if state.get('source') not in ('cosmos', 'local') or not state.get('token'):
+            raise InvalidCursorError("Invalid cursor")
+        return state
+    
+    @staticmethod
+    def _encode_source_cursor(source: str, token: Optional[str]) -> Optional[str]:
+        """Wrap a storage-specific token so the next page goes to the same storage"""
+        return encode_cursor({'source': source, 'token': token}) if token else None
+    
+    def list_claims_page(self, limit: int = 100,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of claims, newest first
+        
+        The first page comes from Cosmos DB when it has data, otherwise from
+        local storage; the returned cursor keeps later pages on the same source.
+        
+        Returns:
+            Tuple of the claims and the next page's cursor (None on the last page)
+        """
+        state = self._decode_source_cursor(cursor)
+        source = state.get('source')
+        
+        if self._list_from_cloud(source):
+            claims, token = self.cosmos_service.list_claims_page(limit, state.get('token'))
+            if claims or source == 'cosmos':
+                return claims, self._encode_source_cursor('cosmos', token)
+        elif source == 'cosmos':
+            # The cursor belongs to a Cosmos DB listing that is no longer reachable
+            return [], None
+        
+        claims, token = self.local_service.list_claims_page(limit, state.get('token'))
+        return ([claim.to_dict() if isinstance(claim, Claim) else claim for claim in claims],
+                self._encode_source_cursor('local', token))
+    
+    def list_claim_summaries(self, limit: int = 100, offset: int = 0,
+                             fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """List claim summaries from primary storage"""
+        if self._list_from_cloud(None):
+            summaries = self.cosmos_service.list_claim_summaries(limit, offset, fields)
+            if summaries:
+                return summaries
+        
+        return self.local_service.list_claim_summaries(limit=limit, offset=offset, fields=fields)
+    
+    def list_claim_summaries_page(self, limit: int = 100, cursor: Optional[str] = None,
+                                  fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of claim summaries, newest first
+        
+        Sources are chosen as in list_claims_page, and cursors of either
+        listing can be used with the other.
+        
+        Returns:
+            Tuple of the summaries and the next page's cursor (None on the last page)
+        """
+        state = self._decode_source_cursor(cursor)
+        source = state.get('source')
+        
+        if self._list_from_cloud(source):
+            summaries, token = self.cosmos_service.list_claim_summaries_page(
+                limit, state.get('token'), fields)
+            if summaries or source == 'cosmos':
+                return summaries, self._encode_source_cursor('cosmos', token)
+        elif source == 'cosmos':
+            return [], None
+        
+        summaries, token = self.local_service.list_claim_summaries_page(
+            limit, state.get('token'), fields=fields)
+        return summaries, self._encode_source_cursor('local', token)
+    
     def delete_claim(self, claim_id: str) -> bool:
         """Delete a claim from both storages"""
+        if self.claim_cache:
+            self.claim_cache.invalidate(claim_id)
+        replaced = self._replaced_claim(claim_id) if self.use_cosmos and self.cosmos_service else REPLACED_UNREAD
         local_success = self.local_service.delete_claim(claim_id)
+        if local_success and self.evidence_store is not None:
+            try:
+                self.evidence_store.release_claim(claim_id)
+            except Exception as e:
+                logger.error(f"Could not release evidence files of claim {claim_id}: {str(e)}")
         
         if self.use_cosmos and self.cosmos_service:
-            cosmos_success = self.cosmos_service.delete_claim(claim_id)
+            if self._defer_cloud_write('claim', claim_id):
+                # Replaces any queued upsert, so the delete cannot be overtaken
+                return self._queue_cloud_write('claim', claim_id, 'delete') and local_success
+            cosmos_success = self.cosmos_service.delete_claim(claim_id, replaced=replaced)
+            if not cosmos_success and local_success:
+                self._queue_cloud_write('claim', claim_id, 'delete', delay=self.sync_retry_delay)
             return local_success and cosmos_success
         
         return local_success
@@ -117,37 +638,145 @@ class HybridDataService:
             print(f"Failed to update claim {claim_id}: {str(e)}")
             return None
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the claim read cache"""
+        if not self.claim_cache:
+            return {'enabled': False}
+        return dict(self.claim_cache.stats(), enabled=True)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Operational metrics: cache, cloud sync lag, outbox depth and Cosmos DB operations"""
+        outbox = self.outbox.stats() if self.outbox else \
+            {'depth': 0, 'lag_seconds': 0.0, 'max_attempts': 0}
+        sync = self.sync_worker.stats() if self.sync_worker else {'running': False}
+        return {
+            'write_mode': self.write_mode,
+            'use_cosmos': self.use_cosmos,
+            'cache': self.get_cache_stats(),
+            'outbox': outbox,
+            'sync': sync,
+            'cosmos': cosmos_metrics.snapshot(),
+            'change_feed': self.change_feed.stats() if self.change_feed else {'running': False}
+        }
+    
+    def get_aggregates(self) -> Dict[str, Any]:
+        """
+        Dashboard aggregates: totals, counts and amounts by status and by day
+        and the fraud score histogram, maintained on every write
+        
+        Read from the same storage as the claim listings, so both agree.
+        """
+        cosmos = self.cosmos_service
+        if self._list_from_cloud(None) and getattr(cosmos, 'aggregates_container', None) is not None:
+            aggregates = cosmos.get_aggregates()
+            if aggregates is not None:
+                return dict(aggregates, source='cosmos')
+        return dict(self.local_service.get_aggregates(), source='local')
+    
+    def get_write_version(self, kind: str) -> Optional[str]:
+        """
+        Token that changes whenever the claims or the events served by reads change
+        
+        Taken from the local storage, which also sees cloud writes of other
+        instances while the change feed runs. Reads served straight from
+        Cosmos DB have no such token, so None is returned for them.
+        """
+        if self._list_from_cloud(None):
+            return None
+        return self.local_service.get_write_version(kind)
+    
+    def warm_up(self) -> None:
+        """Prepare the Cosmos DB client of this process before the first request"""
+        if self.use_cosmos and self.cosmos_service:
+            try:
+                self.cosmos_service.warm_up()
+            except Exception as e:
+                logger.error(f"Cosmos DB warm-up failed: {str(e)}")
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Cached health of the storages, without any I/O"""
+        if not (self.use_cosmos and self.cosmos_service):
+            return {'status': 'ok', 'cosmos': {'connected': False}}
+        cosmos = self.cosmos_service.get_health()
+        return {'status': 'ok' if cosmos.get('available') else 'degraded', 'cosmos': cosmos}
+    
+    def close(self) -> None:
+        """Stop the health probe, change feed and sync worker and close the outbox"""
+        if self.use_cosmos and self.cosmos_service:
+            self.cosmos_service.stop_health_probe()
+        if self.change_feed:
+            self.change_feed.stop()
+        if self.sync_worker:
+            self.sync_worker.stop()
+        if self.outbox:
+            self.outbox.close()
+    
+    def get_claim_history(self, claim_id: str) -> List[Dict[str, Any]]:
+        """List the stored revisions of a claim (kept in local storage only)"""
+        return self.local_service.get_claim_history(claim_id)
+    
+    def get_claim_at(self, claim_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Get a claim as it was at a given revision"""
+        claim = self.local_service.get_claim_at(claim_id, version)
+        return claim.to_dict() if isinstance(claim, Claim) else claim
+    
     def save_event(self, event: Union[Event, Dict[str, Any]]) -> str:
         """Save an event to both local and cloud storage"""
-        # Always save locally first
-        if isinstance(event, Dict):
-            event_obj = Event.from_dict(event)
-            event_id = self.local_service.save_event(event_obj)
-        else:
-            event_id = self.local_service.save_event(event)
+        result = self.save_event_with_result(event)
+        return result.entity_id if result.local_ok else ""
+    
+    def save_event_with_result(self, event: Union[Event, Dict[str, Any]]) -> WriteResult:
+        """Save an event to local and cloud storage, reporting both outcomes"""
+        event_obj = Event.from_dict(event) if isinstance(event, Dict) else event
+        event_dict = event if isinstance(event, Dict) else event.to_dict()
         
-        # Try to save to Cosmos DB if available
+        cloud_write = None
         if self.use_cosmos and self.cosmos_service:
+            cloud_write = lambda: self.cosmos_service.save_event(event_dict)
+        
+        result, _ = self._dual_write(
+            'event', event_obj.event_id,
+            lambda: self.local_service.save_event(event_obj), cloud_write, event_dict)
+        return result
+    
+    def save_events_bulk(self, events: List[Union[Event, Dict[str, Any]]]) -> List[WriteResult]:
+        """
+        Save many events to local and cloud storage
+        
+        Returns:
+            One WriteResult per event, in input order
+        """
+        start = time.monotonic()
+        results: List[Optional[WriteResult]] = [None] * len(events)
+        pending: List[Tuple[int, Event]] = []
+        for position, event in enumerate(events):
             try:
-                if isinstance(event, Event):
-                    event_dict = event.to_dict()
-                else:
-                    event_dict = event
-                    
-                cosmos_success = self.cosmos_service.save_event(event_dict)
-                
-                if cosmos_success:
-                    print(f"Event {event_id} saved to both local and cloud storage")
-                else:
-                    print(f"Event {event_id} saved locally only (cloud failed)")
+                pending.append((position, Event.from_dict(event) if isinstance(event, Dict) else event))
             except Exception as e:
-                print(f"Event {event_id} saved locally only (cloud error: {str(e)})")
+                results[position] = WriteResult(
+                    entity_id=str(event.get('event_id', '')) if isinstance(event, Dict) else '',
+                    local_ok=False, cloud_status='skipped',
+                    elapsed_ms=(time.monotonic() - start) * 1000, local_error=str(e))
         
-        return event_id
+        local_results = self.local_service.save_events_bulk([event_obj for _, event_obj in pending])
+        stored = []
+        for (position, event_obj), local_result in zip(pending, local_results):
+            if local_result.ok:
+                stored.append((position, event_obj.event_id, event_obj.to_dict()))
+            else:
+                results[position] = WriteResult(
+                    entity_id=event_obj.event_id, local_ok=False, cloud_status='skipped',
+                    elapsed_ms=(time.monotonic() - start) * 1000, local_error=local_result.error)
+        
+        cloud_bulk_write = None
+        if self.use_cosmos and self.cosmos_service:
+            cloud_bulk_write = self.cosmos_service.save_events_bulk
+        self._bulk_cloud_write('event', stored, cloud_bulk_write, results, start)
+        return results
     
     def list_events(self, entity_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
         """List events, optionally filtered by entity_id"""
-        if self.use_cosmos and self.cosmos_service:
+        if self._list_from_cloud(None):
             # Try to list from Cosmos DB first
             events = self.cosmos_service.list_events(entity_id, limit)
             if events:
@@ -156,3 +785,25 @@ class HybridDataService:
         # Fallback to local
         events = self.local_service.list_events(entity_id)
         return [event.to_dict() if isinstance(event, Event) else event for event in events]
+    
+    def list_events_page(self, entity_id: Optional[str] = None, limit: int = 100,
+                         cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of events, newest first, optionally filtered by entity_id
+        
+        Returns:
+            Tuple of the events and the next page's cursor (None on the last page)
+        """
+        state = self._decode_source_cursor(cursor)
+        source = state.get('source')
+        
+        if self._list_from_cloud(source):
+            events, token = self.cosmos_service.list_events_page(entity_id, limit, state.get('token'))
+            if events or source == 'cosmos':
+                return events, self._encode_source_cursor('cosmos', token)
+        elif source == 'cosmos':
+            return [], None
+        
+        events, token = self.local_service.list_events_page(entity_id, limit, state.get('token'))
+        return ([event.to_dict() if isinstance(event, Event) else event for event in events],
+                self._encode_source_cursor('local', token))
@@ -0,0 +1,397 @@
+"""
+Durable job queue and worker pool for processing submitted claims.
+
+A submission is recorded as a job in a small SQLite table, together with
+the raw claim, before the request returns; the work itself runs later in
+a pool of local worker threads. A job runs a fixed list of named stages in
+order (storing the claim, checking its evidence, ...). The stages a job
+completed are recorded as it goes, so a retry after a failure, or after a
+crash while the job was leased, resumes at the failed stage. Stages should
+therefore be safe to repeat. Failed stages are retried with exponential
+backoff up to a maximum number of attempts; errors listed as permanent
+(such as validation errors) fail the job at once.
+
+Queue depth and per-stage latency histograms are exposed by stats().
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Any, Optional, Tuple, Type
+import logging
+
+from .cosmos_metrics import Histogram, LATENCY_BUCKETS_MS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        stage_index INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result TEXT NOT NULL DEFAULT '{}',
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        next_attempt REAL NOT NULL,
+        lease_until REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status_next_attempt ON jobs(status, next_attempt)",
+)
+
+INSERT_JOB = """INSERT INTO jobs (job_id, kind, entity_id, payload, status, created_at, updated_at, next_attempt)
+    VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)"""
+# Take the next due job, or one whose worker's lease ran out, in one statement
+LEASE_NEXT = """UPDATE jobs SET status = 'running', lease_until = ?, updated_at = ?
+    WHERE job_id = (
+        SELECT job_id FROM jobs
+        WHERE (status = 'queued' AND next_attempt <= ?) OR (status = 'running' AND lease_until < ?)
+        ORDER BY next_attempt LIMIT 1)
+    RETURNING job_id, kind, entity_id, payload, stage_index, attempts, result"""
+ADVANCE = """UPDATE jobs SET stage_index = ?, result = ?, updated_at = ?, lease_until = ?
+    WHERE job_id = ? AND status = 'running'"""
+FINISH = """UPDATE jobs SET status = ?, last_error = ?, updated_at = ?, lease_until = NULL
+    WHERE job_id = ?"""
+RESCHEDULE = """UPDATE jobs SET status = 'queued', attempts = attempts + 1, last_error = ?,
+    next_attempt = ?, updated_at = ?, lease_until = NULL
+    WHERE job_id = ?"""
+SELECT_JOB = """SELECT job_id, kind, entity_id, status, stage_index, attempts, result, last_error,
+    created_at, updated_at FROM jobs WHERE job_id = ?"""
+SELECT_STATS = """SELECT status, COUNT(*), MIN(created_at) FROM jobs GROUP BY status"""
+PURGE = "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?"
+
+
+class JobQueue:
+    """SQLite-backed queue of processing jobs"""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the queue.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def enqueue(self, kind: str, entity_id: str, payload: Dict[str, Any]) -> str:
+        """
+        Record a job.
+
+        Args:
+            kind: Kind of job, e.g. 'claim'
+            entity_id: ID of the entity processed
+            payload: Input of the job
+
+        Returns:
+            str: ID of the job
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(INSERT_JOB, (job_id, kind, entity_id, json.dumps(payload), now, now, now))
+        return job_id
+
+    def lease(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Take the next due job for processing.
+
+        Args:
+            lease_seconds: Time after which the job is handed to another worker
+                if this one has not finished or extended it
+
+        Returns:
+            Optional[Dict[str, Any]]: The job, or None if none is due
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(LEASE_NEXT, (now + lease_seconds, now, now, now)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, entity_id, payload, stage_index, attempts, result = row
+        return {'job_id': job_id, 'kind': kind, 'entity_id': entity_id, 'payload': json.loads(payload),
+                'stage_index': stage_index, 'attempts': attempts, 'result': json.loads(result)}
+
+    def advance(self, job: Dict[str, Any], lease_seconds: float) -> None:
+        """Record the stages a job completed and its results, extending its lease"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(ADVANCE, (job['stage_index'], json.dumps(job['result']), now,
+                                         now + lease_seconds, job['job_id']))
+
+    def complete(self, job_id: str) -> None:
+        """Mark a job succeeded"""
+        with self._lock, self._conn:
+            self._conn.execute(FINISH, (SUCCEEDED, None, time.time(), job_id))
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job failed for good"""
+        with self._lock, self._conn:
+            self._conn.execute(FINISH, (FAILED, error[:500], time.time(), job_id))
+
+    def retry(self, job_id: str, error: str, retry_in: float) -> None:
+        """Queue a job again after a failed attempt"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(RESCHEDULE, (error[:500], now + retry_in, now, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, or None if there is no such job"""
+        with self._lock:
+            row = self._conn.execute(SELECT_JOB, (job_id,)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, entity_id, status, stage_index, attempts, result, last_error, created_at, updated_at = row
+        return {'job_id': job_id, 'kind': kind, 'entity_id': entity_id, 'status': status,
+                'stage_index': stage_index, 'attempts': attempts, 'result': json.loads(result),
+                'last_error': last_error, 'created_at': created_at, 'updated_at': updated_at}
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated more than older_than seconds ago"""
+        with self._lock, self._conn:
+            return self._conn.execute(PURGE, (time.time() - older_than,)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Jobs per status and the age of the oldest unfinished job"""
+        with self._lock:
+            rows = self._conn.execute(SELECT_STATS).fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        oldest = None
+        for status, count, created_at in rows:
+            counts[status] = count
+            if status in (QUEUED, RUNNING) and created_at is not None:
+                oldest = created_at if oldest is None else min(oldest, created_at)
+        return dict(counts, depth=counts[QUEUED] + counts[RUNNING],
+                    lag_seconds=time.time() - oldest if oldest is not None else 0.0)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class StageStats:
+    """Latency histogram and outcome counters of one stage"""
+
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._lock = threading.Lock()
+        self.counters = {'succeeded': 0, 'failed': 0}
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        self.latency_ms.observe(elapsed_ms)
+        with self._lock:
+            self.counters['succeeded' if ok else 'failed'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, latency_ms=self.latency_ms.snapshot())
+
+
+Stage = Tuple[str, Callable[[Dict[str, Any], Dict[str, Any]], Optional[Dict[str, Any]]]]
+
+
+class JobWorkerPool:
+    """Worker threads running the stages of queued jobs, with retries"""
+
+    def __init__(self, queue: JobQueue, stages: List[Stage], workers: int = 4,
+                 max_attempts: int = 5, base_backoff: float = 1.0, max_backoff: float = 60.0,
+                 lease_seconds: float = 300.0, interval: float = 0.5,
+                 permanent_errors: Tuple[Type[BaseException], ...] = (),
+                 retention_seconds: float = 86400.0,
+                 on_failure: Optional[Callable[[Dict[str, Any], str], None]] = None):
+        """
+        Create the pool (call start() to run it).
+
+        Args:
+            queue: Queue to take jobs from
+            stages: (name, handler) pairs run in order; a handler receives the
+                job payload and the results of the earlier stages and returns
+                its own result (a JSON-serializable dict) or None
+            workers: Number of worker threads
+            max_attempts: Attempts after which a failing job is marked failed
+            base_backoff: Delay before the first retry of a failed job
+            max_backoff: Upper bound on the retry delay
+            lease_seconds: Time a worker may hold a job before another takes it over
+            interval: Seconds between polls while the queue is idle
+            permanent_errors: Exception types that fail a job without retrying
+            retention_seconds: Age after which finished jobs are deleted
+            on_failure: Called with the job and its error once it has failed for
+                good, to undo what its payload holds on to
+        """
+        self.queue = queue
+        self.stages = list(stages)
+        self.stage_names = [name for name, _ in self.stages]
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.permanent_errors = permanent_errors
+        self.retention_seconds = retention_seconds
+        self.on_failure = on_failure
+
+        self.stage_stats = {name: StageStats() for name in self.stage_names}
+        self.job_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._wakeup = threading.Condition()
+        self._pending_wakeups = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._threads_lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        """Start the worker threads that are not running"""
+        with self._threads_lock:
+            self._stop.clear()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, entity_id: str, payload: Dict[str, Any]) -> str:
+        """
+        Queue a job and wake a worker, starting the pool on first use.
+
+        Returns:
+            str: ID of the job
+        """
+        job_id = self.queue.enqueue(kind, entity_id, payload)
+        self.start()
+        with self._wakeup:
+            self._pending_wakeups += 1
+            self._wakeup.notify()
+        return job_id
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker threads after their current job"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        with self._threads_lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _backoff(self, attempts: int) -> float:
+        """Retry delay after `attempts` failures, with jitter"""
+        delay = min(self.base_backoff * (2 ** attempts), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def process(self, job: Dict[str, Any]) -> bool:
+        """
+        Run the remaining stages of a leased job.
+
+        Returns:
+            bool: True if the job finished all its stages
+        """
+        started = time.perf_counter()
+        while job['stage_index'] < len(self.stages):
+            name, handler = self.stages[job['stage_index']]
+            stage_started = time.perf_counter()
+            try:
+                result = handler(job['payload'], job['result'])
+            except Exception as e:
+                self.stage_stats[name].record((time.perf_counter() - stage_started) * 1000, False)
+                error = f"{name}: {getattr(e, 'message', None) or str(e)}"
+                if isinstance(e, self.permanent_errors) or job['attempts'] + 1 >= self.max_attempts:
+                    # Before the job shows as failed, so its status means the cleanup ran
+                    if self.on_failure is not None:
+                        try:
+                            self.on_failure(job, error)
+                        except Exception as cleanup_error:
+                            logger.error(f"Cleanup of failed job {job['job_id']} failed: {str(cleanup_error)}")
+                    self.queue.fail(job['job_id'], error)
+                    logger.error(f"Job {job['job_id']} failed: {error}")
+                else:
+                    self.queue.retry(job['job_id'], error, self._backoff(job['attempts']))
+                    logger.warning(f"Job {job['job_id']} attempt {job['attempts'] + 1} failed: {error}")
+                return False
+
+            self.stage_stats[name].record((time.perf_counter() - stage_started) * 1000, True)
+            if result is not None:
+                job['result'][name] = result
+            job['stage_index'] += 1
+            self.queue.advance(job, self.lease_seconds)
+
+        self.queue.complete(job['job_id'])
+        self.job_latency_ms.observe((time.perf_counter() - started) * 1000)
+        return True
+
+    def run_once(self) -> bool:
+        """
+        Process the next due job, if any.
+
+        Returns:
+            bool: True if a job was processed, whatever its outcome
+        """
+        job = self.queue.lease(self.lease_seconds)
+        if job is None:
+            return False
+        self.process(job)
+        return True
+
+    def _run(self) -> None:
+        """Worker loop"""
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+                if time.time() - self._last_purge > self.retention_seconds / 24:
+                    self._last_purge = time.time()
+                    self.queue.purge(self.retention_seconds)
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+            with self._wakeup:
+                if not self._pending_wakeups:
+                    self._wakeup.wait(self.interval)
+                self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, with its stages and which of them completed"""
+        job = self.queue.get(job_id)
+        if job is None:
+            return None
+        stage_index = job.pop('stage_index')
+        job['stages'] = [{'name': name, 'done': index < stage_index}
+                         for index, name in enumerate(self.stage_names)]
+        job['stage'] = self.stage_names[stage_index] if stage_index < len(self.stage_names) else None
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth by status, worker count and latency per stage and per job"""
+        with self._threads_lock:
+            running = sum(thread.is_alive() for thread in self._threads)
+        return {
+            'queue': self.queue.stats(),
+            'workers': running,
+            'stages': {name: stats.snapshot() for name, stats in self.stage_stats.items()},
+            'job_latency_ms': self.job_latency_ms.snapshot()
+        }
+
+    def close(self) -> None:
+        """Stop the workers and close the queue"""
+        self.stop()
+        self.queue.close()
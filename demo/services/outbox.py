@@ -0,0 +1,272 @@
+"""
+Durable outbox for cloud writes that failed or were deferred.
+
+Every cloud write that could not be confirmed is recorded in a small SQLite
+table keyed by entity, so later writes of the same claim replace the
+pending one instead of queueing behind it. A background worker replays
+due entries in batches with exponential backoff. Replays are upserts or
+deletes, so repeating one is harmless.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS outbox (
+        key TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        op TEXT NOT NULL,
+        payload TEXT,
+        rev INTEGER NOT NULL DEFAULT 1,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        enqueued_at REAL NOT NULL,
+        next_attempt REAL NOT NULL,
+        last_error TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox(next_attempt)",
+)
+
+# A newer write for the same entity replaces the pending payload but keeps
+# the original enqueue time, so lag reflects how long the entity has been stale
+ENQUEUE = """INSERT INTO outbox (key, kind, entity_id, op, payload, enqueued_at, next_attempt)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        op = excluded.op, payload = excluded.payload, rev = outbox.rev + 1,
+        attempts = 0, next_attempt = excluded.next_attempt, last_error = NULL"""
+SELECT_DUE = """SELECT key, kind, entity_id, op, payload, rev, attempts FROM outbox
+    WHERE next_attempt <= ? ORDER BY next_attempt LIMIT ?"""
+DELETE_DONE = "DELETE FROM outbox WHERE key = ? AND rev = ?"
+RESCHEDULE = """UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ?
+    WHERE key = ? AND rev = ?"""
+RELEASE = "UPDATE outbox SET next_attempt = ? WHERE key = ?"
+SELECT_PENDING = "SELECT 1 FROM outbox WHERE key = ?"
+SELECT_STATS = "SELECT COUNT(*), MIN(enqueued_at), MAX(attempts) FROM outbox"
+
+
+def outbox_key(kind: str, entity_id: str) -> str:
+    """Key under which writes of one entity are coalesced"""
+    return f"{kind}:{entity_id}"
+
+
+class CloudOutbox:
+    """SQLite-backed queue of pending cloud writes, coalesced per entity"""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the outbox.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def enqueue(self, kind: str, entity_id: str, op: str,
+                payload: Optional[Dict[str, Any]] = None, delay: float = 0.0) -> None:
+        """
+        Record a cloud write to replay.
+
+        Args:
+            kind: 'claim' or 'event'
+            entity_id: ID of the entity
+            op: 'upsert' or 'delete'
+            payload: Document to upsert
+            delay: Seconds before the entry becomes due
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(ENQUEUE, (
+                outbox_key(kind, entity_id), kind, entity_id, op,
+                json.dumps(payload) if payload is not None else None, now, now + delay))
+
+    def enqueue_many(self, kind: str, entries: List[Tuple[str, Optional[Dict[str, Any]]]],
+                     op: str = 'upsert', delay: float = 0.0) -> None:
+        """
+        Record many cloud writes of one kind in a single transaction.
+
+        Args:
+            kind: 'claim' or 'event'
+            entries: (entity_id, payload) pairs
+            op: 'upsert' or 'delete'
+            delay: Seconds before the entries become due
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(ENQUEUE, [
+                (outbox_key(kind, entity_id), kind, entity_id, op,
+                 json.dumps(payload) if payload is not None else None, now, now + delay)
+                for entity_id, payload in entries])
+
+    def release(self, kind: str, entity_id: str) -> None:
+        """Make a delayed entry due immediately"""
+        with self._lock, self._conn:
+            self._conn.execute(RELEASE, (time.time(), outbox_key(kind, entity_id)))
+
+    def is_pending(self, kind: str, entity_id: str) -> bool:
+        """Check whether an entity has a write waiting to be replayed"""
+        with self._lock:
+            return self._conn.execute(SELECT_PENDING, (outbox_key(kind, entity_id),)).fetchone() is not None
+
+    def due(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return up to `limit` entries whose next attempt time has passed"""
+        with self._lock:
+            rows = self._conn.execute(SELECT_DUE, (time.time(), limit)).fetchall()
+        return [{
+            'key': key, 'kind': kind, 'entity_id': entity_id, 'op': op,
+            'payload': json.loads(payload) if payload is not None else None,
+            'rev': rev, 'attempts': attempts
+        } for key, kind, entity_id, op, payload, rev, attempts in rows]
+
+    def mark_done(self, entry: Dict[str, Any]) -> bool:
+        """
+        Remove a replayed entry.
+
+        Returns:
+            bool: False if a newer write replaced the entry in the meantime,
+            in which case it stays queued
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(DELETE_DONE, (entry['key'], entry['rev'])).rowcount > 0
+
+    def mark_failed(self, entry: Dict[str, Any], error: str, retry_in: float) -> None:
+        """Schedule another attempt for an entry"""
+        with self._lock, self._conn:
+            self._conn.execute(RESCHEDULE, (time.time() + retry_in, error[:500],
+                                            entry['key'], entry['rev']))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and the age of the oldest pending write"""
+        with self._lock:
+            depth, oldest, max_attempts = self._conn.execute(SELECT_STATS).fetchone()
+        return {
+            'depth': depth,
+            'lag_seconds': time.time() - oldest if oldest is not None else 0.0,
+            'max_attempts': max_attempts or 0
+        }
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class CloudSyncWorker:
+    """Background thread that replays outbox entries with exponential backoff"""
+
+    def __init__(self, outbox: CloudOutbox, appliers: Dict[str, Callable[[Dict[str, Any]], bool]],
+                 batch_size: int = 100, interval: float = 1.0,
+                 base_backoff: float = 1.0, max_backoff: float = 300.0):
+        """
+        Create the worker (call start() to run it).
+
+        Args:
+            outbox: Outbox to drain
+            appliers: Map of "<kind>:<op>" to a callable that performs the cloud
+                write for an entry and returns True on success
+            batch_size: Maximum entries replayed per pass
+            interval: Seconds between passes when the outbox is idle
+            base_backoff: Delay before the first retry of a failed entry
+            max_backoff: Upper bound on the retry delay
+        """
+        self.outbox = outbox
+        self.appliers = appliers
+        self.batch_size = batch_size
+        self.interval = interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'replayed': 0, 'failed_attempts': 0, 'superseded': 0,
+                       'last_success_time': None, 'last_error': None}
+
+    def start(self) -> None:
+        """Start the background thread if it is not running"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='cloud-sync', daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        """Ask the worker to run a pass now"""
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _backoff(self, attempts: int) -> float:
+        """Retry delay after `attempts` failures, with jitter"""
+        delay = min(self.base_backoff * (2 ** attempts), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def run_once(self) -> int:
+        """
+        Replay one batch of due entries.
+
+        Returns:
+            int: Number of entries replayed successfully
+        """
+        replayed = 0
+        for entry in self.outbox.due(self.batch_size):
+            applier = self.appliers.get(f"{entry['kind']}:{entry['op']}")
+            error = None
+            try:
+                if applier is None:
+                    raise ValueError(f"No applier for {entry['kind']}:{entry['op']}")
+                ok = applier(entry)
+            except Exception as e:
+                ok, error = False, str(e)
+
+            with self._stats_lock:
+                if ok:
+                    if self.outbox.mark_done(entry):
+                        self._stats['replayed'] += 1
+                        replayed += 1
+                    else:
+                        self._stats['superseded'] += 1
+                    self._stats['last_success_time'] = time.time()
+                else:
+                    error = error or 'cloud write returned failure'
+                    self.outbox.mark_failed(entry, error, self._backoff(entry['attempts']))
+                    self._stats['failed_attempts'] += 1
+                    self._stats['last_error'] = error
+                    logger.warning(f"Replay of {entry['key']} failed "
+                                   f"(attempt {entry['attempts'] + 1}): {error}")
+        return replayed
+
+    def _run(self) -> None:
+        """Background loop"""
+        while not self._stop.is_set():
+            try:
+                if self.run_once() >= self.batch_size:
+                    continue  # more work is probably due
+            except Exception as e:
+                logger.error(f"Error replaying outbox: {str(e)}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Replay counters"""
+        with self._stats_lock:
+            return dict(self._stats, running=self._thread is not None and self._thread.is_alive())
@@ -0,0 +1,631 @@
+"""
+Segmented append-only claim storage for the insurance fraud detection system.
+
+Claims are appended as JSON lines to size-capped segment files instead of
+one file per claim. An in-memory index maps each claim_id to the segment
+and byte offset of its latest record, so reads are a single positioned
+read. Listing summaries of the live claims are kept in memory, so summary
+listings need no reads at all. Sealed segments are compacted in the background to drop superseded
+records and tombstones.
+
+The engine supports a single writer process per segments directory. A store
+takes an exclusive lock on the directory when it is opened, so a second
+process (another app worker, or the maintenance commands below while the
+app runs) fails with SegmentStoreLockedError instead of corrupting it.
+
+Usage (from the demo directory, with the app stopped):
+    python -m services.segment_service migrate [--claims-dir DIR] [--remove-source]
+    python -m services.segment_service compact
+"""
+import argparse
+import bisect
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Any, Optional, NamedTuple, Tuple
+import logging
+
+from models import claim_summary
+from utils.pagination import keyset_page
+from .data_service import LocalDataService
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = '.lock'
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+
+
+class SegmentStoreLockedError(RuntimeError):
+    """Raised when a segments directory is already open in another process"""
+    pass
+
+
+class _Location(NamedTuple):
+    """Position of the latest record for a key"""
+    segment_id: int
+    offset: int
+    length: int
+    seq: int
+    sort_keys: Tuple[str, ...]
+
+
+class SegmentLogStore:
+    """Append-only key/document store backed by size-capped segment files"""
+
+    def __init__(self, directory: str, max_segment_bytes: int = 4 * 1024 * 1024,
+                 compaction_min_segments: int = 4, compaction_garbage_ratio: float = 0.5,
+                 compaction_interval: float = 30.0, fsync: bool = False,
+                 sort_fields: Tuple[str, ...] = ('submission_time', 'updated_time'),
+                 background: bool = True,
+                 summarize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        Open (or create) a segment store.
+
+        Args:
+            directory: Directory holding the segment files
+            max_segment_bytes: Size at which the active segment is sealed
+            compaction_min_segments: Sealed segments required before compacting
+            compaction_garbage_ratio: Fraction of dead bytes that triggers compaction
+            compaction_interval: Seconds between background compaction checks
+            fsync: Whether to fsync the active segment after every append
+            sort_fields: Document fields that listings can be ordered by
+            background: Whether to run the background compactor thread
+            summarize: Builds the in-memory summary of a document, or None to keep none
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.compaction_min_segments = compaction_min_segments
+        self.compaction_garbage_ratio = compaction_garbage_ratio
+        self.compaction_interval = compaction_interval
+        self.fsync = fsync
+        self.sort_fields = tuple(sort_fields)
+        self.summarize = summarize
+
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._index: Dict[str, _Location] = {}
+        self._sorted: List[List[Tuple[str, str]]] = [[] for _ in self.sort_fields]
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._fds: Dict[int, int] = {}
+        self._segment_sizes: Dict[int, int] = {}
+        self._live_bytes: Dict[int, int] = {}
+        self._seq = 0
+        self._next_segment_id = 1
+        self._active_id = 0
+        self._active_file = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_directory()
+        try:
+            self._load()
+        except BaseException:
+            self._lock_file.close()
+            raise
+
+        self._compactor = None
+        if background:
+            self._compactor = threading.Thread(target=self._compaction_loop,
+                                               name='segment-compactor', daemon=True)
+            self._compactor.start()
+
+    # Opening and recovery
+
+    def _acquire_directory(self):
+        """Take the exclusive writer lock of the directory, without waiting"""
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.seek(0)
+                owner = lock_file.read().strip() or 'unknown'
+                lock_file.close()
+                raise SegmentStoreLockedError(
+                    f"Segment store {self.directory} is already open in process {owner}; "
+                    f"the segment engine allows one process per directory")
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        return lock_file
+
+    def _segment_path(self, segment_id: int) -> str:
+        """Path of a segment file"""
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment_id:08d}{SEGMENT_SUFFIX}")
+
+    def _segment_ids(self) -> List[int]:
+        """Ids of the segment files present on disk, ascending"""
+        ids = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    ids.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(ids)
+
+    def _load(self) -> None:
+        """Rebuild the index by scanning every segment"""
+        segment_ids = self._segment_ids()
+        for segment_id in segment_ids:
+            self._scan_segment(segment_id, truncate_tail=(segment_id == segment_ids[-1]))
+
+        # Drop keys whose latest record is a tombstone
+        self._index = {key: loc for key, loc in self._index.items() if loc.length > 0}
+        for key, loc in self._index.items():
+            self._live_bytes[loc.segment_id] = self._live_bytes.get(loc.segment_id, 0) + loc.length
+            for position, value in enumerate(loc.sort_keys):
+                self._sorted[position].append((value, key))
+        for keys in self._sorted:
+            keys.sort()
+
+        if segment_ids:
+            self._next_segment_id = segment_ids[-1] + 1
+            self._open_active(segment_ids[-1])
+        else:
+            self._roll_segment()
+
+        logger.info(f"Segment store opened at {self.directory}: "
+                    f"{len(self._index)} keys in {len(self._segment_sizes)} segments")
+
+    def _scan_segment(self, segment_id: int, truncate_tail: bool) -> None:
+        """Read every record of a segment into the index"""
+        path = self._segment_path(segment_id)
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    if truncate_tail:
+                        logger.warning(f"Truncating torn record at {path}:{offset}")
+                        break
+                    logger.error(f"Skipping corrupt record at {path}:{offset}")
+                    offset += len(line)
+                    continue
+
+                seq = record.get('seq', 0)
+                key = record.get('key')
+                current = self._index.get(key)
+                if current is None or seq >= current.seq:
+                    if record.get('op') == 'del':
+                        # Zero length marks a tombstone until loading finishes
+                        self._index[key] = _Location(segment_id, offset, 0, seq, ())
+                        self._summaries.pop(key, None)
+                    else:
+                        self._index[key] = _Location(segment_id, offset, len(line), seq,
+                                                     self._sort_keys(record.get('doc')))
+                        self._set_summary(key, record.get('doc'))
+                self._seq = max(self._seq, seq)
+                offset += len(line)
+
+        if truncate_tail and offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._segment_sizes[segment_id] = offset
+
+    def _open_active(self, segment_id: int) -> None:
+        """Make a segment the append target"""
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active_id = segment_id
+        self._active_file = open(self._segment_path(segment_id), 'ab')
+        self._segment_sizes.setdefault(segment_id, self._active_file.tell())
+
+    def _roll_segment(self) -> None:
+        """Seal the active segment and start a new one"""
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        self._open_active(segment_id)
+        if len(self._sealed_ids()) >= self.compaction_min_segments:
+            self._wakeup.set()
+
+    def _sealed_ids(self) -> List[int]:
+        """Ids of the segments that no longer receive appends"""
+        return sorted(sid for sid in self._segment_sizes if sid != self._active_id)
+
+    def _fd(self, segment_id: int) -> int:
+        """Cached read descriptor for a segment"""
+        fd = self._fds.get(segment_id)
+        if fd is None:
+            fd = os.open(self._segment_path(segment_id), os.O_RDONLY)
+            self._fds[segment_id] = fd
+        return fd
+
+    # Reads and writes
+
+    def _append(self, record: Dict[str, Any]) -> _Location:
+        """Append a record to the active segment (lock must be held)"""
+        self._seq += 1
+        record['seq'] = self._seq
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+        if self._segment_sizes[self._active_id] and \
+                self._segment_sizes[self._active_id] + len(line) > self.max_segment_bytes:
+            self._roll_segment()
+
+        offset = self._segment_sizes[self._active_id]
+        self._active_file.write(line)
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+        self._segment_sizes[self._active_id] = offset + len(line)
+
+        return _Location(self._active_id, offset, len(line), self._seq,
+                         self._sort_keys(record.get('doc')))
+
+    def _sort_keys(self, doc: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+        """Extract the listing sort keys from a document"""
+        doc = doc or {}
+        return tuple(str(doc.get(field) or '') for field in self.sort_fields)
+
+    def _replace_location(self, key: str, location: Optional[_Location]) -> None:
+        """Point a key at a new record and update live byte accounting"""
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self._live_bytes[previous.segment_id] -= previous.length
+            for position, value in enumerate(previous.sort_keys):
+                keys = self._sorted[position]
+                index = bisect.bisect_left(keys, (value, key))
+                if index < len(keys) and keys[index] == (value, key):
+                    del keys[index]
+        if location is not None:
+            self._index[key] = location
+            self._live_bytes[location.segment_id] = \
+                self._live_bytes.get(location.segment_id, 0) + location.length
+            for position, value in enumerate(location.sort_keys):
+                bisect.insort(self._sorted[position], (value, key))
+
+    def _set_summary(self, key: str, doc: Optional[Dict[str, Any]]) -> None:
+        """Remember the summary of a key's latest document (lock must be held)"""
+        if self.summarize is not None:
+            self._summaries[key] = self.summarize(doc or {})
+
+    def put(self, key: str, doc: Dict[str, Any]) -> None:
+        """Store a document under a key, superseding any previous version"""
+        with self._lock:
+            location = self._append({'op': 'put', 'key': key, 'doc': doc})
+            self._replace_location(key, location)
+            self._set_summary(key, doc)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the latest document for a key, or None"""
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            return self._read_record(location)['doc']
+
+    def get_summary(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the summary of a key's latest document without reading any segment"""
+        with self._lock:
+            summary = self._summaries.get(key)
+            return dict(summary) if summary is not None else None
+
+    def delete(self, key: str) -> bool:
+        """Remove a key, returning False if it was not present"""
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._append({'op': 'del', 'key': key})
+            self._replace_location(key, None)
+            self._summaries.pop(key, None)
+            return True
+
+    def contains(self, key: str) -> bool:
+        """Check whether a key is present"""
+        with self._lock:
+            return key in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def list(self, limit: int = 100, offset: int = 0, sort_by: Optional[str] = None,
+             after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Return a page of documents ordered by a sort field, newest first.
+
+        Args:
+            limit: Maximum number of documents to return
+            offset: Number of documents to skip
+            sort_by: One of sort_fields (defaults to the first)
+            after: Only return documents ordered after this (sort value, key) pair
+        """
+        position = self.sort_fields.index(sort_by) if sort_by else 0
+        with self._lock:
+            page = keyset_page(self._sorted[position], limit, offset, after)
+            return [self._read_record(self._index[key])['doc'] for _, key in page]
+
+    def list_summaries(self, limit: int = 100, offset: int = 0, sort_by: Optional[str] = None,
+                       after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Return a page of document summaries without reading any segment.
+
+        Takes the same arguments as list(); requires a summarize function.
+        """
+        if self.summarize is None:
+            raise ValueError("Store was opened without a summarize function")
+        position = self.sort_fields.index(sort_by) if sort_by else 0
+        with self._lock:
+            page = keyset_page(self._sorted[position], limit, offset, after)
+            return [dict(self._summaries[key]) for _, key in page]
+
+    def _read_record(self, location: _Location) -> Dict[str, Any]:
+        """Read one record with a positioned read (lock must be held)"""
+        data = os.pread(self._fd(location.segment_id), location.length, location.offset)
+        return json.loads(data)
+
+    # Compaction
+
+    def garbage_ratio(self) -> float:
+        """Fraction of sealed segment bytes that no longer back a live key"""
+        with self._lock:
+            sealed = self._sealed_ids()
+            total = sum(self._segment_sizes[sid] for sid in sealed)
+            if not total:
+                return 0.0
+            live = sum(self._live_bytes.get(sid, 0) for sid in sealed)
+            return 1.0 - live / total
+
+    def should_compact(self) -> bool:
+        """Check whether sealed segments are worth rewriting"""
+        with self._lock:
+            sealed_count = len(self._sealed_ids())
+        return sealed_count >= self.compaction_min_segments and \
+            self.garbage_ratio() >= self.compaction_garbage_ratio
+
+    def compact(self) -> int:
+        """
+        Rewrite all sealed segments keeping only live records.
+
+        Appends continue while the rewrite runs; records overwritten in the
+        meantime are left behind as garbage for the next pass. Inputs are
+        removed oldest first, and because every record carries a sequence
+        number, a crash part-way leaves duplicates that resolve on reload.
+
+        Returns:
+            int: Number of segment files removed
+        """
+        with self._compaction_lock:
+            with self._lock:
+                inputs = self._sealed_ids()
+                if not inputs:
+                    return 0
+                input_set = set(inputs)
+                snapshot = {key: loc for key, loc in self._index.items()
+                            if loc.segment_id in input_set}
+
+            # Copy live records into fresh segments outside the write lock
+            moved: Dict[str, tuple] = {}
+            outputs: List[int] = []
+            in_file = None
+            out_file = None
+            out_size = 0
+            try:
+                for key, loc in sorted(snapshot.items(),
+                                       key=lambda item: (item[1].segment_id, item[1].offset)):
+                    if in_file is None or in_file.name != self._segment_path(loc.segment_id):
+                        if in_file is not None:
+                            in_file.close()
+                        in_file = open(self._segment_path(loc.segment_id), 'rb')
+                    in_file.seek(loc.offset)
+                    line = in_file.read(loc.length)
+                    if out_file is None or out_size + len(line) > self.max_segment_bytes:
+                        if out_file is not None:
+                            out_file.flush()
+                            os.fsync(out_file.fileno())
+                            out_file.close()
+                        with self._lock:
+                            segment_id = self._next_segment_id
+                            self._next_segment_id += 1
+                        outputs.append(segment_id)
+                        out_file = open(self._segment_path(segment_id), 'wb')
+                        out_size = 0
+                    out_file.write(line)
+                    moved[key] = (loc, _Location(outputs[-1], out_size, loc.length,
+                                                 loc.seq, loc.sort_keys))
+                    out_size += len(line)
+                if out_file is not None:
+                    out_file.flush()
+                    os.fsync(out_file.fileno())
+            finally:
+                if in_file is not None:
+                    in_file.close()
+                if out_file is not None:
+                    out_file.close()
+
+            # Swap index entries that were not overwritten during the copy
+            with self._lock:
+                for segment_id in outputs:
+                    self._segment_sizes[segment_id] = os.path.getsize(self._segment_path(segment_id))
+                    self._live_bytes.setdefault(segment_id, 0)
+                for key, (old, new) in moved.items():
+                    if self._index.get(key) == old:
+                        self._replace_location(key, new)
+                for segment_id in inputs:
+                    fd = self._fds.pop(segment_id, None)
+                    if fd is not None:
+                        os.close(fd)
+                    os.remove(self._segment_path(segment_id))
+                    self._segment_sizes.pop(segment_id, None)
+                    self._live_bytes.pop(segment_id, None)
+
+            logger.info(f"Compacted {len(inputs)} segments into {len(outputs)} "
+                        f"({len(moved)} live records)")
+            return len(inputs)
+
+    def _compaction_loop(self) -> None:
+        """Background thread that compacts when thresholds are met"""
+        while not self._stop.is_set():
+            self._wakeup.wait(self.compaction_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                if self.should_compact():
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Segment compaction failed: {str(e)}")
+
+    def close(self) -> None:
+        """Stop the compactor and release file handles"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            if not self._lock_file.closed:
+                self._lock_file.close()
+
+
+class SegmentedDataService(LocalDataService):
+    """LocalDataService variant that keeps claims in an append-only segment log"""
+
+    def __init__(self):
+        """Initialize the data service and open the segment store"""
+        super().__init__()
+        self.segments_dir = self.config.get('storage.segments_dir', 'claims_segments')
+        try:
+            self.store = SegmentLogStore(
+                self.segments_dir,
+                max_segment_bytes=self.config.get('storage.segment_max_bytes', 4 * 1024 * 1024),
+                compaction_min_segments=self.config.get('storage.compaction_min_segments', 4),
+                compaction_garbage_ratio=self.config.get('storage.compaction_garbage_ratio', 0.5),
+                fsync=self.config.get('storage.segment_fsync', False),
+                summarize=claim_summary
+            )
+        except SegmentStoreLockedError:
+            # Stop the event writer started by LocalDataService
+            super().close()
+            raise
+        logger.info(f"SegmentedDataService initialized with segments directory: {self.segments_dir}")
+
+    def _write_claim_record(self, claim_id: str, claim_data: Dict[str, Any]) -> None:
+        """Append a claim document to the log"""
+        self.store.put(claim_id, claim_data)
+
+    def _read_claim_record(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Read the latest claim document from the log"""
+        return self.store.get(claim_id)
+
+    def _delete_claim_record(self, claim_id: str) -> bool:
+        """Append a tombstone for a claim"""
+        return self.store.delete(claim_id)
+
+    def _read_claim_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Read a claim summary from memory"""
+        return self.store.get_summary(claim_id)
+
+    def _aggregates_path(self) -> str:
+        """Aggregates journal kept with the segments"""
+        return os.path.join(self.segments_dir, 'aggregates.jsonl')
+
+    def _write_version_path(self, kind: str) -> str:
+        """Claims write version kept with the segments; events stay in the events directory"""
+        if kind == 'claims':
+            return os.path.join(self.segments_dir, 'claims.version')
+        return super()._write_version_path(kind)
+
+    def _list_claim_records(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                            after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Read a page of claims ordered by submission or update time"""
+        return self.store.list(limit, offset, sort_by, after)
+
+    def _list_claim_summaries(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                              after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Read a page of claim summaries from memory"""
+        return self.store.list_summaries(limit, offset, sort_by, after)
+
+    def migrate_from_files(self, claims_dir: Optional[str] = None,
+                           remove_source: bool = False) -> int:
+        """
+        Import claims from the one-file-per-claim layout.
+
+        Claims already present in the log are skipped, so the migration can
+        be re-run safely. Documents are copied verbatim; no events are logged.
+
+        Args:
+            claims_dir: Directory of per-claim JSON files (defaults to storage.claims_dir)
+            remove_source: Delete each source file once it has been imported
+
+        Returns:
+            int: Number of claims imported
+        """
+        claims_dir = claims_dir or self.claims_dir
+        imported = 0
+        for file_name in sorted(os.listdir(claims_dir)):
+            if not file_name.endswith('.json') or file_name.startswith('.'):
+                continue
+            file_path = os.path.join(claims_dir, file_name)
+            try:
+                with open(file_path, 'r') as f:
+                    claim_data = json.load(f)
+                claim_id = claim_data.get('claim_id') or file_name[:-len('.json')]
+                if not self.store.contains(claim_id):
+                    self.store.put(claim_id, claim_data)
+                    imported += 1
+                if remove_source:
+                    os.remove(file_path)
+            except Exception as e:
+                logger.error(f"Error migrating claim from {file_name}: {str(e)}")
+
+        logger.info(f"Migrated {imported} claims from {claims_dir} into {self.segments_dir}")
+        if imported:
+            self.rebuild_aggregates()
+        return imported
+
+    def close(self) -> None:
+        """Flush events and release the segment store"""
+        super().close()
+        self.store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for segment store maintenance"""
+    parser = argparse.ArgumentParser(description="Segmented claim store maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Import per-file claims into the segment log")
+    migrate.add_argument('--claims-dir', default=None, help="Source directory of claim JSON files")
+    migrate.add_argument('--remove-source', action='store_true',
+                         help="Delete source files after importing them")
+
+    subparsers.add_parser('compact', help="Compact sealed segments now")
+
+    args = parser.parse_args(argv)
+    try:
+        service = SegmentedDataService()
+    except SegmentStoreLockedError as e:
+        print(f"{e}; stop the app before running maintenance commands")
+        return 1
+    try:
+        if args.command == 'migrate':
+            count = service.migrate_from_files(args.claims_dir, remove_source=args.remove_source)
+            print(f"Imported {count} claims")
+        elif args.command == 'compact':
+            removed = service.store.compact()
+            print(f"Compacted {removed} segments")
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,446 @@
+"""
+SQLite storage for the insurance fraud detection system.
+
+Claims and events live in a single SQLite database in WAL mode, so several
+worker processes can read while one of them writes, and listings and range
+queries are answered from indexes instead of by opening claim files. The
+listing summary of each claim is stored in columns next to the document,
+so summary listings never parse the JSON. Each
+thread (and each forked process) uses its own connection; statements are
+parameterized and reused from the connection's statement cache.
+
+The engine keeps no event files. Events written by the file engine are
+imported into the events table when the service starts, so switching
+engines keeps the event history.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from models import Claim
+from .data_service import LocalDataService
+from .event_store import EntityEventStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS claims (
+        claim_id TEXT PRIMARY KEY,
+        submission_time TEXT NOT NULL DEFAULT '',
+        updated_time TEXT NOT NULL DEFAULT '',
+        status TEXT,
+        fraud_score REAL,
+        claim_amount REAL,
+        files_count INTEGER NOT NULL DEFAULT 0,
+        doc TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_claims_submission_time ON claims(submission_time, claim_id)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_updated_time ON claims(updated_time, claim_id)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_status ON claims(status, submission_time)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_fraud_score ON claims(fraud_score)",
+    """CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_id TEXT NOT NULL,
+        entity_id TEXT NOT NULL DEFAULT '',
+        event_type TEXT,
+        timestamp TEXT,
+        doc TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_events_entity_id ON events(entity_id, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_events_event_id ON events(event_id)",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+)
+
+UPSERT_CLAIM = """INSERT OR REPLACE INTO claims
+    (claim_id, submission_time, updated_time, status, fraud_score, claim_amount, files_count, doc)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_CLAIM_IF_ABSENT = UPSERT_CLAIM.replace("INSERT OR REPLACE", "INSERT OR IGNORE", 1)
+SELECT_CLAIM = "SELECT doc FROM claims WHERE claim_id = ?"
+DELETE_CLAIM = "DELETE FROM claims WHERE claim_id = ?"
+INSERT_EVENT = """INSERT INTO events (event_id, entity_id, event_type, timestamp, doc)
+    VALUES (?, ?, ?, ?, ?)"""
+INSERT_EVENT_IF_ABSENT = """INSERT INTO events (event_id, entity_id, event_type, timestamp, doc)
+    SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM events WHERE event_id = ?)"""
+SELECT_META = "SELECT value FROM meta WHERE key = ?"
+UPSERT_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+SELECT_RECENT_EVENTS = "SELECT seq, doc FROM events WHERE seq < ? ORDER BY seq DESC LIMIT ?"
+SELECT_ENTITY_EVENTS = """SELECT seq, doc FROM events WHERE entity_id = ? AND seq < ?
+    ORDER BY seq DESC LIMIT ?"""
+
+MAX_SEQ = 2 ** 63 - 1
+
+# Sort fields map to fixed ORDER BY clauses so user input never reaches the SQL text
+LIST_CLAIMS = {
+    'submission_time': "SELECT doc FROM claims ORDER BY submission_time DESC, claim_id DESC LIMIT ? OFFSET ?",
+    'updated_time': "SELECT doc FROM claims ORDER BY updated_time DESC, claim_id DESC LIMIT ? OFFSET ?",
+}
+SUMMARY_COLUMNS = "claim_id, claim_amount, submission_time, updated_time, status, fraud_score, files_count"
+LIST_SUMMARIES = {
+    'submission_time': f"""SELECT {SUMMARY_COLUMNS} FROM claims
+        ORDER BY submission_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+    'updated_time': f"""SELECT {SUMMARY_COLUMNS} FROM claims
+        ORDER BY updated_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+}
+LIST_SUMMARIES_AFTER = {
+    'submission_time': f"""SELECT {SUMMARY_COLUMNS} FROM claims WHERE (submission_time, claim_id) < (?, ?)
+        ORDER BY submission_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+    'updated_time': f"""SELECT {SUMMARY_COLUMNS} FROM claims WHERE (updated_time, claim_id) < (?, ?)
+        ORDER BY updated_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+}
+SELECT_SUMMARY = f"SELECT {SUMMARY_COLUMNS} FROM claims WHERE claim_id = ?"
+LIST_CLAIMS_AFTER = {
+    'submission_time': """SELECT doc FROM claims WHERE (submission_time, claim_id) < (?, ?)
+        ORDER BY submission_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+    'updated_time': """SELECT doc FROM claims WHERE (updated_time, claim_id) < (?, ?)
+        ORDER BY updated_time DESC, claim_id DESC LIMIT ? OFFSET ?""",
+}
+
+
+def _summary_row(row: Tuple) -> Dict[str, Any]:
+    """Claim summary from the SUMMARY_COLUMNS of a row"""
+    claim_id, claim_amount, submission_time, updated_time, status, fraud_score, files_count = row
+    return {
+        'claim_id': claim_id,
+        'claim_amount': claim_amount,
+        'submission_time': submission_time or None,
+        'updated_time': updated_time or None,
+        'status': status,
+        'fraud_score': fraud_score,
+        'files_count': files_count
+    }
+
+
+def _event_row(event_data: Dict[str, Any]) -> Tuple:
+    """Column values for one event document"""
+    return (
+        event_data.get('event_id'),
+        event_data.get('entity_id') or '',
+        event_data.get('event_type'),
+        event_data.get('timestamp'),
+        json.dumps(event_data, separators=(',', ':'))
+    )
+
+
+def _claim_row(claim_id: str, claim_data: Dict[str, Any]) -> Tuple:
+    """Column values for one claim document"""
+    return (
+        claim_id,
+        claim_data.get('submission_time') or '',
+        claim_data.get('updated_time') or '',
+        claim_data.get('status'),
+        claim_data.get('fraud_score'),
+        claim_data.get('claim_amount'),
+        len(claim_data.get('uploaded_files') or []),
+        json.dumps(claim_data, separators=(',', ':'))
+    )
+
+
+class SQLiteDataService(LocalDataService):
+    """LocalDataService variant that keeps claims and events in a SQLite database"""
+
+    def __init__(self):
+        """Initialize the data service and open the database"""
+        super().__init__()
+        self.db_path = self.config.get('storage.sqlite_path', 'claims.db')
+        self.synchronous = self.config.get('storage.sqlite_synchronous', 'NORMAL')
+        self.busy_timeout = self.config.get('storage.sqlite_busy_timeout', 5.0)
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._local = threading.local()
+        self._connections_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+        with self._connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._add_summary_columns(conn)
+        try:
+            self.migrate_events_from_files()
+        except Exception as e:
+            logger.error(f"Error importing file events into {self.db_path}: {str(e)}")
+        logger.info(f"SQLiteDataService initialized with database: {self.db_path}")
+
+    @staticmethod
+    def _add_summary_columns(conn: sqlite3.Connection) -> None:
+        """Add and backfill summary columns missing from databases created by older versions"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(claims)")}
+        if 'files_count' in columns:
+            return
+        conn.execute("ALTER TABLE claims ADD COLUMN files_count INTEGER NOT NULL DEFAULT 0")
+        rows = conn.execute("SELECT claim_id, doc FROM claims").fetchall()
+        conn.executemany("UPDATE claims SET files_count = ? WHERE claim_id = ?", [
+            (len(json.loads(doc).get('uploaded_files') or []), claim_id) for claim_id, doc in rows])
+        logger.info(f"Backfilled files_count for {len(rows)} claims")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        # Connections must not be shared across fork, so a worker forked
+        # from a preloaded parent opens its own
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    # Claim storage hooks
+
+    def _write_claim_record(self, claim_id: str, claim_data: Dict[str, Any]) -> None:
+        """Insert or replace a claim row"""
+        with self._connection() as conn:
+            conn.execute(UPSERT_CLAIM, _claim_row(claim_id, claim_data))
+
+    def _write_claim_records(self, records: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Insert or replace many claim rows in one transaction"""
+        with self._connection() as conn:
+            conn.executemany(UPSERT_CLAIM, [_claim_row(claim_id, claim_data)
+                                            for claim_id, claim_data in records])
+
+    def _read_claim_record(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load a claim document by primary key"""
+        row = self._connection().execute(SELECT_CLAIM, (claim_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _delete_claim_record(self, claim_id: str) -> bool:
+        """Delete a claim row, returning False if it does not exist"""
+        with self._connection() as conn:
+            return conn.execute(DELETE_CLAIM, (claim_id,)).rowcount > 0
+
+    def _read_claim_summary(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Load a claim summary from the indexed columns"""
+        row = self._connection().execute(SELECT_SUMMARY, (claim_id,)).fetchone()
+        return _summary_row(row) if row else None
+
+    def _aggregates_path(self) -> str:
+        """Aggregates journal kept next to the database"""
+        return f"{self.db_path}.aggregates.jsonl"
+
+    def _write_version_path(self, kind: str) -> str:
+        """Write version markers kept next to the database"""
+        return f"{self.db_path}.{kind}.version"
+
+    def _list_claim_records(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                            after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Read a page of claims using the submission or update time index"""
+        if sort_by not in LIST_CLAIMS:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        if after is None:
+            rows = self._connection().execute(LIST_CLAIMS[sort_by], (limit, offset)).fetchall()
+        else:
+            rows = self._connection().execute(
+                LIST_CLAIMS_AFTER[sort_by], (after[0], after[1], limit, offset)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _list_claim_summaries(self, limit: int, offset: int, sort_by: str = 'submission_time',
+                              after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Read a page of claim summaries from the indexed columns"""
+        if sort_by not in LIST_SUMMARIES:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        if after is None:
+            rows = self._connection().execute(LIST_SUMMARIES[sort_by], (limit, offset)).fetchall()
+        else:
+            rows = self._connection().execute(
+                LIST_SUMMARIES_AFTER[sort_by], (after[0], after[1], limit, offset)).fetchall()
+        return [_summary_row(row) for row in rows]
+
+    # Event storage hooks
+
+    def _open_event_store(self) -> Optional[EntityEventStore]:
+        """Events live in the database; files left by the file engine are imported instead"""
+        return None
+
+    def _append_event_records(self, events: List[Dict[str, Any]]) -> None:
+        """Insert a batch of events in one transaction"""
+        with self._connection() as conn:
+            conn.executemany(INSERT_EVENT, [_event_row(event_data) for event_data in events])
+
+    def _list_event_records(self, entity_id: Optional[str], limit: int,
+                            before: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Load the most recent events older than a sequence number, newest first"""
+        before = before if before is not None else MAX_SEQ
+        if entity_id is None:
+            rows = self._connection().execute(SELECT_RECENT_EVENTS, (before, limit)).fetchall()
+        else:
+            rows = self._connection().execute(
+                SELECT_ENTITY_EVENTS, (entity_id, before, limit)).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    # Queries
+
+    def find_claims(self, status: Optional[str] = None,
+                    min_fraud_score: Optional[float] = None,
+                    max_fraud_score: Optional[float] = None,
+                    submitted_from: Optional[str] = None,
+                    submitted_to: Optional[str] = None,
+                    limit: int = 100, offset: int = 0) -> List[Claim]:
+        """
+        Find claims matching the given filters, newest first
+
+        Args:
+            status: Only claims with this status
+            min_fraud_score: Only claims scored at least this high
+            max_fraud_score: Only claims scored at most this high
+            submitted_from: Only claims submitted at or after this ISO timestamp
+            submitted_to: Only claims submitted before this ISO timestamp
+            limit: Maximum number of claims to return
+            offset: Number of claims to skip
+
+        Returns:
+            List[Claim]: Matching claim objects
+        """
+        conditions = []
+        params: List[Any] = []
+        for clause, value in (("status = ?", status),
+                              ("fraud_score >= ?", min_fraud_score),
+                              ("fraud_score <= ?", max_fraud_score),
+                              ("submission_time >= ?", submitted_from),
+                              ("submission_time < ?", submitted_to)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+
+        query = "SELECT doc FROM claims"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY submission_time DESC, claim_id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        try:
+            rows = self._connection().execute(query, params).fetchall()
+            return [Claim.from_dict(json.loads(row[0])) for row in rows]
+        except Exception as e:
+            logger.error(f"Error querying claims: {str(e)}")
+            return []
+
+    def count_claims(self) -> int:
+        """Return the number of stored claims"""
+        return self._connection().execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+
+    def migrate_from_files(self, claims_dir: Optional[str] = None) -> int:
+        """
+        Import claims from the one-file-per-claim layout.
+
+        Claims already in the database are left untouched, so the migration
+        can be re-run safely. Documents are copied verbatim; no events are logged.
+
+        Args:
+            claims_dir: Directory of per-claim JSON files (defaults to storage.claims_dir)
+
+        Returns:
+            int: Number of claims imported
+        """
+        claims_dir = claims_dir or self.claims_dir
+        rows = []
+        for file_name in sorted(os.listdir(claims_dir)):
+            if not file_name.endswith('.json') or file_name.startswith('.'):
+                continue
+            try:
+                with open(os.path.join(claims_dir, file_name), 'r') as f:
+                    claim_data = json.load(f)
+                rows.append(_claim_row(claim_data.get('claim_id') or file_name[:-len('.json')],
+                                       claim_data))
+            except Exception as e:
+                logger.error(f"Error migrating claim from {file_name}: {str(e)}")
+
+        with self._connection() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_CLAIM_IF_ABSENT, rows)
+            imported = conn.total_changes - before
+
+        logger.info(f"Migrated {imported} claims from {claims_dir} into {self.db_path}")
+        if imported:
+            self.rebuild_aggregates()
+        return imported
+
+    def migrate_events_from_files(self, events_dir: Optional[str] = None) -> int:
+        """
+        Import events written by the file engine into the events table.
+
+        Covers the entity logs and events still saved as one file each. The
+        timeline position reached is recorded in the database, so each start
+        only reads events appended since, and events already in the table are
+        skipped; the files are left in place for the file engine.
+
+        Args:
+            events_dir: Events directory of the file engine (defaults to storage.events_dir)
+
+        Returns:
+            int: Number of events imported
+        """
+        events_dir = events_dir or self.events_dir
+        has_legacy_files = os.path.isdir(events_dir) and any(
+            f.endswith('.json') and not f.startswith('.') for f in os.listdir(events_dir))
+        if not has_legacy_files and not os.path.exists(os.path.join(events_dir, 'timeline.log')):
+            return 0
+
+        event_store = EntityEventStore(events_dir)
+        event_store.migrate_legacy_files()
+        key = f"events_timeline_offset:{os.path.abspath(event_store.timeline_path)}"
+        conn = self._connection()
+        with conn:
+            # Serialize with other workers importing at startup
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(SELECT_META, (key,)).fetchone()
+            events, offset = event_store.read_timeline(int(row[0]) if row else 0)
+            before = conn.total_changes
+            conn.executemany(INSERT_EVENT_IF_ABSENT, [_event_row(event_data) + (event_data.get('event_id'),)
+                                                      for event_data in events])
+            imported = conn.total_changes - before
+            conn.execute(UPSERT_META, (key, str(offset)))
+
+        if imported:
+            logger.info(f"Imported {imported} events from {events_dir} into {self.db_path}")
+            self._bump_write_version('events')
+        return imported
+
+    def close(self) -> None:
+        """Flush events and close every connection opened by this service"""
+        super().close()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error closing database connection: {str(e)}")
+        self._local = threading.local()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for SQLite store maintenance"""
+    parser = argparse.ArgumentParser(description="SQLite claim store maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Import per-file claims into the database")
+    migrate.add_argument('--claims-dir', default=None, help="Source directory of claim JSON files")
+    migrate.add_argument('--events-dir', default=None, help="Events directory of the file engine")
+
+    args = parser.parse_args(argv)
+    service = SQLiteDataService()
+    try:
+        if args.command == 'migrate':
+            count = service.migrate_from_files(args.claims_dir)
+            print(f"Imported {count} claims")
+            print(f"Imported {service.migrate_events_from_files(args.events_dir)} events")
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
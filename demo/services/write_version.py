@@ -0,0 +1,65 @@
+"""
+Cross-process write version of a store.
+
+Every write to the claims or the events appends one byte to a small marker
+file next to the store. The version token is derived from a single stat()
+of that file (inode, size and modification time), so any worker process can
+tell whether the store changed since a response was built without reading
+it. When the marker grows past a limit it is replaced by an empty file; the
+new inode keeps the token moving forward.
+"""
+import os
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteVersion:
+    """Marker file whose stat() changes on every write to a store"""
+
+    def __init__(self, path: str, max_bytes: int = 1 << 20):
+        """
+        Args:
+            path: Path of the marker file
+            max_bytes: Marker size at which it is replaced by an empty file
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def bump(self) -> None:
+        """Record a write; never raises, a missed bump only costs a cache miss later"""
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, b'.')
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size >= self.max_bytes:
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb'):
+                    pass
+                os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error recording write version {self.path}: {str(e)}")
+
+    def token(self) -> Optional[str]:
+        """
+        Current version of the store
+
+        Returns:
+            Optional[str]: Opaque token, or None when the marker cannot be read
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Nothing written since the marker was introduced
+            self.bump()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return None
+        except OSError:
+            return None
+        return f"{stat.st_ino:x}.{stat.st_size:x}.{stat.st_mtime_ns:x}"
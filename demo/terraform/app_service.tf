@@ -42,6 +42,9 @@ resource "azurerm_linux_web_app" "flask_app" {
     "COSMOS_ENDPOINT"          = azurerm_cosmosdb_account.main.endpoint
     "COSMOS_DATABASE"          = azurerm_cosmosdb_sql_database.main.name
     "COSMOS_KEY"               = azurerm_cosmosdb_account.main.primary_key
+    "COSMOS_EVENTS_CONTAINER"  = azurerm_cosmosdb_sql_container.events_by_entity.name
+    "COSMOS_EVENTS_LEGACY_CONTAINER" = azurerm_cosmosdb_sql_container.events.name
+    "COSMOS_AGGREGATES_CONTAINER" = azurerm_cosmosdb_sql_container.aggregates.name
     "USE_MANAGED_IDENTITY"     = "false"
     
     # Storage account configuration
@@ -55,7 +55,9 @@ resource "azurerm_cosmosdb_sql_container" "claims" {
   }
 }
 
-# Cosmos DB SQL Container for Events
+# Legacy Cosmos DB SQL Container for Events, partitioned on /event_id so
+# every per-claim lookup fans out to all partitions. Still read while
+# events are migrated to events-by-entity; remove once migration is done.
 resource "azurerm_cosmosdb_sql_container" "events" {
   name                = "events"
   resource_group_name = azurerm_cosmosdb_account.main.resource_group_name
@@ -76,6 +78,46 @@ resource "azurerm_cosmosdb_sql_container" "events" {
   }
 }
 
+# Cosmos DB SQL Container for Events, partitioned on /entity_id so a
+# claim's history is served by a single-partition query
+resource "azurerm_cosmosdb_sql_container" "events_by_entity" {
+  name                = "events-by-entity"
+  resource_group_name = azurerm_cosmosdb_account.main.resource_group_name
+  account_name        = azurerm_cosmosdb_account.main.name
+  database_name       = azurerm_cosmosdb_sql_database.main.name
+  partition_key_path  = "/entity_id"
+  
+  indexing_policy {
+    indexing_mode = "consistent"
+    
+    included_path {
+      path = "/*"
+    }
+    
+    excluded_path {
+      path = "/\"_etag\"/?"
+    }
+  }
+}
+
+# Cosmos DB SQL Container for the dashboard aggregates: a few counter shard
+# documents, each its own partition so concurrent patches do not contend
+resource "azurerm_cosmosdb_sql_container" "aggregates" {
+  name                = "aggregates"
+  resource_group_name = azurerm_cosmosdb_account.main.resource_group_name
+  account_name        = azurerm_cosmosdb_account.main.name
+  database_name       = azurerm_cosmosdb_sql_database.main.name
+  partition_key_path  = "/id"
+  
+  indexing_policy {
+    indexing_mode = "consistent"
+    
+    excluded_path {
+      path = "/*"
+    }
+  }
+}
+
 # Role assignment moved to app_service.tf for the Linux Flask app
 
 # Data source to get current Azure subscription info
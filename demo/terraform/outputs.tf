@@ -126,6 +126,11 @@ output "cosmos_claims_container" {
 
 output "cosmos_events_container" {
   description = "Name of the Cosmos DB container for events"
+  value       = azurerm_cosmosdb_sql_container.events_by_entity.name
+}
+
+output "cosmos_events_legacy_container" {
+  description = "Name of the legacy Cosmos DB events container being migrated from"
   value       = azurerm_cosmosdb_sql_container.events.name
 }
 
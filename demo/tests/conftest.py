@@ -61,6 +61,39 @@ def temp_data_dir():
         yield temp_dir
 
 
+@pytest.fixture
+def local_service(temp_data_dir):
+    """LocalDataService storing claims and events in a temporary directory"""
+    from services.data_service import LocalDataService
+    from utils.config import Config
+    
+    Config()
+    keys = ('storage.claims_dir', 'storage.events_dir', 'storage.backup_dir')
+    previous = [Config.get(key) for key in keys]
+    for key in keys:
+        Config.set(key, os.path.join(temp_data_dir, key.split('.')[1]))
+    service = LocalDataService()
+    yield service
+    service.close()
+    for key, value in zip(keys, previous):
+        Config.set(key, value)
+
+
+@pytest.fixture(autouse=True)
+def isolated_outbox(tmp_path):
+    """Keep each test's cloud write outbox and job queue out of the working directory"""
+    from utils.config import Config
+    
+    Config()
+    keys = ('hybrid.outbox_path', 'processing.jobs_path')
+    previous = [Config.get(key) for key in keys]
+    Config.set('hybrid.outbox_path', str(tmp_path / 'outbox.db'))
+    Config.set('processing.jobs_path', str(tmp_path / 'jobs.db'))
+    yield
+    for key, value in zip(keys, previous):
+        Config.set(key, value)
+
+
 @pytest.fixture
 def mock_cosmos_config():
     """Mock Cosmos DB configuration for testing"""
@@ -3,7 +3,36 @@ Flask application tests using pytest.
 """
 import pytest
 import json
-from unittest.mock import patch, MagicMock
+import gzip
+import hashlib
+import io
+import os
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+
+@pytest.fixture
+def uploads_app(temp_data_dir):
+    """Flask app keeping its uploads in a temporary folder"""
+    from app import create_app
+    from utils import Config
+    
+    previous = Config.get('app.upload_folder')
+    Config.set('app.upload_folder', os.path.join(temp_data_dir, 'uploads'))
+    try:
+        yield create_app(testing=True)
+    finally:
+        Config.set('app.upload_folder', previous)
+
+
+def wait_for_job(client, job_id, timeout=5.0):
+    """Poll /jobs/<job_id> until the job has finished and return it"""
+    deadline = time.time() + timeout
+    while True:
+        job = json.loads(client.get(f'/jobs/{job_id}').data)['job']
+        if job['status'] in ('succeeded', 'failed') or time.time() > deadline:
+            return job
+        time.sleep(0.02)
 
 
 class TestFlaskApp:
@@ -17,8 +46,8 @@ class TestFlaskApp:
     
     def test_list_claims_empty(self, client):
         """Test listing claims when no claims exist"""
-        with patch.object(client.application.data_service, 'list_claims') as mock_list_claims:
-            mock_list_claims.return_value = []
+        with patch.object(client.application.data_service, 'list_claim_summaries_page') as mock_list_claims:
+            mock_list_claims.return_value = ([], None)
             
             response = client.get('/list_claims')
             assert response.status_code == 200
@@ -29,8 +58,8 @@ class TestFlaskApp:
     
     def test_list_claims_with_data(self, client, sample_claim_data):
         """Test listing claims when claims exist"""
-        with patch.object(client.application.data_service, 'list_claims') as mock_list_claims:
-            mock_list_claims.return_value = [sample_claim_data]
+        with patch.object(client.application.data_service, 'list_claim_summaries_page') as mock_list_claims:
+            mock_list_claims.return_value = ([sample_claim_data], None)
             
             response = client.get('/list_claims')
             assert response.status_code == 200
@@ -51,11 +80,136 @@ class TestFlaskApp:
             }
             
             response = client.post('/submit_claim', data=form_data)
-            assert response.status_code == 200
+            assert response.status_code == 202
             
             data = json.loads(response.data)
             assert data['success'] is True
             assert 'claim_id' in data
+            
+            job = wait_for_job(client, data['job_id'])
+            assert job['status'] == 'succeeded'
+            assert [stage['done'] for stage in job['stages']] == [True, True]
+            assert job['result']['store']['claim_id'] == sample_claim_data['claim_id']
+            mock_save_claim.assert_called_once()
+    
+    def test_failed_submission_releases_its_files(self, uploads_app, sample_claim_data):
+        """Test that evidence of a claim that is never stored does not stay referenced"""
+        from utils.validation import ValidationError
+        app = uploads_app
+        with patch.object(app.data_service, 'save_claim',
+                          side_effect=ValidationError("Claim data validation failed", ["bad claim"])):
+            form_data = {
+                'claimId': sample_claim_data['claim_id'],
+                'claimAmount': '250.0',
+                'description': 'Broken window',
+                'imageEvidence': [(io.BytesIO(b'rejected image'), 'a.jpg')]
+            }
+            client = app.test_client()
+            response = client.post('/submit_claim', data=form_data, content_type='multipart/form-data')
+            assert wait_for_job(client, json.loads(response.data)['job_id'])['status'] == 'failed'
+        
+        sha256 = hashlib.sha256(b'rejected image').hexdigest()
+        assert app.evidence_store.claims_for(sha256) == []
+        assert not os.path.exists(app.evidence_store.object_path(sha256))
+    
+    def test_job_not_found(self, client):
+        """Test the status of an unknown job"""
+        response = client.get('/jobs/missing')
+        assert response.status_code == 404
+    
+    def test_submit_claim_streams_uploads(self, uploads_app, temp_data_dir, sample_claim_data):
+        """Test that uploaded files are stored with their size and checksum"""
+        app = uploads_app
+        with patch.object(app.data_service, 'save_claim') as mock_save_claim:
+            mock_save_claim.return_value = sample_claim_data['claim_id']
+            form_data = {
+                'claimId': sample_claim_data['claim_id'],
+                'claimAmount': '250.0',
+                'description': 'Broken window',
+                'pdfDocument': (io.BytesIO(b'%PDF-1.4 report'), 'report.pdf'),
+                'imageEvidence': [(io.BytesIO(b'image-1'), 'a.jpg'), (io.BytesIO(b'image-2'), 'b.png'),
+                                  (io.BytesIO(b'MZ'), 'tool.exe')]
+            }
+            client = app.test_client()
+            response = client.post('/submit_claim', data=form_data, content_type='multipart/form-data')
+            assert response.status_code == 202
+            assert wait_for_job(client, json.loads(response.data)['job_id'])['status'] == 'succeeded'
+            
+            files = json.loads(response.data)['uploadedFiles']
+            assert [f['original_name'] for f in files] == ['report.pdf', 'a.jpg', 'b.png']
+            assert files[1]['sha256'] == hashlib.sha256(b'image-1').hexdigest()
+            assert files[0]['file_size'] == len(b'%PDF-1.4 report')
+            assert os.path.exists(files[2]['file_path'])
+            saved = mock_save_claim.call_args[0][0]
+            assert saved['uploaded_files'][0]['sha256'] == files[0]['sha256']
+            
+            response = client.get(f"/download_file/{sample_claim_data['claim_id']}/{files[1]['saved_name']}")
+            assert response.status_code == 200
+            assert response.data == b'image-1'
+            response.close()
+            
+            response = client.get(f"/evidence/{files[1]['sha256']}/claims")
+            assert json.loads(response.data)['claims'][0]['claim_id'] == sample_claim_data['claim_id']
+        assert os.listdir(os.path.join(temp_data_dir, 'uploads', '.incoming')) == []
+    
+    def test_download_file_conditional_and_range(self, uploads_app):
+        """Test the strong ETag, 304, byte ranges and cache headers of downloads"""
+        from werkzeug.datastructures import FileStorage
+        
+        data = b'0123456789' * 100
+        info = uploads_app.evidence_store.save(FileStorage(io.BytesIO(data), 'scan.pdf'), 'pdf', 'claim-d')
+        url = f"/download_file/claim-d/{info['saved_name']}"
+        client = uploads_app.test_client()
+        
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['ETag'] == f'"{info["sha256"]}"'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'private' in response.headers['Cache-Control']
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        response.close()
+        
+        response = client.get(url, headers={'If-None-Match': f'"{info["sha256"]}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+        
+        response = client.get(url, headers={'Range': 'bytes=10-19'})
+        assert response.status_code == 206
+        assert response.data == data[10:20]
+        assert response.headers['Content-Range'] == f'bytes 10-19/{len(data)}'
+        response.close()
+        
+        assert client.get(url, headers={'Range': 'bytes=5000-'}).status_code == 416
+    
+    def test_download_file_offloaded(self, temp_data_dir):
+        """Test that downloads can be handed to the front web server"""
+        from app import create_app
+        from utils import Config
+        from werkzeug.datastructures import FileStorage
+        
+        keys = ('app.upload_folder', 'app.download_offload')
+        previous = [Config.get(key) for key in keys]
+        Config.set('app.upload_folder', os.path.join(temp_data_dir, 'uploads'))
+        Config.set('app.download_offload', 'x-accel-redirect')
+        try:
+            app = create_app(testing=True)
+        finally:
+            for key, value in zip(keys, previous):
+                Config.set(key, value)
+        
+        info = app.evidence_store.save(FileStorage(io.BytesIO(b'photo'), 'a.jpg'), 'image', 'claim-e')
+        url = f"/download_file/claim-e/{info['saved_name']}"
+        sha256 = info['sha256']
+        response = app.test_client().get(url)
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.headers['X-Accel-Redirect'] == \
+            f"/protected-uploads/objects/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+        assert info['saved_name'] in response.headers['Content-Disposition']
+        
+        response = app.test_client().get(url, headers={'If-None-Match': f'"{sha256}"'})
+        assert response.status_code == 304
+        assert 'X-Accel-Redirect' not in response.headers
     
     def test_submit_claim_missing_data(self, client):
         """Test claim submission with missing required data"""
@@ -127,6 +281,191 @@ class TestFlaskApp:
             assert 'Claim not found' in data['error']
 
 
+    def test_claim_history(self, client, sample_claim_data):
+        """Test listing the revisions of a claim"""
+        versions = [{'version': 1, 'kind': 'full'}, {'version': 2, 'kind': 'delta'}]
+        with patch.object(client.application.data_service, 'get_claim_history') as mock_history:
+            mock_history.return_value = versions
+            
+            claim_id = sample_claim_data['claim_id']
+            response = client.get(f'/claims/{claim_id}/history')
+            assert response.status_code == 200
+            
+            data = json.loads(response.data)
+            assert data['success'] is True
+            assert data['versions'] == versions
+    
+    def test_claim_version_not_found(self, client):
+        """Test retrieving a revision that does not exist"""
+        with patch.object(client.application.data_service, 'get_claim_at') as mock_get_claim_at:
+            mock_get_claim_at.return_value = None
+            
+            response = client.get('/claims/nonexistent-id/history/3')
+            assert response.status_code == 404
+            mock_get_claim_at.assert_called_once_with('nonexistent-id', 3)
+    
+    def test_list_claims_cursor(self, client, sample_claim_data):
+        """Test that the cursor is passed through and the next one returned"""
+        with patch.object(client.application.data_service, 'list_claim_summaries_page') as mock_list_claims:
+            mock_list_claims.return_value = ([sample_claim_data], 'next-page')
+            
+            response = client.get('/list_claims?limit=1&cursor=this-page')
+            assert response.status_code == 200
+            mock_list_claims.assert_called_once_with(limit=1, cursor='this-page', fields=[
+                'claim_id', 'claim_amount', 'submission_time', 'files_count', 'status', 'fraud_score'])
+            
+            data = json.loads(response.data)
+            assert data['next_cursor'] == 'next-page'
+    
+    def test_metrics(self, client):
+        """Test the operational metrics endpoint"""
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        
+        data = json.loads(response.data)
+        assert data['success'] is True
+        assert 'depth' in data['metrics']['outbox']
+        assert 'hits' in data['metrics']['cache']
+        assert 'operations' in data['metrics']['cosmos']
+    
+    def test_stats(self, client):
+        """Test that the dashboard aggregates are served from the data service"""
+        with patch.object(client.application.data_service, 'get_aggregates') as mock_aggregates:
+            mock_aggregates.return_value = {'total': {'count': 3, 'amount': 450.0}, 'source': 'local'}
+            response = client.get('/stats')
+            assert response.status_code == 200
+            
+            data = json.loads(response.data)
+            assert data['success'] is True
+            assert data['stats']['total']['count'] == 3
+    
+    def test_list_claims_fields(self, client):
+        """Test that ?fields= selects the summary fields and rejects unknown ones"""
+        with patch.object(client.application.data_service, 'list_claim_summaries_page') as mock_list_claims:
+            mock_list_claims.return_value = ([{'claim_id': 'c1', 'status': 'Pending'}], None)
+            
+            response = client.get('/list_claims?fields=claim_id,status')
+            assert response.status_code == 200
+            assert mock_list_claims.call_args.kwargs['fields'] == ['claim_id', 'status']
+            assert json.loads(response.data)['claims'] == [{'claim_id': 'c1', 'status': 'Pending'}]
+        
+        response = client.get('/list_claims?fields=claim_id,description')
+        assert response.status_code == 400
+        assert 'description' in json.loads(response.data)['error']
+    
+    def test_list_claims_not_modified(self, client, sample_claim_data):
+        """Test that a matching If-None-Match is answered with 304 until claims are written"""
+        with patch.object(client.application.data_service, 'list_claim_summaries_page') as mock_list_claims:
+            mock_list_claims.return_value = ([sample_claim_data], None)
+            
+            response = client.get('/list_claims?limit=5')
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+            assert etag.startswith('W/') and 'no-cache' in response.headers['Cache-Control']
+            
+            response = client.get('/list_claims?limit=5', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert mock_list_claims.call_count == 1
+            
+            # Another query is another resource
+            response = client.get('/list_claims?limit=6', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            
+            client.application.data_service.local_service._bump_write_version('claims')
+            response = client.get('/list_claims?limit=5', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+        
+        assert client.application.response_stats.snapshot()['not_modified'] == 1
+    
+    def test_get_claim_etag_across_workers(self, client, sample_claim_data):
+        """Test that a worker holding a cached claim never pairs the old body with a new ETag"""
+        from app import create_app
+        other = create_app(testing=True).test_client()
+        claim_id = sample_claim_data['claim_id']
+        url = f'/get_claim/{claim_id}'
+        client.application.data_service.save_claim(sample_claim_data)
+        
+        response = other.get(url)
+        assert json.loads(response.data)['claim']['status'] == 'pending'
+        etag = response.headers['ETag']
+        
+        client.application.data_service.update_claim(claim_id, {'status': 'under_review'})
+        response = other.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert json.loads(response.data)['claim']['status'] == 'under_review'
+        etag = response.headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        assert other.get(url, headers={'If-None-Match': etag}).status_code == 304
+    
+    def test_events_compressed(self, client):
+        """Test that large JSON responses are gzipped for clients that accept it"""
+        events = [{'event_id': f"e{i}", 'event_type': 'claim_saved', 'entity_id': 'c1'} for i in range(50)]
+        with patch.object(client.application.data_service, 'list_events_page') as mock_list_events:
+            mock_list_events.return_value = (events, None)
+            
+            response = client.get('/events/c1', headers={'Accept-Encoding': 'gzip'})
+            assert response.status_code == 200
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'Accept-Encoding' in response.headers['Vary']
+            assert json.loads(gzip.decompress(response.data))['count'] == 50
+            
+            response = client.get('/events/c1')
+            assert 'Content-Encoding' not in response.headers
+            assert json.loads(response.data)['count'] == 50
+        
+        stats = client.application.response_stats.snapshot()
+        assert stats['compressed'] == 1 and stats['bytes_saved'] > 0
+        assert json.loads(client.get('/metrics').data)['metrics']['http']['compressed'] == 1
+    
+    def test_async_storage(self, sample_claim_data):
+        """Test that routes go through the async service when async storage is enabled"""
+        from app import create_app
+        from utils.config import Config
+        
+        Config()
+        previous = Config.get('hybrid.async_storage')
+        Config.set('hybrid.async_storage', True)
+        try:
+            app = create_app(testing=True)
+        finally:
+            Config.set('hybrid.async_storage', previous)
+        
+        with patch.object(app.async_service, 'get_claim', AsyncMock(return_value=sample_claim_data)):
+            response = app.test_client().get(f"/get_claim/{sample_claim_data['claim_id']}")
+            assert response.status_code == 200
+            assert json.loads(response.data)['claim']['claim_id'] == sample_claim_data['claim_id']
+        
+        claim_id = sample_claim_data['claim_id']
+        with patch.object(app.async_service, 'update_claim', AsyncMock(return_value=sample_claim_data)) as update, \
+                patch.object(app.async_service, 'get_claim_history', AsyncMock(return_value=[{'version': 1}])), \
+                patch.object(app.async_service, 'get_claim_at', AsyncMock(return_value=sample_claim_data)), \
+                patch.object(app.async_service, 'get_aggregates', AsyncMock(return_value={'total': {}})):
+            client = app.test_client()
+            assert client.post(f"/update_claim/{claim_id}", json={'status': 'approved'}).status_code == 200
+            update.assert_awaited_once_with(claim_id, {'status': 'approved'})
+            assert client.get(f"/claims/{claim_id}/history").status_code == 200
+            assert json.loads(client.get(f"/claims/{claim_id}/history/1").data)['claim'] == sample_claim_data
+            assert json.loads(client.get('/stats').data)['stats'] == {'total': {}}
+    
+    def test_healthz(self, client):
+        """Test the cached health endpoint"""
+        response = client.get('/healthz')
+        assert response.status_code == 200
+        
+        data = json.loads(response.data)
+        assert data['status'] in ('ok', 'degraded')
+        assert 'cosmos' in data
+    
+    def test_list_claims_invalid_cursor(self, client):
+        """Test that a malformed cursor is rejected"""
+        response = client.get('/list_claims?cursor=not-a-cursor')
+        assert response.status_code == 400
+        
+        data = json.loads(response.data)
+        assert data['success'] is False
+
+
 class TestFlaskAppIntegration:
     """Integration tests for Flask app (marked as integration tests)"""
     
@@ -140,11 +479,12 @@ class TestFlaskAppIntegration:
         }
         
         response = client.post('/submit_claim', data=form_data)
-        assert response.status_code == 200
+        assert response.status_code == 202
         
         submit_data = json.loads(response.data)
         assert submit_data['success'] is True
         claim_id = submit_data['claim_id']
+        assert wait_for_job(client, submit_data['job_id'])['status'] == 'succeeded'
         
         # Retrieve the claim
         response = client.get(f'/get_claim/{claim_id}')
@@ -0,0 +1,209 @@
+"""
+Tests for the incrementally maintained claim aggregates.
+"""
+import pytest
+import os
+from unittest.mock import patch
+
+from services.aggregates import (AggregateStore, claim_delta, compute_counters, main, merge_counters,
+                                 patch_operations, summarize)
+from services.change_feed import ChangeFeedProcessor
+from services.cosmos_client_factory import CosmosClientFactory
+from services.cosmos_service import CosmosDBService
+from services.hybrid_service import HybridDataService
+from utils.config import Config
+
+
+@pytest.fixture
+def fake_service():
+    """CosmosDBService on a fresh fake:// endpoint, keeping aggregates in two shards"""
+    CosmosClientFactory.reset()
+    Config()
+    keys = ('database.cosmos_endpoint', 'database.cosmos_aggregates_container', 'database.aggregate_shards')
+    previous = [Config.get(key) for key in keys]
+    for key, value in zip(keys, ('fake://aggregates?partitions=2', 'aggregates', 2)):
+        Config.set(key, value)
+    try:
+        service = CosmosDBService()
+    finally:
+        for key, value in zip(keys, previous):
+            Config.set(key, value)
+    yield service
+    CosmosClientFactory.reset()
+
+
+def make_claim(claim_id, amount=100.0, status='pending', day='2024-01-01', fraud_score=None):
+    """Build a minimal claim dictionary"""
+    return {'claim_id': claim_id, 'claim_amount': amount, 'description': 'Test claim',
+            'submission_time': f"{day}T10:00:00", 'status': status, 'fraud_score': fraud_score}
+
+
+class TestCounters:
+    """Test cases for the counter arithmetic"""
+
+    def test_delta_moves_a_claim_between_groups(self):
+        """Test that an update subtracts the old version and adds the new one"""
+        before = make_claim('a', status='pending', fraud_score=0.15)
+        after = make_claim('a', amount=250.0, status='reviewed', fraud_score=0.95)
+        counters, count = compute_counters([before])
+        assert count == 1
+
+        stats = summarize(compute_counters([after])[0])
+        from_delta = summarize(merge_counters(counters, claim_delta(before, after)))
+        assert from_delta == stats
+        assert stats['by_status'] == {'reviewed': {'count': 1, 'amount': 250.0}}
+        assert stats['fraud_score_histogram']['0.9-1.0'] == 1
+        assert claim_delta(after, after) == {}
+
+    def test_delete_and_patch_chunks(self):
+        """Test the delta of a deletion and the ten-operation patch limit"""
+        claim = make_claim('a', fraud_score=1.0)
+        delta = claim_delta(claim, None)
+        assert delta['count'] == -1 and delta['fraud_score/0.9-1.0'] == -1
+
+        chunks = patch_operations({f"day_count/2024-01-{day:02d}": 1 for day in range(1, 24)})
+        assert [len(chunk) for chunk in chunks] == [10, 10, 3]
+        assert chunks[0][0] == {'op': 'incr', 'path': '/day_count/2024-01-01', 'value': 1}
+
+
+class TestAggregateStore:
+    """Test cases for the journal-backed local store"""
+
+    def test_journal_is_shared_and_compacted(self, temp_data_dir):
+        """Test that another instance sees appended deltas and survives compaction"""
+        path = os.path.join(temp_data_dir, 'aggregates.jsonl')
+        writer = AggregateStore(path, compact_min_records=3)
+        reader = AggregateStore(path)
+        assert not writer.exists()
+
+        for i in range(5):
+            writer.apply(claim_delta(None, make_claim(f"c{i}")))
+        assert reader.snapshot()['total'] == {'count': 5, 'amount': 500.0}
+        with open(path) as f:
+            assert len(f.readlines()) < 5
+
+        writer.apply(claim_delta(make_claim('c0'), None))
+        assert reader.counters()['count'] == 4
+        assert AggregateStore(path).snapshot()['by_day']['2024-01-01']['count'] == 4
+
+
+class TestLocalAggregates:
+    """Test cases for aggregates kept by the local storage"""
+
+    def test_writes_update_aggregates(self, local_service):
+        """Test save, update, bulk save and delete against a rebuild"""
+        local_service.save_claim(make_claim('a', fraud_score=0.5))
+        local_service.save_claims_bulk([make_claim('b', day='2024-01-02'),
+                                        make_claim('b', amount=300.0, day='2024-01-02')])
+        local_service.update_claim('a', {'status': 'approved'})
+        local_service.save_claim(make_claim('c'))
+        local_service.delete_claim('c')
+
+        stats = local_service.get_aggregates()
+        assert stats['total'] == {'count': 2, 'amount': 400.0}
+        assert stats['by_status']['approved']['count'] == 1
+        assert stats['by_day']['2024-01-02'] == {'count': 1, 'amount': 300.0}
+
+        assert local_service.rebuild_aggregates() == 2
+        rebuilt = local_service.get_aggregates()
+        assert {k: rebuilt[k] for k in ('total', 'by_status', 'by_day', 'fraud_score_histogram')} == \
+            {k: stats[k] for k in ('total', 'by_status', 'by_day', 'fraud_score_histogram')}
+
+    def test_first_use_builds_from_existing_claims(self, local_service):
+        """Test that claims written before the journal existed are counted once"""
+        local_service.save_claim(make_claim('a'))
+        os.remove(local_service._aggregates_path())
+        local_service._aggregates = None
+
+        local_service.save_claim(make_claim('b'))
+        assert local_service.get_aggregates()['total']['count'] == 2
+
+
+    def test_rebuild_command(self, local_service, capsys):
+        """Test the command line rebuild of the local aggregates"""
+        local_service.save_claim(make_claim('a'))
+        os.remove(local_service._aggregates_path())
+
+        assert main(['rebuild', '--local-only']) == 0
+        assert 'from 1 claims' in capsys.readouterr().out
+        assert os.path.exists(local_service._aggregates_path())
+
+class TestCosmosAggregates:
+    """Test cases for the sharded aggregates in Cosmos DB"""
+
+    def test_writes_patch_shards(self, fake_service):
+        """Test that saves, bulk saves and deletes are summed over the shards"""
+        assert fake_service.save_claim(make_claim('a', status='pending'))
+        assert fake_service.save_claim(make_claim('a', status='reviewed'))
+        results = fake_service.save_claims_bulk([make_claim(f"b{i}", amount=10.0) for i in range(5)] +
+                                                [make_claim('b0', amount=20.0)])
+        assert all(result.ok for result in results)
+        assert fake_service.delete_claim('b1')
+
+        stats = fake_service.get_aggregates()
+        assert stats['total'] == {'count': 5, 'amount': 150.0}
+        assert stats['by_status']['reviewed'] == {'count': 1, 'amount': 100.0}
+        assert len(list(fake_service.aggregates_container.read_all_items())) <= 2
+
+    def test_rebuild_replaces_shards(self, fake_service):
+        """Test that a rebuild corrects drifted counters"""
+        fake_service.save_claim(make_claim('a'))
+        fake_service.save_claim(make_claim('b', day='2024-01-02'))
+        fake_service._update_aggregates({'count': 7})
+
+        assert fake_service.get_aggregates()['total']['count'] == 9
+        assert fake_service.rebuild_aggregates() == 2
+        stats = fake_service.get_aggregates()
+        assert stats['total'] == {'count': 2, 'amount': 200.0}
+        assert set(stats['by_day']) == {'2024-01-01', '2024-01-02'}
+
+    def test_hybrid_writes_pass_the_local_version(self, fake_service, local_service, temp_data_dir):
+        """Test that with the change feed on, hybrid saves and deletes do not read the claim from Cosmos DB"""
+        with patch('services.hybrid_service.CosmosDBService', return_value=fake_service), \
+                patch('services.hybrid_service.HybridDataService._create_local_service',
+                      return_value=local_service):
+            service = HybridDataService()
+        # Not started; only its presence makes the local store authoritative
+        service.change_feed = ChangeFeedProcessor(fake_service, local_service, None,
+                                                  checkpoint_path=os.path.join(temp_data_dir, 'feed.json'))
+        try:
+            with patch.object(fake_service.claims_container, 'read_item',
+                              side_effect=AssertionError("read_item called")):
+                service.save_claim(make_claim('a', status='pending'))
+                service.save_claim(make_claim('a', amount=50.0, status='reviewed'))
+                service.save_claim(make_claim('b'))
+                assert service.delete_claim('b')
+        finally:
+            service.close()
+
+        stats = fake_service.get_aggregates()
+        assert stats['total'] == {'count': 1, 'amount': 50.0}
+        assert stats['by_status'] == {'reviewed': {'count': 1, 'amount': 50.0}}
+
+    def test_hybrid_instances_without_change_feed(self, fake_service, temp_data_dir):
+        """Test that an update by an instance whose local store lacks the claim is not counted twice"""
+        Config()
+        keys = ('storage.claims_dir', 'storage.events_dir', 'storage.backup_dir')
+        previous = [Config.get(key) for key in keys]
+        services = []
+        try:
+            with patch('services.hybrid_service.CosmosDBService', return_value=fake_service):
+                for name in ('a', 'b'):
+                    for key in keys:
+                        Config.set(key, os.path.join(temp_data_dir, name, key.split('.')[1]))
+                    services.append(HybridDataService())
+        finally:
+            for key, value in zip(keys, previous):
+                Config.set(key, value)
+        a, b = services
+        try:
+            assert a.change_feed is None
+            a.save_claim(make_claim('c1', status='pending'))
+            assert b.update_claim('c1', {'status': 'reviewed'})['status'] == 'reviewed'
+        finally:
+            a.close()
+            b.close()
+
+        stats = fake_service.get_aggregates()
+        assert stats['total'] == {'count': 1, 'amount': 100.0}
+        assert stats['by_status'] == {'reviewed': {'count': 1, 'amount': 100.0}}
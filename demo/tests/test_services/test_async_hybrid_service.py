@@ -0,0 +1,156 @@
+"""
+Tests for the asynchronous request path over the hybrid storage.
+"""
+import pytest
+import asyncio
+import os
+import threading
+from unittest.mock import patch
+
+from services.async_hybrid_service import AsyncHybridDataService, EventLoopThread
+from services.hybrid_service import HybridDataService
+from utils.config import Config
+
+
+class FakeAsyncCosmos:
+    """Async Cosmos DB stand-in with a configurable response time"""
+
+    def __init__(self, claims=None, save_ok=True, delay=0.0):
+        self.claims = claims or {}
+        self.save_ok = save_ok
+        self.delay = delay
+        self.reads = 0
+        self.saved = []
+
+    def is_connected(self):
+        return True
+
+    def is_available(self):
+        return True
+
+    async def get_claim(self, claim_id):
+        self.reads += 1
+        await asyncio.sleep(self.delay)
+        return self.claims.get(claim_id)
+
+    async def save_claim(self, claim_data, replaced=None):
+        await asyncio.sleep(self.delay)
+        if self.save_ok:
+            self.saved.append(claim_data)
+        return self.save_ok
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def hybrid(temp_data_dir):
+    """Hybrid service with mocked local storage and its outbox in a temporary directory"""
+    previous = Config.get('hybrid.outbox_path')
+    Config.set('hybrid.outbox_path', os.path.join(temp_data_dir, 'outbox.db'))
+    try:
+        with patch('services.hybrid_service.LocalDataService') as mock_local:
+            service = HybridDataService()
+            service.local_service = mock_local.return_value
+            service.sync_interval = 60
+            yield service
+            service.close()
+    finally:
+        Config.set('hybrid.outbox_path', previous)
+
+
+class TestAsyncHybridDataService:
+    """Test cases for AsyncHybridDataService"""
+
+    def test_concurrent_reads_share_one_load(self, hybrid, sample_claim_data):
+        """Test that concurrent misses for one claim issue a single Cosmos read"""
+        claim_id = sample_claim_data['claim_id']
+        cosmos = FakeAsyncCosmos({claim_id: sample_claim_data}, delay=0.05)
+        service = AsyncHybridDataService(hybrid, cosmos)
+
+        claims = asyncio.run(service.get_claims([claim_id] * 50))
+        assert claims == [sample_claim_data] * 50
+        assert cosmos.reads == 1
+
+    def test_falls_back_to_local(self, hybrid, sample_claim_data):
+        """Test that claims missing from Cosmos DB are read from local storage"""
+        hybrid.local_service.get_claim.return_value = sample_claim_data
+        service = AsyncHybridDataService(hybrid, FakeAsyncCosmos())
+
+        assert asyncio.run(service.get_claim(sample_claim_data['claim_id'])) == sample_claim_data
+        hybrid.local_service.get_claim.assert_called_once_with(sample_claim_data['claim_id'])
+
+    def test_update_claim_merges_and_saves(self, hybrid, sample_claim_data):
+        """Test that an update reads the claim, applies the changes and writes both storages"""
+        claim_id = sample_claim_data['claim_id']
+        hybrid.local_service.save_claim.return_value = claim_id
+        cosmos = FakeAsyncCosmos({claim_id: sample_claim_data})
+        service = AsyncHybridDataService(hybrid, cosmos)
+
+        updated = asyncio.run(service.update_claim(claim_id, {'status': 'approved'}))
+        assert updated['status'] == 'approved'
+        assert updated['claim_amount'] == sample_claim_data['claim_amount']
+        assert cosmos.saved[-1]['status'] == 'approved'
+        hybrid.local_service.save_claim.assert_called_once()
+        hybrid.local_service.get_claim.return_value = None
+        assert asyncio.run(service.update_claim('missing', {'status': 'approved'})) is None
+
+    def test_failed_cloud_write_is_queued(self, hybrid, sample_claim_data):
+        """Test that failed cloud writes go to the shared outbox"""
+        hybrid.local_service.save_claim.return_value = sample_claim_data['claim_id']
+        service = AsyncHybridDataService(hybrid, FakeAsyncCosmos(save_ok=False))
+
+        result = asyncio.run(service.save_claim_with_result(sample_claim_data))
+        assert result.local_ok is True
+        assert result.cloud_status == 'failed'
+        assert result.queued is True
+        assert hybrid.outbox.is_pending('claim', sample_claim_data['claim_id'])
+
+        service.cosmos_service.save_ok = True
+        result = asyncio.run(service.save_claim_with_result(dict(sample_claim_data, status='approved')))
+        assert result.cloud_status == 'queued'
+
+    def test_slow_cloud_write_times_out(self, hybrid, sample_claim_data):
+        """Test that a write missing the deadline returns and is queued for replay"""
+        hybrid.local_service.save_claim.return_value = sample_claim_data['claim_id']
+        hybrid.write_deadline = 0.05
+        cosmos = FakeAsyncCosmos(delay=0.3)
+        service = AsyncHybridDataService(hybrid, cosmos)
+
+        async def save_and_wait():
+            result = await service.save_claim_with_result(sample_claim_data)
+            await asyncio.sleep(0.4)
+            return result
+
+        result = asyncio.run(save_and_wait())
+        assert result.cloud_status == 'timeout'
+        assert result.queued is True
+        assert result.elapsed_ms < 300
+        assert len(cosmos.saved) == 1
+
+
+class TestEventLoopThread:
+    """Test cases for EventLoopThread"""
+
+    def test_runs_coroutines_from_many_threads(self):
+        """Test that coroutines submitted by several threads share one loop"""
+        runner = EventLoopThread()
+        loops, results = set(), []
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            loops.add(id(asyncio.get_running_loop()))
+            return value * 2
+
+        try:
+            threads = [threading.Thread(target=lambda i=i: results.append(runner.run(work(i))))
+                       for i in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            runner.stop()
+
+        assert sorted(results) == [i * 2 for i in range(10)]
+        assert len(loops) == 1
@@ -0,0 +1,96 @@
+"""
+Tests for bulk writes to Cosmos DB containers.
+"""
+import pytest
+import threading
+
+from services.bulk import bulk_upsert, BulkItemResult
+
+
+class FakeContainer:
+    """Container stand-in that records batches and upserts"""
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.batches = []
+        self.upserts = []
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        items = [args[0] for _, args in batch_operations]
+        if any(item['event_id'] in self.fail_ids for item in items):
+            raise Exception("batch aborted")
+        with self._lock:
+            self.batches.append((partition_key, [item['event_id'] for item in items]))
+            for item in items:
+                self.items[item['event_id']] = item
+
+    def upsert_item(self, item):
+        if item['event_id'] in self.fail_ids:
+            error = Exception("request rate too large")
+            error.status_code = 429
+            raise error
+        with self._lock:
+            self.upserts.append(item['event_id'])
+            self.items[item['event_id']] = item
+
+
+def make_events(entity_id, count, start=0):
+    """Build events that share a partition key"""
+    return [{'event_id': f"{entity_id}-{i}", 'entity_id': entity_id}
+            for i in range(start, start + count)]
+
+
+class TestBulkUpsert:
+    """Test cases for bulk_upsert"""
+
+    def test_groups_by_partition_key(self):
+        """Test that items sharing a partition key are written as one batch"""
+        container = FakeContainer()
+        items = make_events('a', 3) + make_events('b', 2) + make_events('c', 1)
+        results = bulk_upsert(container, items, 'event_id', 'entity_id')
+
+        assert [r.item_id for r in results] == [item['event_id'] for item in items]
+        assert all(r.ok for r in results)
+        assert sorted(container.batches) == [('a', ['a-0', 'a-1', 'a-2']), ('b', ['b-0', 'b-1'])]
+        assert container.upserts == ['c-0']
+
+    def test_batches_are_capped(self):
+        """Test that large groups are split into batches of batch_size"""
+        container = FakeContainer()
+        results = bulk_upsert(container, make_events('a', 250), 'event_id', 'entity_id',
+                              batch_size=100)
+
+        assert all(r.ok for r in results)
+        assert sorted(len(ids) for _, ids in container.batches) == [50, 100, 100]
+
+    def test_failed_batch_reports_per_item(self):
+        """Test that a failed batch is retried item by item"""
+        container = FakeContainer(fail_ids={'a-1'})
+        results = bulk_upsert(container, make_events('a', 3), 'event_id', 'entity_id')
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert results[1].status_code == 429
+        assert 'rate' in results[1].error
+        assert set(container.items) == {'a-0', 'a-2'}
+
+    def test_items_missing_keys(self):
+        """Test that items without an ID or partition key are rejected"""
+        container = FakeContainer()
+        results = bulk_upsert(container, [{'event_id': 'x'}, {'entity_id': 'a'}],
+                              'event_id', 'entity_id')
+
+        assert results == [BulkItemResult('x', False, error='missing entity_id'),
+                           BulkItemResult('', False, error='missing event_id')]
+        assert container.items == {}
+
+    def test_without_batches(self):
+        """Test that batching can be turned off"""
+        container = FakeContainer()
+        results = bulk_upsert(container, make_events('a', 3), 'event_id', 'entity_id',
+                              use_batches=False)
+
+        assert all(r.ok for r in results)
+        assert container.batches == []
+        assert sorted(container.upserts) == ['a-0', 'a-1', 'a-2']
@@ -0,0 +1,222 @@
+"""
+Tests for the change feed consumer that replicates Cosmos DB changes locally.
+"""
+import pytest
+import os
+from unittest.mock import patch, MagicMock
+
+from services.change_feed import ChangeFeedProcessor, load_checkpoint
+from services.claim_cache import ClaimCache
+from services.cosmos_client_factory import CosmosClientFactory
+from services.hybrid_service import HybridDataService
+from utils.config import Config
+
+
+class StandInFeedPager:
+    """Iterates over change pages and exposes the continuation token"""
+
+    def __init__(self, documents, page_size, token):
+        self.documents = documents
+        self.page_size = page_size or len(documents) or 1
+        self.continuation_token = token
+        self._position = int(token) if token else 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position >= len(self.documents):
+            raise StopIteration
+        page = self.documents[self._position:self._position + self.page_size]
+        self._position += len(page)
+        self.continuation_token = str(self._position)
+        return iter(page)
+
+
+class StandInFeed:
+    def __init__(self, documents, page_size, token):
+        self.documents, self.page_size, self.token = documents, page_size, token
+
+    def by_page(self):
+        return StandInFeedPager(self.documents, self.page_size, self.token)
+
+
+class FeedContainer:
+    """Container stand-in whose change feed lists every upserted document in order"""
+
+    def __init__(self):
+        self.changes = []
+        self.reads = []
+
+    def upsert(self, document):
+        self.changes.append(dict(document, _ts=1700000000 + len(self.changes), _etag='etag'))
+
+    def query_items_change_feed(self, continuation=None, is_start_from_beginning=False,
+                                max_item_count=None):
+        assert continuation or is_start_from_beginning
+        self.reads.append(continuation)
+        return StandInFeed(list(self.changes), max_item_count, continuation)
+
+
+def make_claim(claim_id, updated_time, status='pending'):
+    return {'claim_id': claim_id, 'claim_amount': 100.0, 'description': 'Replicated claim',
+            'submission_time': '2024-01-01T00:00:00', 'updated_time': updated_time,
+            'status': status, 'uploaded_files': []}
+
+
+def make_event(event_id, entity_id):
+    return {'event_id': event_id, 'entity_id': entity_id, 'event_type': 'claim_saved',
+            'timestamp': '2024-01-01T00:00:00', 'data': {}}
+
+
+def make_processor(local_service, temp_data_dir, claim_cache=None):
+    cosmos = MagicMock()
+    cosmos.claims_container, cosmos.events_container = FeedContainer(), FeedContainer()
+    processor = ChangeFeedProcessor(cosmos, local_service, claim_cache,
+                                    checkpoint_path=os.path.join(temp_data_dir, 'feed.json'),
+                                    page_size=2)
+    return processor, cosmos.claims_container, cosmos.events_container
+
+
+class TestChangeFeedProcessor:
+    """Test cases for ChangeFeedProcessor"""
+
+    def test_applies_changes_and_refreshes_cache(self, local_service, temp_data_dir):
+        """Test that changed claims and events reach local storage and the read cache"""
+        cache = ClaimCache()
+        processor, claims, events = make_processor(local_service, temp_data_dir, cache)
+        for i in range(3):
+            claims.upsert(make_claim(f"claim-{i}", '2024-01-02T00:00:00'))
+            events.upsert(make_event(f"event-{i}", f"claim-{i}"))
+
+        assert processor.run_once() == 6
+        assert local_service.get_claim('claim-2').description == 'Replicated claim'
+        assert '_etag' not in cache.get('claim-1')
+        assert [e.event_id for e in local_service.list_events('claim-0')] == ['event-0']
+        assert local_service.list_claim_summaries(fields=['claim_id'])[0]['claim_id'].startswith('claim-')
+        processor.stop()
+
+    def test_resumes_from_checkpoint(self, local_service, temp_data_dir):
+        """Test that a new processor reads only the changes made since the checkpoint"""
+        processor, claims, events = make_processor(local_service, temp_data_dir)
+        claims.upsert(make_claim('claim-a', '2024-01-02T00:00:00'))
+        processor.run_once()
+        processor.stop()
+        assert load_checkpoint(processor.checkpoint_path) == {'claims': '1'}
+
+        resumed = ChangeFeedProcessor(processor.cosmos_service, local_service,
+                                      checkpoint_path=processor.checkpoint_path)
+        claims.upsert(make_claim('claim-b', '2024-01-02T00:00:00'))
+        assert resumed.run_once() == 1
+        assert claims.reads[-1] == '1'
+        assert resumed.stats()['claims_applied'] == 1
+        resumed.stop()
+
+    def test_replays_do_not_clobber_or_duplicate(self, local_service, temp_data_dir):
+        """Test that older claim versions and known events are skipped"""
+        local_service.save_claim(make_claim('claim-a', None, status='approved'))
+        local_service.save_event(make_event('event-a', 'claim-a'))
+
+        applied = local_service.apply_replicated_claims([make_claim('claim-a', '2000-01-01T00:00:00')])
+        assert applied == []
+        assert local_service.get_claim('claim-a').status == 'approved'
+
+        events = [make_event('event-a', 'claim-a'), make_event('event-b', 'claim-a')]
+        assert local_service.apply_replicated_events(events) == 1
+        assert local_service.apply_replicated_events(events) == 0
+
+    def test_one_consumer_per_store(self, local_service, temp_data_dir):
+        """Test that a second processor on the same checkpoint waits for the lock"""
+        first, _, _ = make_processor(local_service, temp_data_dir)
+        second, _, _ = make_processor(local_service, temp_data_dir)
+        assert first.run_once() == 0
+        assert second.run_once() is None
+
+        first.stop()
+        assert second.run_once() == 0
+        second.stop()
+
+
+@pytest.fixture
+def replicas(temp_data_dir):
+    """Two hybrid instances with their own local stores on one fake:// account, each with a change feed consumer"""
+    CosmosClientFactory.reset()
+    Config()
+    keys = ('database.cosmos_endpoint', 'cache.enabled',
+            'storage.claims_dir', 'storage.events_dir', 'storage.backup_dir')
+    previous = [Config.get(key) for key in keys]
+    services = []
+    try:
+        for name in ('a', 'b'):
+            directory = os.path.join(temp_data_dir, name)
+            for key, value in zip(keys, ('fake://replicas', False, os.path.join(directory, 'claims'),
+                                         os.path.join(directory, 'events'), os.path.join(directory, 'backups'))):
+                Config.set(key, value)
+            service = HybridDataService()
+            # Not started; the test polls each consumer in turn
+            service.change_feed = ChangeFeedProcessor(
+                service.cosmos_service, service.local_service, service.claim_cache,
+                checkpoint_path=os.path.join(directory, 'feed.json'))
+            services.append(service)
+    finally:
+        for key, value in zip(keys, previous):
+            Config.set(key, value)
+    yield services
+    for service in services:
+        service.close()
+    CosmosClientFactory.reset()
+
+
+class TestReplication:
+    """Test cases for claims updated on several instances"""
+
+    def test_updates_converge(self, replicas, sample_claim_data):
+        """Test that alternating updates through update_claim reach the other instance"""
+        a, b = replicas
+        a.save_claim(sample_claim_data)
+        b.change_feed.run_once()
+        claim_id = sample_claim_data['claim_id']
+        assert b.get_claim(claim_id)['status'] == 'pending'
+
+        a.update_claim(claim_id, {'status': 'under_review'})
+        b.change_feed.run_once()
+        assert b.get_claim(claim_id)['status'] == 'under_review'
+
+        b.update_claim(claim_id, {'status': 'approved'})
+        a.change_feed.run_once()
+        assert a.get_claim(claim_id)['status'] == 'approved'
+
+        cloud = a.cosmos_service.get_claim(claim_id)
+        assert cloud['status'] == 'approved' and cloud['revision'] == 3
+        assert cloud['updated_time'] == a.get_claim(claim_id)['updated_time']
+
+        # A replay of an older version is ignored
+        a.change_feed.run_once()
+        assert a.local_service.apply_replicated_claims([dict(cloud, revision=2, status='pending')]) == []
+
+
+class TestReplicaReads:
+    """Test cases for hybrid reads while the change feed runs"""
+
+    def test_reads_go_local_first(self, sample_claim_data):
+        """Test that claims and listings are served locally, falling back to Cosmos DB on a miss"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            local, cosmos = mock_local.return_value, mock_cosmos.return_value
+            local.get_claim.side_effect = lambda claim_id: \
+                sample_claim_data if claim_id == sample_claim_data['claim_id'] else None
+            local.list_claim_summaries_page.return_value = ([], None)
+            cosmos.get_claim.return_value = {'claim_id': 'remote'}
+            service = HybridDataService()
+            service.use_cosmos, service.cosmos_service = True, cosmos
+            service.change_feed = MagicMock()
+            try:
+                assert service.get_claim(sample_claim_data['claim_id']) == sample_claim_data
+                cosmos.get_claim.assert_not_called()
+                assert service.get_claim('remote') == {'claim_id': 'remote'}
+
+                service.list_claim_summaries_page(10)
+                cosmos.list_claim_summaries_page.assert_not_called()
+            finally:
+                service.change_feed = None
+                service.close()
@@ -0,0 +1,193 @@
+"""
+Tests for the Cosmos DB circuit breaker and health probe.
+"""
+import pytest
+import asyncio
+import time
+from unittest.mock import patch, MagicMock
+
+from services.circuit_breaker import (CircuitBreaker, CircuitOpenError, GuardedContainer,
+                                      HealthProber, CLOSED, OPEN, HALF_OPEN)
+from services.hybrid_service import HybridDataService
+
+
+class HttpError(Exception):
+    """Error carrying an HTTP status code, like the SDK's"""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FlakyContainer:
+    """Container stand-in that fails while `down` is set"""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def read_item(self, item, partition_key):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("connection refused")
+        return {'claim_id': item}
+
+    def query_items(self, query, **kwargs):
+        self.calls += 1
+
+        def results():
+            if self.down:
+                raise ConnectionError("connection reset")
+            yield {'claim_id': 'a'}
+        return results()
+
+
+class FlakyAsyncContainer(FlakyContainer):
+    """Coroutine counterpart of FlakyContainer, like an azure.cosmos.aio container"""
+
+    async def read_item(self, item, partition_key):
+        return FlakyContainer.read_item(self, item, partition_key)
+
+    def query_items(self, query, **kwargs):
+        self.calls += 1
+
+        async def results():
+            if self.down:
+                raise ConnectionError("connection reset")
+            yield {'claim_id': 'a'}
+        return results()
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker"""
+
+    def test_opens_after_threshold_and_recovers(self):
+        """Test the closed, open, half-open and closed transitions"""
+        breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05)
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow_request()
+
+        time.sleep(0.06)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()  # one trial call at a time
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.stats()['rejected'] == 2
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed half-open trial opens the circuit again"""
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.stats()['opened'] == 2
+
+    def test_client_errors_are_not_failures(self):
+        """Test that answers from a working service keep the circuit closed"""
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        for status_code in (404, 409, 429):
+            breaker.record(HttpError(status_code))
+        assert breaker.state == CLOSED
+        breaker.record(HttpError(503))
+        breaker.record(HttpError(503))
+        assert breaker.state == OPEN
+
+
+class TestGuardedContainer:
+    """Test cases for GuardedContainer"""
+
+    def test_rejects_calls_while_open(self):
+        """Test that an open circuit fails calls without reaching the container"""
+        container = FlakyContainer()
+        guarded = GuardedContainer(container, CircuitBreaker('test', failure_threshold=2))
+        container.down = True
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                guarded.read_item(item='a', partition_key='a')
+        with pytest.raises(CircuitOpenError):
+            guarded.read_item(item='a', partition_key='a')
+        assert container.calls == 2
+
+    def test_lazy_query_failures_count(self):
+        """Test that errors raised while iterating a query are recorded"""
+        container = FlakyContainer()
+        breaker = CircuitBreaker('test', failure_threshold=1)
+        guarded = GuardedContainer(container, breaker)
+
+        assert list(guarded.query_items("SELECT * FROM c")) == [{'claim_id': 'a'}]
+        container.down = True
+        with pytest.raises(ConnectionError):
+            list(guarded.query_items("SELECT * FROM c"))
+        assert breaker.state == OPEN
+
+
+    def test_async_calls_share_the_breaker(self):
+        """Test that awaited calls and async query iteration are accounted and rejected"""
+        container = FlakyAsyncContainer()
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        guarded = GuardedContainer(container, breaker)
+
+        async def query():
+            return [item async for item in guarded.query_items("SELECT * FROM c")]
+
+        assert asyncio.run(guarded.read_item(item='a', partition_key='a')) == {'claim_id': 'a'}
+        assert asyncio.run(query()) == [{'claim_id': 'a'}]
+        container.down = True
+        with pytest.raises(ConnectionError):
+            asyncio.run(guarded.read_item(item='a', partition_key='a'))
+        with pytest.raises(ConnectionError):
+            asyncio.run(query())
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            guarded.read_item(item='a', partition_key='a')
+        assert container.calls == 4
+
+
+class TestHealthProber:
+    """Test cases for HealthProber"""
+
+    def test_probe_closes_circuit_and_caches_snapshot(self):
+        """Test that a successful probe closes an open circuit"""
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+        probe = MagicMock(side_effect=[ConnectionError("down"), {'id': 'db'}])
+        prober = HealthProber(breaker, probe)
+
+        snapshot = prober.check()
+        assert snapshot['healthy'] is False
+        assert breaker.state == OPEN
+
+        snapshot = prober.check()
+        assert snapshot['healthy'] is True
+        assert snapshot['circuit']['state'] == CLOSED
+        assert prober.snapshot()['checked_at'] == snapshot['checked_at']
+
+
+class TestHybridRouting:
+    """Test cases for routing around an open circuit"""
+
+    def test_open_circuit_routes_to_local(self, sample_claim_data):
+        """Test that reads skip Cosmos DB and writes are queued while the circuit is open"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            mock_local.return_value.get_claim.return_value = sample_claim_data
+            mock_local.return_value.save_claim.return_value = sample_claim_data['claim_id']
+            service = HybridDataService()
+            service.use_cosmos = True
+            service.cosmos_service = mock_cosmos.return_value
+            service.cosmos_service.is_available.return_value = False
+            service.sync_interval = 60
+            try:
+                assert service.get_claim(sample_claim_data['claim_id']) == sample_claim_data
+                result = service.save_claim_with_result(dict(sample_claim_data, status='approved'))
+                assert result.cloud_status == 'queued'
+                assert result.elapsed_ms < 1000
+                mock_cosmos.return_value.get_claim.assert_not_called()
+            finally:
+                service.close()
@@ -0,0 +1,215 @@
+"""
+Tests for the in-process claim read cache.
+"""
+import pytest
+import threading
+import time
+from unittest.mock import patch
+
+from services.claim_cache import ClaimCache
+from services.hybrid_service import HybridDataService
+
+
+class TestClaimCache:
+    """Test cases for ClaimCache"""
+
+    def test_get_or_load_caches_result(self):
+        """Test that a loaded claim is served from the cache afterwards"""
+        cache = ClaimCache()
+        calls = []
+
+        def loader(claim_id):
+            calls.append(claim_id)
+            return {'claim_id': claim_id, 'status': 'Pending'}
+
+        assert cache.get_or_load('c1', loader)['status'] == 'Pending'
+        assert cache.get_or_load('c1', loader)['status'] == 'Pending'
+        assert calls == ['c1']
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['loads'] == 1
+
+    def test_missing_claims_are_not_cached(self):
+        """Test that a None result is reloaded on the next lookup"""
+        cache = ClaimCache()
+        calls = []
+
+        def loader(claim_id):
+            calls.append(claim_id)
+            return None
+
+        assert cache.get_or_load('missing', loader) is None
+        assert cache.get_or_load('missing', loader) is None
+        assert len(calls) == 2
+
+    def test_returned_values_are_copies(self):
+        """Test that callers cannot mutate the cached document"""
+        cache = ClaimCache()
+        cache.put('c1', {'claim_id': 'c1', 'tags': ['a']})
+        value = cache.get('c1')
+        value['tags'].append('b')
+        assert cache.get('c1')['tags'] == ['a']
+
+    def test_lru_eviction(self):
+        """Test that the least recently used claim is evicted first"""
+        cache = ClaimCache(max_entries=2)
+        cache.put('c1', {'claim_id': 'c1'})
+        cache.put('c2', {'claim_id': 'c2'})
+        cache.get('c1')
+        cache.put('c3', {'claim_id': 'c3'})
+        assert cache.get('c2') is None
+        assert cache.get('c1') is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        cache = ClaimCache(ttl_seconds=0.05)
+        cache.put('c1', {'claim_id': 'c1'})
+        assert cache.get('c1') is not None
+        time.sleep(0.1)
+        assert cache.get('c1') is None
+
+    def test_invalidate(self):
+        """Test that invalidated claims are reloaded"""
+        cache = ClaimCache()
+        cache.put('c1', {'claim_id': 'c1', 'status': 'Pending'})
+        cache.invalidate('c1')
+        value = cache.get_or_load('c1', lambda claim_id: {'claim_id': claim_id, 'status': 'Approved'})
+        assert value['status'] == 'Approved'
+        assert cache.stats()['invalidations'] == 1
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Test that simultaneous misses trigger a single load"""
+        cache = ClaimCache()
+        calls = []
+        release = threading.Event()
+
+        def loader(claim_id):
+            calls.append(claim_id)
+            release.wait(5)
+            return {'claim_id': claim_id}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('c1', loader)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert len(results) == 8
+        assert all(result == {'claim_id': 'c1'} for result in results)
+        assert cache.stats()['coalesced'] == 7
+
+    def test_loader_errors_reach_waiters(self):
+        """Test that a failed load is raised to every caller and not cached"""
+        cache = ClaimCache()
+
+        def loader(claim_id):
+            raise IOError("storage unavailable")
+
+        with pytest.raises(IOError):
+            cache.get_or_load('c1', loader)
+        assert cache.get('c1') is None
+
+    def test_write_during_load_wins(self):
+        """Test that a load finishing after a write does not cache old data"""
+        cache = ClaimCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        def loader(claim_id):
+            started.set()
+            release.wait(5)
+            return {'claim_id': claim_id, 'status': 'Pending'}
+
+        thread = threading.Thread(target=cache.get_or_load, args=('c1', loader))
+        thread.start()
+        started.wait(5)
+        cache.put('c1', {'claim_id': 'c1', 'status': 'Approved'})
+        release.set()
+        thread.join(5)
+
+        assert cache.get('c1')['status'] == 'Approved'
+
+    def test_entries_follow_the_write_version(self):
+        """Test that entries loaded before another process wrote are reloaded"""
+        version = ['v1']
+        cache = ClaimCache(version=lambda: version[0])
+        calls = []
+
+        def loader(claim_id):
+            calls.append(claim_id)
+            return {'claim_id': claim_id, 'status': f"status-{len(calls)}"}
+
+        assert cache.get_or_load('c1', loader)['status'] == 'status-1'
+        assert cache.get_or_load('c1', loader)['status'] == 'status-1'
+        version[0] = 'v2'
+        assert cache.get_or_load('c1', loader)['status'] == 'status-2'
+        assert cache.stats()['outdated'] == 1
+
+        # Without a version nothing is cached
+        version[0] = None
+        cache.get_or_load('c1', loader)
+        cache.get_or_load('c1', loader)
+        assert len(calls) == 4
+
+
+class TestHybridClaimCache:
+    """Test cases for the read cache inside HybridDataService"""
+
+    def test_repeated_reads_hit_cache(self, sample_claim_data):
+        """Test that a hot claim is only read from storage once"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local:
+            mock_local.return_value.get_claim.return_value = sample_claim_data
+
+            service = HybridDataService()
+            service.use_cosmos = False
+            service.cosmos_service = None
+
+            for _ in range(3):
+                assert service.get_claim(sample_claim_data['claim_id']) == sample_claim_data
+            mock_local.return_value.get_claim.assert_called_once()
+            assert service.get_cache_stats()['hits'] == 2
+
+    def test_update_is_visible_immediately(self, sample_claim_data):
+        """Test that writes go through the cache instead of serving stale data"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local:
+            mock_local.return_value.get_claim.return_value = sample_claim_data
+            mock_local.return_value.save_claim.return_value = sample_claim_data['claim_id']
+
+            service = HybridDataService()
+            service.use_cosmos = False
+            service.cosmos_service = None
+
+            claim_id = sample_claim_data['claim_id']
+            service.get_claim(claim_id)
+            service.update_claim(claim_id, {'status': 'Approved'})
+            assert service.get_claim(claim_id)['status'] == 'Approved'
+            mock_local.return_value.get_claim.assert_called_once()
+
+            service.delete_claim(claim_id)
+            service.get_claim(claim_id)
+            assert mock_local.return_value.get_claim.call_count == 2
+
+    def test_writes_by_another_instance_are_seen(self, local_service, sample_claim_data):
+        """Test that a cached claim is reloaded after another service on the store updates it"""
+        from services.data_service import LocalDataService
+        with patch('services.hybrid_service.HybridDataService._create_local_service',
+                   side_effect=lambda: LocalDataService()):
+            first, second = HybridDataService(), HybridDataService()
+        try:
+            for service in (first, second):
+                service.use_cosmos, service.cosmos_service = False, None
+            claim_id = sample_claim_data['claim_id']
+            first.save_claim(sample_claim_data)
+            assert second.get_claim(claim_id)['status'] == 'pending'
+
+            first.update_claim(claim_id, {'status': 'approved'})
+            assert second.get_claim(claim_id)['status'] == 'approved'
+        finally:
+            first.close()
+            second.close()
@@ -0,0 +1,119 @@
+"""
+Tests for the persistent claim time index.
+"""
+import pytest
+import os
+import json
+
+from services.claim_index import ClaimTimeIndex
+
+
+def write_claim(claims_dir, claim_id, submission_time, updated_time=None):
+    """Write a claim file the way the file engine lays it out"""
+    with open(os.path.join(claims_dir, f"{claim_id}.json"), 'w') as f:
+        json.dump({'claim_id': claim_id, 'submission_time': submission_time,
+                   'updated_time': updated_time}, f)
+
+
+@pytest.fixture
+def journal_path(temp_data_dir):
+    """Path of the index journal inside the temporary claims directory"""
+    return os.path.join(temp_data_dir, '.claim_index.jsonl')
+
+
+class TestClaimTimeIndex:
+    """Test cases for ClaimTimeIndex"""
+
+    def test_page_orders_by_submission_time(self, temp_data_dir, journal_path):
+        """Test that pages follow submission_time, newest first"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        index.put('old', '2025-01-01T00:00:00', '2025-03-01T00:00:00')
+        index.put('new', '2025-02-01T00:00:00', '2025-02-01T00:00:00')
+        index.put('mid', '2025-01-15T00:00:00', None)
+
+        assert index.page(limit=10) == ['new', 'mid', 'old']
+        assert index.page(limit=1, offset=1) == ['mid']
+        assert index.page(limit=10, offset=5) == []
+        assert index.page(limit=10, sort_by='updated_time') == ['old', 'new', 'mid']
+        assert index.page(limit=10, after=('2025-02-01T00:00:00', 'new')) == ['mid', 'old']
+
+    def test_put_moves_existing_entry(self, temp_data_dir, journal_path):
+        """Test that re-indexing a claim replaces its previous position"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        index.put('a', '2025-01-01T00:00:00', '2025-01-01T00:00:00')
+        index.put('b', '2025-01-02T00:00:00', '2025-01-02T00:00:00')
+        index.put('a', '2025-01-01T00:00:00', '2025-01-03T00:00:00')
+
+        assert len(index) == 2
+        assert index.page(sort_by='updated_time') == ['a', 'b']
+
+    def test_remove(self, temp_data_dir, journal_path):
+        """Test removing a claim from the index"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        index.put('a', '2025-01-01T00:00:00', None)
+        index.remove('a')
+
+        assert index.page() == []
+        assert index.get('a') is None
+
+    def test_journal_survives_reload(self, temp_data_dir, journal_path):
+        """Test that a second instance sees the same entries"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        index.put('a', '2025-01-01T00:00:00', None)
+        index.put('b', '2025-01-02T00:00:00', None)
+        index.remove('a')
+
+        reloaded = ClaimTimeIndex(journal_path, temp_data_dir)
+        assert reloaded.page() == ['b']
+
+    def test_catches_up_with_other_writers(self, temp_data_dir, journal_path):
+        """Test that appends from another instance are picked up before reads"""
+        first = ClaimTimeIndex(journal_path, temp_data_dir)
+        second = ClaimTimeIndex(journal_path, temp_data_dir)
+
+        second.put('a', '2025-01-01T00:00:00', None)
+        assert first.page() == ['a']
+
+        second.compact()
+        first.put('b', '2025-01-02T00:00:00', None)
+        assert second.page() == ['b', 'a']
+
+    def test_rebuilds_from_claim_files(self, temp_data_dir, journal_path):
+        """Test that a missing journal is rebuilt from the claim files"""
+        write_claim(temp_data_dir, 'a', '2025-01-01T00:00:00')
+        write_claim(temp_data_dir, 'b', '2025-01-02T00:00:00')
+
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        assert index.page() == ['b', 'a']
+
+        os.remove(journal_path)
+        write_claim(temp_data_dir, 'c', '2025-01-03T00:00:00')
+        assert index.page() == ['c', 'b', 'a']
+        assert os.path.exists(journal_path)
+
+    def test_compaction_keeps_entries(self, temp_data_dir, journal_path):
+        """Test that journal compaction shrinks the file without losing data"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir, compact_min_records=10)
+        for i in range(30):
+            index.put('a', f"2025-01-01T00:00:{i:02d}", None)
+        index.put('b', '2025-01-02T00:00:00', None)
+
+        with open(journal_path) as f:
+            assert len(f.readlines()) < 30
+        assert index.page() == ['b', 'a']
+        assert index.get('a')['submission_time'] == '2025-01-01T00:00:29'
+
+    def test_summaries_follow_entries(self, temp_data_dir, journal_path):
+        """Test that summaries are paged with their entries and survive a rebuild"""
+        index = ClaimTimeIndex(journal_path, temp_data_dir)
+        index.put('a', '2025-01-01T00:00:00', None, summary={'claim_id': 'a', 'status': 'pending'})
+        index.put('b', '2025-01-02T00:00:00', None)
+
+        assert index.page_summaries() == [('b', None), ('a', {'claim_id': 'a', 'status': 'pending'})]
+        assert ClaimTimeIndex(journal_path, temp_data_dir).page_summaries(limit=1, offset=1)[0][1] == \
+            {'claim_id': 'a', 'status': 'pending'}
+
+        os.remove(journal_path)
+        write_claim(temp_data_dir, 'c', '2025-01-03T00:00:00')
+        claim_id, summary = index.page_summaries(limit=1)[0]
+        assert claim_id == 'c' and summary['files_count'] == 0
@@ -0,0 +1,73 @@
+"""
+Tests for the process-wide Cosmos DB client.
+"""
+import pytest
+import os
+from unittest.mock import patch, MagicMock
+
+from services.cosmos_client_factory import CosmosClientFactory
+from services.cosmos_service import CosmosDBService
+from utils.config import Config
+
+
+@pytest.fixture
+def cosmos_client():
+    """Patch CosmosClient and start from an empty client cache"""
+    CosmosClientFactory.reset()
+    with patch('services.cosmos_client_factory.CosmosClient') as mock_client:
+        mock_client.side_effect = lambda **kwargs: MagicMock()
+        yield mock_client
+    CosmosClientFactory.reset()
+
+
+class TestCosmosClientFactory:
+    """Test cases for CosmosClientFactory"""
+
+    def test_client_is_shared(self, cosmos_client):
+        """Test that one client is created per endpoint and credential"""
+        first = CosmosClientFactory.get_shared_client('https://a', key='k')
+        assert CosmosClientFactory.get_shared_client('https://a', key='k') is first
+        assert CosmosClientFactory.get_shared_client('https://a', key='other') is not first
+        assert cosmos_client.call_count == 2
+
+    def test_pool_size(self, cosmos_client):
+        """Test that the transport pools the configured number of connections"""
+        CosmosClientFactory.get_shared_client('https://a', key='k', pool_size=64)
+        transport = cosmos_client.call_args.kwargs['transport']
+        adapter = transport.session.get_adapter('https://a')
+        assert adapter._pool_maxsize == 64
+
+    def test_forked_process_gets_its_own_client(self, cosmos_client):
+        """Test that a client inherited across fork is not reused"""
+        parent = CosmosClientFactory.get_shared_client('https://a', key='k')
+        with patch('services.cosmos_client_factory.os.getpid', return_value=os.getpid() + 1):
+            child = CosmosClientFactory.get_shared_client('https://a', key='k')
+        assert child is not parent
+
+    def test_warm_up_runs_once(self, cosmos_client):
+        """Test that database and containers are read once per process"""
+        client = CosmosClientFactory.get_shared_client('https://a', key='k')
+        database = client.get_database_client.return_value
+        database.read.return_value = {'id': 'db'}
+
+        for _ in range(3):
+            assert CosmosClientFactory.warm_up(client, 'db', ['claims', 'events']) == {'id': 'db'}
+        assert database.read.call_count == 1
+        assert database.get_container_client.return_value.read.call_count == 2
+
+    def test_services_share_the_connection(self, cosmos_client):
+        """Test that creating services after the first costs no round trips"""
+        with patch.dict(os.environ, {'COSMOS_ENDPOINT': 'https://a', 'COSMOS_KEY': 'k'}):
+            Config()
+            previous = (Config.get('database.cosmos_endpoint'), Config.get('database.cosmos_key'))
+            Config.set('database.cosmos_endpoint', 'https://a')
+            Config.set('database.cosmos_key', 'k')
+            try:
+                services = [CosmosDBService() for _ in range(5)]
+            finally:
+                Config.set('database.cosmos_endpoint', previous[0])
+                Config.set('database.cosmos_key', previous[1])
+
+        assert all(service.is_connected() for service in services)
+        assert len({id(service.client) for service in services}) == 1
+        assert services[0].client.get_database_client.return_value.read.call_count == 1
@@ -0,0 +1,230 @@
+"""
+Tests for partition-aware event queries and the events container migration.
+
+The containers are stand-ins that model physical partitions: a query
+scoped to a partition key touches one partition, a cross-partition query
+touches all of them, and each touched partition adds to the request charge
+and to the simulated latency.
+"""
+import pytest
+import json
+import os
+import zlib
+from unittest.mock import patch
+
+from services.cosmos_service import CosmosDBService
+from services.cosmos_queries import LIST_ENTITY_EVENTS_QUERY, LEGACY_TOKEN_PREFIX, event_query
+from services.event_migration import migrate_events, count_events
+
+PHYSICAL_PARTITIONS = 8
+RU_PER_PARTITION = 2.5
+RU_PER_DOCUMENT = 0.1
+MS_PER_PARTITION = 4.0
+
+
+class StandInPager:
+    """Iterates over pages and exposes the continuation token of the next one"""
+
+    def __init__(self, items, page_size, token):
+        self.items = items
+        self.page_size = page_size or len(items) or 1
+        self.continuation_token = token
+        self._position = int(token) if token else 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position >= len(self.items):
+            raise StopIteration
+        page = self.items[self._position:self._position + self.page_size]
+        self._position += len(page)
+        self.continuation_token = str(self._position) if self._position < len(self.items) else None
+        return iter(page)
+
+
+class StandInQuery(list):
+    """Query result that can also be read page by page"""
+
+    def __init__(self, items, page_size):
+        super().__init__(items)
+        self.page_size = page_size
+
+    def by_page(self, continuation_token=None):
+        return StandInPager(list(self), self.page_size, continuation_token)
+
+
+class PartitionedContainer:
+    """In-memory container that accounts request units per touched partition"""
+
+    def __init__(self, partition_key_field, fail_ids=()):
+        self.partition_key_field = partition_key_field
+        self.fail_ids = set(fail_ids)
+        self.items = {}
+        self.calls = []
+        self.request_charge = 0.0
+        self.simulated_ms = 0.0
+        self.last_response_headers = {}
+
+    def _partition(self, value):
+        return zlib.crc32(str(value).encode('utf-8')) % PHYSICAL_PARTITIONS
+
+    def upsert_item(self, item):
+        if item.get('event_id') in self.fail_ids:
+            raise Exception("write failed")
+        self.items[item['event_id']] = dict(item, _rid='rid', _ts=1)
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        for _, (item,) in batch_operations:
+            if item[self.partition_key_field] != partition_key:
+                raise Exception("batch spans partitions")
+            self.upsert_item(item)
+
+    def query_items(self, query, parameters=None, partition_key=None,
+                    enable_cross_partition_query=False, max_item_count=None):
+        params = {p['name']: p['value'] for p in parameters or []}
+        assert "'" not in query, "query text must not embed values"
+        if partition_key is None and not enable_cross_partition_query:
+            raise Exception("cross-partition query not enabled")
+
+        if partition_key is not None:
+            touched = {self._partition(partition_key)}
+            candidates = [item for item in self.items.values()
+                          if item.get(self.partition_key_field) == partition_key]
+        else:
+            touched = set(range(PHYSICAL_PARTITIONS))
+            candidates = list(self.items.values())
+
+        if '@entity_id' in params:
+            candidates = [item for item in candidates if item.get('entity_id') == params['@entity_id']]
+        if 'c.timestamp DESC' in query:
+            candidates.sort(key=lambda item: item.get('timestamp') or '', reverse=True)
+        if '@limit' in params:
+            candidates = candidates[params.get('@offset', 0):params.get('@offset', 0) + params['@limit']]
+        results = [len(candidates)] if 'COUNT(1)' in query else candidates
+
+        charge = len(touched) * RU_PER_PARTITION + len(candidates) * RU_PER_DOCUMENT
+        self.request_charge += charge
+        self.simulated_ms += len(touched) * MS_PER_PARTITION
+        self.last_response_headers = {'x-ms-request-charge': str(charge)}
+        self.calls.append({'query': query, 'parameters': params, 'partition_key': partition_key,
+                           'partitions': len(touched)})
+        return StandInQuery(results, max_item_count)
+
+
+def make_events(entity_count, per_entity):
+    """Events for several claims with increasing timestamps"""
+    return [{'event_id': f"e-{entity}-{i}", 'entity_id': f"claim-{entity}", 'event_type': 'claim_saved',
+             'timestamp': f"2024-01-01T00:{entity:02d}:{i:02d}", 'data': {}}
+            for entity in range(entity_count) for i in range(per_entity)]
+
+
+def make_service(events_container, legacy_container=None):
+    """CosmosDBService wired to stand-in containers"""
+    with patch.dict(os.environ, {'COSMOS_ENDPOINT': ''}):
+        service = CosmosDBService()
+    service.client = object()
+    service.claims_container = PartitionedContainer('claim_id')
+    service.events_container = events_container
+    service.legacy_events_container = legacy_container
+    return service
+
+
+def fill(container, events):
+    """Store events directly in a container"""
+    for event in events:
+        container.items[event['event_id']] = dict(event)
+
+
+class TestPartitionedEventQueries:
+    """Test cases for entity event lookups"""
+
+    def test_entity_lookup_is_single_partition_and_parameterized(self):
+        """Test that a claim's events are read from one partition with bound parameters"""
+        container = PartitionedContainer('entity_id')
+        fill(container, make_events(5, 3))
+        service = make_service(container)
+
+        events = service.list_events("claim-2", limit=2)
+        assert [e['event_id'] for e in events] == ['e-2-2', 'e-2-1']
+
+        service.list_events("claim-1' OR '1'='1")
+        queries = {call['query'] for call in container.calls}
+        assert queries == {LIST_ENTITY_EVENTS_QUERY}
+        assert all(call['partitions'] == 1 for call in container.calls)
+        assert container.calls[-1]['parameters']['@entity_id'] == "claim-1' OR '1'='1"
+
+    def test_request_units_and_latency_against_legacy_layout(self):
+        """Test that entity-partitioned lookups cost a fraction of fan-out lookups"""
+        events = make_events(40, 5)
+        legacy, current = PartitionedContainer('event_id'), PartitionedContainer('entity_id')
+        fill(legacy, events)
+        fill(current, events)
+        service = make_service(current)
+
+        for entity in range(40):
+            # A container partitioned on /event_id can only answer with a fan-out query
+            query = event_query(f"claim-{entity}", 100)
+            assert service._query(legacy, query['query'], query['parameters']) == \
+                service.list_events(f"claim-{entity}")
+
+        assert all(call['partitions'] == PHYSICAL_PARTITIONS for call in legacy.calls)
+        assert current.request_charge < legacy.request_charge / 4
+        assert current.simulated_ms * PHYSICAL_PARTITIONS == legacy.simulated_ms
+
+    def test_dual_read_merges_legacy_events(self):
+        """Test that unmigrated events are still returned during the transition"""
+        legacy, current = PartitionedContainer('event_id'), PartitionedContainer('entity_id')
+        events = make_events(1, 4)
+        fill(legacy, events[:3])
+        fill(current, events[2:])
+        service = make_service(current, legacy)
+
+        listed = service.list_events("claim-0")
+        assert [e['event_id'] for e in listed] == ['e-0-3', 'e-0-2', 'e-0-1', 'e-0-0']
+
+    def test_page_falls_back_to_legacy_container(self):
+        """Test that an unmigrated claim is paged from the legacy container"""
+        legacy, current = PartitionedContainer('event_id'), PartitionedContainer('entity_id')
+        fill(legacy, make_events(1, 3))
+        service = make_service(current, legacy)
+
+        page, token = service.list_events_page("claim-0", limit=2)
+        assert [e['event_id'] for e in page] == ['e-0-2', 'e-0-1']
+        assert token.startswith(LEGACY_TOKEN_PREFIX)
+
+        page, token = service.list_events_page("claim-0", limit=2, continuation_token=token)
+        assert [e['event_id'] for e in page] == ['e-0-0']
+        assert token is None
+
+
+class TestEventMigration:
+    """Test cases for copying events to the entity-partitioned container"""
+
+    def test_copies_all_events(self, temp_data_dir):
+        """Test that every event is copied without Cosmos system properties"""
+        legacy, current = PartitionedContainer('event_id'), PartitionedContainer('entity_id')
+        fill(legacy, [dict(event, _etag='x', _self='y') for event in make_events(6, 4)])
+        checkpoint = os.path.join(temp_data_dir, 'checkpoint.json')
+
+        result = migrate_events(legacy, current, page_size=5, checkpoint_path=checkpoint)
+        assert result == {'copied': 24, 'failed': 0, 'complete': True}
+        assert count_events(current) == count_events(legacy) == 24
+        assert '_etag' not in current.items['e-3-1']
+
+    def test_resumes_from_checkpoint(self, temp_data_dir):
+        """Test that a failed page stops the run and is retried on the next"""
+        legacy = PartitionedContainer('event_id')
+        fill(legacy, make_events(3, 4))
+        checkpoint = os.path.join(temp_data_dir, 'checkpoint.json')
+
+        failing = PartitionedContainer('entity_id', fail_ids={'e-2-0'})
+        result = migrate_events(legacy, failing, page_size=4, checkpoint_path=checkpoint)
+        assert result['complete'] is False
+        with open(checkpoint) as f:
+            assert json.load(f)['continuation_token'] == '8'
+
+        current = PartitionedContainer('entity_id')
+        result = migrate_events(legacy, current, page_size=4, checkpoint_path=checkpoint)
+        assert result == {'copied': 4, 'failed': 0, 'complete': True}
+        assert sorted(current.items) == [f"e-2-{i}" for i in range(4)]
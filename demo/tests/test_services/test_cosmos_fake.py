@@ -0,0 +1,152 @@
+"""
+Tests for the in-memory Cosmos DB fake.
+"""
+import pytest
+import os
+
+from azure.cosmos import exceptions
+
+from services.change_feed import ChangeFeedProcessor
+from services.cosmos_client_factory import CosmosClientFactory
+from services.cosmos_fake import FakeCosmosClient, create_fake_client
+from services.cosmos_metrics import cosmos_metrics
+from services.cosmos_service import CosmosDBService
+from services.event_migration import count_events
+from services.circuit_breaker import CLOSED
+from services.cosmos_queries import claim_summaries_query
+from utils.config import Config
+
+
+@pytest.fixture
+def fake_service():
+    """CosmosDBService connected to a fresh fake:// endpoint"""
+    CosmosClientFactory.reset()
+    Config()
+    previous = Config.get('database.cosmos_endpoint')
+    Config.set('database.cosmos_endpoint', 'fake://test?partitions=4')
+    try:
+        service = CosmosDBService()
+    finally:
+        Config.set('database.cosmos_endpoint', previous)
+    yield service
+    CosmosClientFactory.reset()
+
+
+def claims_container():
+    return FakeCosmosClient().get_database_client('db').get_container_client('claims')
+
+
+class TestFakeContainer:
+    """Test cases for FakeContainer"""
+
+    def test_point_operations(self, sample_claim_data):
+        """Test upsert, read, delete and the 404 of a missing item"""
+        container = claims_container()
+        container.upsert_item(sample_claim_data)
+        claim_id = sample_claim_data['claim_id']
+
+        item = container.read_item(item=claim_id, partition_key=claim_id)
+        assert item['description'] == sample_claim_data['description']
+        assert '_etag' in item
+        container.delete_item(item=claim_id, partition_key=claim_id)
+        with pytest.raises(exceptions.CosmosResourceNotFoundError):
+            container.read_item(item=claim_id, partition_key=claim_id)
+
+    def test_queries_project_order_and_page(self, sample_claim_data):
+        """Test projections, ordering and continuation tokens"""
+        container = claims_container()
+        for i in range(5):
+            container.upsert_item(dict(sample_claim_data, claim_id=f"claim-{i}",
+                                       submission_time=f"2024-01-0{i + 1}T00:00:00"))
+
+        pager = container.query_items(query=claim_summaries_query(['claim_id', 'files_count'], paged=True),
+                                      enable_cross_partition_query=True, max_item_count=2).by_page()
+        first = list(next(pager))
+        assert first == [{'claim_id': 'claim-4', 'files_count': 0}, {'claim_id': 'claim-3', 'files_count': 0}]
+        resumed = container.query_items(query=claim_summaries_query(['claim_id'], paged=True),
+                                        enable_cross_partition_query=True,
+                                        max_item_count=2).by_page(pager.continuation_token)
+        assert [item['claim_id'] for item in next(resumed)] == ['claim-2', 'claim-1']
+        assert count_events(container) == 5
+
+        with pytest.raises(exceptions.CosmosHttpResponseError):
+            list(container.query_items(query="SELECT * FROM c WHERE c.claim_amount > 5",
+                                       enable_cross_partition_query=True))
+
+    def test_cross_partition_queries_cost_more(self, sample_claim_data):
+        """Test that a query scoped to one partition key touches one physical partition"""
+        container = claims_container()
+        container.upsert_item(sample_claim_data)
+        claim_id = sample_claim_data['claim_id']
+        query = {'query': "SELECT * FROM c WHERE c.claim_id = @id",
+                 'parameters': [{'name': '@id', 'value': claim_id}]}
+        charges = []
+
+        def hook(headers, result):
+            charges.append(float(headers['x-ms-request-charge']))
+
+        assert len(list(container.query_items(partition_key=claim_id, response_hook=hook, **query))) == 1
+        assert len(list(container.query_items(enable_cross_partition_query=True,
+                                              response_hook=hook, **query))) == 1
+        assert charges[1] == charges[0] + 3 * 2.5
+        with pytest.raises(exceptions.CosmosHttpResponseError):
+            list(container.query_items(**query))
+
+
+class TestFakeClient:
+    """Test cases for the fake behind the services"""
+
+    def test_factory_selects_fake(self):
+        """Test that fake:// endpoints share one fake client and need no key"""
+        CosmosClientFactory.reset()
+        client = CosmosClientFactory.get_shared_client('fake://a?latency_ms=0&seed=1')
+        assert isinstance(client, FakeCosmosClient)
+        assert CosmosClientFactory.get_shared_client('fake://a?latency_ms=0&seed=1') is client
+        CosmosClientFactory.reset()
+        with pytest.raises(ValueError):
+            create_fake_client('fake://a?latency=5')
+
+    def test_service_round_trip_with_metrics(self, fake_service, sample_claim_data):
+        """Test the service against the fake, with synthetic charges in the metrics"""
+        cosmos_metrics.reset()
+        fake_service.aggregates_container = None  # charge the claim write alone
+        assert fake_service.is_connected()
+        assert fake_service.save_claim(sample_claim_data)
+        assert fake_service.get_claim(sample_claim_data['claim_id'])['claim_id'] == sample_claim_data['claim_id']
+        assert fake_service.get_claim('missing') is None
+        assert len(fake_service.list_claims()) == 1
+
+        operations = cosmos_metrics.snapshot()['operations']
+        assert operations['save_claim']['request_charge']['sum'] == 5.5
+        assert operations['list_claims']['request_charge']['sum'] == 4 * 2.5 + 0.1
+        cosmos_metrics.reset()
+
+    def test_throttling_does_not_open_the_circuit(self, fake_service, sample_claim_data):
+        """Test that injected 429s fail the request but leave the breaker closed"""
+        fake_service.client.throttle_rate = 1.0
+        for _ in range(fake_service.breaker.failure_threshold + 1):
+            assert fake_service.save_claim(sample_claim_data) is False
+        assert fake_service.breaker.state == CLOSED
+        fake_service.client.throttle_rate = 0.0
+        assert fake_service.save_claim(sample_claim_data) is True
+
+    def test_throttled_write_is_not_applied(self, sample_claim_data):
+        """Test that a request answered 429 leaves the container unchanged"""
+        client = FakeCosmosClient()
+        container = client.get_database_client('db').get_container_client('claims')
+        client.throttle_next(1)
+        with pytest.raises(exceptions.CosmosHttpResponseError):
+            container.upsert_item(sample_claim_data)
+        assert list(container.read_all_items()) == []
+
+    def test_change_feed_replicates(self, fake_service, local_service, temp_data_dir, sample_claim_data):
+        """Test that the change feed processor runs against the fake"""
+        fake_service.save_claim(sample_claim_data)
+        processor = ChangeFeedProcessor(fake_service, local_service,
+                                        checkpoint_path=os.path.join(temp_data_dir, 'feed.json'))
+        assert processor.run_once() == 1
+        assert local_service.get_claim(sample_claim_data['claim_id']) is not None
+        fake_service.save_claim(dict(sample_claim_data, claim_id='claim-2'))
+        assert processor.run_once() == 1
+        assert processor.run_once() == 0
+        processor.stop()
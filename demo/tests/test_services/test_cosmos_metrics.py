@@ -0,0 +1,185 @@
+"""
+Tests for the request-unit and latency instrumentation of Cosmos DB calls.
+"""
+import pytest
+import asyncio
+import logging
+import os
+from unittest.mock import patch
+
+from services.cosmos_metrics import (Histogram, InstrumentedContainer, cosmos_metrics,
+                                     instrumented)
+from services.cosmos_service import CosmosDBService
+
+
+class HttpError(Exception):
+    """Error carrying an HTTP status code, like the SDK's"""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class ChargingContainer:
+    """Container stand-in that reports a request charge through response_hook"""
+
+    def __init__(self, charge=2.5, server_ms=1.5, throttled=False):
+        self.charge = charge
+        self.server_ms = server_ms
+        self.throttled = throttled
+        self.items = {}
+
+    def _respond(self, response_hook, result, retries=0):
+        response_hook({'x-ms-request-charge': str(self.charge),
+                       'x-ms-request-duration-ms': str(self.server_ms),
+                       'x-ms-throttle-retry-count': str(retries),
+                       'x-ms-activity-id': 'activity-1'}, result)
+        return result
+
+    def read_item(self, item, partition_key, response_hook):
+        if self.throttled:
+            raise HttpError(429)
+        return self._respond(response_hook, self.items[item], retries=1)
+
+    def upsert_item(self, body, response_hook):
+        self.items[body['claim_id']] = body
+        return self._respond(response_hook, body)
+
+    def execute_item_batch(self, batch_operations, partition_key, response_hook):
+        for _, (item,) in batch_operations:
+            self.items[item['claim_id']] = item
+        return self._respond(response_hook, [])
+
+    def query_items(self, query, parameters=None, enable_cross_partition_query=False, response_hook=None):
+        items = list(self.items.values())
+        for start in range(0, len(items), 2):  # one response per page of two
+            self._respond(response_hook, {})
+            yield from items[start:start + 2]
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start every test from empty metrics with the default thresholds"""
+    cosmos_metrics.reset()
+    cosmos_metrics.configure(50.0, 500.0)
+    yield
+    cosmos_metrics.reset()
+
+
+def make_service(container):
+    """CosmosDBService wired to an instrumented stand-in container"""
+    with patch.dict(os.environ, {'COSMOS_ENDPOINT': ''}):
+        service = CosmosDBService()
+    service.client = object()
+    service.claims_container = InstrumentedContainer(container)
+    return service
+
+
+def operation(name):
+    return cosmos_metrics.snapshot()['operations'][name]
+
+
+class TestHistogram:
+    """Test cases for Histogram"""
+
+    def test_buckets_and_percentiles(self):
+        """Test cumulative bucket counts and bucket-bound percentiles"""
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50, 500):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot['buckets'] == {'1': 1, '10': 3, '100': 4, '+Inf': 5}
+        assert snapshot['count'] == 5
+        assert snapshot['sum'] == 560.5
+        assert snapshot['p50'] == 10
+        assert snapshot['p99'] == 500
+
+
+class TestInstrumentedService:
+    """Test cases for metrics of CosmosDBService operations"""
+
+    def test_records_charge_latency_and_items(self, sample_claim_data):
+        """Test that each operation records its request charge and item count"""
+        container = ChargingContainer()
+        service = make_service(container)
+        for i in range(5):
+            service.save_claim(dict(sample_claim_data, claim_id=f"claim-{i}"))
+
+        assert len(service.list_claims()) == 5
+        assert service.get_claim('claim-0')['claim_id'] == 'claim-0'
+
+        saves, lists = operation('save_claim'), operation('list_claims')
+        assert saves['calls'] == 5
+        assert saves['request_charge']['sum'] == 12.5
+        assert lists['request_charge']['sum'] == 7.5  # three pages
+        assert lists['server_latency_ms']['sum'] == 4.5
+        assert lists['item_count']['sum'] == 5
+        assert lists['client_latency_ms']['count'] == 1
+        assert operation('get_claim')['throttled'] == 1
+
+    def test_throttled_errors_are_counted(self):
+        """Test that a 429 raised by the SDK counts as an error and a throttle"""
+        service = make_service(ChargingContainer(throttled=True))
+        assert service.get_claim('claim-0') is None
+
+        stats = operation('get_claim')
+        assert stats['errors'] == 1
+        assert stats['throttled'] == 1
+
+    def test_bulk_requests_are_attributed_to_the_operation(self, sample_claim_data):
+        """Test that requests made by bulk worker threads add to the caller's operation"""
+        service = make_service(ChargingContainer(charge=10))
+        claims = [dict(sample_claim_data, claim_id=f"claim-{i}") for i in range(4)]
+        results = service.save_claims_bulk(claims)
+
+        assert all(result.ok for result in results)
+        stats = operation('save_claims_bulk')
+        assert stats['request_charge']['sum'] == 40
+        assert stats['item_count']['sum'] == 4
+
+    def test_slow_operations_are_logged(self, sample_claim_data, caplog):
+        """Test that operations above the RU threshold go to the slow-query log"""
+        service = make_service(ChargingContainer(charge=80))
+        with caplog.at_level(logging.WARNING, logger='cosmos.slow'):
+            service.save_claim(sample_claim_data)
+
+        assert operation('save_claim')['slow'] == 1
+        assert '80.00 RU' in caplog.text
+        assert 'activity-1' in caplog.text
+
+    def test_unconnected_calls_are_not_recorded(self):
+        """Test that calls which never reach Cosmos DB leave no metrics"""
+        with patch.dict(os.environ, {'COSMOS_ENDPOINT': ''}):
+            service = CosmosDBService()
+        assert service.get_claim('claim-0') is None
+        assert cosmos_metrics.snapshot()['operations'] == {}
+
+
+class TestInstrumentedCoroutines:
+    """Test cases for metrics of coroutine operations"""
+
+    def test_concurrent_operations_keep_their_own_totals(self):
+        """Test that concurrent coroutines do not mix their request charges"""
+
+        class AsyncContainer:
+            async def read_item(self, item, partition_key, response_hook):
+                await asyncio.sleep(0.01)
+                response_hook({'x-ms-request-charge': item}, {})
+                return {}
+
+        container = InstrumentedContainer(AsyncContainer())
+
+        @instrumented('read')
+        async def read(charge):
+            return await container.read_item(charge, charge)
+
+        async def main():
+            await asyncio.gather(*(read(str(charge)) for charge in (1, 3, 20)))
+
+        asyncio.run(main())
+        stats = operation('read')
+        assert stats['calls'] == 3
+        assert stats['request_charge']['buckets']['1'] == 1
+        assert stats['request_charge']['buckets']['5'] == 2
+        assert stats['request_charge']['max'] == 20
@@ -0,0 +1,45 @@
+"""
+Tests for the claim summary projections sent to Cosmos DB.
+"""
+import pytest
+import os
+from unittest.mock import patch, MagicMock
+
+from services.cosmos_service import CosmosDBService
+from services.cosmos_queries import claim_summaries_query, normalize_summaries
+
+
+class TestClaimSummaryQueries:
+    """Test cases for claim summary projections"""
+
+    def test_projection_text_is_canonical(self):
+        """Test that the same field set always produces the same query"""
+        query = claim_summaries_query(['status', 'claim_id', 'files_count'])
+        assert query == claim_summaries_query(['files_count', 'claim_id', 'status'])
+        assert query.startswith("SELECT c.claim_id, c.status, ARRAY_LENGTH(c.uploaded_files) AS files_count")
+        assert "SELECT *" not in claim_summaries_query()
+        assert "OFFSET" not in claim_summaries_query(paged=True)
+
+    def test_unknown_fields_are_rejected(self):
+        """Test that only summary fields can be projected"""
+        with pytest.raises(ValueError):
+            claim_summaries_query(['claim_id', 'description'])
+
+    def test_missing_values_are_normalized(self):
+        """Test that fields left out of a projection are filled in"""
+        assert normalize_summaries([{'claim_id': 'a'}], ['claim_id', 'files_count', 'status']) == \
+            [{'claim_id': 'a', 'files_count': 0, 'status': None}]
+
+    def test_service_sends_projection(self):
+        """Test that the service queries summaries with bound paging parameters"""
+        with patch.dict(os.environ, {'COSMOS_ENDPOINT': ''}):
+            service = CosmosDBService()
+        service.client = object()
+        service.claims_container = MagicMock()
+        service.claims_container.query_items.return_value = [{'claim_id': 'a', 'files_count': 2}]
+
+        assert service.list_claim_summaries(limit=5, fields=['claim_id', 'files_count']) == \
+            [{'claim_id': 'a', 'files_count': 2}]
+        kwargs = service.claims_container.query_items.call_args.kwargs
+        assert kwargs['query'] == claim_summaries_query(['claim_id', 'files_count'])
+        assert {'name': '@limit', 'value': 5} in kwargs['parameters']
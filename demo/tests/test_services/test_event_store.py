@@ -0,0 +1,104 @@
+"""
+Tests for the entity-partitioned event store.
+"""
+import pytest
+import os
+import json
+
+from services.event_store import EntityEventStore, read_lines_backwards
+
+
+def make_event(event_id, entity_id, timestamp):
+    """Build a minimal event dictionary"""
+    return {'event_id': event_id, 'entity_id': entity_id,
+            'event_type': 'claim_saved', 'timestamp': timestamp, 'data': {}}
+
+
+class TestReadLinesBackwards:
+    """Test cases for the reverse line reader"""
+
+    def test_reads_newest_first_across_chunks(self, temp_data_dir):
+        """Test reading lines longer than the chunk size from the end"""
+        path = os.path.join(temp_data_dir, 'log')
+        lines = [f"{i}:{'x' * (i * 700)}\n".encode() for i in range(30)]
+        with open(path, 'wb') as f:
+            f.write(b''.join(lines))
+
+        result = read_lines_backwards(path, 5)
+        assert [line for _, line in result] == list(reversed(lines[-5:]))
+
+        offset = result[-1][0]
+        earlier = read_lines_backwards(path, 100, end_offset=offset)
+        assert [line for _, line in earlier] == list(reversed(lines[:-5]))
+
+    def test_ignores_partial_tail(self, temp_data_dir):
+        """Test that an unterminated final line is skipped"""
+        path = os.path.join(temp_data_dir, 'log')
+        with open(path, 'wb') as f:
+            f.write(b'a\nb\npartial')
+
+        assert read_lines_backwards(path, 10) == [(2, b'b\n'), (0, b'a\n')]
+
+    def test_missing_file(self, temp_data_dir):
+        """Test that a missing log reads as empty"""
+        assert read_lines_backwards(os.path.join(temp_data_dir, 'none'), 10) == []
+
+
+class TestEntityEventStore:
+    """Test cases for EntityEventStore"""
+
+    def test_list_entity_only_reads_that_entity(self, temp_data_dir):
+        """Test that entity history is isolated and newest first"""
+        store = EntityEventStore(temp_data_dir)
+        store.append_many([
+            make_event('e1', 'claim-a', '2025-01-01T00:00:01'),
+            make_event('e2', 'claim-b', '2025-01-01T00:00:02'),
+            make_event('e3', 'claim-a', '2025-01-01T00:00:03'),
+        ])
+
+        assert [e['event_id'] for e in store.list_entity('claim-a')] == ['e3', 'e1']
+        assert [e['event_id'] for e in store.list_entity('claim-a', limit=1)] == ['e3']
+        assert store.list_entity('claim-c') == []
+
+    def test_list_recent_uses_timeline(self, temp_data_dir):
+        """Test the global most-recent query"""
+        store = EntityEventStore(temp_data_dir)
+        for i in range(5):
+            store.append(make_event(f"e{i}", f"claim-{i % 2}", f"2025-01-01T00:00:0{i}"))
+
+        assert [e['event_id'] for e in store.list_recent(3)] == ['e4', 'e3', 'e2']
+
+    def test_pages_continue_from_position(self, temp_data_dir):
+        """Test that passing the last position back returns the next older events"""
+        store = EntityEventStore(temp_data_dir)
+        for i in range(5):
+            store.append(make_event(f"e{i}", 'claim-a', f"2025-01-01T00:00:0{i}"))
+
+        first = store.page_entity('claim-a', 2)
+        second = store.page_entity('claim-a', 2, before=first[-1][0])
+        last = store.page_entity('claim-a', 2, before=second[-1][0])
+        assert [e['event_id'] for _, e in first + second + last] == ['e4', 'e3', 'e2', 'e1', 'e0']
+
+        recent = store.page_recent(3)
+        assert [e['event_id'] for _, e in store.page_recent(3, before=recent[-1][0])] == ['e1', 'e0']
+
+    def test_entity_ids_are_not_used_as_paths(self, temp_data_dir):
+        """Test that hostile entity ids stay inside the store"""
+        store = EntityEventStore(temp_data_dir)
+        path = store.entity_log_path('../../etc/passwd')
+
+        assert os.path.abspath(path).startswith(os.path.abspath(store.entities_dir))
+
+    def test_migrate_legacy_files(self, temp_data_dir):
+        """Test importing one-file-per-event data"""
+        for i in range(3):
+            with open(os.path.join(temp_data_dir, f"legacy-{i}.json"), 'w') as f:
+                json.dump(make_event(f"legacy-{i}", 'claim-a', f"2025-01-01T00:00:0{i}"), f)
+
+        store = EntityEventStore(temp_data_dir)
+        assert store.migrate_legacy_files() == 3
+        assert store.migrate_legacy_files() == 0
+
+        assert not [f for f in os.listdir(temp_data_dir) if f.endswith('.json')]
+        assert [e['event_id'] for e in store.list_entity('claim-a')] == \
+            ['legacy-2', 'legacy-1', 'legacy-0']
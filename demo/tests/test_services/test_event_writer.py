@@ -0,0 +1,161 @@
+"""
+Tests for the buffered group-commit event writer.
+"""
+import pytest
+import threading
+import time
+from unittest.mock import patch
+
+from services.event_writer import BufferedEventWriter
+
+
+class RecordingSink:
+    """Sink that records each batch it receives"""
+
+    def __init__(self, fail=False, delay=0.0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+
+    def __call__(self, events):
+        time.sleep(self.delay)
+        if self.fail:
+            raise IOError("disk full")
+        self.batches.append(list(events))
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+def make_event(i):
+    """Build a minimal event dictionary"""
+    return {'event_id': f"e{i}", 'entity_id': 'claim-a'}
+
+
+class TestBufferedEventWriter:
+    """Test cases for BufferedEventWriter"""
+
+    def test_sync_mode_writes_inline(self):
+        """Test that sync mode calls the sink once per event"""
+        sink = RecordingSink()
+        writer = BufferedEventWriter(sink, durability='sync')
+
+        assert writer.write(make_event(1)) is True
+        assert sink.batches == [[make_event(1)]]
+
+    def test_async_mode_batches_events(self):
+        """Test that async writes are grouped into few sink calls"""
+        sink = RecordingSink()
+        writer = BufferedEventWriter(sink, durability='async', max_batch=50, flush_interval=1.0)
+        try:
+            for i in range(100):
+                assert writer.write(make_event(i)) is True
+            writer.flush()
+
+            assert len(sink.events) == 100
+            assert len(sink.batches) <= 3
+            assert sink.events[0] == make_event(0)
+        finally:
+            writer.close()
+
+    def test_flushes_on_interval(self):
+        """Test that a partial batch is written after the flush interval"""
+        sink = RecordingSink()
+        writer = BufferedEventWriter(sink, durability='async', max_batch=100, flush_interval=0.01)
+        try:
+            writer.write(make_event(1))
+            deadline = time.time() + 2
+            while not sink.events and time.time() < deadline:
+                time.sleep(0.01)
+            assert sink.events == [make_event(1)]
+        finally:
+            writer.close()
+
+    def test_group_mode_waits_for_commit(self):
+        """Test that concurrent group writers share a batch and see its outcome"""
+        sink = RecordingSink()
+        writer = BufferedEventWriter(sink, durability='group', max_batch=100, flush_interval=0.05)
+        results = []
+        try:
+            threads = [threading.Thread(target=lambda i=i: results.append(writer.write(make_event(i))))
+                       for i in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert results == [True] * 10
+            assert len(sink.events) == 10
+            assert len(sink.batches) < 10
+        finally:
+            writer.close()
+
+    def test_group_mode_reports_failure(self):
+        """Test that a failed batch is reported to group-mode writers"""
+        writer = BufferedEventWriter(RecordingSink(fail=True), durability='group')
+        try:
+            assert writer.write(make_event(1)) is False
+            assert writer.stats()['failed'] == 1
+        finally:
+            writer.close()
+
+    def test_flush_waits_for_in_flight_batch(self):
+        """Test that flush covers a batch the background thread is already writing"""
+        sink = RecordingSink(delay=0.1)
+        writer = BufferedEventWriter(sink, durability='async', flush_interval=0)
+        try:
+            writer.write(make_event(1))
+            time.sleep(0.02)
+            writer.flush()
+            assert sink.events == [make_event(1)]
+        finally:
+            writer.close()
+
+    def test_flush_timeout_returns_false(self):
+        """Test that a flush that outlasts its timeout reports failure instead of raising"""
+        sink = RecordingSink(delay=0.3)
+        writer = BufferedEventWriter(sink, durability='async', flush_interval=0)
+        try:
+            writer.write(make_event(1))
+            assert writer.flush(timeout=0.01) is False
+            assert writer.flush() is True
+        finally:
+            writer.close()
+
+    def test_flush_reports_failed_batch(self):
+        """Test that a flush covering a failed batch returns False"""
+        sink = RecordingSink(fail=True)
+        writer = BufferedEventWriter(sink, durability='async', flush_interval=60)
+        try:
+            writer.write(make_event(1))
+            assert writer.flush() is False
+            sink.fail = False
+            writer.write(make_event(2))
+            assert writer.flush() is True
+            assert writer.stats()['failed'] == 1
+        finally:
+            writer.close()
+
+    def test_close_removes_exit_hook(self):
+        """Test that a closed writer is no longer held by the interpreter exit hooks"""
+        with patch('services.event_writer.atexit') as mock_atexit:
+            writer = BufferedEventWriter(RecordingSink(), durability='async')
+            writer.close()
+        mock_atexit.unregister.assert_called_once_with(writer.close)
+
+    def test_close_flushes_pending_events(self):
+        """Test the shutdown hook drains the queue"""
+        sink = RecordingSink()
+        writer = BufferedEventWriter(sink, durability='async', flush_interval=60)
+        writer.write(make_event(1))
+        writer.close()
+
+        assert sink.events == [make_event(1)]
+        assert writer.write(make_event(2)) is True
+        assert sink.events == [make_event(1), make_event(2)]
+
+    def test_rejects_unknown_mode(self):
+        """Test validation of the durability mode"""
+        with pytest.raises(ValueError):
+            BufferedEventWriter(RecordingSink(), durability='eventually')
@@ -0,0 +1,155 @@
+"""
+Tests for the evidence file store.
+"""
+import pytest
+import hashlib
+import io
+import os
+from unittest.mock import patch
+
+from werkzeug.datastructures import FileStorage
+
+from services.evidence_store import EvidenceStore, UploadSpool, main
+from services.hybrid_service import HybridDataService
+
+
+@pytest.fixture
+def store(temp_data_dir):
+    """EvidenceStore under a temporary upload folder, with a small copy chunk"""
+    store = EvidenceStore(os.path.join(temp_data_dir, 'uploads'), chunk_size=7, workers=4)
+    yield store
+    store.close()
+
+
+def upload(data, name='photo.jpg'):
+    """FileStorage over in-memory bytes"""
+    return FileStorage(io.BytesIO(data), name)
+
+
+class TestEvidenceStore:
+    """Test cases for EvidenceStore"""
+
+    def test_spooled_file_is_renamed_into_place(self, store):
+        """Test that a spool hashes as it is written and is moved, not copied"""
+        spool = store.spool()
+        for chunk in (b'%PDF-1.4 ', b'police report'):
+            spool.write(chunk)
+        spool.seek(0)
+        spool_path = spool.path
+
+        info = store.save(FileStorage(spool, 'report.PDF'), 'pdf', 'claim-1')
+        assert info['sha256'] == hashlib.sha256(b'%PDF-1.4 police report').hexdigest()
+        assert info['file_size'] == 22
+        assert info['saved_name'].startswith('claim-1_') and info['saved_name'].endswith('.pdf')
+        assert info['file_path'] == store.object_path(info['sha256'])
+        assert not os.path.exists(spool_path)
+        with open(info['file_path'], 'rb') as f:
+            assert f.read() == b'%PDF-1.4 police report'
+        assert os.listdir(store.incoming_dir) == []
+
+    def test_save_all_copies_streams_concurrently_in_order(self, store):
+        """Test that plain streams are copied in chunks and results keep the upload order"""
+        contents = [os.urandom(1000 + i) for i in range(6)]
+        uploads = [(FileStorage(io.BytesIO(data), f"photo{i}.jpg"), 'image') for i, data in enumerate(contents)]
+
+        infos = store.save_all(uploads, 'claim-2')
+        assert [info['original_name'] for info in infos] == [f"photo{i}.jpg" for i in range(6)]
+        for info, data in zip(infos, contents):
+            assert info['file_size'] == len(data)
+            assert info['sha256'] == hashlib.sha256(data).hexdigest()
+            assert os.path.getsize(info['file_path']) == len(data)
+
+    def test_files_are_synced_outside_the_lock(self, temp_data_dir):
+        """Test that fsync runs before the store lock is taken, and only for new objects"""
+        store = EvidenceStore(os.path.join(temp_data_dir, 'uploads'), fsync=True)
+        held = []
+        real_fsync = os.fsync
+
+        def fsync(fd):
+            held.append(store._lock.locked())
+            real_fsync(fd)
+
+        try:
+            with patch('services.evidence_store.os.fsync', side_effect=fsync):
+                store.save(upload(b'scan one', 'a.pdf'), 'pdf', 'claim-f')
+                store.save(upload(b'scan two', 'b.pdf'), 'pdf', 'claim-f')
+                store.save(upload(b'scan one', 'again.pdf'), 'pdf', 'claim-g')
+        finally:
+            store.close()
+        assert held == [False, False]
+
+    def test_unsaved_spool_is_removed_on_close(self, store):
+        """Test that a part that was never saved leaves nothing behind"""
+        spool = store.spool()
+        spool.write(b'rejected.exe')
+        spool.close()
+        assert os.listdir(store.incoming_dir) == []
+        assert isinstance(spool, UploadSpool)
+
+    def test_identical_uploads_share_one_object(self, store):
+        """Test deduplication across claims, the hash index and reference counting"""
+        data = b'the same police report'
+        first = store.save(upload(data, 'report.pdf'), 'pdf', 'claim-a')
+        second = store.save(upload(data, 'copy.pdf'), 'pdf', 'claim-b')
+        other = store.save(upload(b'another photo'), 'image', 'claim-b')
+
+        assert first['file_path'] == second['file_path']
+        sha256 = first['sha256']
+        assert first['file_path'].endswith(os.path.join(sha256[:2], sha256[2:4], sha256))
+        assert [ref['claim_id'] for ref in store.claims_for(sha256)] == ['claim-a', 'claim-b']
+        assert store.resolve('claim-b', second['saved_name']) == first['file_path']
+        assert store.stats()['bytes_deduplicated'] == len(data)
+
+        assert store.release_claim('claim-a') == 0
+        assert os.path.exists(first['file_path'])
+        assert store.release_claim('claim-b') == 2
+        assert not os.path.exists(first['file_path']) and not os.path.exists(other['file_path'])
+        assert store.stats()['objects'] == 0
+
+    def test_release_files_keeps_the_claims_other_files(self, store):
+        """Test that releasing a submission's files leaves earlier files of the claim referenced"""
+        kept = store.save(upload(b'first report', 'first.pdf'), 'pdf', 'claim-h')
+        dropped = store.save(upload(b'second report', 'second.pdf'), 'pdf', 'claim-h')
+
+        assert store.release_files('claim-h', [dropped['saved_name'], 'claim-h_unknown.pdf']) == 1
+        assert not os.path.exists(dropped['file_path'])
+        assert store.resolve('claim-h', kept['saved_name']) == kept['file_path']
+
+    def test_legacy_files_resolve_and_migrate(self, store):
+        """Test that files saved before content addressing are served and imported"""
+        os.makedirs(os.path.join(store.upload_folder, 'images'))
+        legacy_path = store.legacy_path('claim-c_0123abcd.jpg')
+        with open(legacy_path, 'wb') as f:
+            f.write(b'old photo')
+        assert store.resolve('claim-c', 'claim-c_0123abcd.jpg') == legacy_path
+        assert store.resolve('claim-c', '../evidence.db') is None
+
+        assert store.migrate_legacy() == 1
+        assert store.migrate_legacy() == 0
+        path = store.resolve('claim-c', 'claim-c_0123abcd.jpg')
+        assert path == store.object_path(hashlib.sha256(b'old photo').hexdigest())
+        assert not os.path.exists(legacy_path)
+
+    def test_deleting_a_claim_releases_its_files(self, store):
+        """Test that the hybrid service releases references when a claim is deleted"""
+        info = store.save(upload(b'dashcam still'), 'image', 'claim-d')
+        with patch('services.hybrid_service.LocalDataService') as mock_local:
+            mock_local.return_value.delete_claim.return_value = True
+            service = HybridDataService()
+            service.use_cosmos = False
+            service.cosmos_service = None
+            service.evidence_store = store
+
+            assert service.delete_claim('claim-d') is True
+        assert store.claims_for(info['sha256']) == []
+        assert not os.path.exists(info['file_path'])
+
+    def test_migrate_command(self, store, capsys):
+        """Test the maintenance command line imports legacy files"""
+        os.makedirs(os.path.join(store.upload_folder, 'pdfs'))
+        with open(store.legacy_path('claim-e_89abcdef.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4 old report')
+        with patch('utils.config.Config.get', return_value=store.upload_folder):
+            assert main(['migrate', '--keep-source']) == 0
+        assert 'Imported 1 evidence files' in capsys.readouterr().out
+        assert os.path.exists(store.legacy_path('claim-e_89abcdef.pdf'))
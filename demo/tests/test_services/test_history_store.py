@@ -0,0 +1,104 @@
+"""
+Tests for the delta-encoded claim history store.
+"""
+import pytest
+import os
+import hashlib
+
+from services.history_store import ClaimHistoryStore
+
+
+def make_claim(status='pending', fraud_score=None, updated_time='2025-01-01T00:00:00'):
+    """Build a claim dictionary with a bulky description"""
+    return {
+        'claim_id': 'claim-a',
+        'claim_amount': 1500.0,
+        'description': ' '.join(hashlib.sha1(str(i).encode()).hexdigest() for i in range(40)),
+        'uploaded_files': [],
+        'submission_time': '2025-01-01T00:00:00',
+        'updated_time': updated_time,
+        'fraud_score': fraud_score,
+        'status': status
+    }
+
+
+def log_size(store, claim_id):
+    """Size of a claim's history log on disk"""
+    return os.path.getsize(store._log_path(claim_id))
+
+
+class TestClaimHistoryStore:
+    """Test cases for ClaimHistoryStore"""
+
+    def test_versions_round_trip(self, temp_data_dir):
+        """Test that every revision can be reconstructed"""
+        store = ClaimHistoryStore(temp_data_dir)
+        revisions = [
+            make_claim(),
+            make_claim(status='reviewed', updated_time='2025-01-02T00:00:00'),
+            make_claim(status='reviewed', fraud_score=0.8, updated_time='2025-01-03T00:00:00'),
+        ]
+        for claim in revisions:
+            store.record('claim-a', claim)
+
+        history = store.get_history('claim-a')
+        assert [entry['version'] for entry in history] == [1, 2, 3]
+        assert [entry['kind'] for entry in history] == ['full', 'delta', 'delta']
+        for version, claim in enumerate(revisions, start=1):
+            assert store.get_version('claim-a', version) == claim
+
+    def test_deltas_are_small(self, temp_data_dir):
+        """Test that a one-field change costs far less than a full copy"""
+        store = ClaimHistoryStore(temp_data_dir)
+        store.record('claim-a', make_claim())
+        first = log_size(store, 'claim-a')
+        store.record('claim-a', make_claim(status='reviewed', updated_time='2025-01-02T00:00:00'))
+
+        assert log_size(store, 'claim-a') - first < first / 2
+
+    def test_identical_content_is_deduplicated(self, temp_data_dir):
+        """Test that re-saving known content stores a reference"""
+        store = ClaimHistoryStore(temp_data_dir)
+        store.record('claim-a', make_claim())
+        store.record('claim-a', make_claim(status='reviewed', updated_time='2025-01-02T00:00:00'))
+        store.record('claim-a', make_claim(updated_time='2025-01-03T00:00:00'))
+
+        history = store.get_history('claim-a')
+        assert history[2]['kind'] == 'ref'
+        assert history[2]['stored_bytes'] == 0
+        reverted = store.get_version('claim-a', 3)
+        assert reverted['status'] == 'pending'
+        assert reverted['updated_time'] == '2025-01-03T00:00:00'
+
+    def test_keyframes_bound_delta_chains(self, temp_data_dir):
+        """Test that full snapshots are written periodically"""
+        store = ClaimHistoryStore(temp_data_dir, keyframe_interval=3)
+        for i in range(7):
+            store.record('claim-a', make_claim(fraud_score=i / 10))
+
+        kinds = [entry['kind'] for entry in store.get_history('claim-a')]
+        assert kinds == ['full', 'delta', 'delta', 'full', 'delta', 'delta', 'full']
+        assert store.get_version('claim-a', 6)['fraud_score'] == 0.5
+
+    def test_deletion_and_recreation(self, temp_data_dir):
+        """Test tombstones and revisions after a delete"""
+        store = ClaimHistoryStore(temp_data_dir)
+        store.record('claim-a', make_claim())
+        assert store.record_deletion('claim-a') == 2
+        store.record('claim-a', make_claim(status='reopened'))
+
+        assert store.get_version('claim-a', 2) is None
+        assert store.get_version('claim-a', 3)['status'] == 'reopened'
+        assert store.record_deletion('never-saved') == 0
+
+    def test_other_instances_see_new_revisions(self, temp_data_dir):
+        """Test that the latest-revision cache is validated against the log"""
+        first = ClaimHistoryStore(temp_data_dir)
+        second = ClaimHistoryStore(temp_data_dir)
+        first.record('claim-a', make_claim())
+        second.record('claim-a', make_claim(status='reviewed'))
+        first.record('claim-a', make_claim(status='reviewed', fraud_score=0.3))
+
+        claim = second.get_version('claim-a', 3)
+        assert claim['status'] == 'reviewed'
+        assert claim['fraud_score'] == 0.3
@@ -2,6 +2,8 @@
 Tests for the HybridDataService integration.
 """
 import pytest
+import threading
+import time
 import uuid
 from datetime import datetime
 from unittest.mock import patch, MagicMock
@@ -129,6 +131,125 @@ class TestHybridDataService:
             assert len(result) == 1
             assert result[0] == sample_claim_data
 
+    
+    def test_list_claims_page_keeps_source(self, sample_claim_data):
+        """Test that a Cosmos DB cursor keeps later pages on Cosmos DB"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            mock_cosmos.return_value.list_claims_page.return_value = ([sample_claim_data], 'token-2')
+            
+            service = HybridDataService()
+            service.use_cosmos = True
+            service.cosmos_service = mock_cosmos.return_value
+            
+            claims, cursor = service.list_claims_page(limit=1)
+            assert claims == [sample_claim_data]
+            
+            mock_cosmos.return_value.list_claims_page.return_value = ([], None)
+            claims, next_cursor = service.list_claims_page(limit=1, cursor=cursor)
+            mock_cosmos.return_value.list_claims_page.assert_called_with(1, 'token-2')
+            assert claims == [] and next_cursor is None
+            mock_local.return_value.list_claims_page.assert_not_called()
+
+
+
+class TestHybridDualWrite:
+    """Test cases for concurrent local + cloud writes"""
+    
+    @staticmethod
+    def make_service(mock_local, mock_cosmos, mode='concurrent', deadline=5.0):
+        """Build a service with Cosmos enabled and the given write settings"""
+        service = HybridDataService()
+        service.use_cosmos = True
+        service.cosmos_service = mock_cosmos.return_value
+        service.write_mode = mode
+        service.write_deadline = deadline
+        return service
+    
+    def test_writes_run_concurrently(self, sample_claim_data):
+        """Test that save latency is the slower side, not the sum"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            def slow(result):
+                def write(*args, **kwargs):
+                    time.sleep(0.3)
+                    return result
+                return write
+            mock_local.return_value.save_claim.side_effect = slow(sample_claim_data['claim_id'])
+            mock_cosmos.return_value.save_claim.side_effect = slow(True)
+            
+            service = self.make_service(mock_local, mock_cosmos)
+            start = time.monotonic()
+            result = service.save_claim_with_result(sample_claim_data)
+            
+            assert time.monotonic() - start < 0.55
+            assert result.local_ok is True
+            assert result.cloud_ok is True
+    
+    def test_cloud_copy_is_stamped(self, sample_claim_data):
+        """Test that Cosmos DB receives the updated_time the local copy is saved with"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            saved = {}
+            def save_local(claim, stamped=False):
+                saved['local'] = claim.to_dict()
+                return claim.claim_id
+            mock_local.return_value.save_claim.side_effect = save_local
+            mock_cosmos.return_value.save_claim.side_effect = lambda claim, **kwargs: saved.setdefault('cloud', claim)
+            
+            service = self.make_service(mock_local, mock_cosmos)
+            service.save_claim_with_result(dict(sample_claim_data, updated_time=None))
+            assert saved['cloud']['updated_time'] is not None
+            assert saved['cloud'] == saved['local']
+            assert mock_local.return_value.save_claim.call_args.kwargs == {'stamped': True}
+    
+    def test_cloud_deadline(self, sample_claim_data):
+        """Test that a slow cloud write is reported as a timeout"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            release = threading.Event()
+            mock_local.return_value.save_claim.return_value = sample_claim_data['claim_id']
+            mock_cosmos.return_value.save_claim.side_effect = lambda claim, **kwargs: release.wait(5)
+            
+            service = self.make_service(mock_local, mock_cosmos, deadline=0.1)
+            result = service.save_claim_with_result(sample_claim_data)
+            release.set()
+            
+            assert result.local_ok is True
+            assert result.cloud_status == 'timeout'
+    
+    def test_cloud_failure_is_reported(self, sample_event_data):
+        """Test that a cloud error is captured instead of raised"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            mock_local.return_value.save_event.return_value = sample_event_data['event_id']
+            mock_cosmos.return_value.save_event.side_effect = Exception("Cosmos DB error")
+            
+            service = self.make_service(mock_local, mock_cosmos)
+            result = service.save_event_with_result(sample_event_data)
+            
+            assert result.entity_id == sample_event_data['event_id']
+            assert result.local_ok is True
+            assert result.cloud_status == 'failed'
+            assert 'Cosmos DB error' in result.cloud_error
+    
+    def test_local_failure_is_raised(self, sample_claim_data):
+        """Test that save_claim still raises when the local write fails"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+            
+            mock_local.return_value.save_claim.side_effect = RuntimeError("disk full")
+            service = self.make_service(mock_local, mock_cosmos, mode='sequential')
+            
+            with pytest.raises(RuntimeError):
+                service.save_claim(sample_claim_data)
+            mock_cosmos.return_value.save_claim.assert_not_called()
+
 
 @pytest.mark.integration
 class TestHybridDataServiceIntegration:
@@ -0,0 +1,113 @@
+"""
+Tests for the claim processing job queue and worker pool.
+"""
+import pytest
+import os
+import time
+
+from services.jobs import JobQueue, JobWorkerPool
+from utils import ValidationError
+
+
+@pytest.fixture
+def queue(temp_data_dir):
+    """JobQueue in a temporary directory"""
+    queue = JobQueue(os.path.join(temp_data_dir, 'jobs.db'))
+    yield queue
+    queue.close()
+
+
+class TestJobWorkerPool:
+    """Test cases for JobQueue and JobWorkerPool"""
+
+    def test_stages_run_in_order(self, queue):
+        """Test that results of earlier stages reach later ones and are recorded"""
+        pool = JobWorkerPool(queue, [
+            ('store', lambda payload, results: {'stored': payload['claim_id']}),
+            ('score', lambda payload, results: {'from': results['store']['stored']}),
+        ])
+        job_id = queue.enqueue('claim', 'c1', {'claim_id': 'c1'})
+        assert pool.status(job_id)['stage'] == 'store'
+
+        assert pool.run_once() is True
+        assert pool.run_once() is False
+        job = pool.status(job_id)
+        assert job['status'] == 'succeeded'
+        assert job['result'] == {'store': {'stored': 'c1'}, 'score': {'from': 'c1'}}
+        stats = pool.stats()
+        assert stats['stages']['score']['latency_ms']['count'] == 1
+        assert stats['queue']['succeeded'] == 1 and stats['queue']['depth'] == 0
+
+    def test_failed_stage_is_retried_from_where_it_stopped(self, queue):
+        """Test retries with backoff, resuming at the failed stage"""
+        calls = {'store': 0, 'score': 0}
+
+        def store(payload, results):
+            calls['store'] += 1
+
+        def score(payload, results):
+            calls['score'] += 1
+            if calls['score'] < 3:
+                raise RuntimeError('scoring service unavailable')
+            return {'score': 0.1}
+
+        pool = JobWorkerPool(queue, [('store', store), ('score', score)], base_backoff=0.0)
+        job_id = queue.enqueue('claim', 'c1', {})
+        for _ in range(3):
+            assert pool.run_once() is True
+
+        job = pool.status(job_id)
+        assert job['status'] == 'succeeded' and job['attempts'] == 2
+        assert calls == {'store': 1, 'score': 3}
+        assert pool.stats()['stages']['score']['failed'] == 2
+
+    def test_permanent_errors_and_attempt_limit_fail_the_job(self, queue):
+        """Test that validation errors fail at once and other errors after max_attempts"""
+        def invalid(payload, results):
+            raise ValidationError("Claim data validation failed", ["Missing required field: description"])
+
+        def broken(payload, results):
+            raise RuntimeError('disk full')
+
+        pool = JobWorkerPool(queue, [('store', invalid)], permanent_errors=(ValidationError,))
+        job_id = queue.enqueue('claim', 'c1', {})
+        pool.run_once()
+        assert pool.status(job_id)['status'] == 'failed'
+        assert 'validation failed' in pool.status(job_id)['last_error']
+
+        pool = JobWorkerPool(queue, [('store', broken)], max_attempts=2, base_backoff=0.0)
+        job_id = queue.enqueue('claim', 'c2', {})
+        pool.run_once()
+        assert pool.status(job_id)['status'] == 'queued'
+        pool.run_once()
+        assert pool.status(job_id)['status'] == 'failed'
+
+    def test_failure_hook_runs_once_the_job_fails(self, queue):
+        """Test that on_failure receives a job only when it will not be retried"""
+        failed = []
+
+        def broken(payload, results):
+            raise RuntimeError('disk full')
+
+        pool = JobWorkerPool(queue, [('store', broken)], max_attempts=2, base_backoff=0.0,
+                             on_failure=lambda job, error: failed.append((job['payload'], error)))
+        queue.enqueue('claim', 'c1', {'claim_id': 'c1'})
+        pool.run_once()
+        assert failed == []
+        pool.run_once()
+        assert failed == [({'claim_id': 'c1'}, 'store: disk full')]
+
+    def test_workers_process_submitted_jobs(self, queue):
+        """Test the worker threads, and that an expired lease hands a job to another worker"""
+        pool = JobWorkerPool(queue, [('store', lambda payload, results: None)], workers=2, interval=0.05)
+        job_ids = [pool.submit('claim', f"c{i}", {}) for i in range(5)]
+        deadline = time.time() + 5
+        while pool.stats()['queue']['succeeded'] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        pool.stop()
+        assert all(pool.status(job_id)['status'] == 'succeeded' for job_id in job_ids)
+
+        abandoned = queue.enqueue('claim', 'c9', {})
+        assert queue.lease(lease_seconds=-1)['job_id'] == abandoned
+        assert pool.run_once() is True
+        assert pool.status(abandoned)['status'] == 'succeeded'
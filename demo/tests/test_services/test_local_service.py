@@ -94,9 +94,9 @@ class TestLocalDataService:
         saved_id = service.save_event(sample_event_data)
         assert saved_id == sample_event_data['event_id']
         
-        # Verify file exists
-        event_file = os.path.join(service.events_dir, f"{sample_event_data['event_id']}.json")
-        assert os.path.exists(event_file)
+        # Verify the entity's event log exists once queued events are flushed
+        service.event_writer.flush()
+        assert os.path.exists(service.event_store.entity_log_path(sample_event_data['entity_id']))
         
         # List events for entity
         events = service.list_events(sample_event_data['entity_id'])
@@ -110,12 +110,6 @@ class TestLocalDataService:
         assert found_event is not None
         assert found_event.event_id == sample_event_data['event_id']
         assert found_event.entity_id == sample_event_data['entity_id']
-        
-        # Cleanup
-        try:
-            os.remove(event_file)
-        except FileNotFoundError:
-            pass
     
     def test_list_events_empty(self):
         """Test listing events when no events exist for entity"""
@@ -151,14 +145,8 @@ class TestLocalDataService:
         our_events = [e for e in events if e.event_id in ['test-event-1', 'test-event-2']]
         assert len(our_events) >= 2
         
-        # Cleanup
-        try:
-            event1_file = os.path.join(service.events_dir, f"{event1['event_id']}.json")
-            event2_file = os.path.join(service.events_dir, f"{event2['event_id']}.json")
-            os.remove(event1_file)
-            os.remove(event2_file)
-        except FileNotFoundError:
-            pass
+        # Newest first
+        assert events[0].event_id == 'test-event-2'
     
     def test_update_existing_claim(self, sample_claim_data):
         """Test updating an existing claim"""
@@ -187,3 +175,42 @@ class TestLocalDataService:
             os.remove(claim_file)
         except FileNotFoundError:
             pass
+    
+    def test_claim_history(self, sample_claim_data):
+        """Test that saves and deletes are recorded as revisions"""
+        service = LocalDataService()
+        claim_id = sample_claim_data['claim_id']
+        
+        service.save_claim(sample_claim_data)
+        service.update_claim(claim_id, {'status': 'reviewed'})
+        service.delete_claim(claim_id)
+        
+        history = service.get_claim_history(claim_id)
+        assert [entry['kind'] for entry in history][-1] == 'deleted'
+        assert service.get_claim_at(claim_id, 1).status == 'pending'
+        assert service.get_claim_at(claim_id, history[-2]['version']).status == 'reviewed'
+        assert service.get_claim_at(claim_id, history[-1]['version']) is None
+    
+    def test_write_version(self, local_service, sample_claim_data):
+        """Test that claim and event writes change their write versions, also for other instances"""
+        claims_version = local_service.get_write_version('claims')
+        events_version = local_service.get_write_version('events')
+        assert claims_version and events_version
+        assert local_service.get_write_version('claims') == claims_version
+        
+        local_service.save_claim(sample_claim_data)
+        local_service.event_writer.flush()
+        assert local_service.get_write_version('claims') != claims_version
+        assert local_service.get_write_version('events') != events_version
+        
+        other = LocalDataService()
+        claims_version = other.get_write_version('claims')
+        local_service.delete_claim(sample_claim_data['claim_id'])
+        assert other.get_write_version('claims') != claims_version
+        other.close()
+        
+        local_service._write_version('claims').max_bytes = 2
+        claims_version = local_service.get_write_version('claims')
+        local_service._bump_write_version('claims')
+        assert os.path.getsize(local_service._write_version_path('claims')) == 0
+        assert local_service.get_write_version('claims') != claims_version
@@ -0,0 +1,206 @@
+"""
+Tests for the cloud write outbox and its sync worker.
+"""
+import pytest
+import os
+import time
+from unittest.mock import patch
+
+from services.bulk import BulkItemResult
+from services.outbox import CloudOutbox, CloudSyncWorker
+from services.hybrid_service import HybridDataService
+from utils.config import Config
+
+
+@pytest.fixture
+def outbox(temp_data_dir):
+    """Outbox stored in a temporary directory"""
+    outbox = CloudOutbox(os.path.join(temp_data_dir, 'outbox.db'))
+    yield outbox
+    outbox.close()
+
+
+class RecordingApplier:
+    """Applier that records payloads and fails a set number of times"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.applied = []
+
+    def __call__(self, entry):
+        if self.failures:
+            self.failures -= 1
+            return False
+        self.applied.append(entry['payload'])
+        return True
+
+
+class TestCloudOutbox:
+    """Test cases for CloudOutbox"""
+
+    def test_writes_are_coalesced_per_entity(self, outbox):
+        """Test that a newer write replaces the queued one"""
+        outbox.enqueue('claim', 'c1', 'upsert', {'status': 'pending'})
+        outbox.enqueue('claim', 'c1', 'upsert', {'status': 'approved'})
+        outbox.enqueue('event', 'e1', 'upsert', {'event_id': 'e1'})
+
+        due = outbox.due()
+        assert len(due) == 2
+        assert [e['payload'] for e in due if e['kind'] == 'claim'] == [{'status': 'approved'}]
+        assert outbox.stats()['depth'] == 2
+
+    def test_delayed_entries_and_release(self, outbox):
+        """Test that delayed entries only become due once released"""
+        outbox.enqueue('claim', 'c1', 'upsert', {}, delay=60)
+        assert outbox.due() == []
+        assert outbox.is_pending('claim', 'c1')
+
+        outbox.release('claim', 'c1')
+        assert len(outbox.due()) == 1
+
+    def test_superseded_entry_is_not_removed(self, outbox):
+        """Test that finishing an old revision keeps the newer write queued"""
+        outbox.enqueue('claim', 'c1', 'upsert', {'v': 1})
+        entry = outbox.due()[0]
+        outbox.enqueue('claim', 'c1', 'upsert', {'v': 2})
+
+        assert outbox.mark_done(entry) is False
+        assert outbox.due()[0]['payload'] == {'v': 2}
+
+    def test_survives_reopen(self, temp_data_dir, outbox):
+        """Test that queued writes persist across restarts"""
+        outbox.enqueue('claim', 'c1', 'upsert', {'v': 1})
+        reopened = CloudOutbox(outbox.path)
+        try:
+            assert reopened.stats()['depth'] == 1
+        finally:
+            reopened.close()
+
+
+class TestCloudSyncWorker:
+    """Test cases for CloudSyncWorker"""
+
+    def test_replay_with_backoff(self, outbox):
+        """Test that failed replays are retried later and then removed"""
+        applier = RecordingApplier(failures=1)
+        worker = CloudSyncWorker(outbox, {'claim:upsert': applier}, base_backoff=0.05)
+        outbox.enqueue('claim', 'c1', 'upsert', {'v': 1})
+
+        assert worker.run_once() == 0
+        assert outbox.due() == []  # backing off
+        assert outbox.stats()['max_attempts'] == 1
+
+        time.sleep(0.1)
+        assert worker.run_once() == 1
+        assert applier.applied == [{'v': 1}]
+        assert outbox.stats()['depth'] == 0
+        assert worker.stats()['failed_attempts'] == 1
+
+    def test_background_thread_drains_outbox(self, outbox):
+        """Test that a started worker replays entries it is woken for"""
+        applier = RecordingApplier()
+        worker = CloudSyncWorker(outbox, {'event:upsert': applier}, interval=5)
+        worker.start()
+        try:
+            outbox.enqueue('event', 'e1', 'upsert', {'event_id': 'e1'})
+            worker.wake()
+            deadline = time.monotonic() + 2
+            while outbox.stats()['depth'] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert applier.applied == [{'event_id': 'e1'}]
+        finally:
+            worker.stop()
+
+
+def wait_for_empty(outbox, timeout=2.0):
+    """Wait until the outbox has been drained"""
+    deadline = time.monotonic() + timeout
+    while outbox.stats()['depth'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return outbox.stats()['depth'] == 0
+
+
+class TestHybridOutbox:
+    """Test cases for outbox use in HybridDataService"""
+
+    @staticmethod
+    def make_service(temp_data_dir, mock_cosmos, mode='concurrent'):
+        """Build a Cosmos-enabled service with its outbox in a temporary directory"""
+        previous = Config.get('hybrid.outbox_path')
+        Config.set('hybrid.outbox_path', os.path.join(temp_data_dir, 'outbox.db'))
+        try:
+            service = HybridDataService()
+        finally:
+            Config.set('hybrid.outbox_path', previous)
+        service.use_cosmos = True
+        service.cosmos_service = mock_cosmos.return_value
+        service.write_mode = mode
+        service.sync_interval = 60
+        return service
+
+    def test_failed_cloud_write_is_queued(self, temp_data_dir, sample_claim_data):
+        """Test that a failed Cosmos write lands in the outbox and is replayed"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+
+            mock_local.return_value.save_claim.return_value = sample_claim_data['claim_id']
+            mock_cosmos.return_value.save_claim.return_value = False
+            service = self.make_service(temp_data_dir, mock_cosmos)
+            try:
+                result = service.save_claim_with_result(sample_claim_data)
+                assert result.cloud_status == 'failed'
+                assert result.queued is True
+                assert service.get_metrics()['outbox']['depth'] == 1
+
+                # Later writes of the same claim queue behind it instead of racing
+                # it, and are replayed by the woken sync worker
+                mock_cosmos.return_value.save_claim.return_value = True
+                result = service.save_claim_with_result(dict(sample_claim_data, status='approved'))
+                assert result.cloud_status == 'queued'
+
+                assert wait_for_empty(service.outbox)
+                assert mock_cosmos.return_value.save_claim.call_count == 2
+                replayed = mock_cosmos.return_value.save_claim.call_args[0][0]
+                assert replayed['status'] == 'approved'
+            finally:
+                service.close()
+
+    def test_write_behind_acknowledges_after_local_write(self, temp_data_dir, sample_event_data):
+        """Test that write-behind mode never calls Cosmos on the request path"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+
+            mock_local.return_value.save_event.return_value = sample_event_data['event_id']
+            service = self.make_service(temp_data_dir, mock_cosmos, mode='write_behind')
+            try:
+                result = service.save_event_with_result(sample_event_data)
+                assert result.local_ok is True
+                assert result.cloud_status == 'queued'
+
+                assert wait_for_empty(service.outbox)
+                mock_cosmos.return_value.save_event.assert_called_once()
+                assert service.get_metrics()['sync']['replayed'] == 1
+            finally:
+                service.close()
+
+    def test_bulk_cloud_failures_are_queued(self, temp_data_dir):
+        """Test that items failing a bulk cloud write are queued individually"""
+        with patch('services.hybrid_service.LocalDataService') as mock_local, \
+             patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+
+            events = [{'event_id': f"e{i}", 'entity_id': 'claim-1', 'event_type': 'imported'}
+                      for i in range(3)]
+            mock_local.return_value.save_events_bulk.side_effect = lambda objs: [
+                BulkItemResult(obj.event_id, True) for obj in objs]
+            mock_cosmos.return_value.save_events_bulk.side_effect = lambda items: [
+                BulkItemResult(item['event_id'], item['event_id'] != 'e1', error='throttled')
+                for item in items]
+            service = self.make_service(temp_data_dir, mock_cosmos)
+            try:
+                results = service.save_events_bulk(events)
+                assert [r.cloud_status for r in results] == ['ok', 'failed', 'ok']
+                assert results[1].queued is True and results[1].cloud_error == 'throttled'
+                assert service.outbox.is_pending('event', 'e1')
+                assert service.get_metrics()['outbox']['depth'] == 1
+            finally:
+                service.close()
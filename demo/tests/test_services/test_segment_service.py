@@ -0,0 +1,203 @@
+"""
+Tests for the segmented append-only claim store.
+"""
+import pytest
+import os
+import json
+
+from services.segment_service import SegmentLogStore, SegmentStoreLockedError, SegmentedDataService, main
+from utils.config import Config
+
+
+@pytest.fixture
+def store(temp_data_dir):
+    """Segment store with a small segment cap and no background thread"""
+    store = SegmentLogStore(temp_data_dir, max_segment_bytes=512,
+                            compaction_min_segments=2, background=False)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def segmented_service(temp_data_dir):
+    """SegmentedDataService writing its segments to a temporary directory"""
+    previous = Config.get('storage.segments_dir')
+    Config.set('storage.segments_dir', os.path.join(temp_data_dir, 'segments'))
+    service = SegmentedDataService()
+    yield service
+    service.close()
+    Config.set('storage.segments_dir', previous)
+
+
+class TestSegmentLogStore:
+    """Test cases for SegmentLogStore"""
+
+    def test_put_get_and_overwrite(self, store):
+        """Test that the latest version of a document wins"""
+        store.put('a', {'claim_id': 'a', 'status': 'pending'})
+        store.put('a', {'claim_id': 'a', 'status': 'reviewed'})
+
+        assert store.get('a')['status'] == 'reviewed'
+        assert store.get('missing') is None
+        assert len(store) == 1
+
+    def test_delete(self, store):
+        """Test deleting a key"""
+        store.put('a', {'claim_id': 'a'})
+
+        assert store.delete('a') is True
+        assert store.get('a') is None
+        assert store.delete('a') is False
+
+    def test_list_orders_by_submission_time(self, store):
+        """Test that listings are newest first and paginated"""
+        for i in range(5):
+            store.put(f"c{i}", {'claim_id': f"c{i}", 'submission_time': f"2025-01-0{i + 1}T00:00:00"})
+
+        page = store.list(limit=2, offset=1)
+        assert [doc['claim_id'] for doc in page] == ['c3', 'c2']
+        page = store.list(limit=2, after=('2025-01-03T00:00:00', 'c2'))
+        assert [doc['claim_id'] for doc in page] == ['c1', 'c0']
+
+        store.delete('c1')
+        store.put('c0', {'claim_id': 'c0', 'submission_time': '2025-01-09T00:00:00'})
+        assert [doc['claim_id'] for doc in store.list(limit=2)] == ['c0', 'c4']
+
+    def test_list_summaries(self, temp_data_dir):
+        """Test that summaries are kept in memory and rebuilt on reopen"""
+        store = SegmentLogStore(temp_data_dir, background=False,
+                                summarize=lambda doc: {'claim_id': doc['claim_id']})
+        store.put('a', {'claim_id': 'a', 'submission_time': '2025-01-01T00:00:00', 'description': 'x' * 100})
+        store.put('b', {'claim_id': 'b', 'submission_time': '2025-01-02T00:00:00'})
+        store.delete('b')
+        assert store.list_summaries() == [{'claim_id': 'a'}]
+        store.close()
+
+        reopened = SegmentLogStore(temp_data_dir, background=False,
+                                   summarize=lambda doc: {'claim_id': doc['claim_id']})
+        assert reopened.list_summaries() == [{'claim_id': 'a'}]
+        reopened.close()
+
+    def test_reopen_rebuilds_index(self, temp_data_dir, store):
+        """Test that the index is rebuilt from segments, including deletes"""
+        for i in range(20):
+            store.put(f"c{i}", {'claim_id': f"c{i}", 'value': i})
+        store.put('c1', {'claim_id': 'c1', 'value': 'updated'})
+        store.delete('c2')
+        store.close()
+
+        reopened = SegmentLogStore(temp_data_dir, max_segment_bytes=512, background=False)
+        try:
+            assert len(reopened) == 19
+            assert reopened.get('c1')['value'] == 'updated'
+            assert reopened.get('c2') is None
+            assert reopened.get('c19')['value'] == 19
+        finally:
+            reopened.close()
+
+    def test_segments_are_size_capped(self, temp_data_dir, store):
+        """Test that appends roll over to new segment files"""
+        for i in range(20):
+            store.put(f"c{i}", {'claim_id': f"c{i}", 'description': 'x' * 50})
+
+        segments = [f for f in os.listdir(temp_data_dir) if f.endswith('.log')]
+        assert len(segments) > 1
+        for name in segments:
+            assert os.path.getsize(os.path.join(temp_data_dir, name)) <= 512
+
+    def test_compaction_drops_garbage(self, temp_data_dir, store):
+        """Test that compaction keeps live data and reclaims space"""
+        for round_number in range(5):
+            for i in range(5):
+                store.put(f"c{i}", {'claim_id': f"c{i}", 'round': round_number})
+        store.delete('c4')
+        size_before = sum(os.path.getsize(os.path.join(temp_data_dir, f))
+                          for f in os.listdir(temp_data_dir))
+
+        assert store.should_compact()
+        assert store.compact() > 0
+
+        size_after = sum(os.path.getsize(os.path.join(temp_data_dir, f))
+                         for f in os.listdir(temp_data_dir))
+        assert size_after < size_before
+        assert store.get('c4') is None
+        for i in range(4):
+            assert store.get(f"c{i}")['round'] == 4
+
+        store.close()
+        reopened = SegmentLogStore(temp_data_dir, max_segment_bytes=512, background=False)
+        try:
+            assert len(reopened) == 4
+            assert reopened.get('c0')['round'] == 4
+        finally:
+            reopened.close()
+
+    def test_torn_tail_is_truncated(self, temp_data_dir, store):
+        """Test recovery from a partially written final record"""
+        store.put('a', {'claim_id': 'a'})
+        store.close()
+
+        segment = sorted(f for f in os.listdir(temp_data_dir) if f.endswith('.log'))[-1]
+        with open(os.path.join(temp_data_dir, segment), 'ab') as f:
+            f.write(b'{"op":"put","key":"b","doc":{')
+
+        reopened = SegmentLogStore(temp_data_dir, background=False)
+        try:
+            assert reopened.get('a') == {'claim_id': 'a'}
+            assert reopened.get('b') is None
+            reopened.put('c', {'claim_id': 'c'})
+            assert reopened.get('c') == {'claim_id': 'c'}
+        finally:
+            reopened.close()
+
+    def test_one_writer_per_directory(self, temp_data_dir, store):
+        """Test that a second store on an open directory fails until the first is closed"""
+        with pytest.raises(SegmentStoreLockedError, match=str(os.getpid())):
+            SegmentLogStore(temp_data_dir, background=False)
+        store.close()
+
+        reopened = SegmentLogStore(temp_data_dir, background=False)
+        reopened.close()
+
+
+class TestSegmentedDataService:
+    """Test cases for SegmentedDataService"""
+
+    def test_claim_lifecycle(self, segmented_service, sample_claim_data):
+        """Test save, get, update, list and delete through the service API"""
+        claim_id = segmented_service.save_claim(sample_claim_data)
+        assert claim_id == sample_claim_data['claim_id']
+        assert not os.path.exists(os.path.join(segmented_service.claims_dir, f"{claim_id}.json"))
+
+        assert segmented_service.get_claim(claim_id).claim_amount == sample_claim_data['claim_amount']
+
+        updated = segmented_service.update_claim(claim_id, {'status': 'reviewed'})
+        assert updated.status == 'reviewed'
+        assert segmented_service.get_claim(claim_id).status == 'reviewed'
+        assert segmented_service.get_aggregates()['by_status']['reviewed']['count'] == 1
+
+        assert claim_id in [c.claim_id for c in segmented_service.list_claims()]
+
+        assert segmented_service.delete_claim(claim_id) is True
+        assert segmented_service.get_claim(claim_id) is None
+        assert segmented_service.get_aggregates()['total']['count'] == 0
+
+    def test_migrate_from_files(self, temp_data_dir, segmented_service, sample_claim_data):
+        """Test importing the per-file layout"""
+        legacy_dir = os.path.join(temp_data_dir, 'legacy')
+        os.makedirs(legacy_dir)
+        with open(os.path.join(legacy_dir, f"{sample_claim_data['claim_id']}.json"), 'w') as f:
+            json.dump(sample_claim_data, f)
+
+        assert segmented_service.migrate_from_files(legacy_dir) == 1
+        assert segmented_service.migrate_from_files(legacy_dir, remove_source=True) == 0
+        assert os.listdir(legacy_dir) == []
+        assert segmented_service.get_aggregates()['total']['count'] == 1
+
+        claim = segmented_service.get_claim(sample_claim_data['claim_id'])
+        assert claim.description == sample_claim_data['description']
+
+    def test_maintenance_refuses_a_live_store(self, segmented_service, capsys):
+        """Test that compact exits with an error while the service holds the store"""
+        assert main(['compact']) == 1
+        assert 'already open' in capsys.readouterr().out
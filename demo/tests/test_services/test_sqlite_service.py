@@ -0,0 +1,243 @@
+"""
+Tests for the SQLite storage backend.
+"""
+import pytest
+import os
+import json
+import threading
+import uuid
+import sqlite3
+from unittest.mock import patch
+
+from services.event_store import EntityEventStore
+from services.sqlite_service import SQLiteDataService
+from services.hybrid_service import HybridDataService
+from utils.config import Config
+
+
+@pytest.fixture
+def sqlite_service(temp_data_dir):
+    """SQLiteDataService using a database in a temporary directory"""
+    keys = ('storage.sqlite_path', 'storage.events_dir')
+    previous = [Config.get(key) for key in keys]
+    Config.set('storage.sqlite_path', os.path.join(temp_data_dir, 'claims.db'))
+    Config.set('storage.events_dir', os.path.join(temp_data_dir, 'events'))
+    service = SQLiteDataService()
+    yield service
+    service.close()
+    for key, value in zip(keys, previous):
+        Config.set(key, value)
+
+
+def make_claim(claim_id, submission_time, status='pending', fraud_score=None):
+    """Build a minimal claim dictionary"""
+    return {'claim_id': claim_id, 'claim_amount': 100.0, 'description': 'Test claim',
+            'submission_time': submission_time, 'status': status, 'fraud_score': fraud_score}
+
+
+class TestSQLiteDataService:
+    """Test cases for SQLiteDataService"""
+
+    def test_wal_mode(self, sqlite_service):
+        """Test that the database is opened in WAL mode"""
+        mode = sqlite_service._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == 'wal'
+
+    def test_claim_lifecycle(self, sqlite_service, sample_claim_data):
+        """Test save, get, update, list and delete through the service API"""
+        claim_id = sqlite_service.save_claim(sample_claim_data)
+        assert not os.path.exists(os.path.join(sqlite_service.claims_dir, f"{claim_id}.json"))
+        assert sqlite_service.get_claim(claim_id).claim_amount == sample_claim_data['claim_amount']
+
+        updated = sqlite_service.update_claim(claim_id, {'status': 'reviewed'})
+        assert updated.status == 'reviewed'
+        assert sqlite_service.get_claim(claim_id).status == 'reviewed'
+        assert claim_id in [c.claim_id for c in sqlite_service.list_claims()]
+
+        assert sqlite_service.delete_claim(claim_id) is True
+        assert sqlite_service.get_claim(claim_id) is None
+        assert sqlite_service.delete_claim(claim_id) is False
+
+    def test_list_claims_pagination(self, sqlite_service):
+        """Test that listings are ordered newest first and paginated"""
+        for i in range(5):
+            sqlite_service.save_claim(make_claim(f"c{i}", f"2024-01-0{i + 1}T00:00:00"))
+
+        first = sqlite_service.list_claims(limit=2)
+        second = sqlite_service.list_claims(limit=2, offset=2)
+        assert [c.claim_id for c in first] == ['c4', 'c3']
+        assert [c.claim_id for c in second] == ['c2', 'c1']
+        with pytest.raises(ValueError):
+            sqlite_service._list_claim_records(10, 0, 'claim_amount')
+
+    def test_list_claims_page_walks_all_claims(self, sqlite_service):
+        """Test that following cursors visits every claim once, ties included"""
+        for i in range(7):
+            sqlite_service.save_claim(make_claim(f"c{i}", f"2024-01-0{i % 3 + 1}T00:00:00"))
+
+        seen = []
+        claims, cursor = sqlite_service.list_claims_page(limit=3)
+        seen.extend(claims)
+        while cursor:
+            claims, cursor = sqlite_service.list_claims_page(limit=3, cursor=cursor)
+            seen.extend(claims)
+        assert sorted(c.claim_id for c in seen) == [f"c{i}" for i in range(7)]
+        assert [c.claim_id for c in seen] == [c.claim_id for c in sqlite_service.list_claims(limit=10)]
+
+    def test_list_claim_summaries(self, sqlite_service):
+        """Test that summaries come from the indexed columns and share cursors with claims"""
+        for i in range(4):
+            claim = make_claim(f"c{i}", f"2024-01-0{i + 1}T00:00:00")
+            claim['uploaded_files'] = [{'original_name': f"{n}.pdf", 'saved_name': f"{n}.pdf",
+                                        'file_path': f"uploads/{n}.pdf", 'file_type': 'pdf',
+                                        'file_size': 1} for n in range(i)]
+            sqlite_service.save_claim(claim)
+
+        summaries, cursor = sqlite_service.list_claim_summaries_page(limit=2, fields=['claim_id', 'files_count'])
+        assert summaries == [{'claim_id': 'c3', 'files_count': 3}, {'claim_id': 'c2', 'files_count': 2}]
+        claims, _ = sqlite_service.list_claims_page(limit=2, cursor=cursor)
+        assert [c.claim_id for c in claims] == ['c1', 'c0']
+        assert sqlite_service.list_claim_summaries(limit=1, offset=3)[0]['status'] == 'pending'
+
+    def test_summary_columns_are_backfilled(self, temp_data_dir):
+        """Test that databases without the files_count column are migrated"""
+        path = os.path.join(temp_data_dir, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE claims (claim_id TEXT PRIMARY KEY, submission_time TEXT,
+            updated_time TEXT, status TEXT, fraud_score REAL, claim_amount REAL, doc TEXT NOT NULL)""")
+        doc = dict(make_claim('old', '2024-01-01T00:00:00'), uploaded_files=[{}, {}])
+        conn.execute("INSERT INTO claims VALUES ('old', '2024-01-01T00:00:00', '', 'pending', NULL, 100.0, ?)",
+                     (json.dumps(doc),))
+        conn.commit()
+        conn.close()
+
+        previous = Config.get('storage.sqlite_path')
+        Config.set('storage.sqlite_path', path)
+        try:
+            service = SQLiteDataService()
+            assert service.list_claim_summaries(fields=['claim_id', 'files_count']) == \
+                [{'claim_id': 'old', 'files_count': 2}]
+            service.close()
+        finally:
+            Config.set('storage.sqlite_path', previous)
+
+    def test_list_events_page(self, sqlite_service, sample_event_data):
+        """Test cursor pagination of an entity's events"""
+        for i in range(3):
+            sqlite_service.save_event(dict(sample_event_data, event_id=f"e{i}"))
+
+        entity_id = sample_event_data['entity_id']
+        first, cursor = sqlite_service.list_events_page(entity_id, limit=2)
+        second, last_cursor = sqlite_service.list_events_page(entity_id, limit=2, cursor=cursor)
+        assert [e.event_id for e in first + second] == ['e2', 'e1', 'e0']
+        assert last_cursor is None
+
+    def test_find_claims(self, sqlite_service):
+        """Test filtering by status, fraud score and submission time"""
+        sqlite_service.save_claim(make_claim('low', '2024-01-01T00:00:00', 'approved', 0.1))
+        sqlite_service.save_claim(make_claim('high', '2024-02-01T00:00:00', 'pending', 0.9))
+        sqlite_service.save_claim(make_claim('mid', '2024-03-01T00:00:00', 'pending', 0.5))
+
+        assert [c.claim_id for c in sqlite_service.find_claims(status='pending')] == ['mid', 'high']
+        assert [c.claim_id for c in sqlite_service.find_claims(min_fraud_score=0.5)] == ['mid', 'high']
+        assert [c.claim_id for c in sqlite_service.find_claims(
+            submitted_from='2024-01-15', submitted_to='2024-02-15')] == ['high']
+
+    def test_events(self, sqlite_service, sample_event_data):
+        """Test that events are stored in the events table, newest first"""
+        sqlite_service.save_event(sample_event_data)
+        sqlite_service.save_event(dict(sample_event_data, event_id='second'))
+
+        events = sqlite_service.list_events(sample_event_data['entity_id'])
+        assert [e.event_id for e in events] == ['second', sample_event_data['event_id']]
+        assert sqlite_service.list_events(limit=1)[0].event_id == 'second'
+
+    def test_bulk_save(self, sqlite_service, sample_event_data):
+        """Test that bulk saves store valid records and report invalid ones"""
+        prefix = uuid.uuid4().hex
+        claims = [make_claim(f"{prefix}-{i}", f"2024-01-0{i + 1}T00:00:00") for i in range(3)]
+        claims.insert(1, {'claim_id': 'bad', 'claim_amount': 'lots', 'description': ''})
+        results = sqlite_service.save_claims_bulk(claims)
+
+        assert [r.ok for r in results] == [True, False, True, True]
+        assert results[1].item_id == 'bad' and results[1].error
+        assert sqlite_service.count_claims() == 3
+        assert sqlite_service.get_claim(f"{prefix}-2").updated_time is not None
+        assert len(sqlite_service.get_claim_history(f"{prefix}-0")) == 1
+
+        events = [dict(sample_event_data, event_id=f"e{i}") for i in range(5)]
+        assert all(r.ok for r in sqlite_service.save_events_bulk(events))
+        assert len(sqlite_service.list_events(sample_event_data['entity_id'])) == 5
+
+    def test_concurrent_writers(self, sqlite_service):
+        """Test writes from several threads at once"""
+        def write(prefix):
+            for i in range(20):
+                sqlite_service.save_claim(make_claim(f"{prefix}-{i}", '2024-01-01T00:00:00'))
+
+        threads = [threading.Thread(target=write, args=(f"t{n}",)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sqlite_service.count_claims() == 80
+
+    def test_migrate_from_files(self, temp_data_dir, sqlite_service, sample_claim_data):
+        """Test importing the per-file layout"""
+        legacy_dir = os.path.join(temp_data_dir, 'legacy')
+        os.makedirs(legacy_dir)
+        with open(os.path.join(legacy_dir, f"{sample_claim_data['claim_id']}.json"), 'w') as f:
+            json.dump(sample_claim_data, f)
+
+        assert sqlite_service.migrate_from_files(legacy_dir) == 1
+        assert sqlite_service.migrate_from_files(legacy_dir) == 0
+        claim = sqlite_service.get_claim(sample_claim_data['claim_id'])
+        assert claim.description == sample_claim_data['description']
+
+    def test_file_events_are_imported(self, temp_data_dir, sqlite_service, sample_event_data):
+        """Test that events written by the file engine stay visible after switching to SQLite"""
+        events_dir = os.path.join(temp_data_dir, 'file-events')
+        EntityEventStore(events_dir).append_many([dict(sample_event_data, event_id=f"e{i}") for i in range(2)])
+        with open(os.path.join(events_dir, 'legacy.json'), 'w') as f:
+            json.dump(dict(sample_event_data, event_id='legacy', timestamp='2000-01-01T00:00:00'), f)
+
+        assert sqlite_service.migrate_events_from_files(events_dir) == 3
+        assert sqlite_service.migrate_events_from_files(events_dir) == 0
+        EntityEventStore(events_dir).append(dict(sample_event_data, event_id='e2'))
+        assert sqlite_service.migrate_events_from_files(events_dir) == 1
+
+        events = sqlite_service.list_events(sample_event_data['entity_id'])
+        assert sorted(e.event_id for e in events) == ['e0', 'e1', 'e2', 'legacy']
+        assert not os.path.exists(os.path.join(sqlite_service.events_dir, 'entities'))
+
+    def test_aggregates_follow_writes(self, sqlite_service):
+        """Test that saves, updates and deletes keep the aggregates in step with a rebuild"""
+        sqlite_service.save_claim(make_claim('a', '2024-01-01T00:00:00', fraud_score=0.3))
+        sqlite_service.save_claim(make_claim('b', '2024-01-02T00:00:00'))
+        sqlite_service.update_claim('a', {'status': 'approved'})
+        sqlite_service.delete_claim('b')
+
+        stats = sqlite_service.get_aggregates()
+        assert stats['total'] == {'count': 1, 'amount': 100.0}
+        assert stats['by_status'] == {'approved': {'count': 1, 'amount': 100.0}}
+        assert sqlite_service.rebuild_aggregates() == 1
+        assert sqlite_service.get_aggregates()['fraud_score_histogram'] == stats['fraud_score_histogram']
+
+    def test_hybrid_uses_sqlite_engine(self, temp_data_dir, sample_claim_data):
+        """Test that storage.engine selects the SQLite backend"""
+        previous = (Config.get('storage.engine'), Config.get('storage.sqlite_path'))
+        Config.set('storage.engine', 'sqlite')
+        Config.set('storage.sqlite_path', os.path.join(temp_data_dir, 'hybrid.db'))
+        try:
+            with patch('services.hybrid_service.CosmosDBService') as mock_cosmos:
+                mock_cosmos.return_value.is_connected.return_value = False
+                service = HybridDataService()
+            assert isinstance(service.local_service, SQLiteDataService)
+
+            claim_id = service.save_claim(sample_claim_data)
+            service.claim_cache.clear()
+            assert service.get_claim(claim_id)['claim_id'] == claim_id
+            service.local_service.close()
+        finally:
+            Config.set('storage.engine', previous[0])
+            Config.set('storage.sqlite_path', previous[1])
@@ -0,0 +1,47 @@
+"""
+Tests for the keyset pagination helpers.
+"""
+import pytest
+
+from utils.pagination import encode_cursor, decode_cursor, keyset_page, InvalidCursorError
+
+
+class TestCursors:
+    """Test cases for cursor encoding"""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the state it was built from"""
+        state = {'sort_by': 'submission_time', 'after': ['2025-01-01T00:00:00', 'claim/1?&']}
+        cursor = encode_cursor(state)
+        assert '=' not in cursor and '/' not in cursor
+        assert decode_cursor(cursor) == state
+
+    @pytest.mark.parametrize('cursor', ['not-a-cursor', '!!!', encode_cursor([1, 2])[:-2], ''])
+    def test_invalid_cursor(self, cursor):
+        """Test that malformed cursors raise InvalidCursorError"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
+
+
+class TestKeysetPage:
+    """Test cases for keyset_page"""
+
+    def test_pages_cover_every_key_once(self):
+        """Test that following the last key of each page visits all keys, ties included"""
+        keys = sorted([('2025-01-02', 'b'), ('2025-01-01', 'a'), ('2025-01-02', 'a'),
+                       ('2025-01-03', 'c'), ('2025-01-02', 'c')])
+        seen = []
+        after = None
+        while True:
+            page = keyset_page(keys, 2, after=after)
+            if not page:
+                break
+            seen.extend(page)
+            after = page[-1]
+        assert seen == list(reversed(keys))
+
+    def test_offset(self):
+        """Test offset-based slicing from the newest key"""
+        keys = [(str(i), str(i)) for i in range(5)]
+        assert keyset_page(keys, 2, offset=1) == [('3', '3'), ('2', '2')]
+        assert keyset_page(keys, 2, offset=10) == []
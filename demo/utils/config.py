@@ -14,19 +14,88 @@ class Config:
             'debug': True,
             'upload_folder': 'uploads',
             'max_file_size': 16 * 1024 * 1024,  # 16MB
-            'allowed_extensions': {'pdf', 'png', 'jpg', 'jpeg', 'gif'}
+            'allowed_extensions': {'pdf', 'png', 'jpg', 'jpeg', 'gif'},
+            'upload_chunk_bytes': 64 * 1024,
+            'upload_workers': 4,  # evidence files of one submission persisted concurrently
+            'upload_fsync': False,
+            'download_max_age': 365 * 24 * 3600,  # uploads are immutable
+            'download_offload': '',  # '', 'x-sendfile' or 'x-accel-redirect'
+            'x_accel_redirect_prefix': '/protected-uploads/',  # nginx internal location of the upload folder
+            'json_etags': True,  # ETags and 304s on /list_claims, /get_claim and /events
+            'compression_min_bytes': 1024,  # smaller JSON responses are sent uncompressed
+            'compression_level': 6
         },
         'storage': {
+            'engine': 'file',  # 'file', 'segment' (one process only) or 'sqlite'
             'claims_dir': 'claims_data',
             'events_dir': 'events_data',
-            'backup_dir': 'backups'
+            'backup_dir': 'backups',
+            'segments_dir': 'claims_segments',
+            'segment_max_bytes': 4 * 1024 * 1024,
+            'compaction_min_segments': 4,
+            'compaction_garbage_ratio': 0.5,
+            'segment_fsync': False,
+            'sqlite_path': 'claims.db',
+            'sqlite_synchronous': 'NORMAL',  # NORMAL is crash-safe in WAL mode
+            'sqlite_busy_timeout': 5.0,
+            'event_durability': 'async',  # 'sync', 'group' or 'async'
+            'event_batch_size': 256,
+            'event_flush_interval': 0.05,
+            'history_keyframe_interval': 20,
+            'write_version_max_bytes': 1024 * 1024  # marker size at which it is replaced
+        },
+        'hybrid': {
+            'write_mode': 'concurrent',  # 'concurrent', 'sequential' or 'write_behind'
+            'write_deadline_seconds': 5.0,
+            'write_workers': 8,
+            'outbox_path': 'outbox.db',
+            'late_write_hold_seconds': 60.0,
+            'sync_batch_size': 100,
+            'sync_interval_seconds': 1.0,
+            'sync_retry_delay_seconds': 1.0,
+            'sync_max_backoff_seconds': 300.0,
+            'async_storage': False,  # serve storage calls from one event loop per worker
+            'async_call_timeout_seconds': 30.0,
+            # Request threads per gunicorn worker with async storage; each one
+            # only waits on the event loop, so this caps storage calls in flight
+            'async_request_threads': 128,
+            'change_feed_enabled': False,  # replicate Cosmos DB changes locally and read locally first
+            'change_feed_checkpoint_path': 'change_feed.checkpoint.json',
+            'change_feed_interval_seconds': 5.0,
+            'change_feed_page_size': 100
+        },
+        'processing': {
+            'async_submit': True,  # queue submissions and answer 202; False processes them inline
+            'jobs_path': 'jobs.db',
+            'workers': 4,
+            'max_attempts': 5,
+            'retry_delay_seconds': 1.0,
+            'max_backoff_seconds': 60.0,
+            'lease_seconds': 300.0,  # a job held longer is taken over by another worker
+            'job_retention_seconds': 86400.0
+        },
+        'cache': {
+            'enabled': True,
+            'max_entries': 1024,
+            'ttl_seconds': 30.0
         },
         'database': {
             'use_cosmos': False,
             'cosmos_endpoint': os.environ.get('COSMOS_ENDPOINT', ''),
             'cosmos_key': os.environ.get('COSMOS_KEY', ''),
             'cosmos_database': os.environ.get('COSMOS_DATABASE', 'insurance-fraud-db'),
-            'cosmos_container': os.environ.get('COSMOS_CONTAINER', 'claims')
+            'cosmos_container': os.environ.get('COSMOS_CONTAINER', 'claims'),
+            'bulk_max_workers': 8,
+            'bulk_batch_size': 100,  # Cosmos DB caps transactional batches at 100
+            'cosmos_pool_size': 32,  # keep-alive connections of the shared client
+            'cosmos_connection_timeout': 10,
+            'circuit_failure_threshold': 5,  # consecutive failures that open the circuit
+            'circuit_reset_seconds': 30.0,
+            'health_probe_interval_seconds': 10.0,
+            # Operations above either threshold are written to the 'cosmos.slow' log
+            'slow_query_request_charge': 50.0,
+            'slow_query_ms': 500.0,
+            'aggregate_shards': 8  # counter documents patched at random by writers
         }
     }
     
@@ -0,0 +1,131 @@
+"""
+Conditional responses and compression for the JSON read API.
+
+ETags are derived from a storage write version and the request, not from the
+response body, so a matching If-None-Match can be answered with 304 before
+any data is loaded. Bodies above a size threshold are compressed with brotli
+when the optional brotli package is installed and the client accepts it, and
+with gzip otherwise.
+"""
+import gzip
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+def version_etag(version: str, *parts: str) -> str:
+    """
+    Build an ETag value from a write version and the request it answers
+
+    Args:
+        version: Write version of the storage the response is read from
+        parts: Anything else the response depends on, e.g. path and query string
+
+    Returns:
+        str: Opaque ETag value, without quotes
+    """
+    digest = hashlib.sha1(version.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\0' + part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """
+    Pick the content coding for a response
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        Optional[str]: 'br', 'gzip', or None to send the body as is
+    """
+    if brotli is not None and accept_encodings['br'] and \
+            accept_encodings['br'] >= accept_encodings['gzip']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(data: bytes, encoding: str, level: int = 6) -> bytes:
+    """Compress a body with 'br' or 'gzip' at a gzip-style level from 1 to 9"""
+    if encoding == 'br':
+        # Brotli qualities run to 11; 4 to 6 match gzip -6 in speed
+        return brotli.compress(data, quality=min(11, max(0, level - 1)))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class ResponseStats:
+    """Counters of conditional and compressed responses, reported in /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            'responses': 0,
+            'not_modified': 0,
+            'compressed': 0,
+            'bytes_uncompressed': 0,
+            'bytes_sent': 0,
+            'bytes_saved': 0
+        }
+
+    def record_not_modified(self) -> None:
+        """Count a 304 answered without loading data"""
+        with self._lock:
+            self._counters['responses'] += 1
+            self._counters['not_modified'] += 1
+
+    def record_body(self, size: int, sent: int) -> None:
+        """Count a full response of `size` bytes sent as `sent` bytes"""
+        with self._lock:
+            self._counters['responses'] += 1
+            self._counters['bytes_uncompressed'] += size
+            self._counters['bytes_sent'] += sent
+            if sent < size:
+                self._counters['compressed'] += 1
+                self._counters['bytes_saved'] += size - sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the counters, with the 304 ratio and the encodings available"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats['not_modified_ratio'] = round(stats['not_modified'] / stats['responses'], 4) \
+            if stats['responses'] else 0.0
+        stats['encodings'] = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return stats
+
+
+def compress_response(response, accept_encodings, min_bytes: int, level: int,
+                      stats: Optional[ResponseStats] = None):
+    """
+    Compress a buffered response in place when it is large enough
+
+    Args:
+        response: Flask response
+        accept_encodings: The request's parsed Accept-Encoding header
+        min_bytes: Bodies smaller than this are sent as is
+        level: Compression level from 1 to 9
+        stats: Counters to record the response in
+
+    Returns:
+        The response
+    """
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    data = response.get_data()
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings) if len(data) >= min_bytes else None
+    if encoding:
+        compressed = compress_body(data, encoding, level)
+        if len(compressed) < len(data):
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = encoding
+    if stats is not None:
+        stats.record_body(len(data), response.content_length or 0)
+    return response
@@ -0,0 +1,59 @@
+"""
+Cursor helpers for keyset pagination.
+
+A cursor is an opaque, URL-safe token describing where the previous page
+ended, so the next page starts there directly instead of skipping an
+ever-growing number of rows.
+"""
+import base64
+import bisect
+import json
+from typing import Dict, List, Any, Optional, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Encode pagination state as an opaque URL-safe string"""
+    data = json.dumps(state, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {str(e)}")
+    if not isinstance(state, dict):
+        raise InvalidCursorError("Invalid cursor")
+    return state
+
+
+def keyset_page(keys: List[Tuple], limit: int, offset: int = 0,
+                after: Optional[Tuple] = None) -> List[Tuple]:
+    """
+    Slice one page, newest first, out of an ascending list of sort keys
+
+    Args:
+        keys: Sort keys in ascending order
+        limit: Maximum number of keys to return
+        offset: Number of keys to skip
+        after: Only return keys strictly below this one (the previous page's last key)
+
+    Returns:
+        List[Tuple]: Keys in descending order
+    """
+    end = len(keys) if after is None else bisect.bisect_left(keys, tuple(after))
+    end = max(end - offset, 0)
+    start = max(end - limit, 0)
+    return list(reversed(keys[start:end]))